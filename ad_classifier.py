@@ -0,0 +1,129 @@
+"""
+Ad Classifier - Bộ phân loại quảng cáo dùng chung cho bản console và tray
+
+Toàn bộ luật (dấu phân cách, từ khóa, từ khóa khớp nguyên từ, danh sách nghệ sĩ
+được bỏ qua/luôn chặn) được biên dịch một lần thành regex và tập hợp. Kết quả cho từng tiêu đề được
+nhớ trong LRU có giới hạn vì Spotify chỉ hiển thị một số ít tiêu đề khác nhau.
+"""
+
+import re
+from functools import lru_cache
+
+
+# Các từ khóa để nhận diện quảng cáo (khớp chuỗi con, không phân biệt hoa thường)
+AD_KEYWORDS = (
+    'advertisement',
+    'quảng cáo',
+    'spotify',  # Khi chỉ hiện "Spotify" không có tên bài hát
+)
+
+# Từ khóa chỉ khớp nguyên từ, vd thêm 'ad' ở đây sẽ không bắt nhầm "Radiohead"
+WORD_KEYWORDS = ()
+
+# Nhạc Spotify thường có dạng "Artist - Song"
+# Các dấu gạch có thể là: hyphen (-), en-dash (–), em-dash (—)
+SEPARATORS = (' - ', ' – ', ' — ')
+
+# Nghệ sĩ/playlist chính chủ của Spotify, tên chứa "spotify" nhưng là nhạc thật
+ALLOWED_ARTISTS = (
+    'spotify singles',
+)
+
+# Nghệ sĩ/tiêu đề luôn bị coi là quảng cáo dù có dạng "Artist - Song"
+DENIED_ARTISTS = ()
+DENIED_TITLES = ()
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+class AdClassifier:
+    """
+    Phân loại tiêu đề cửa sổ Spotify: quảng cáo hay nhạc
+    """
+
+    def __init__(self, keywords=AD_KEYWORDS, word_keywords=WORD_KEYWORDS,
+                 separators=SEPARATORS, allowed_artists=ALLOWED_ARTISTS,
+                 denied_artists=DENIED_ARTISTS, denied_titles=DENIED_TITLES,
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            keywords: Từ khóa quảng cáo (khớp chuỗi con)
+            word_keywords: Từ khóa quảng cáo (khớp nguyên từ)
+            separators: Các dấu phân cách "Artist - Song"
+            allowed_artists: Nghệ sĩ luôn được coi là nhạc
+            denied_artists: Nghệ sĩ luôn bị coi là quảng cáo
+            denied_titles: Tiêu đề (nguyên văn, không phân biệt hoa thường) luôn là quảng cáo
+            cache_size: Số tiêu đề tối đa được nhớ kết quả
+        """
+        self.keywords = tuple(keywords)
+        self.word_keywords = tuple(word_keywords)
+        self.separators = tuple(separators)
+        self.allowed_artists = frozenset(a.lower().strip() for a in allowed_artists)
+        self.denied_artists = frozenset(a.lower().strip() for a in denied_artists)
+        self.denied_titles = frozenset(t.lower().strip() for t in denied_titles)
+
+        self._separator_re = re.compile(self._separator_pattern(self.separators))
+        # Tiêu đề được lower() trước khi so, nên regex không cần IGNORECASE (chậm hơn)
+        patterns = [re.escape(k.lower()) for k in self.keywords]
+        patterns += [r'\b' + re.escape(k.lower()) + r'\b' for k in self.word_keywords]
+        # Regex không bao giờ khớp nếu không có từ khóa nào
+        self._keyword_re = re.compile('|'.join(patterns) or r'(?!)')
+
+        self._cached = lru_cache(maxsize=cache_size)(self._classify)
+
+    @staticmethod
+    def _separator_pattern(separators) -> str:
+        """
+        Gộp các dấu phân cách dạng " X " thành một character class " [X] "
+        (nhanh hơn nhiều so với phép OR giữa các chuỗi)
+        """
+        if separators and all(len(sep) == 3 and sep[0] == sep[2] == ' ' for sep in separators):
+            return ' [' + ''.join(re.escape(sep[1]) for sep in separators) + '] '
+        return '|'.join(re.escape(sep) for sep in separators) or r'(?!)'
+
+    def is_ad(self, window_title: str) -> bool:
+        """
+        Kiểm tra tiêu đề có phải quảng cáo không (có cache)
+
+        Args:
+            window_title: Tiêu đề cửa sổ Spotify
+
+        Returns:
+            True nếu đang phát quảng cáo, False nếu không
+        """
+        if not window_title:
+            return False
+        return self._cached(window_title)
+
+    __call__ = is_ad
+
+    def _classify(self, window_title: str) -> bool:
+        if self.denied_titles and window_title.strip().lower() in self.denied_titles:
+            return True
+
+        match = self._separator_re.search(window_title)
+        if match is None:
+            # Không có dấu gạch phân cách -> Khả năng cao là quảng cáo
+            return True
+
+        if self.denied_artists and (
+                window_title[:match.start()].strip().lower() in self.denied_artists):
+            return True
+
+        # Có định dạng nhạc nhưng chứa từ khóa quảng cáo
+        if self._keyword_re.search(window_title.lower()) is None:
+            return False
+
+        # Nghệ sĩ trong allow-list được bỏ qua dù tên chứa từ khóa
+        artist = window_title[:match.start()].strip().lower()
+        return artist not in self.allowed_artists
+
+    def has_separator(self, window_title: str) -> bool:
+        """Tiêu đề có dạng "Artist - Song" (không có thì bị coi là quảng cáo theo mặc định)"""
+        return self._separator_re.search(window_title) is not None
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def clear_cache(self):
+        self._cached.cache_clear()
@@ -0,0 +1,111 @@
+"""
+Ad History - Truy vấn lịch sử quảng cáo từ spotify_events.bin
+
+Chạy:
+    python ad_history.py summary [--since 7d]
+    python ad_history.py ads-per-hour [--since 24h]
+    python ad_history.py ad-length [--since 30d]
+    python ad_history.py misclassified [--since 7d] [--limit 20]
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+
+from event_store import (EVENTS_FILE, EventLog, ad_breaks, ads_per_hour, median_ad_length,
+                         misclassifications, mute_latency)
+
+UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_since(value: str, now: float = None) -> float:
+    """'90m', '24h', '7d', '2w' -> mốc Unix time; None/'all' = toàn bộ lịch sử"""
+    if value in (None, 'all'):
+        return None
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([mhdw])', value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"khoảng thời gian không hợp lệ: {value}")
+    now = time.time() if now is None else now
+    return now - float(match.group(1)) * UNITS[match.group(2)]
+
+
+def format_time(ts: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+
+
+def cmd_summary(log: EventLog, since: float, args) -> dict:
+    rate = ads_per_hour(log, since)
+    breaks = ad_breaks(log, since)
+    return {
+        'events': len(log),
+        'ad_breaks': len(breaks),
+        'ads_per_hour': rate['rate'],
+        'listening_hours': rate['listening_hours'],
+        'median_ad_length_s': round(median_ad_length(log, since), 1),
+        'misclassifications': len(misclassifications(log, since)),
+        'mute_latency': mute_latency(log, since),
+    }
+
+
+def cmd_ads_per_hour(log: EventLog, since: float, args) -> dict:
+    return ads_per_hour(log, since)
+
+
+def cmd_ad_length(log: EventLog, since: float, args) -> dict:
+    lengths = [b.end - b.start for b in ad_breaks(log, since)]
+    return {
+        'ad_breaks': len(lengths),
+        'median_s': round(statistics.median(lengths), 1) if lengths else 0.0,
+        'max_s': round(max(lengths), 1) if lengths else 0.0,
+        'total_muted_min': round(sum(lengths) / 60, 1),
+    }
+
+
+def cmd_misclassified(log: EventLog, since: float, args) -> dict:
+    found = misclassifications(log, since)
+    counts = {}
+    for item in found:
+        counts[item.reason] = counts.get(item.reason, 0) + 1
+    return {
+        'counts': counts,
+        'examples': [
+            {'time': format_time(item.ts), 'reason': item.reason, 'title': item.title}
+            for item in found[-args.limit:]
+        ],
+    }
+
+
+COMMANDS = {
+    'summary': cmd_summary,
+    'ads-per-hour': cmd_ads_per_hour,
+    'ad-length': cmd_ad_length,
+    'misclassified': cmd_misclassified,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Truy vấn lịch sử quảng cáo")
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--since', type=parse_since, default=None,
+                        help="Chỉ xét khoảng gần đây: 90m, 24h, 7d, 2w (mặc định: tất cả)")
+    parser.add_argument('--file', default=EVENTS_FILE)
+    parser.add_argument('--limit', type=int, default=20, help="Số ví dụ tối đa")
+    args = parser.parse_args(argv)
+
+    try:
+        log = EventLog(args.file)
+    except ValueError as e:
+        print(f"Lỗi: {e}")
+        return 1
+    with log:
+        result = COMMANDS[args.command](log, args.since, args)
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
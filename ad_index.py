@@ -0,0 +1,302 @@
+"""
+Ad Index - Chỉ mục các quảng cáo đã gặp (tiêu đề -> thời lượng), lưu trên đĩa
+
+Spotify xoay vòng một số ít quảng cáo. Mỗi lần một tiêu đề quảng cáo kết thúc
+(tiêu đề kế tiếp xuất hiện), thời lượng của nó được ghi vào bảng băm địa chỉ mở
+trong file spotify_known_ads.bin:
+
+    header 32 byte  <magic, kích thước slot, số slot, số mục>
+    slot 20 byte    <key u64 (blake2b của tiêu đề, 0 = trống), duration f32,
+                     seen u32, stable u16, 2 byte trống>
+
+File được mở bằng mmap nên khởi động không phải đọc/parse gì, tra cứu là một phép
+băm và vài lần so key. Ghi trực tiếp vào vùng map, hệ điều hành tự đưa xuống đĩa
+(kể cả khi tiến trình bị kill).
+
+Một tiêu đề chỉ được coi là "đã biết" khi các lần gặp liên tiếp có thời lượng gần
+như nhau (stable >= min_stable). Tiêu đề chung (chỉ gồm một từ khóa quảng cáo như
+"Advertisement") và tiêu đề tạm dừng ("Spotify") không bao giờ được học hay tra:
+quảng cáo chung thường dài đúng 15 hoặc 30 giây, và hai lần tạm dừng dài gần bằng
+nhau cũng đủ khớp, nên thời lượng của chúng không nói lên quảng cáo nào đang phát.
+
+Lỗi ghi file (vd trên Windows không thay được file khi instance khác đang map nó)
+chỉ được ghi log: chỉ mục dùng tiếp bảng cũ, không ném exception cho monitor.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from ad_classifier import AD_KEYWORDS
+from detection_state import PAUSE_TITLES
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'spotify_known_ads.bin'
+
+MAGIC = b'SAMADX01'
+HEADER = struct.Struct('<8sIII12x')
+SLOT = struct.Struct('<QfIHxx')
+
+# Bảng đầy hơn mức này thì tăng gấp đôi số slot
+MAX_LOAD = 0.5
+
+# Tiêu đề không mang thông tin về quảng cáo cụ thể (không phân biệt hoa thường)
+GENERIC_TITLES = AD_KEYWORDS + PAUSE_TITLES
+
+# duration: giây (lần gặp gần nhất), seen: số lần gặp, stable: số lần liên tiếp khớp
+KnownAd = namedtuple('KnownAd', ['duration', 'seen', 'stable'])
+
+
+def title_key(title: str) -> int:
+    """Key 64 bit của tiêu đề (0 dành cho slot trống)"""
+    digest = hashlib.blake2b(title.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class KnownAdIndex:
+    """
+    Bảng băm tiêu đề quảng cáo -> thời lượng, map từ file
+
+    Tra cứu và ghi chạy trên thread của event loop; clear() có thể được gọi từ
+    thread nạp cấu hình nên mọi thao tác đi qua một lock.
+    """
+
+    def __init__(self, path: str = INDEX_FILE, tolerance: float = 1.0,
+                 min_stable: int = 1, min_duration: float = 1.0,
+                 max_duration: float = 120.0, capacity: int = 256,
+                 max_capacity: int = 1 << 16, generic_titles=GENERIC_TITLES):
+        """
+        Args:
+            path: File chỉ mục
+            tolerance: Hai lần gặp lệch nhau không quá chừng này giây thì coi là khớp
+            min_stable: Số lần khớp liên tiếp trước khi tiêu đề được coi là đã biết
+            min_duration: Bỏ qua lần gặp ngắn hơn (tiêu đề chớp qua)
+            max_duration: Bỏ qua lần gặp dài hơn (tạm dừng giữa quảng cáo, podcast)
+            capacity: Số slot khi tạo file mới (lũy thừa của 2)
+            max_capacity: Số slot tối đa; đầy thì không học thêm tiêu đề mới
+            generic_titles: Tiêu đề không bao giờ học/tra (từ khóa quảng cáo, tiêu đề
+                tạm dừng)
+        """
+        self.path = path
+        self.tolerance = tolerance
+        self.min_stable = min_stable
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.initial_capacity = capacity
+        self.max_capacity = max_capacity
+        self.set_generic_titles(generic_titles)
+
+        self.capacity = 0
+        self.count = 0
+        self.lookups = 0
+        self.hits = 0
+        self.learned = 0
+        self.rejected = 0
+        self._file = None
+        self._map = None
+        self._lock = threading.Lock()
+
+    # ---- Mở/đóng ----
+
+    def open(self):
+        """Map file chỉ mục (tạo mới nếu chưa có hoặc hỏng)"""
+        with self._lock:
+            try:
+                self._map_file()
+            except (OSError, ValueError) as e:
+                logger.warning("Chỉ mục quảng cáo %s không dùng được (%s), tạo mới",
+                               self.path, e)
+                self._unmap()
+                self._create(self.initial_capacity)
+                self._map_file()
+        logger.debug("Chỉ mục quảng cáo: %s mục / %s slot", self.count, self.capacity)
+        return self
+
+    def _map_file(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+            self._create(self.initial_capacity)
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, slot_size, capacity, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or slot_size != SLOT.size:
+            raise ValueError("định dạng file không đúng")
+        if capacity & (capacity - 1) or len(self._map) != HEADER.size + capacity * SLOT.size:
+            raise ValueError("kích thước file không khớp header")
+        self.capacity = capacity
+        self.count = count
+
+    def _create(self, capacity: int, entries=()):
+        """Ghi file mới (qua file tạm rồi thay thế) với các mục (key, duration, seen, stable)"""
+        table = bytearray(HEADER.size + capacity * SLOT.size)
+        count = 0
+        for key, duration, seen, stable in entries:
+            slot = key & (capacity - 1)
+            while SLOT.unpack_from(table, HEADER.size + slot * SLOT.size)[0]:
+                slot = (slot + 1) & (capacity - 1)
+            SLOT.pack_into(table, HEADER.size + slot * SLOT.size, key, duration, seen, stable)
+            count += 1
+        HEADER.pack_into(table, 0, MAGIC, SLOT.size, capacity, count)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(table)
+        os.replace(tmp, self.path)
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+            self._unmap()
+
+    # ---- Bảng băm ----
+
+    def _find(self, key: int):
+        """(vị trí slot, có tìm thấy không)"""
+        mask = self.capacity - 1
+        slot = key & mask
+        while True:
+            offset = HEADER.size + slot * SLOT.size
+            found = SLOT.unpack_from(self._map, offset)[0]
+            if found == key:
+                return offset, True
+            if not found:
+                return offset, False
+            slot = (slot + 1) & mask
+
+    def _entries(self):
+        for slot in range(self.capacity):
+            entry = SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)
+            if entry[0]:
+                yield entry
+
+    def _grow(self) -> bool:
+        if self.capacity * 2 > self.max_capacity:
+            return False
+        entries = list(self._entries())
+        self._unmap()
+        try:
+            self._create(self.capacity * 2, entries)
+        except OSError as e:
+            logger.warning("Không mở rộng được chỉ mục quảng cáo: %s", e)
+            self._remap()
+            return False
+        self._remap()
+        return self._map is not None
+
+    def _remap(self):
+        """Map lại file sau khi thay thế; lỗi thì tắt chỉ mục tới lần open() sau"""
+        try:
+            self._map_file()
+        except (OSError, ValueError) as e:
+            logger.error("Không map lại được chỉ mục quảng cáo, tạm tắt: %s", e)
+            self._unmap()
+
+    def set_generic_titles(self, titles):
+        """Đổi danh sách tiêu đề chung (vd khi nạp lại từ khóa trong cấu hình)"""
+        self.generic_titles = frozenset(t.strip().lower() for t in titles)
+
+    def is_generic(self, title: str) -> bool:
+        return title.strip().lower() in self.generic_titles
+
+    # ---- API ----
+
+    def lookup(self, title: str):
+        """KnownAd của tiêu đề (kể cả chưa ổn định), None nếu chưa từng gặp"""
+        with self._lock:
+            if self._map is None or not title:
+                return None
+            offset, found = self._find(title_key(title))
+            if not found:
+                return None
+            _, duration, seen, stable = SLOT.unpack_from(self._map, offset)
+            return KnownAd(duration, seen, stable)
+
+    def match(self, title: str):
+        """
+        Tiêu đề là quảng cáo đã biết với thời lượng ổn định?
+
+        Returns:
+            KnownAd (duration dùng để dự đoán lúc quảng cáo hết) hoặc None
+        """
+        self.lookups += 1
+        if not title or self.is_generic(title):
+            return None
+        known = self.lookup(title)
+        if known is None or known.stable < self.min_stable:
+            return None
+        self.hits += 1
+        return known
+
+    def learn(self, title: str, duration: float) -> bool:
+        """
+        Ghi nhận một lần quảng cáo đã phát trọn (từ lúc tiêu đề xuất hiện tới tiêu đề kế tiếp)
+
+        Returns:
+            True nếu đã ghi vào chỉ mục
+        """
+        if not title or self.is_generic(title) or \
+                not self.min_duration <= duration <= self.max_duration:
+            self.rejected += 1
+            return False
+        key = title_key(title)
+        with self._lock:
+            if self._map is None:
+                return False
+            offset, found = self._find(key)
+            if found:
+                _, previous, seen, stable = SLOT.unpack_from(self._map, offset)
+                stable = min(stable + 1, 0xFFFF) if abs(duration - previous) <= self.tolerance \
+                    else 0
+                seen = min(seen + 1, 0xFFFFFFFF)
+            else:
+                if self.count + 1 > self.capacity * MAX_LOAD:
+                    if not self._grow():
+                        self.rejected += 1
+                        return False
+                    offset, _ = self._find(key)
+                seen, stable = 1, 0
+                self.count += 1
+                HEADER.pack_into(self._map, 0, MAGIC, SLOT.size, self.capacity, self.count)
+            SLOT.pack_into(self._map, offset, key, duration, seen, stable)
+        self.learned += 1
+        return True
+
+    def clear(self):
+        """Xóa toàn bộ chỉ mục (vd khi luật phân loại đổi, quảng cáo cũ có thể không còn đúng)"""
+        with self._lock:
+            if self._map is None:
+                return
+            self._unmap()
+            try:
+                self._create(self.initial_capacity)
+            except OSError as e:
+                logger.warning("Không xóa được chỉ mục quảng cáo: %s", e)
+                self._remap()
+                return
+            self._remap()
+        logger.info("Đã xóa chỉ mục quảng cáo đã biết")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def stats(self) -> dict:
+        return {
+            'entries': self.count,
+            'capacity': self.capacity,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'learned': self.learned,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,206 @@
+"""
+Ad Predictor - Dự đoán thời điểm Spotify chèn quảng cáo
+
+Spotify Free chèn quảng cáo ở ranh giới giữa hai bài, sau một khoảng thời gian
+nghe tương đối đều đặn. AdBreakPredictor học từ chuỗi chuyển tiêu đề đã phân loại:
+
+- khoảng nghe nhạc giữa hai đợt quảng cáo (gap)
+- thời lượng của từng bài (lần sau gặp lại biết bài sắp hết lúc nào)
+
+Khi đã nghe gần đủ một gap và bài hiện tại sắp hết, predictor bật chế độ "hot":
+monitor đọc tiêu đề dày hơn và lấy sẵn audio session. Nếu biết chính xác lúc bài
+hết, predictor còn cho phép mute trước (pre-mute) vài trăm ms; số lần mute nhầm
+bị giới hạn bởi false_mute_budget (số lần mỗi giờ).
+"""
+
+import time
+from collections import OrderedDict, deque
+
+
+class AdBreakPredictor:
+    """
+    Học nhịp quảng cáo từ lịch sử tiêu đề và bật chế độ hot gần ranh giới bài
+    """
+
+    def __init__(self, hot_lead: float = 20.0, hot_interval: float = 0.05,
+                 pre_mute_lead: float = 0.3, pre_mute_timeout: float = 2.0,
+                 false_mute_budget: int = 2, budget_window: float = 3600.0,
+                 min_breaks: int = 2, gap_quantile: float = 0.1,
+                 history: int = 50, max_tracks: int = 2000, clock=time.monotonic):
+        """
+        Args:
+            hot_lead: Bật hot trước ranh giới dự đoán bao nhiêu giây
+            hot_interval: Chu kỳ đọc tiêu đề khi hot (giây)
+            pre_mute_lead: Mute trước lúc bài hết bao nhiêu giây (0 = không pre-mute)
+            pre_mute_timeout: Quá thời gian này sau lúc bài lẽ ra hết mà tiêu đề
+                không đổi thì coi là mute nhầm
+            false_mute_budget: Số lần pre-mute nhầm tối đa trong budget_window
+            budget_window: Cửa sổ tính budget (giây)
+            min_breaks: Số gap tối thiểu trước khi bắt đầu dự đoán
+            gap_quantile: Dùng quantile thấp của các gap làm mốc (thận trọng)
+            history: Số gap gần nhất được giữ lại
+            max_tracks: Số bài tối đa được nhớ thời lượng
+            clock: Hàm đồng hồ (giây)
+        """
+        self.hot_lead = hot_lead
+        self.hot_interval = hot_interval
+        self.pre_mute_lead = pre_mute_lead
+        self.pre_mute_timeout = pre_mute_timeout
+        self.false_mute_budget = false_mute_budget
+        self.budget_window = budget_window
+        self.min_breaks = min_breaks
+        self.gap_quantile = gap_quantile
+        self.max_tracks = max_tracks
+        self.clock = clock
+
+        self.gaps = deque(maxlen=history)
+        self.durations = OrderedDict()
+        self.in_break = False
+        self.break_ended_at = None
+        self.current_title = None
+        self.current_started = None
+        self.current_is_ad = False
+
+        self.pre_muted_at = None
+        self.false_mutes = deque()
+        # Bộ đếm để đánh giá offline và hiển thị
+        self.pre_mutes = 0
+        self.hits = 0
+        self.misses = 0
+        self.false_mute_total = 0
+        self.suspended = 0
+
+    # ---- Học từ lịch sử ----
+
+    def observe(self, title: str, is_ad: bool, now: float = None):
+        """
+        Ghi nhận tiêu đề mới đã được phân loại (gọi mỗi khi tiêu đề đổi)
+        """
+        now = self.clock() if now is None else now
+        if self.current_title is not None and not self.current_is_ad:
+            self._remember_duration(self.current_title, now - self.current_started)
+
+        if is_ad:
+            if not self.in_break:
+                if self.break_ended_at is not None:
+                    self.gaps.append(now - self.break_ended_at)
+                self.in_break = True
+                if self.pre_muted_at is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        else:
+            if self.in_break:
+                self.in_break = False
+                self.break_ended_at = now
+            elif self.break_ended_at is None:
+                # Chưa thấy quảng cáo nào: tính gap từ bài đầu tiên
+                self.break_ended_at = now
+            if self.pre_muted_at is not None:
+                self._record_false_mute(now)
+
+        self.pre_muted_at = None
+        self.current_title = title
+        self.current_started = now
+        self.current_is_ad = is_ad
+
+    def _remember_duration(self, title: str, seconds: float):
+        self.durations[title] = seconds
+        self.durations.move_to_end(title)
+        while len(self.durations) > self.max_tracks:
+            self.durations.popitem(last=False)
+
+    def expected_gap(self):
+        """Khoảng nghe nhạc (giây) dự kiến trước đợt quảng cáo kế tiếp, None nếu chưa đủ dữ liệu"""
+        if len(self.gaps) < self.min_breaks:
+            return None
+        ordered = sorted(self.gaps)
+        return ordered[int((len(ordered) - 1) * self.gap_quantile)]
+
+    def remaining(self, now: float = None):
+        """Số giây còn lại của bài hiện tại, None nếu chưa biết thời lượng"""
+        if self.current_title is None or self.current_is_ad:
+            return None
+        duration = self.durations.get(self.current_title)
+        if duration is None:
+            return None
+        now = self.clock() if now is None else now
+        return duration - (now - self.current_started)
+
+    # ---- Dự đoán ----
+
+    def is_hot(self, now: float = None) -> bool:
+        """Đang ở gần một ranh giới có khả năng chèn quảng cáo"""
+        if self.in_break or self.current_title is None or self.current_is_ad:
+            return False
+        gap = self.expected_gap()
+        if gap is None or self.break_ended_at is None:
+            return False
+        now = self.clock() if now is None else now
+        remaining = self.remaining(now)
+        listened = now - self.break_ended_at
+        if remaining is None:
+            # Không biết bài hết lúc nào: hot suốt phần còn lại sau mốc gap
+            return listened >= gap - self.hot_lead
+        # Ranh giới kế tiếp là lúc bài này hết
+        return listened + remaining >= gap and remaining <= self.hot_lead
+
+    def budget_left(self, now: float = None) -> int:
+        """Số lần pre-mute nhầm còn được phép trong cửa sổ budget"""
+        now = self.clock() if now is None else now
+        while self.false_mutes and now - self.false_mutes[0] > self.budget_window:
+            self.false_mutes.popleft()
+        return self.false_mute_budget - len(self.false_mutes)
+
+    def should_pre_mute(self, now: float = None) -> bool:
+        """Có nên mute ngay (trước khi tiêu đề đổi) hay không"""
+        if self.pre_mute_lead <= 0 or self.pre_muted_at is not None:
+            return False
+        now = self.clock() if now is None else now
+        if not self.is_hot(now):
+            return False
+        remaining = self.remaining(now)
+        if remaining is None or remaining > self.pre_mute_lead:
+            return False
+        if self.budget_left(now) <= 0:
+            self.suspended += 1
+            return False
+        return True
+
+    def mark_pre_muted(self, now: float = None):
+        """Monitor báo đã phát lệnh pre-mute"""
+        self.pre_muted_at = self.clock() if now is None else now
+        self.pre_mutes += 1
+
+    def pre_mute_expired(self, now: float = None) -> bool:
+        """
+        Pre-mute đã quá hạn mà tiêu đề không đổi (vd: tua lại, lặp bài)
+
+        Returns:
+            True nếu monitor cần unmute; lần này được tính là mute nhầm
+        """
+        if self.pre_muted_at is None:
+            return False
+        now = self.clock() if now is None else now
+        if now - self.pre_muted_at < self.pre_mute_lead + self.pre_mute_timeout:
+            return False
+        self._record_false_mute(now)
+        self.pre_muted_at = None
+        return True
+
+    def _record_false_mute(self, now: float):
+        self.false_mutes.append(now)
+        self.false_mute_total += 1
+
+    def stats(self) -> dict:
+        gap = self.expected_gap()
+        return {
+            'breaks_learned': len(self.gaps),
+            'expected_gap_s': round(gap, 1) if gap is not None else None,
+            'tracks_known': len(self.durations),
+            'pre_mutes': self.pre_mutes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'false_mutes': self.false_mute_total,
+            'suspended': self.suspended,
+        }
@@ -0,0 +1,688 @@
+"""
+Async Monitor - Lõi monitor chạy trên asyncio
+
+Các bước được tách thành task riêng, nối với nhau bằng queue:
+
+    sample  ->  titles  ->  classify  ->  actions  ->  audio  ->  ui  ->  notify
+
+- sample: đọc tiêu đề trong executor "window" (Win32), chờ sự kiện push hoặc timeout
+- classify: phân loại ngay trên event loop (rẻ), quyết định mute/unmute
+- audio: gọi mute/unmute trong executor "audio" riêng (COM), chỉ lấy lệnh mới nhất
+- ui: báo trạng thái mới cho giao diện (tray icon, menu)
+
+Chu kỳ đọc do PollScheduler quyết định: thưa khi không thấy Spotify hoặc tiêu đề
+đứng yên lâu, dày ngay sau khi đổi tiêu đề, không đọc khi chức năng đang tắt. Nếu
+có predictor (AdBreakPredictor), task sample đọc dày hơn khi gần ranh giới quảng
+cáo dự đoán, lấy sẵn audio session và có thể mute trước. Nếu có process_watcher
+(SpotifyProcessWatcher), mọi việc đọc cửa sổ được bỏ qua khi Spotify không chạy.
+Nếu có history (EventStore), tiêu đề đã phân loại và kết quả mute/unmute được ghi
+vào lịch sử trên đĩa (không chặn event loop). Nếu có ad_index (KnownAdIndex),
+tiêu đề quảng cáo đã biết được mute ngay không qua bộ phân loại, và task sample thức
+dậy đúng lúc quảng cáo dự kiến hết để unmute không phải chờ tới chu kỳ đọc kế tiếp.
+
+Quyết định mute/unmute đi qua DetectionStateMachine: tiêu đề chớp qua ("Spotify",
+tiêu đề rỗng khi chuyển bài) không tốn lệnh âm thanh nào, tạm dừng và đóng Spotify
+không đổi âm thanh. Khi có chuyển tiếp đang chờ xác nhận, task sample thức dậy đúng
+lúc hết cửa sổ xác nhận.
+
+SetMute chậm chỉ làm chậm task audio, không làm trễ lần đọc tiêu đề kế tiếp. Trạng
+thái (enabled, is_muted, ad_count, ...) chỉ được ghi trên thread của event loop;
+thread khác muốn thay đổi phải đi qua set_enabled()/stop().
+
+Không chạy event loop thì check_once() đi qua đúng các bước trên một cách đồng bộ
+(đọc, phân loại, máy trạng thái, mute/unmute), dùng cho benchmark phát lại timeline.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import event_store
+from detection_state import AD, CLOSED, PAUSED, PLAYING, SUSPECT_AD, DetectionStateMachine
+from poll_scheduler import PollScheduler
+
+logger = logging.getLogger(__name__)
+
+# Mục trong queue titles: hết cửa sổ xác nhận của máy trạng thái
+CONFIRM = object()
+
+
+class AsyncMonitor:
+    """
+    Service monitor Spotify dựa trên asyncio
+    """
+
+    def __init__(self, get_title, is_ad, mute, unmute, notify=None,
+                 check_interval: float = 0.3, event_source=None,
+                 audio_initializer=None, latency=None, predictor=None, prefetch=None,
+                 scheduler=None, process_watcher=None, history=None, ad_index=None,
+                 detector=None, settled=None, is_audible=None):
+        """
+        Args:
+            get_title: Hàm blocking lấy tiêu đề Spotify (chạy trong executor window)
+            is_ad: Hàm phân loại tiêu đề (chạy trên event loop, phải rẻ)
+            mute: Hàm blocking tắt tiếng, trả về bool (chạy trong executor audio)
+            unmute: Hàm blocking bật tiếng, trả về bool (chạy trong executor audio)
+            notify: Callback nhận monitor mỗi khi trạng thái đổi (task ui)
+            check_interval: Chu kỳ đọc tiêu đề; với event_source là chu kỳ resync
+            event_source: Nguồn sự kiện push (vd WinEventSource), None = polling
+            audio_initializer: Hàm khởi tạo thread audio (vd CoInitialize)
+            latency: LatencyRecorder để ghi tổng độ trễ title -> mute
+            predictor: AdBreakPredictor để bật chế độ hot/pre-mute (None = tắt)
+            prefetch: Hàm blocking lấy sẵn audio session khi vào hot (executor audio)
+            scheduler: PollScheduler chọn chu kỳ đọc (mặc định theo check_interval)
+            process_watcher: SpotifyProcessWatcher, None = luôn đọc tiêu đề
+            history: EventStore ghi lịch sử sự kiện (None = không ghi)
+            ad_index: KnownAdIndex tra quảng cáo đã biết và học thời lượng (None = tắt)
+            detector: DetectionStateMachine (mặc định: cửa sổ xác nhận mặc định); đồng hồ
+                của nó phải là time.perf_counter như mốc đọc tiêu đề
+            settled: Hàm nhận callback(perf_counter), gọi callback khi lệnh âm thanh
+                vừa chạy có hiệu lực hoàn toàn (vd AudioSink.when_settled với đường dốc
+                âm lượng); None = ngay khi mute/unmute trả về
+            is_audible: Hàm trả về Spotify còn phát ra tiếng không (True/False/None), để
+                nâng tiêu đề tạm dừng kéo dài mà vẫn có tiếng lên quảng cáo (None = tắt)
+        """
+        self.get_title = get_title
+        self.is_ad = is_ad
+        self.mute = mute
+        self.unmute = unmute
+        self.notify = notify
+        self.check_interval = check_interval
+        self.event_source = event_source
+        self.audio_initializer = audio_initializer
+        self.latency = latency
+        self.predictor = predictor
+        self.prefetch = prefetch
+        self.scheduler = scheduler if scheduler is not None else PollScheduler(check_interval)
+        self.process_watcher = process_watcher
+        self.history = history
+        self.ad_index = ad_index
+        self.detector = detector if detector is not None else DetectionStateMachine(
+            clock=time.perf_counter)
+        self.settled = settled
+        self.is_audible = is_audible
+
+        # Trạng thái - chỉ ghi trên thread event loop
+        self.enabled = True
+        self.want_muted = False
+        self.is_muted = False
+        self.last_title = ""
+        self.ad_count = 0
+        self.song_count = 0
+        self.samples = 0
+        self.hot = False
+        self.pre_muted = False
+        self.index_hits = 0
+        # Quảng cáo đang phát: tiêu đề, lúc đọc được và lúc dự kiến hết (theo đồng hồ
+        # của detector, cùng đồng hồ với read_at)
+        self.ad_title = None
+        self.ad_started = None
+        self.ad_ends_at = None
+        # Lúc quảng cáo nhường chỗ cho tiêu đề tạm dừng (chưa biết đã hết hay chỉ dừng)
+        self._ad_left_at = None
+        # Tiêu đề đang xử lý: lúc đọc, KnownAd (nếu có), có phải tiêu đề tạm dừng không
+        self._title_read_at = None
+        self._title_known = None
+        self._title_paused = False
+        # Tiêu đề cuối cùng đã báo cho predictor
+        self._settled_title = None
+
+        self.loop = None
+        self.titles = self.actions = self.ui = None
+        self._running = False
+        self._wake = None
+        self._source_stop = threading.Event()
+        self._force_refresh = False
+        self._confirm_queued = False
+
+    # ---- API an toàn khi gọi từ thread khác ----
+
+    def set_enabled(self, enabled: bool):
+        """Bật/tắt chức năng (gọi được từ thread UI)"""
+        if self.loop is None:
+            self.enabled = enabled
+            return
+        self.loop.call_soon_threadsafe(self._set_enabled, enabled)
+
+    def refresh(self):
+        """Xử lý lại tiêu đề hiện tại, vd sau khi đổi luật phân loại (gọi được từ thread khác)"""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._refresh)
+
+    def stop(self):
+        """Dừng monitor (gọi được từ thread UI)"""
+        self._source_stop.set()
+        if self.event_source is not None:
+            self.event_source.wake()
+        if self.loop is None:
+            self._running = False
+            return
+        self.loop.call_soon_threadsafe(self._request_stop)
+
+    # ---- Xử lý trên event loop ----
+
+    def _set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        logger.info(f"Chức năng: {'Bật' if enabled else 'Tắt'}")
+        if not enabled:
+            self._end_ad()
+            self._settled_title = None
+            self.detector.reset()
+        if not enabled and self.want_muted:
+            self.want_muted = False
+            self.pre_muted = False
+            self.actions.put_nowait(('unmute', None))
+        if enabled:
+            # Xử lý lại tiêu đề hiện tại vì có thể đã đổi trong lúc tắt
+            self._force_refresh = True
+        self._wake.set()
+        self.ui.put_nowait('enabled')
+
+    def _refresh(self):
+        self._force_refresh = True
+        self._wake.set()
+
+    def _request_stop(self):
+        self._running = False
+        self._wake.set()
+        self.titles.put_nowait(None)
+
+    def _on_source_event(self):
+        """Được gọi từ thread của event_source"""
+        self.loop.call_soon_threadsafe(self._wake.set)
+
+    # ---- Chạy đồng bộ, không có event loop (benchmark phát lại, kiểm thử) ----
+
+    def check_once(self, now: float = None):
+        """
+        Đọc và xử lý tiêu đề một lần ngay trên thread gọi, lệnh âm thanh chạy luôn
+
+        Không dùng cùng lúc với run(). Predictor (hot/pre-mute) được cập nhật sau mỗi
+        lần đọc như task sample, nhưng chu kỳ đọc thì người gọi tự quyết định (vd theo
+        scheduler.next_interval(), predictor.hot_interval khi self.hot).
+
+        Args:
+            now: Thời điểm theo đồng hồ của detector (mặc định perf_counter); benchmark
+                phát lại truyền đồng hồ ảo. Độ trễ title -> mute vẫn đo bằng perf_counter.
+
+        Returns:
+            Tiêu đề vừa đọc
+        """
+        if self.titles is None:
+            self.titles = asyncio.Queue()
+            self.actions = asyncio.Queue()
+            self.ui = asyncio.Queue()
+        started = time.perf_counter()
+        now = started if now is None else now
+        if not self.enabled:
+            return self.last_title
+        try:
+            title, events = self._read_title()
+        except Exception as e:
+            logger.error(f"Lỗi khi đọc tiêu đề: {e}")
+            return self.last_title
+        for event in events:
+            self._on_process_event(event)
+        self.samples += 1
+        changed = title != self.last_title
+        self.scheduler.on_sample(title, changed)
+        try:
+            if self.detector.confirm_in(now) == 0:
+                self._handle(CONFIRM, now)
+            if changed or self._force_refresh:
+                self._force_refresh = False
+                self._handle(title, now)
+        except Exception:
+            logger.exception("Lỗi khi xử lý tiêu đề %r", title)
+        if self.predictor is not None and self.enabled:
+            self._predict()
+
+        # Như task audio: chỉ lệnh mới nhất có ý nghĩa
+        item = None
+        while not self.actions.empty():
+            item = self.actions.get_nowait()
+        if item is not None:
+            action = item[0]
+            try:
+                ok = (self.mute if action == 'mute' else self.unmute)()
+            except Exception as e:
+                logger.error(f"Lỗi khi {action}: {e}")
+                ok = False
+            self._action_done(action, started, ok)
+        updated = False
+        while not self.ui.empty():
+            self.ui.get_nowait()
+            updated = True
+        if updated and self.notify is not None:
+            self.notify(self)
+        return title
+
+    async def run(self):
+        """Chạy monitor tới khi stop() được gọi"""
+        self.loop = asyncio.get_running_loop()
+        self._running = True
+        self._record(event_store.START)
+        self._wake = asyncio.Event()
+        self.titles = asyncio.Queue()
+        self.actions = asyncio.Queue()
+        self.ui = asyncio.Queue()
+
+        self.window_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='window')
+        self.audio_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='audio', initializer=self.audio_initializer)
+
+        source_thread = None
+        if self.event_source is not None:
+            source_thread = threading.Thread(
+                target=self.event_source.run,
+                args=(self._on_source_event, self._source_stop),
+                daemon=True,
+            )
+            source_thread.start()
+
+        tasks = [
+            asyncio.create_task(self._sample_task()),
+            asyncio.create_task(self._classify_task()),
+            asyncio.create_task(self._audio_task()),
+            asyncio.create_task(self._ui_task()),
+        ]
+        try:
+            await tasks[0]
+            # Đợi classify xử lý hết tiêu đề, sau đó audio trả lại âm thanh khi thoát
+            await tasks[1]
+            # Lệnh mute có thể vẫn đang chạy nên xét cả want_muted
+            if self.is_muted or self.want_muted:
+                self.want_muted = False
+                await self.actions.put(('unmute', None))
+            await self.actions.put(None)
+            await tasks[2]
+            await self.ui.put(None)
+            await tasks[3]
+            self._record(event_store.STOP)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._source_stop.set()
+            if self.event_source is not None:
+                self.event_source.wake()
+            self.window_executor.shutdown(wait=False)
+            self.audio_executor.shutdown(wait=True)
+
+    async def _sample_task(self):
+        """Đọc tiêu đề khi có sự kiện hoặc hết chu kỳ, đẩy tiêu đề mới vào queue"""
+        last = None
+        while self._running:
+            if self.enabled:
+                read_at = time.perf_counter()
+                events = []
+                try:
+                    title, events = await self.loop.run_in_executor(
+                        self.window_executor, self._read_title)
+                except Exception as e:
+                    logger.error(f"Lỗi khi đọc tiêu đề: {e}")
+                    title = last
+                for event in events:
+                    self._on_process_event(event)
+                self.samples += 1
+                changed = title != last
+                self.scheduler.on_sample(title, changed)
+                if changed or self._force_refresh:
+                    self._force_refresh = False
+                    last = title
+                    await self.titles.put((title, read_at))
+            if self.enabled and not self._confirm_queued and self.detector.confirm_in() == 0:
+                # Hết cửa sổ xác nhận: classify xử lý sau các tiêu đề đã xếp hàng
+                self._confirm_queued = True
+                await self.titles.put((CONFIRM, time.perf_counter()))
+            if self.predictor is not None and self.enabled:
+                self._predict()
+            interval = self.next_interval()
+            try:
+                # interval None: chức năng tắt, chỉ chờ set_enabled()/stop() đánh thức
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+        await self.titles.put(None)
+
+    def next_interval(self):
+        """
+        Chu kỳ chờ trước lần đọc kế tiếp (None = chỉ chờ được đánh thức)
+
+        Gọi sau _predict(): chế độ hot, thời gian còn lại của bài/quảng cáo đã biết và
+        trạng thái của máy trạng thái (tạm dừng/đóng thì đọc thưa) đều được xét.
+        """
+        hot_interval = None
+        remaining = None
+        if self.predictor is not None and self.enabled:
+            if self.hot:
+                hot_interval = self.predictor.hot_interval
+            remaining = self.predictor.remaining()
+        ad_remaining = self._ad_remaining()
+        if ad_remaining is not None:
+            remaining = ad_remaining
+        state = self.detector.state
+        if self.titles is not None and not self.titles.empty():
+            # Tiêu đề mới chưa được phân loại: trạng thái của máy trạng thái đã cũ
+            state = None
+        elif state == PAUSED and self.detector.muted:
+            # Tạm dừng giữa đợt quảng cáo: quảng cáo kế tiếp hoặc bài hát tới ngay
+            state = AD
+        interval = self.scheduler.next_interval(self.enabled, hot_interval, remaining,
+                                                state=state)
+        if interval is not None and ad_remaining is not None and ad_remaining > 0:
+            # Đọc đúng lúc quảng cáo đã biết dự kiến hết, sau đó burst như cuối bài
+            interval = min(interval, ad_remaining)
+        confirm_in = self.detector.confirm_in()
+        if interval is not None and confirm_in is not None:
+            # Đang chờ xác nhận (vd cửa sổ chớp mất): chưa lùi về chu kỳ absent/idle
+            interval = min(interval, confirm_in, self.scheduler.interval)
+        return interval
+
+    def _ad_remaining(self, overrun: float = 2.0):
+        """
+        Số giây còn lại của quảng cáo đã biết, None nếu không dự đoán được hoặc đã quá hạn
+
+        ad_ends_at tính từ read_at nên so với đồng hồ của detector (check_once với đồng
+        hồ ảo dùng cùng đồng hồ đó), không phải perf_counter.
+        """
+        if self.ad_ends_at is None:
+            return None
+        remaining = self.ad_ends_at - self.detector.clock()
+        # Quá hạn lâu (tạm dừng giữa quảng cáo): thôi đọc dày
+        return remaining if remaining > -overrun else None
+
+    def _read_title(self):
+        """Kiểm tra tiến trình (nếu tới hạn) rồi đọc tiêu đề, chạy trong executor window"""
+        events = []
+        watcher = self.process_watcher
+        if watcher is not None:
+            events = watcher.maybe_poll()
+            if not watcher.running:
+                # Spotify không chạy: không đụng tới EnumWindows
+                return "", events
+        return self.get_title(), events
+
+    def _on_process_event(self, event):
+        """Spotify mở/thoát (chạy trên event loop)"""
+        if event.kind == 'started':
+            # Xử lý lại tiêu đề đầu tiên và lấy sẵn session cho lần mute đầu
+            self._force_refresh = True
+            if self.prefetch is not None:
+                if self.loop is None:
+                    self._run_prefetch()
+                else:
+                    self.loop.run_in_executor(self.audio_executor, self._run_prefetch)
+        self.ui.put_nowait('process')
+
+    def _predict(self) -> bool:
+        """Cập nhật chế độ hot/pre-mute theo predictor, trả về True nếu đang hot"""
+        predictor = self.predictor
+        now = predictor.clock()
+        hot = predictor.is_hot(now)
+        if hot != self.hot:
+            self.hot = hot
+            logger.debug("Predictor: %s chế độ hot", 'bật' if hot else 'tắt')
+            if hot and self.prefetch is not None:
+                if self.loop is None:
+                    self._run_prefetch()
+                else:
+                    # Không chờ: executor audio chỉ có một worker nên lệnh mute sau đó
+                    # vẫn chạy sau khi session đã được lấy sẵn
+                    self.loop.run_in_executor(self.audio_executor, self._run_prefetch)
+
+        # Tiêu đề mới đang chờ phân loại thì predictor chưa cập nhật, chưa mute trước
+        if not self.want_muted and self.titles.empty() and predictor.should_pre_mute(now):
+            predictor.mark_pre_muted(now)
+            self.pre_muted = True
+            self.want_muted = True
+            self.detector.set_muted(True)
+            logger.info(">>> Sắp hết bài, có thể có quảng cáo: MUTE TRƯỚC")
+            self._record(event_store.PRE_MUTE)
+            self.actions.put_nowait(('mute', None))
+        elif self.pre_muted and predictor.pre_mute_expired(now):
+            self.pre_muted = False
+            self.want_muted = False
+            self.detector.set_muted(False)
+            logger.info(">>> Không có quảng cáo sau pre-mute, UNMUTE")
+            self.actions.put_nowait(('unmute', None))
+        return hot
+
+    def _run_prefetch(self):
+        try:
+            self.prefetch()
+        except Exception as e:
+            logger.debug("Lỗi khi lấy sẵn audio session: %s", e)
+
+    async def _classify_task(self):
+        """Phân loại tiêu đề và quyết định hành động âm thanh"""
+        while True:
+            item = await self.titles.get()
+            if item is None:
+                return
+            try:
+                self._handle(*item)
+            except Exception:
+                # Một tiêu đề lỗi không được làm chết task: sample vẫn đẩy tiêu đề vào queue
+                logger.exception("Lỗi khi xử lý tiêu đề %r", item[0])
+
+    def _handle(self, window_title, read_at: float):
+        """Xử lý một tiêu đề (hoặc CONFIRM) từ queue titles, đẩy lệnh vào actions/ui"""
+        if window_title is CONFIRM:
+            self._confirm_queued = False
+            if self.enabled:
+                transition = self.detector.tick(read_at, audible=self._audible())
+                if transition is not None and transition.state == AD and \
+                        transition.previous == SUSPECT_AD and self._title_paused:
+                    # Tiêu đề tạm dừng được nâng lên quảng cáo (vẫn có âm thanh)
+                    self._record(event_store.TITLE, self.last_title, is_ad=True)
+                self._apply(transition, self.last_title, read_at)
+                if transition is not None and transition.state in (AD, PLAYING):
+                    # Tiêu đề hiện tại vừa được xác nhận sau cửa sổ chờ
+                    self._settle(self.last_title, transition.state == AD)
+            return
+        if not self.enabled:
+            return
+
+        logger.info("Title changed: '%s' -> '%s'", self.last_title, window_title)
+        self.last_title = window_title
+        self._title_read_at = read_at
+        self._title_known = None
+        self._title_paused = False
+        if not window_title:
+            # Có thể chỉ chớp mất khi chuyển bài: chờ xác nhận CLOSED
+            self._apply(self.detector.observe("", False, read_at), "", read_at)
+            return
+
+        known = self.ad_index.match(window_title) if self.ad_index is not None else None
+        if known is not None:
+            # Quảng cáo đã gặp nhiều lần với cùng thời lượng: không cần phân loại
+            is_ad = True
+            self.index_hits += 1
+            logger.info("Check Ad: '%s' -> quảng cáo đã biết (~%.1f s)",
+                        window_title, known.duration)
+        else:
+            is_ad = self.is_ad(window_title)
+            logger.info("Check Ad: '%s' -> IsAd: %s", window_title, is_ad)
+        self._title_known = known
+
+        target = self.detector.target(window_title, is_ad)
+        pre_muted = False
+        if target == PAUSED:
+            # Tạm dừng/chuyển bài: không phải quảng cáo hay bài hát, pre-mute (nếu có)
+            # chờ tiêu đề kế tiếp quyết định
+            self._title_paused = True
+            self._record(event_store.PAUSE, window_title)
+        else:
+            self._record(event_store.TITLE, window_title, is_ad=target == AD)
+            pre_muted, self.pre_muted = self.pre_muted, False
+
+        transition = self.detector.observe(window_title, is_ad, read_at, audible=self._audible())
+        if transition is None and target == AD and self.detector.state == AD:
+            # Quảng cáo kế tiếp trong cùng đợt: Spotify có thể tạo lại session giữa các
+            # ads, session manager chỉ gọi SetMute cho session lệch trạng thái nên lệnh
+            # lặp lại gần như miễn phí
+            logger.info(">>> Vẫn là quảng cáo... Đảm bảo Mute...")
+            self.actions.put_nowait(('mute', read_at))
+        self._apply(transition, window_title, read_at, pre_muted)
+        if target in (AD, PLAYING) and self.detector.state == target:
+            self._settle(window_title, target == AD)
+        self.ui.put_nowait('title')
+
+    def _audible(self):
+        return self.is_audible() if self.is_audible is not None else None
+
+    def _settle(self, window_title: str, is_ad: bool):
+        """
+        Tiêu đề hiện tại đã được máy trạng thái xác nhận là quảng cáo hoặc bài hát
+
+        Predictor và chỉ mục quảng cáo chỉ học từ đây, không từ kết quả phân loại thô:
+        tiêu đề tạm dừng hay chớp qua không phải đợt quảng cáo.
+        """
+        read_at = self._title_read_at
+        if is_ad:
+            if window_title != self.ad_title:
+                # Quảng cáo trước trong cùng đợt đã phát trọn
+                self._end_ad(self._ad_left_at or read_at)
+                self.ad_title = window_title
+                self.ad_started = read_at
+                known = self._title_known
+                if known is not None:
+                    self.ad_ends_at = read_at + known.duration
+                    # Task sample đang chờ theo chu kỳ cũ: tính lại lúc thức dậy
+                    if self._wake is not None:
+                        self._wake.set()
+            elif self._ad_left_at is not None:
+                # Cùng quảng cáo phát tiếp sau khi tạm dừng: thời lượng không còn đúng
+                self.ad_started = self.ad_ends_at = self._ad_left_at = None
+        elif window_title == self.ad_title:
+            # Phân loại lại theo luật mới: không còn là quảng cáo, không học
+            self._end_ad()
+        else:
+            self._end_ad(self._ad_left_at or read_at)
+        if self.predictor is not None and window_title != self._settled_title:
+            self.predictor.observe(window_title, is_ad)
+        self._settled_title = window_title
+
+    def _apply(self, transition, window_title: str, read_at: float, pre_muted: bool = False):
+        """Thực hiện chuyển tiếp của máy trạng thái (tối đa một lệnh âm thanh)"""
+        if transition is None:
+            return
+        state = transition.state
+        if state == AD:
+            if transition.action == 'mute' or pre_muted:
+                self.ad_count += 1
+                logger.info(">>> PHÁT HIỆN QUẢNG CÁO! MUTE NGAY! (#%s)", self.ad_count)
+            else:
+                # Đợt quảng cáo tiếp tục sau khi tạm dừng/mở lại Spotify: không tính thêm
+                logger.info(">>> Quảng cáo tiếp tục, vẫn mute ('%s')", window_title)
+        elif state == PLAYING and transition.action == 'unmute':
+            if pre_muted:
+                logger.info(">>> Pre-mute nhầm, bài mới không phải quảng cáo. UNMUTE! ('%s')",
+                            window_title)
+            else:
+                self.song_count += 1
+                logger.info(">>> HẾT QUẢNG CÁO! UNMUTE! ('%s')", window_title)
+        elif state == PLAYING:
+            logger.info("Đang phát nhạc: '%s'", window_title)
+        elif state == PAUSED:
+            logger.info("Spotify tạm dừng ('%s')%s", window_title,
+                        ", giữ mute" if self.detector.muted else "")
+            if self.ad_title is not None and self._ad_left_at is None:
+                # Quảng cáo hết (hoặc bị dừng giữa chừng): tiêu đề kế tiếp quyết định
+                self._ad_left_at = self._title_read_at
+        elif state == CLOSED:
+            logger.info("Không thấy cửa sổ Spotify")
+            self._end_ad()
+        else:
+            logger.debug("Chờ xác nhận tiêu đề '%s'", window_title)
+        if transition.action is not None:
+            self.want_muted = transition.action == 'mute'
+            self.actions.put_nowait((transition.action, read_at))
+        self.ui.put_nowait('state')
+
+    def _end_ad(self, ended_at: float = None):
+        """
+        Kết thúc quảng cáo đang theo dõi; ended_at khác None thì ghi thời lượng vào chỉ mục
+        """
+        title, started, ends_at = self.ad_title, self.ad_started, self.ad_ends_at
+        self.ad_title = self.ad_started = self.ad_ends_at = self._ad_left_at = None
+        if title is None or started is None or ended_at is None or self.ad_index is None:
+            return
+        if ends_at is not None and self.latency is not None:
+            self.latency.record('ad_end_error', abs(ended_at - ends_at))
+        self.ad_index.learn(title, ended_at - started)
+
+    async def _audio_task(self):
+        """Thực hiện mute/unmute trong executor audio, bỏ qua lệnh đã lỗi thời"""
+        while True:
+            item = await self.actions.get()
+            stopping = item is None
+            # Chỉ lệnh mới nhất có ý nghĩa nếu audio đang chậm hơn tiêu đề
+            while not self.actions.empty():
+                newer = self.actions.get_nowait()
+                if newer is None:
+                    stopping = True
+                else:
+                    item = newer
+            if item is not None:
+                action, read_at = item
+                func = self.mute if action == 'mute' else self.unmute
+                try:
+                    ok = await self.loop.run_in_executor(self.audio_executor, func)
+                except Exception as e:
+                    logger.error(f"Lỗi khi {action}: {e}")
+                    ok = False
+                try:
+                    self._action_done(action, read_at, ok)
+                except Exception:
+                    # Task audio còn phải trả lại âm thanh khi thoát
+                    logger.exception("Lỗi khi cập nhật trạng thái sau %s", action)
+            if stopping:
+                return
+
+    def _action_done(self, action: str, read_at: float, ok: bool):
+        """Cập nhật trạng thái, lịch sử và độ trễ sau một lệnh mute/unmute"""
+        elapsed = time.perf_counter() - read_at if read_at is not None else None
+        self._record(event_store.MUTE if action == 'mute' else event_store.UNMUTE,
+                     ok=ok, latency=elapsed)
+        if ok:
+            self.is_muted = action == 'mute'
+            if self.latency is not None and elapsed is not None:
+                self._record_settled(f'title_to_{action}', read_at)
+            if action == 'unmute':
+                logger.info(">>> UNMUTE THÀNH CÔNG")
+        else:
+            logger.error(">>> %s THẤT BẠI", action.upper())
+        self.ui.put_nowait('audio')
+
+    def _record_settled(self, stage: str, read_at: float):
+        """Ghi độ trễ tới lúc âm thanh thật sự đổi (đường dốc bị hủy thì không ghi)"""
+        if self.settled is None:
+            self.latency.record(stage, time.perf_counter() - read_at)
+            return
+        latency = self.latency
+        self.settled(lambda done_at: latency.record(stage, done_at - read_at))
+
+    def _record(self, kind: int, title: str = None, is_ad: bool = False, ok: bool = True,
+                latency: float = None):
+        if self.history is not None:
+            self.history.record(kind, title, is_ad=is_ad, ok=ok, latency=latency)
+
+    async def _ui_task(self):
+        """Gộp các thay đổi trạng thái và báo cho giao diện"""
+        while True:
+            item = await self.ui.get()
+            while not self.ui.empty():
+                if self.ui.get_nowait() is None:
+                    item = None
+            if self.notify is not None:
+                try:
+                    self.notify(self)
+                except Exception as e:
+                    logger.error(f"Lỗi khi cập nhật giao diện: {e}")
+            if item is None:
+                return
@@ -0,0 +1,534 @@
+"""
+Audio Detector - Ý kiến thứ hai từ tín hiệu âm thanh, bên cạnh tiêu đề
+
+Âm thanh của Spotify (mono, 16 kHz) được đọc từ một capture source vào ring buffer
+có kích thước cố định và phân tích trên thread riêng, theo từng khung 64 ms (bước
+16 ms), hoàn toàn bằng phép toán vector của NumPy:
+
+- Độ lớn: năng lượng vài giây gần nhất so với mức nền của ~30 s trước đó. Quảng
+  cáo thường được master to hơn nhạc vài dB.
+- Dấu vân tay phổ: log năng lượng theo dải tần (thang log, 300 Hz - 4 kHz) của
+  từng khung. Jingle quảng cáo đã biết (file WAV) được so bằng hệ số tương quan
+  chuẩn hóa trên cửa sổ trượt, sau khi bỏ mức trung bình của từng dải (chỉ còn
+  hình dạng theo thời gian, không phụ thuộc âm lượng hay màu âm của thiết bị).
+- Im lặng: khung dưới -50 dBFS liên tục.
+
+AudioSecondOpinion gộp kết quả với phán đoán theo tiêu đề:
+- Tiêu đề trông như nhạc nhưng âm thanh chắc chắn là quảng cáo -> quảng cáo. Khớp
+  jingle thì giữ nguyên cho tới khi tiêu đề đổi (sau khi mute thì âm thanh thu được
+  là im lặng). Độ lớn chỉ được xét vài giây đầu sau khi tiêu đề đổi (một bài hát to
+  dần lên giữa chừng không phải quảng cáo) và chỉ được giữ trong lúc còn mute.
+- Tiêu đề không có "Artist - Song" (vd "Spotify" khi tạm dừng) nhưng âm thanh đã im
+  lặng từ trước trong lúc không bị mute -> không phải quảng cáo.
+Khi không có dữ liệu âm thanh mới (capture lỗi/không chạy), chỉ dùng tiêu đề.
+
+NumPy là phụ thuộc tùy chọn: module này chỉ được import khi bật bộ phát hiện.
+WavCaptureSource phát lại file WAV thay cho capture thật (test, benchmark).
+"""
+
+import logging
+import threading
+import time
+import wave
+from collections import namedtuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME = 1024           # 64 ms
+HOP = 256              # 16 ms
+BATCH = 32             # Số khung tối đa mỗi lần phân tích
+BANDS = 16
+BAND_LOW = 300.0
+BAND_HIGH = 4000.0
+SILENCE_DB = -50.0
+
+# Thời gian giữ lại (giây): mẫu âm thanh thô và đặc trưng theo khung
+SAMPLE_HISTORY = 4.0
+FEATURE_HISTORY = 40.0
+
+AudioSnapshot = namedtuple('AudioSnapshot', [
+    'ad_score',        # 0..1, max(jingle_score, loud_score)
+    'jingle',          # tên jingle khớp nhất (None nếu không có)
+    'jingle_score',    # 0..1
+    'loudness_jump',   # dB so với mức nền, None nếu chưa đủ lịch sử
+    'silent_for',      # số giây im lặng liên tục tới thời điểm cập nhật
+    'updated_at',      # clock() lúc cập nhật
+])
+
+EMPTY_SNAPSHOT = AudioSnapshot(0.0, None, 0.0, None, 0.0, None)
+
+
+class RingBuffer:
+    """
+    Bộ đệm vòng NumPy kích thước cố định, đánh chỉ số theo vị trí tuyệt đối
+    """
+
+    def __init__(self, capacity: int, width: int = None, dtype=np.float32):
+        shape = (capacity,) if width is None else (capacity, width)
+        self.data = np.zeros(shape, dtype=dtype)
+        self.capacity = capacity
+        self.total = 0
+
+    @property
+    def start(self) -> int:
+        """Vị trí tuyệt đối cũ nhất còn giữ"""
+        return max(0, self.total - self.capacity)
+
+    def write(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        n = len(values)
+        if n >= self.capacity:
+            values = values[-self.capacity:]
+            self.total += n - self.capacity
+            n = self.capacity
+        pos = self.total % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos + first] = values[:first]
+        self.data[:n - first] = values[first:]
+        self.total += n
+
+    def read(self, start: int, end: int = None) -> np.ndarray:
+        """Bản sao các phần tử [start, end) (vị trí tuyệt đối)"""
+        end = self.total if end is None else end
+        if start < self.start or end > self.total or start > end:
+            raise IndexError(f"[{start}, {end}) nằm ngoài bộ đệm [{self.start}, {self.total})")
+        a, b = start % self.capacity, end % self.capacity
+        if end - start == 0:
+            return self.data[:0].copy()
+        if a < b:
+            return self.data[a:b].copy()
+        return np.concatenate((self.data[a:], self.data[:b]))
+
+    def latest(self, n: int) -> np.ndarray:
+        n = min(n, self.total - self.start)
+        return self.read(self.total - n)
+
+
+def _band_matrix(sample_rate: int) -> np.ndarray:
+    """Ma trận (bin FFT, dải) cộng năng lượng các bin vào dải tần thang log"""
+    freqs = np.fft.rfftfreq(FRAME, 1.0 / sample_rate)
+    edges = np.geomspace(BAND_LOW, BAND_HIGH, BANDS + 1)
+    band = np.searchsorted(edges, freqs, side='right') - 1
+    matrix = np.zeros((len(freqs), BANDS), dtype=np.float32)
+    valid = (band >= 0) & (band < BANDS)
+    matrix[np.nonzero(valid)[0], band[valid]] = 1.0
+    return matrix
+
+
+class FeatureExtractor:
+    """
+    Tính đặc trưng cho một loạt khung (mảng (n, FRAME))
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.window = np.hanning(FRAME).astype(np.float32)
+        self.bands = _band_matrix(sample_rate)
+
+    def __call__(self, frames: np.ndarray):
+        """
+        Returns:
+            (dB theo khung (n,), log10 năng lượng theo dải (n, BANDS))
+        """
+        power = np.mean(frames * frames, axis=1)
+        db = 10.0 * np.log10(power + 1e-12)
+        spectrum = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        energy = spectrum @ self.bands
+        # Dải yếu hơn dải mạnh nhất của khung quá 30 dB bị kẹp về cùng một mức, để
+        # nhiễu nền không quyết định hình dạng phổ (không phụ thuộc âm lượng)
+        floor = energy.max(axis=1, keepdims=True) * 1e-3 + 1e-9
+        energy = np.log10(energy + floor)
+        return db.astype(np.float32), energy.astype(np.float32)
+
+
+def _centered(windows: np.ndarray) -> np.ndarray:
+    """Bỏ trung bình theo thời gian của từng dải, chuẩn hóa về độ dài 1 (trục cuối: (dải, khung))"""
+    centered = windows - windows.mean(axis=-1, keepdims=True)
+    norm = np.sqrt((centered * centered).sum(axis=(-2, -1), keepdims=True))
+    return centered / np.maximum(norm, 1e-9)
+
+
+def _mean_db(levels: np.ndarray) -> float:
+    """Trung bình theo năng lượng (không phải trung bình dB) để đoạn to chiếm ưu thế"""
+    return 10.0 * np.log10(np.mean(10.0 ** (levels / 10.0)))
+
+
+def split_frames(samples: np.ndarray) -> np.ndarray:
+    """Cắt mẫu thành các khung FRAME chồng nhau theo bước HOP"""
+    if len(samples) < FRAME:
+        return np.zeros((0, FRAME), dtype=np.float32)
+    return sliding_window_view(samples, FRAME)[::HOP]
+
+
+def read_wav(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Đọc WAV PCM 8/16/32 bit thành float32 mono ở sample_rate (nội suy tuyến tính)"""
+    with wave.open(path, 'rb') as f:
+        width = f.getsampwidth()
+        channels = f.getnchannels()
+        rate = f.getframerate()
+        raw = f.readframes(f.getnframes())
+    if width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        data = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 4:
+        data = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"{path}: không hỗ trợ mẫu {width * 8} bit")
+    if channels > 1:
+        data = data.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate and len(data):
+        duration = len(data) / rate
+        positions = np.arange(int(duration * sample_rate)) * (rate / sample_rate)
+        data = np.interp(positions, np.arange(len(data)), data).astype(np.float32)
+    return data
+
+
+class Jingle:
+    """
+    Dấu vân tay của một jingle quảng cáo đã biết
+    """
+
+    def __init__(self, name: str, bands: np.ndarray):
+        """
+        Args:
+            name: Tên hiển thị
+            bands: log năng lượng theo dải (khung, BANDS)
+        """
+        self.name = name
+        self.frames = len(bands)
+        # (BANDS, khung) đã bỏ trung bình và chuẩn hóa, sẵn sàng để tính tương quan
+        self.template = _centered(bands.T)
+
+    @classmethod
+    def from_samples(cls, name: str, samples: np.ndarray, sample_rate: int = SAMPLE_RATE):
+        frames = split_frames(samples)
+        if len(frames) < 8:
+            raise ValueError(f"Jingle {name} quá ngắn")
+        _, bands = FeatureExtractor(sample_rate)(frames)
+        return cls(name, bands)
+
+    @classmethod
+    def from_wav(cls, path: str, sample_rate: int = SAMPLE_RATE):
+        return cls.from_samples(path, read_wav(path, sample_rate), sample_rate)
+
+
+class WavCaptureSource:
+    """
+    Capture source giả lập: phát lại file WAV (và khoảng im lặng) theo thứ tự
+
+    read() trả về từng khối mẫu float32 mono, None khi hết. Với realtime=True, mỗi
+    khối được trả về đúng nhịp thời gian thực.
+    """
+
+    def __init__(self, items, sample_rate: int = SAMPLE_RATE, chunk: int = 1600,
+                 realtime: bool = False, clock=time.perf_counter):
+        """
+        Args:
+            items: Danh sách đường dẫn WAV, mảng mẫu, hoặc số giây im lặng
+            chunk: Số mẫu mỗi lần read() (mặc định 100 ms)
+        """
+        parts = []
+        for item in items:
+            if isinstance(item, (int, float)):
+                parts.append(np.zeros(int(item * sample_rate), dtype=np.float32))
+            elif isinstance(item, str):
+                parts.append(read_wav(item, sample_rate))
+            else:
+                parts.append(np.asarray(item, dtype=np.float32))
+        self.samples = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+        self.sample_rate = sample_rate
+        self.chunk = chunk
+        self.realtime = realtime
+        self.clock = clock
+        self.position = 0
+        self._started = None
+        self._closed = threading.Event()
+
+    def read(self):
+        if self._closed.is_set() or self.position >= len(self.samples):
+            return None
+        if self.realtime:
+            if self._started is None:
+                self._started = self.clock()
+            due = self._started + (self.position + self.chunk) / self.sample_rate
+            if self._closed.wait(max(0.0, due - self.clock())):
+                return None
+        block = self.samples[self.position:self.position + self.chunk]
+        self.position += len(block)
+        return block
+
+    def close(self):
+        self._closed.set()
+
+
+class AudioAdDetector:
+    """
+    Phân tích âm thanh trên thread riêng, giữ AudioSnapshot mới nhất
+    """
+
+    def __init__(self, source, jingles=(), sample_rate: int = SAMPLE_RATE,
+                 ad_threshold: float = 0.8, pause_after: float = 2.0,
+                 loud_window: float = 3.0, baseline_window: float = 30.0,
+                 on_change=None, clock=time.perf_counter):
+        """
+        Args:
+            source: Capture source có read() -> mảng float32 mono (None = hết) và close()
+            jingles: Danh sách Jingle cần nhận diện
+            ad_threshold: Điểm từ đó coi âm thanh là quảng cáo (báo on_change)
+            pause_after: Im lặng liên tục bao lâu thì báo on_change (giây)
+            loud_window: Cửa sổ đo độ lớn hiện tại (giây)
+            baseline_window: Cửa sổ đo mức nền trước đó (giây)
+            on_change: Callback (không tham số) khi ý kiến đổi: vượt/xuống dưới
+                ad_threshold hoặc bắt đầu im lặng đủ lâu. Chạy trên thread detector
+            clock: Hàm đồng hồ (giây)
+        """
+        self.source = source
+        self.jingles = list(jingles)
+        self.sample_rate = sample_rate
+        self.ad_threshold = ad_threshold
+        self.pause_after = pause_after
+        self.on_change = on_change
+        self.clock = clock
+        self.frame_rate = sample_rate / HOP
+        self.loud_frames = int(loud_window * self.frame_rate)
+        self.baseline_frames = int(baseline_window * self.frame_rate)
+
+        self.extract = FeatureExtractor(sample_rate)
+        self.samples = RingBuffer(int(SAMPLE_HISTORY * sample_rate))
+        feature_frames = max(int(FEATURE_HISTORY * self.frame_rate),
+                             self.loud_frames + self.baseline_frames)
+        self.levels = RingBuffer(feature_frames)
+        longest = max((j.frames for j in self.jingles), default=0)
+        self.bands = RingBuffer(longest + BATCH, BANDS)
+        self._next_frame = 0
+        self._silent_frames = 0
+        self._searched_to = 0
+        # Độ lớn chỉ tính vào ad_score tới thời điểm này (None = luôn tính)
+        self.loudness_until = None
+
+        self.snapshot = EMPTY_SNAPSHOT
+        self.frames = 0
+        self.chunks = 0
+        self.busy = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- Điều khiển ----
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='audio-detector', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        self.source.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def join(self, timeout: float = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                block = self.source.read()
+            except Exception as e:
+                logger.error(f"Lỗi khi đọc âm thanh: {e}")
+                return
+            if block is None:
+                return
+            self.feed(block)
+
+    def limit_loudness(self, until: float):
+        """Chỉ tính độ lớn vào ad_score tới thời điểm until (theo clock), vd vài giây đầu bài"""
+        self.loudness_until = until
+
+    # ---- Phân tích ----
+
+    def feed(self, block) -> AudioSnapshot:
+        """Đưa một khối mẫu vào và cập nhật snapshot (thread detector hoặc test)"""
+        started = time.perf_counter()
+        block = np.asarray(block, dtype=np.float32)
+        self.chunks += 1
+        # Khối lớn được chia nhỏ để ring buffer không bao giờ bị ghi đè trước khi phân tích
+        for offset in range(0, len(block), BATCH * HOP):
+            self.samples.write(block[offset:offset + BATCH * HOP])
+            # Các khung mới đã đủ mẫu: bắt đầu tại _next_frame, bước HOP
+            available = self.samples.total - self._next_frame
+            count = 0 if available < FRAME else (available - FRAME) // HOP + 1
+            if count:
+                end = self._next_frame + (count - 1) * HOP + FRAME
+                span = self.samples.read(self._next_frame, end)
+                self._next_frame += count * HOP
+                self._analyze(split_frames(span))
+        self.busy += time.perf_counter() - started
+        return self.snapshot
+
+    def _analyze(self, frames: np.ndarray):
+        db, bands = self.extract(frames)
+        self.frames += len(frames)
+        self.levels.write(db)
+        self.bands.write(bands)
+
+        # Im lặng: đếm số khung im lặng liên tục ở cuối
+        loud = np.nonzero(db >= SILENCE_DB)[0]
+        if len(loud):
+            self._silent_frames = int(len(db) - 1 - loud[-1])
+        else:
+            self._silent_frames += len(db)
+        silent_for = float(self._silent_frames / self.frame_rate)
+
+        jump = self._loudness_jump()
+        now = self.clock()
+        if jump is None or (self.loudness_until is not None and now > self.loudness_until):
+            loud_score = 0.0
+        else:
+            loud_score = float(np.clip((jump - 3.0) / 6.0, 0.0, 1.0))
+        jingle, jingle_score = self._match_jingles()
+        previous = self.snapshot
+        self.snapshot = AudioSnapshot(max(jingle_score, loud_score), jingle, jingle_score,
+                                      jump, silent_for, now)
+
+        if self.on_change is not None:
+            was_ad = previous.ad_score >= self.ad_threshold
+            is_ad = self.snapshot.ad_score >= self.ad_threshold
+            paused = previous.silent_for < self.pause_after <= silent_for
+            if was_ad != is_ad or paused:
+                try:
+                    self.on_change()
+                except Exception as e:
+                    logger.error(f"Lỗi trong callback của audio detector: {e}")
+
+    def _loudness_jump(self):
+        """Độ lớn vài giây gần nhất trừ mức nền trước đó (dB), bỏ qua khung im lặng"""
+        needed = self.loud_frames + self.baseline_frames // 3
+        if self.levels.total - self.levels.start < needed:
+            return None
+        levels = self.levels.latest(self.loud_frames + self.baseline_frames)
+        current, baseline = levels[-self.loud_frames:], levels[:-self.loud_frames]
+        current = current[current >= SILENCE_DB]
+        baseline = baseline[baseline >= SILENCE_DB]
+        if len(current) < self.loud_frames // 2 or len(baseline) < self.baseline_frames // 3:
+            return None
+        return float(_mean_db(current) - _mean_db(baseline))
+
+    def _match_jingles(self):
+        """So các jingle với các khung mới (chỉ các vị trí kết thúc chưa xét)"""
+        best_name, best_score = None, 0.0
+        total = self.bands.total
+        for jingle in self.jingles:
+            k = jingle.frames
+            start = max(self.bands.start, min(self._searched_to, total) - k + 1, 0)
+            if total - start < k:
+                continue
+            # (vị trí, BANDS, k) -> tương quan với (BANDS, k) của jingle
+            windows = _centered(sliding_window_view(self.bands.read(start), k, axis=0))
+            correlation = (windows * jingle.template).sum(axis=(1, 2))
+            # Nhạc bất kỳ thường tương quan dưới 0.5; từ 0.85 là chắc chắn
+            score = float(np.clip((correlation.max() - 0.5) / 0.35, 0.0, 1.0))
+            if score > best_score:
+                best_name, best_score = jingle.name, score
+        self._searched_to = total
+        return best_name, best_score
+
+    def stats(self) -> dict:
+        s = self.snapshot
+        return {
+            'ad_score': round(s.ad_score, 3),
+            'jingle': s.jingle,
+            'loudness_jump_db': None if s.loudness_jump is None else round(s.loudness_jump, 1),
+            'silent_for_s': round(s.silent_for, 2),
+            'frames': self.frames,
+            'busy_ms_per_s_audio': round(self.busy * 1000 / max(self.frames / self.frame_rate, 1e-9), 3),
+            'memory_kb': round((self.samples.data.nbytes + self.levels.data.nbytes
+                                + self.bands.data.nbytes) / 1024, 1),
+        }
+
+
+class AudioSecondOpinion:
+    """
+    Gộp phán đoán theo tiêu đề với AudioSnapshot mới nhất (rẻ, chạy trên event loop)
+    """
+
+    def __init__(self, detector: AudioAdDetector, ad_threshold: float = None,
+                 pause_after: float = None, max_age: float = 1.0,
+                 audible_within: float = 0.5, loudness_for: float = 5.0):
+        """
+        Args:
+            detector: AudioAdDetector đang chạy
+            ad_threshold: Điểm âm thanh để coi là quảng cáo (mặc định của detector)
+            pause_after: Im lặng bao lâu thì coi là tạm dừng (mặc định của detector)
+            max_age: Snapshot cũ hơn số giây này thì bỏ qua âm thanh
+            audible_within: Im lặng ngắn hơn chừng này vẫn coi là đang có tiếng (audible())
+            loudness_for: Độ lớn chỉ được xét trong chừng này giây sau khi tiêu đề đổi
+        """
+        self.detector = detector
+        self.ad_threshold = detector.ad_threshold if ad_threshold is None else ad_threshold
+        self.pause_after = detector.pause_after if pause_after is None else pause_after
+        self.max_age = max_age
+        self.audible_within = audible_within
+        self.loudness_for = loudness_for
+        self.title = None
+        self.sticky_title = None
+        self.loud_title = None
+        self.audio_ads = 0
+        self.pauses = 0
+
+    def combine(self, title: str, title_is_ad: bool, has_separator: bool, muted: bool) -> bool:
+        """
+        Args:
+            title: Tiêu đề hiện tại
+            title_is_ad: Phán đoán của AdClassifier
+            has_separator: Tiêu đề có dạng "Artist - Song"
+            muted: Spotify đang bị mute/giảm âm lượng bởi ứng dụng (im lặng không có nghĩa)
+        """
+        if title != self.title:
+            # Tiêu đề mới: độ lớn chỉ có nghĩa vài giây đầu, so với bài trước đó
+            self.title = title
+            self.detector.limit_loudness(self.detector.clock() + self.loudness_for)
+        if title == self.sticky_title:
+            return True
+        self.sticky_title = None
+        if title == self.loud_title and muted:
+            # Đang mute vì độ lớn: âm thanh thu được chỉ còn im lặng, không đổi ý được
+            return True
+        self.loud_title = None
+        snapshot = self.detector.snapshot
+        if snapshot.updated_at is None or self.detector.clock() - snapshot.updated_at > self.max_age:
+            return title_is_ad
+        if not title_is_ad and snapshot.ad_score >= self.ad_threshold:
+            if snapshot.jingle_score >= self.ad_threshold:
+                # Jingle đã biết: chắc chắn, giữ tới khi tiêu đề đổi
+                self.sticky_title = title
+            else:
+                # Chỉ dựa vào độ lớn: giữ trong lúc còn mute, không giữ theo tiêu đề
+                self.loud_title = title
+            self.audio_ads += 1
+            logger.info("Âm thanh giống quảng cáo (%.2f, %s): '%s'",
+                        snapshot.ad_score, snapshot.jingle or 'độ lớn', title)
+            return True
+        if title_is_ad and not has_separator and not muted and snapshot.silent_for >= self.pause_after:
+            self.pauses += 1
+            logger.info("Không có âm thanh %.1f s, coi là tạm dừng: '%s'", snapshot.silent_for, title)
+            return False
+        return title_is_ad
+
+    def audible(self):
+        """
+        Spotify đang phát ra tiếng? None nếu chưa có snapshot mới (capture dừng)
+
+        Sau khi ứng dụng mute thì luôn là im lặng, chỉ có nghĩa lúc chưa mute.
+        """
+        snapshot = self.detector.snapshot
+        if snapshot.updated_at is None or self.detector.clock() - snapshot.updated_at > self.max_age:
+            return None
+        return snapshot.silent_for < self.audible_within
+
+    def stats(self) -> dict:
+        return dict(self.detector.stats(), audio_ads=self.audio_ads, pauses=self.pauses)
@@ -0,0 +1,449 @@
+"""
+Audio Sessions - Quản lý và cache các audio session của Spotify
+
+SpotifySessionManager giữ sẵn interface ISimpleAudioVolume của mọi session
+Spotify. Danh sách chỉ được làm mới khi có sự kiện session-created/expired hoặc
+khi một lời gọi thất bại, nên mute/unmute lúc quảng cáo bắt đầu chỉ còn là các
+lời gọi SetMute trên tập đã cache.
+
+Manager còn giữ bảng trạng thái mute theo từng session (mong muốn / thực tế).
+Nếu backend báo được thay đổi mute từ bên ngoài thì chỉ session lệch trạng thái
+mới được gọi SetMute, nên các lệnh mute lặp lại trong lúc quảng cáo không tốn lời
+gọi nào khi mọi session đã mute.
+
+Backend âm thanh được tách ra (AudioBackend) để có thể test bằng FakeAudioBackend
+trên Linux.
+"""
+
+import sys
+import threading
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+# key: định danh session, session: đối tượng session gốc, volume: ISimpleAudioVolume
+SessionHandle = namedtuple('SessionHandle', ['key', 'session', 'volume'])
+
+
+class AudioBackend:
+    """
+    Giao diện backend âm thanh
+    """
+
+    def find_sessions(self, process_keyword: str) -> list:
+        """
+        Tìm các session của tiến trình có tên chứa process_keyword
+
+        Returns:
+            Danh sách SessionHandle
+        """
+        raise NotImplementedError
+
+    def set_mute(self, handle: SessionHandle, muted: bool):
+        """Đặt trạng thái mute cho một session (ném exception nếu thất bại)"""
+        raise NotImplementedError
+
+    def get_volume(self, handle: SessionHandle) -> float:
+        """Âm lượng của session (0.0 - 1.0)"""
+        raise NotImplementedError
+
+    def set_volume(self, handle: SessionHandle, level: float):
+        """Đặt âm lượng cho session (0.0 - 1.0, ném exception nếu thất bại)"""
+        raise NotImplementedError
+
+    def watch_sessions(self, on_change) -> bool:
+        """
+        Đăng ký nhận sự kiện session được tạo/hết hạn
+
+        Args:
+            on_change: Callback không tham số, có thể được gọi từ thread khác
+
+        Returns:
+            True nếu backend hỗ trợ sự kiện
+        """
+        return False
+
+    def watch_mute(self, on_mute_changed) -> bool:
+        """
+        Đăng ký nhận thay đổi mute của session (vd người dùng bật tiếng trong
+        Volume Mixer, Spotify tạo lại stream)
+
+        Args:
+            on_mute_changed: Callback(key, muted), muted=None nếu không rõ trạng thái mới
+
+        Returns:
+            True nếu backend hỗ trợ (chỉ có hiệu lực sau watch_sessions)
+        """
+        return False
+
+    def close(self):
+        """Hủy đăng ký sự kiện"""
+
+
+class PycawAudioBackend(AudioBackend):
+    """
+    Backend Windows dùng pycaw (WASAPI)
+
+    pycaw/comtypes chỉ được import ở lần dùng đầu tiên, trên thread audio.
+    """
+
+    def __init__(self):
+        self._utilities = None
+        self._volume_interface = None
+        self._on_change = None
+        self._on_mute_changed = None
+        self._manager = None
+        self._notification = None
+        self._session_events = {}
+
+    def _load(self):
+        if self._utilities is not None:
+            return
+        if getattr(sys, 'frozen', False):
+            # Bản EXE: dùng lại code comtypes đã sinh ở lần chạy trước
+            from comtypes_cache import setup_comtypes_cache
+            setup_comtypes_cache()
+        from pycaw.pycaw import AudioUtilities, ISimpleAudioVolume
+
+        self._utilities = AudioUtilities
+        self._volume_interface = ISimpleAudioVolume
+
+    def find_sessions(self, process_keyword: str) -> list:
+        self._load()
+        handles = []
+        for session in self._utilities.GetAllSessions():
+            if session.Process and process_keyword in session.Process.name().lower():
+                volume = session._ctl.QueryInterface(self._volume_interface)
+                try:
+                    key = session.InstanceIdentifier
+                except Exception:
+                    key = (session.ProcessId, id(session))
+                handles.append(SessionHandle(key, session, volume))
+                self._watch_session(key, session)
+        return handles
+
+    def set_mute(self, handle: SessionHandle, muted: bool):
+        handle.volume.SetMute(1 if muted else 0, None)
+
+    def get_volume(self, handle: SessionHandle) -> float:
+        return handle.volume.GetMasterVolume()
+
+    def set_volume(self, handle: SessionHandle, level: float):
+        handle.volume.SetMasterVolume(level, None)
+
+    def watch_sessions(self, on_change) -> bool:
+        self._on_change = on_change
+        try:
+            self._load()
+            from pycaw.callbacks import AudioSessionNotification
+
+            backend = self
+
+            class _SessionCreated(AudioSessionNotification):
+                def on_session_created(self, new_session):
+                    backend._notify()
+
+            self._manager = self._utilities.GetAudioSessionManager()
+            self._notification = _SessionCreated()
+            self._manager.RegisterSessionNotification(self._notification)
+            # WASAPI chỉ bắt đầu gửi sự kiện sau lần liệt kê session đầu tiên
+            self._manager.GetSessionEnumerator()
+            return True
+        except Exception as e:
+            logger.warning(f"Không đăng ký được sự kiện audio session: {e}")
+            self._manager = None
+            self._notification = None
+            return False
+
+    def watch_mute(self, on_mute_changed) -> bool:
+        # Đi kèm AudioSessionEvents đăng ký cho từng session trong _watch_session
+        self._on_mute_changed = on_mute_changed
+        return self._manager is not None
+
+    def _watch_session(self, key, session):
+        """Theo dõi session hết hạn/ngắt kết nối"""
+        if self._on_change is None or key in self._session_events:
+            return
+        try:
+            from pycaw.callbacks import AudioSessionEvents
+
+            backend = self
+
+            class _SessionEvents(AudioSessionEvents):
+                def on_simple_volume_changed(self, new_volume, new_mute, event_context):
+                    if backend._on_mute_changed:
+                        backend._on_mute_changed(key, bool(new_mute))
+
+                def on_state_changed(self, new_state, new_state_id):
+                    if new_state == 'Expired':
+                        backend._session_gone(key)
+
+                def on_session_disconnected(self, disconnect_reason, disconnect_reason_id):
+                    backend._session_gone(key)
+
+            events = _SessionEvents()
+            session.register_notification(events)
+            self._session_events[key] = (session, events)
+        except Exception as e:
+            logger.debug("Không theo dõi được session %s: %s", key, e)
+
+    def _session_gone(self, key):
+        """Session hết hạn: key có thể được dùng lại cho session mới chưa mute"""
+        self._session_events.pop(key, None)
+        if self._on_mute_changed:
+            self._on_mute_changed(key, None)
+        self._notify()
+
+    def _notify(self):
+        if self._on_change:
+            self._on_change()
+
+    def close(self):
+        for session, _ in self._session_events.values():
+            try:
+                session.unregister_notification()
+            except Exception:
+                pass
+        self._session_events.clear()
+        if self._manager is not None and self._notification is not None:
+            try:
+                self._manager.UnregisterSessionNotification(self._notification)
+            except Exception:
+                pass
+        self._manager = None
+        self._notification = None
+
+
+class FakeAudioBackend(AudioBackend):
+    """
+    Backend giả lập cho test và benchmark trên Linux
+
+    Mỗi session là một dict {'muted': bool, 'volume': float}; đếm số lần tìm
+    kiếm, SetMute và SetMasterVolume.
+    """
+
+    def __init__(self, session_keys=('spotify-1',)):
+        self.sessions = {key: {'muted': False, 'volume': 1.0} for key in session_keys}
+        self.find_calls = 0
+        self.set_mute_calls = 0
+        self.set_volume_calls = 0
+        self.failing = set()
+        self._on_change = None
+        self._on_mute_changed = None
+
+    def find_sessions(self, process_keyword: str) -> list:
+        self.find_calls += 1
+        return [SessionHandle(key, key, state) for key, state in self.sessions.items()]
+
+    def set_mute(self, handle: SessionHandle, muted: bool):
+        self.set_mute_calls += 1
+        if handle.key in self.failing or handle.key not in self.sessions:
+            raise OSError(f"Session {handle.key} không còn hợp lệ")
+        handle.volume['muted'] = muted
+
+    def get_volume(self, handle: SessionHandle) -> float:
+        return handle.volume['volume']
+
+    def set_volume(self, handle: SessionHandle, level: float):
+        self.set_volume_calls += 1
+        if handle.key in self.failing or handle.key not in self.sessions:
+            raise OSError(f"Session {handle.key} không còn hợp lệ")
+        handle.volume['volume'] = level
+
+    def watch_sessions(self, on_change) -> bool:
+        self._on_change = on_change
+        return True
+
+    def watch_mute(self, on_mute_changed) -> bool:
+        self._on_mute_changed = on_mute_changed
+        return True
+
+    def external_set_mute(self, key, muted: bool, notify: bool = True):
+        """Giả lập trạng thái mute bị đổi từ bên ngoài (notify=False: mất sự kiện)"""
+        self.sessions[key]['muted'] = muted
+        if notify and self._on_mute_changed:
+            self._on_mute_changed(key, muted)
+
+    def add_session(self, key):
+        """Giả lập Spotify tạo session mới"""
+        self.sessions[key] = {'muted': False, 'volume': 1.0}
+        if self._on_change:
+            self._on_change()
+
+    def expire_session(self, key, notify: bool = True):
+        """Giả lập session hết hạn (notify=False: mất sự kiện)"""
+        self.sessions.pop(key, None)
+        if notify and self._on_mute_changed:
+            self._on_mute_changed(key, None)
+        if notify and self._on_change:
+            self._on_change()
+
+    def is_muted(self, key) -> bool:
+        return self.sessions[key]['muted']
+
+
+class SessionMuteState:
+    """
+    Trạng thái mute của một session: desired (mong muốn) và actual (thực tế,
+    None = chưa biết, vd session mới hoặc lần gọi trước lỗi)
+    """
+
+    __slots__ = ('desired', 'actual')
+
+    def __init__(self, desired: bool = False, actual: bool = None):
+        self.desired = desired
+        self.actual = actual
+
+    @property
+    def in_sync(self) -> bool:
+        return self.actual == self.desired
+
+    def __repr__(self):
+        return f"SessionMuteState(desired={self.desired}, actual={self.actual})"
+
+
+class SpotifySessionManager:
+    """
+    Cache các audio session của Spotify, làm mới theo sự kiện
+    """
+
+    def __init__(self, backend: AudioBackend = None, process_keyword: str = 'spotify'):
+        """
+        Args:
+            backend: Backend âm thanh (mặc định PycawAudioBackend)
+            process_keyword: Từ khóa nhận diện tiến trình Spotify
+        """
+        self.backend = backend if backend is not None else PycawAudioBackend()
+        self.process_keyword = process_keyword
+        self.handles = []
+        self.refreshes = 0
+        # key session -> SessionMuteState
+        self.states = {}
+        self.desired_muted = False
+        self.set_mute_calls = 0
+        self.skipped_calls = 0
+        self._dirty = True
+        self._owner_thread = None
+        self._lock = threading.Lock()
+        # Đăng ký sự kiện ở lần làm mới đầu tiên, tức là trên thread làm việc
+        # với âm thanh (thread đó đã CoInitialize và có message loop)
+        self.has_events = None
+        # Chỉ tin bảng trạng thái khi backend báo được thay đổi mute từ bên ngoài
+        self.tracks_mute = False
+
+    def invalidate(self):
+        """Đánh dấu cache cần làm mới (an toàn khi gọi từ thread khác)"""
+        self._dirty = True
+
+    def refresh(self) -> list:
+        """Liệt kê lại session của Spotify và cache interface"""
+        if self.has_events is None:
+            self.has_events = self.backend.watch_sessions(self.invalidate)
+            self.tracks_mute = self.has_events and self.backend.watch_mute(self.on_mute_changed)
+        self._dirty = False
+        try:
+            self.handles = self.backend.find_sessions(self.process_keyword)
+        except Exception as e:
+            logger.error(f"Lỗi khi lấy audio session: {e}")
+            self.handles = []
+            self._dirty = True
+        # Giữ trạng thái của session còn sống (backend báo session hết hạn qua
+        # on_mute_changed(key, None)); session mới có trạng thái thực tế chưa biết
+        old = self.states if self.tracks_mute else {}
+        self.states = {
+            handle.key: old.get(handle.key) or SessionMuteState(self.desired_muted)
+            for handle in self.handles
+        }
+        self._owner_thread = threading.get_ident()
+        self.refreshes += 1
+        return self.handles
+
+    def get_sessions(self) -> list:
+        """
+        Danh sách session đã cache, làm mới nếu cần
+
+        Khi chưa có session nào (Spotify chưa phát âm thanh) hoặc backend không
+        hỗ trợ sự kiện tạo session thì luôn liệt kê lại.
+        """
+        with self._lock:
+            if self._dirty or not self.handles:
+                self.refresh()
+            elif self._owner_thread != threading.get_ident():
+                # Interface COM gắn với apartment của thread đã tạo ra nó,
+                # thread khác phải tự liệt kê và không ghi đè cache
+                return self.backend.find_sessions(self.process_keyword)
+            return list(self.handles)
+
+    def on_mute_changed(self, key, muted):
+        """Backend báo trạng thái mute của session đổi (có thể từ thread khác)"""
+        state = self.states.get(key)
+        if state is not None:
+            state.actual = muted
+
+    def out_of_sync(self) -> list:
+        """Key các session có trạng thái thực tế khác mong muốn"""
+        return [key for key, state in list(self.states.items()) if not state.in_sync]
+
+    def set_mute(self, muted: bool) -> int:
+        """
+        Đưa mọi session Spotify về trạng thái mute mong muốn
+
+        Chỉ gọi backend cho session lệch trạng thái (hoặc mọi session nếu backend
+        không báo thay đổi mute). Nếu có session lỗi, làm mới cache rồi thử lại
+        một lần.
+
+        Returns:
+            Số session đang ở trạng thái mong muốn
+        """
+        self.desired_muted = muted
+        handles = self.get_sessions()
+        count, failed = self._apply(handles, muted)
+        if failed:
+            logger.debug("%s session lỗi, làm mới cache và thử lại", failed)
+            self.invalidate()
+            count, failed = self._apply(self.get_sessions(), muted)
+        return count
+
+    def _apply(self, handles, muted: bool):
+        count = 0
+        failed = 0
+        for handle in handles:
+            state = self.states.get(handle.key)
+            if state is None:
+                state = self.states[handle.key] = SessionMuteState()
+            state.desired = muted
+            if self.tracks_mute and state.in_sync:
+                self.skipped_calls += 1
+                count += 1
+                continue
+            self.set_mute_calls += 1
+            try:
+                self.backend.set_mute(handle, muted)
+                state.actual = muted
+                count += 1
+            except Exception as e:
+                state.actual = None
+                failed += 1
+                logger.error("Lỗi %s session %s: %s", 'mute' if muted else 'unmute',
+                             handle.key, e)
+        return count, failed
+
+    def mute(self) -> int:
+        return self.set_mute(True)
+
+    def unmute(self) -> int:
+        return self.set_mute(False)
+
+    def stats(self) -> dict:
+        return {
+            'sessions': len(self.states),
+            'out_of_sync': len(self.out_of_sync()),
+            'set_mute_calls': self.set_mute_calls,
+            'skipped_calls': self.skipped_calls,
+            'refreshes': self.refreshes,
+        }
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,78 @@
+"""
+Microbenchmark bộ phân loại quảng cáo - 1 triệu tiêu đề
+
+So sánh vòng lặp cũ (lower + duyệt separator/keyword mỗi lần gọi) với
+AdClassifier khi tắt và bật cache LRU.
+
+Chạy: python bench_classifier.py [số_tiêu_đề]
+"""
+
+import random
+import sys
+import time
+
+from ad_classifier import AD_KEYWORDS, AdClassifier
+
+
+def legacy_is_ad_playing(window_title: str) -> bool:
+    """Logic is_ad_playing trước khi có AdClassifier (để so sánh)"""
+    if not window_title:
+        return False
+    title_lower = window_title.lower().strip()
+    is_music_format = False
+    for sep in [' - ', ' – ', ' — ']:
+        if sep in window_title:
+            is_music_format = True
+            break
+    if not is_music_format:
+        return True
+    for keyword in AD_KEYWORDS:
+        if keyword.lower() in title_lower:
+            return True
+    return False
+
+
+def make_titles(count: int, distinct: int = 2000, seed: int = 1) -> list:
+    """Sinh danh sách tiêu đề, lặp lại từ một tập nhỏ như khi nghe thật"""
+    rng = random.Random(seed)
+    artists = ["Radiohead", "Sơn Tùng M-TP", "Adele", "Đen", "Daft Punk", "Mỹ Tâm", "The Weeknd"]
+    pool = []
+    for i in range(distinct):
+        roll = rng.random()
+        if roll < 0.05:
+            pool.append(rng.choice(["Advertisement", "Spotify", "Quảng cáo", "Spotify Free"]))
+        elif roll < 0.08:
+            pool.append(f"Spotify - Try Premium {i}")
+        else:
+            sep = rng.choice([' - ', ' – ', ' — '])
+            pool.append(f"{rng.choice(artists)}{sep}Track number {i} (Remastered {1990 + i % 30})")
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def run(name: str, func, titles: list) -> float:
+    start = time.perf_counter()
+    for title in titles:
+        func(title)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:7.3f} s  ({elapsed / len(titles) * 1e9:7.1f} ns/tiêu đề)")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    titles = make_titles(count)
+
+    uncached = AdClassifier(cache_size=0)
+    cached = AdClassifier()
+    mismatches = sum(1 for t in set(titles) if legacy_is_ad_playing(t) != cached.is_ad(t))
+
+    print(f"Phân loại {count:,} tiêu đề ({len(set(titles))} tiêu đề khác nhau)")
+    run("legacy loop", legacy_is_ad_playing, titles)
+    run("AdClassifier (no cache)", uncached._classify, titles)
+    run("AdClassifier (LRU)", cached.is_ad, titles)
+    print(f"Cache: {cached.cache_info()}")
+    print(f"Khác biệt so với logic cũ: {mismatches} tiêu đề (do allow-list)")
+
+
+if __name__ == "__main__":
+    main()
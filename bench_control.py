@@ -0,0 +1,205 @@
+"""
+Benchmark control API - Đo độ trễ phát hiện quảng cáo khi control API bị dội lệnh
+
+Daemon chạy với backend giả lập và nguồn tiêu đề theo kịch bản (push, quảng cáo và
+bài hát xen kẽ). Lần đo thứ nhất không có client; lần thứ hai có nhiều tiến trình
+client gửi status/stats liên tục qua socket và vài client nhận stream metrics.
+Độ trễ phát hiện là khoảng từ lúc tiêu đề quảng cáo xuất hiện tới khi lệnh mute
+được gọi; control plane không chặn monitor thì hai lần đo phải gần như nhau.
+
+Chạy: python bench_control.py [--duration 5] [--clients 4] [--subscribers 2]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from ad_index import KnownAdIndex
+from audio_sessions import FakeAudioBackend, SpotifySessionManager
+from control_api import ControlClient
+from event_store import EventStore
+from latency_stats import LatencyHistogram
+from platform_backends import PlatformBackend
+from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+from spotify_ads_mute_daemon import SpotifyAdsMuteDaemon
+from title_watcher import ScriptedTitleSource
+
+
+class ScriptedBackend(PlatformBackend):
+    """
+    Nguồn tiêu đề theo kịch bản vừa là title source vừa là event source
+
+    Kịch bản chỉ bắt đầu khi go được set (sau khi mọi client đã kết nối).
+    """
+
+    def __init__(self, source: ScriptedTitleSource):
+        self.source = source
+        self.go = threading.Event()
+
+    def create_title_source(self, process_watcher=None):
+        return self
+
+    def create_event_source(self, title_source):
+        return self
+
+    def get_title(self) -> str:
+        return self.source()
+
+    def invalidate(self):
+        pass
+
+    def run(self, notify, stop_event):
+        while not self.go.wait(0.05):
+            if stop_event.is_set():
+                return
+        self.source.start()
+        notify()
+        self.source.run(notify, stop_event)
+
+    def wake(self):
+        self.source.wake()
+
+
+def build_timeline(duration: float, period: float) -> list:
+    timeline = []
+    for i in range(int(duration / period)):
+        title = "Advertisement" if i % 2 else f"Artist - Song {i}"
+        timeline.append((0.05 + i * period, title))
+    return timeline
+
+
+def hammer(address: str, stop, ready, results):
+    """Tiến trình client: gửi status/stats liên tục tới khi stop được set"""
+    histogram = LatencyHistogram()
+    with ControlClient(address) as client:
+        ready.release()
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.request('stats' if i % 4 == 0 else 'status')
+            histogram.record(time.perf_counter() - start)
+            i += 1
+    results.put(('requests', histogram.count, histogram.buckets, histogram.max))
+
+
+def subscribe(address: str, stop, ready, results):
+    """Tiến trình client: nhận stream metrics tới khi stop được set"""
+    lines = 0
+    with ControlClient(address) as client:
+        ready.release()
+        for _ in client.stream('metrics', interval=0.05):
+            lines += 1
+            if stop.is_set():
+                break
+    results.put(('metrics', lines, None, None))
+
+
+def run_once(duration: float, period: float, clients: int, subscribers: int) -> dict:
+    source = ScriptedTitleSource(build_timeline(duration, period))
+    backend = ScriptedBackend(source)
+    tmp = tempfile.mkdtemp(prefix='bench_control_')
+    daemon = SpotifyAdsMuteDaemon(
+        address=os.path.join(tmp, 'ctl.sock') if os.name != 'nt' else None,
+        session_manager=SpotifySessionManager(FakeAudioBackend()),
+        process_watcher=SpotifyProcessWatcher(FakeProcessTable({1: "Spotify.exe"})),
+        platform_backend=backend,
+        history=EventStore(os.path.join(tmp, 'events.bin')),
+        ad_index=KnownAdIndex(os.path.join(tmp, 'known_ads.bin')),
+        fade=False,
+    )
+    mute_times = []
+    original_mute = daemon.engine.monitor.mute
+
+    def timed_mute():
+        mute_times.append(time.perf_counter())
+        return original_mute()
+
+    daemon.engine.monitor.mute = timed_mute
+    thread = threading.Thread(target=daemon.run, daemon=True)
+    thread.start()
+    while daemon.control.loop is None or not daemon.control._ready.is_set():
+        time.sleep(0.01)
+
+    # Client là tiến trình riêng, giống công cụ ngoài gọi vào daemon
+    ctx = multiprocessing.get_context('spawn')
+    ready = ctx.Semaphore(0)
+    results = ctx.Queue()
+    stop = ctx.Event()
+    procs = []
+    for i in range(clients + subscribers):
+        target = hammer if i < clients else subscribe
+        proc = ctx.Process(target=target, args=(daemon.control.address, stop, ready, results))
+        proc.start()
+        procs.append(proc)
+    # Chờ mọi client kết nối xong rồi mới phát kịch bản
+    for _ in procs:
+        ready.acquire()
+
+    started = time.perf_counter()
+    backend.go.set()
+    time.sleep(duration + 0.2)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    ad_starts = [at for at, title in source.change_times() if title == "Advertisement"]
+
+    collected = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    daemon.request_stop()
+    thread.join(5.0)
+
+    detection = LatencyHistogram()
+    for start in ad_starts:
+        muted = next((t for t in mute_times if t >= start), None)
+        if muted is not None:
+            detection.record(muted - start)
+
+    requests = LatencyHistogram()
+    for kind, count, buckets, longest in collected:
+        if kind == 'requests':
+            requests.count += count
+            for index, n in buckets.items():
+                requests.buckets[index] = requests.buckets.get(index, 0) + n
+            requests.max = max(requests.max or 0.0, longest)
+    return {
+        'ads': len(ad_starts),
+        'detected': detection.count,
+        'detection': detection.summary(),
+        'requests': requests.count,
+        'requests_per_s': round(requests.count / elapsed),
+        'request_latency': requests.summary() if requests.count else None,
+        'metrics_lines': sum(count for kind, count, _, _ in collected if kind == 'metrics'),
+        'server': daemon.control.stats(),
+    }
+
+
+def report(name: str, result: dict):
+    d = result['detection']
+    print(f"{name}: {result['detected']}/{result['ads']} quảng cáo, độ trễ phát hiện "
+          f"p50 {d['p50_ms']:.2f} / p95 {d['p95_ms']:.2f} / max {d['max_ms']:.2f} ms")
+    if result['request_latency']:
+        r = result['request_latency']
+        print(f"    {result['requests']} lệnh ({result['requests_per_s']}/s), "
+              f"p50 {r['p50_ms']:.2f} / p99 {r['p99_ms']:.2f} ms; "
+              f"{result['metrics_lines']} dòng metrics; ngắt {result['server']['dropped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--period', type=float, default=0.2, help="Độ dài mỗi tiêu đề (giây)")
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--subscribers', type=int, default=2)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    report("Không tải  ", run_once(args.duration, args.period, 0, 0))
+    report("Có tải     ", run_once(args.duration, args.period, args.clients, args.subscribers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark đường dốc âm lượng - jitter của từng bước so với lịch
+
+Chạy các đường dốc giảm/khôi phục âm lượng trên FakeAudioBackend và in phân bố
+độ trễ của các bước (timer độ phân giải cao) so với time.sleep thông thường.
+
+Chạy: python bench_fader.py [số_đường_dốc] [bước_ms]
+"""
+
+import sys
+import time
+
+from audio_sessions import FakeAudioBackend, SpotifySessionManager
+from latency_stats import LatencyHistogram
+from volume_fader import FadingMuter, VolumeFader
+
+
+def bench_fader(ramps: int, step: float) -> dict:
+    backend = FakeAudioBackend(['spotify-1', 'spotify-2'])
+    fader = VolumeFader(backend, step_interval=step)
+    muter = FadingMuter(SpotifySessionManager(backend), fader, fade_out=0.1, fade_in=0.3)
+    for i in range(ramps):
+        muter.mute() if i % 2 == 0 else muter.unmute()
+        fader.wait(5.0)
+    muter.close()
+    return fader.jitter.summary()
+
+
+def bench_sleep(samples: int, step: float) -> dict:
+    """Cách đơn giản: time.sleep(step) giữa các bước, đo độ trễ tích lũy so với lịch"""
+    histogram = LatencyHistogram()
+    start = time.perf_counter()
+    for i in range(1, samples + 1):
+        time.sleep(step)
+        histogram.record(max(0.0, time.perf_counter() - (start + i * step)))
+    return histogram.summary()
+
+
+def report(name: str, summary: dict):
+    print(f"{name:<12} bước={summary['count']:5d}  p50={summary['p50_ms']:7.3f} ms  "
+          f"p95={summary['p95_ms']:7.3f} ms  p99={summary['p99_ms']:7.3f} ms  "
+          f"max={summary['max_ms']:7.3f} ms")
+
+
+def main():
+    ramps = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    step = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.01
+    fader = bench_fader(ramps, step)
+    report("fader", fader)
+    report("time.sleep", bench_sleep(fader['count'], step))
+
+
+if __name__ == "__main__":
+    main()
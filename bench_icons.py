@@ -0,0 +1,82 @@
+"""
+Benchmark cập nhật icon tray - vẽ lại mỗi lần vs. tra bảng icon vẽ sẵn
+
+Mô phỏng chuỗi chuyển trạng thái của một phiên nghe (kể cả các lần cập nhật
+trùng trạng thái) và đo chi phí trung bình mỗi lần chuyển.
+
+Chạy: python bench_icons.py [số_lần_chuyển]
+"""
+
+import sys
+import time
+
+from tray_icons import IconSprites, IconUpdater, render_icon
+
+
+class FakeIcon:
+    """Thay cho pystray.Icon, chỉ ghi nhận icon được gán"""
+
+    def __init__(self):
+        self.icon = None
+        self.assignments = 0
+
+    def __setattr__(self, name, value):
+        if name == 'icon':
+            object.__setattr__(self, 'assignments', getattr(self, 'assignments', 0) + 1)
+        object.__setattr__(self, name, value)
+
+
+def transitions(count: int) -> list:
+    # Mỗi quảng cáo: mute, vài lần "vẫn là quảng cáo", unmute, vài bài hát
+    cycle = ['muted', 'muted', 'muted', 'enabled', 'enabled', 'enabled', 'disabled', 'enabled']
+    return [cycle[i % len(cycle)] for i in range(count)]
+
+
+def bench_redraw(states: list) -> tuple:
+    """
+    Cách cũ: vẽ ảnh mới cho mỗi lần update_icon
+
+    Returns:
+        (thời gian giây, số lần gán icon)
+    """
+    icon = FakeIcon()
+    start = time.perf_counter()
+    for state in states:
+        icon.icon = render_icon(state)
+    elapsed = time.perf_counter() - start
+    return elapsed, icon.assignments
+
+
+def bench_sprites(states: list) -> tuple:
+    """
+    Cách mới: tra bảng và bỏ qua nếu trạng thái không đổi
+
+    Returns:
+        (thời gian giây, số lần gán icon, thời gian vẽ sẵn lúc khởi động)
+    """
+    icon = FakeIcon()
+    startup = time.perf_counter()
+    updater = IconUpdater(IconSprites())
+    startup = time.perf_counter() - startup
+    start = time.perf_counter()
+    for state in states:
+        updater.apply(icon, state)
+    elapsed = time.perf_counter() - start
+    return elapsed, icon.assignments, startup
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    states = transitions(count)
+
+    redraw, redraw_sets = bench_redraw(states)
+    sprites, sprite_sets, startup = bench_sprites(states)
+
+    print(f"{count} lần update_icon")
+    print(f"vẽ lại mỗi lần : {redraw / count * 1e6:8.2f} µs/lần  (gán icon {redraw_sets} lần)")
+    print(f"icon vẽ sẵn    : {sprites / count * 1e6:8.2f} µs/lần  (gán icon {sprite_sets} lần, "
+          f"vẽ sẵn lúc khởi động {startup * 1000:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
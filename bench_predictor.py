@@ -0,0 +1,157 @@
+"""
+Đánh giá offline AdBreakPredictor trên timeline đã ghi (bench_timelines/*.tsv)
+
+Timeline được phát lại qua AsyncMonitor.check_once() trên đồng hồ ảo, lặp lại
+nhiều vòng để predictor có lịch sử học (vòng đầu chưa biết gì). So sánh monitor
+polling thường với monitor có predictor (chế độ hot + pre-mute):
+
+- số giây quảng cáo bị nghe thấy trước khi mute (tổng và trung bình mỗi đợt)
+- số lần pre-mute trúng / nhầm, số giây nhạc bị mute nhầm
+- số lần thức dậy mỗi phút (chi phí của chế độ hot)
+
+Chạy:
+    python bench_predictor.py                        # mọi timeline, lặp 5 vòng
+    python bench_predictor.py --repeat 20 --budget 1 bench_timelines/free_tier_session.tsv
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+from ad_classifier import AdClassifier
+from ad_predictor import AdBreakPredictor
+from async_monitor import AsyncMonitor
+from bench_replay import TIMELINE_DIR, load_timeline
+from config import AppConfig
+
+
+def repeat_timeline(segments: list, rounds: int) -> list:
+    """Nối timeline với chính nó rounds lần (offset dịch theo độ dài timeline)"""
+    length = segments[-1][0]
+    result = []
+    for i in range(rounds):
+        body = segments if i == rounds - 1 else segments[:-1]
+        result.extend((offset + i * length, label, title) for offset, label, title in body)
+    return result
+
+
+def simulate(segments: list, interval: float = 0.3, predictor: AdBreakPredictor = None,
+             classifier: AdClassifier = None, config: AppConfig = None) -> dict:
+    """
+    Phát lại timeline qua AsyncMonitor.check_once() trên đồng hồ ảo
+
+    Phân loại, máy trạng thái, predictor (hot/pre-mute) đều là code chạy thật; chỉ
+    cửa sổ và âm thanh là giả lập, thời gian xử lý coi như bằng 0. Chu kỳ thức dậy
+    chọn như task sample: hot_interval khi predictor đang hot, sớm hơn nếu máy trạng
+    thái đang chờ xác nhận.
+    """
+    classifier = classifier or AdClassifier()
+    config = config or AppConfig()
+    end = segments[-1][0]
+    clock = [0.0]
+    position = [0]
+    audio = {'muted': False, 'mutes': 0}
+
+    def get_title():
+        while position[0] + 1 < len(segments) and segments[position[0] + 1][0] <= clock[0]:
+            position[0] += 1
+        return segments[position[0]][2]
+
+    def set_muted(muted):
+        audio['mutes'] += muted
+        audio['muted'] = muted
+        return True
+
+    if predictor is not None:
+        predictor.clock = lambda: clock[0]
+    monitor = AsyncMonitor(get_title, classifier.is_ad, lambda: set_muted(True),
+                           lambda: set_muted(False), check_interval=interval,
+                           predictor=predictor,
+                           detector=config.build_detector(clock=lambda: clock[0]))
+
+    wakeups = 0
+    audible_ad = 0.0
+    false_mute = 0.0
+    breaks = 0
+    pre_muted_breaks = 0
+    t = 0.0
+
+    while t < end:
+        clock[0] = t
+        monitor.check_once(now=t)
+        wakeups += 1
+        muted = audio['muted']
+
+        next_interval = predictor.hot_interval if monitor.hot else interval
+        confirm_in = monitor.detector.confirm_in(t)
+        if confirm_in is not None:
+            next_interval = min(next_interval, max(confirm_in, 1e-3))
+
+        # Tích lũy thời gian nghe nhầm/mute nhầm tới lần thức dậy kế tiếp
+        t_next = min(t + next_interval, end)
+        cursor = t
+        i = position[0]
+        while cursor < t_next:
+            seg_end = segments[i + 1][0] if i + 1 < len(segments) else end
+            span_end = min(seg_end, t_next)
+            seg_label = segments[i][1]
+            if seg_label == 'ad' and not muted:
+                audible_ad += span_end - cursor
+            elif seg_label == 'music' and muted:
+                false_mute += span_end - cursor
+            if span_end >= seg_end and i + 1 < len(segments):
+                i += 1
+                # Đầu một đợt quảng cáo: đang pre-mute nghĩa là dự đoán đã trúng
+                if segments[i][1] == 'ad' and segments[i - 1][1] != 'ad':
+                    breaks += 1
+                    if monitor.pre_muted:
+                        pre_muted_breaks += 1
+            cursor = span_end
+        t = t_next
+
+    result = {
+        'ad_breaks': breaks,
+        'audible_ad_s': round(audible_ad, 3),
+        'audible_per_break_ms': round(audible_ad / breaks * 1000, 1) if breaks else 0.0,
+        'pre_muted_breaks': pre_muted_breaks,
+        'false_mute_s': round(false_mute, 3),
+        'wakeups_per_min': round(wakeups / end * 60, 1) if end else 0.0,
+        'mutes': audio['mutes'],
+        'detected_ads': monitor.ad_count,
+    }
+    if predictor is not None:
+        result.update(predictor.stats())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đánh giá predictor quảng cáo trên timeline đã ghi")
+    parser.add_argument('timelines', nargs='*', help="File timeline (.tsv), mặc định bench_timelines/*.tsv")
+    parser.add_argument('--repeat', type=int, default=5, help="Số vòng lặp lại timeline")
+    parser.add_argument('--interval', type=float, default=0.3, help="Chu kỳ polling thường (giây)")
+    parser.add_argument('--hot-interval', type=float, default=0.05, help="Chu kỳ khi hot (giây)")
+    parser.add_argument('--lead', type=float, default=0.3, help="Pre-mute trước bao nhiêu giây (0 = tắt)")
+    parser.add_argument('--budget', type=int, default=2, help="Số lần mute nhầm tối đa mỗi giờ")
+    args = parser.parse_args()
+
+    paths = args.timelines or sorted(glob.glob(os.path.join(TIMELINE_DIR, '*.tsv')))
+    if not paths:
+        print("Không tìm thấy timeline nào")
+        sys.exit(1)
+
+    for path in paths:
+        segments = repeat_timeline(load_timeline(path), args.repeat)
+        baseline = simulate(segments, args.interval)
+        predictor = AdBreakPredictor(hot_interval=args.hot_interval, pre_mute_lead=args.lead,
+                                     false_mute_budget=args.budget)
+        predicted = simulate(segments, args.interval, predictor)
+        print(f"{os.path.basename(path)} (x{args.repeat}, {baseline['ad_breaks']} đợt quảng cáo)")
+        for name, r in (('polling', baseline), ('predictor', predicted)):
+            print(f"  {name:<10} nghe lọt={r['audible_ad_s']:6.2f} s ({r['audible_per_break_ms']:6.1f} ms/đợt)  "
+                  f"pre-mute trúng={r['pre_muted_breaks']}  mute nhầm={r['false_mute_s']:5.2f} s  "
+                  f"wakeups={r['wakeups_per_min']:6.1f}/phút")
+
+
+if __name__ == "__main__":
+    main()
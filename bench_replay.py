@@ -0,0 +1,253 @@
+"""
+Benchmark replay - Phát lại timeline tiêu đề qua MuteEngine với backend giả lập
+
+Mỗi timeline (bench_timelines/*.tsv) là danh sách "offset<TAB>nhãn<TAB>tiêu đề".
+Benchmark dùng đồng hồ ảo: tiêu đề được đặt vào FakeWindowApi, mute/unmute đi qua
+FakeAudioBackend, mỗi lần thức dậy gọi MuteEngine.check() (cùng đường xử lý với
+các bản chạy thật, không có event loop), nên chạy được headless trên Linux trong
+vài giây.
+
+Kết quả cho mỗi timeline:
+- độ trễ phát hiện (từ lúc quảng cáo bắt đầu tới khi mute, gồm cả thời gian xử lý)
+- số false positive (mute khi đang phát nhạc) / false negative (bỏ lọt quảng cáo)
+- CPU time mỗi lần kiểm tra, số lần thức dậy
+- số lần gọi SetMute / liệt kê audio session / quét lại cửa sổ
+- số lệnh âm thanh máy trạng thái đã tránh so với mute/unmute mỗi khi kết quả
+  phân loại đổi, và số tiêu đề chớp qua được bỏ qua
+
+Chạy:
+    python bench_replay.py                       # mọi timeline, backend polling
+    python bench_replay.py --backend push
+    python bench_replay.py --backend adaptive      # polling với PollScheduler
+    python bench_replay.py --json bench_output.json bench_timelines/edge_cases.tsv
+"""
+
+import argparse
+import bisect
+import glob
+import json
+import logging
+import os
+import sys
+import time
+
+from audio_sessions import FakeAudioBackend, SpotifySessionManager
+from detection_state import DetectionStateMachine
+from poll_scheduler import PollScheduler
+from config import AppConfig
+from event_store import EventStore
+from mute_engine import MuteEngine
+from platform_backends import PlatformBackend
+from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+from window_resolver import FakeWindowApi, SpotifyWindowResolver
+
+
+TIMELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_timelines')
+
+SPOTIFY_PID = 4242
+SPOTIFY_HWND = 0x1001
+# Số cửa sổ khác trên desktop giả lập
+DESKTOP_WINDOWS = 150
+
+
+def load_timeline(path: str) -> list:
+    """
+    Đọc timeline dạng TSV
+
+    Returns:
+        Danh sách (offset giây, nhãn, tiêu đề)
+    """
+    segments = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split('\t', 2)
+            offset, label = float(parts[0]), parts[1]
+            title = parts[2] if len(parts) > 2 else ""
+            segments.append((offset, label, title))
+    return segments
+
+
+def build_desktop() -> FakeWindowApi:
+    windows = {i: (10000 + i, f"Window {i}") for i in range(DESKTOP_WINDOWS)}
+    processes = {10000 + i: "explorer.exe" for i in range(DESKTOP_WINDOWS)}
+    processes[SPOTIFY_PID] = "Spotify.exe"
+    return FakeWindowApi(windows, processes)
+
+
+def apply_segment(api: FakeWindowApi, label: str, title: str):
+    """Đặt trạng thái cửa sổ Spotify theo đoạn timeline"""
+    if label == 'closed':
+        api.windows.pop(SPOTIFY_HWND, None)
+    else:
+        api.windows[SPOTIFY_HWND] = (SPOTIFY_PID, title)
+
+
+def tick_times(segments: list, backend: str, interval: float, next_interval=None, clock=None):
+    """
+    Các thời điểm (ảo) mà monitor thức dậy kiểm tra tiêu đề
+
+    Với backend 'adaptive' và 'push', chu kỳ kế tiếp do next_interval()
+    (AsyncMonitor.next_interval, giống task sample) chọn sau mỗi lần kiểm tra; clock
+    là list một phần tử giữ thời điểm ảo hiện tại. Backend push còn thức dậy ngay khi
+    tiêu đề đổi (sự kiện), chu kỳ chỉ còn là resync và hạn cửa sổ xác nhận.
+    """
+    end = segments[-1][0]
+    if backend in ('push', 'adaptive'):
+        changes = [offset for offset, _, _ in segments] if backend == 'push' else []
+        t = 0.0
+        while t <= end:
+            clock[0] = t
+            yield t
+            wait = next_interval()
+            wake = t + wait if wait is not None else end + 1.0
+            index = bisect.bisect_right(changes, t)
+            if index < len(changes):
+                wake = min(wake, changes[index])
+            t = wake
+        return
+    count = int(end / interval) + 1
+    yield from (i * interval for i in range(count))
+
+
+def segment_at(segments: list, t: float) -> int:
+    index = 0
+    for i, (offset, _, _) in enumerate(segments):
+        if offset > t:
+            break
+        index = i
+    return index
+
+
+def replay(segments: list, backend: str = 'polling', interval: float = 0.3) -> dict:
+    """Phát lại một timeline, trả về số liệu benchmark"""
+    api = build_desktop()
+    audio = FakeAudioBackend(['spotify-main'])
+    clock = [0.0]
+    scheduler = None
+    if backend == 'adaptive':
+        scheduler = PollScheduler(interval, clock=lambda: clock[0])
+    elif backend == 'push':
+        # Như MuteEngine với event source: polling chỉ còn là resync, không burst
+        scheduler = PollScheduler(AppConfig().resync_interval, burst_interval=None,
+                                  clock=lambda: clock[0])
+    engine = MuteEngine(
+        config=AppConfig({'check_interval': interval}),
+        platform_backend=PlatformBackend(),
+        title_source=SpotifyWindowResolver(api, clock=lambda: clock[0]),
+        session_manager=SpotifySessionManager(audio),
+        process_watcher=SpotifyProcessWatcher(FakeProcessTable({SPOTIFY_PID: "Spotify.exe"})),
+        # Không start(): lịch sử và chỉ mục quảng cáo không được mở, không ghi gì xuống đĩa
+        history=EventStore(os.devnull),
+        # Cửa sổ xác nhận tính theo đồng hồ ảo
+        detector=DetectionStateMachine(clock=lambda: clock[0]),
+        scheduler=scheduler,
+        fade=False,
+    )
+
+    states = []  # (thời điểm ảo, chỉ số đoạn, muted, thời gian xử lý)
+    cpu_total = 0.0
+    # Predictor (hot/pre-mute) cũng chạy theo đồng hồ ảo
+    engine.monitor.predictor.clock = lambda: clock[0]
+    for t in tick_times(segments, backend, interval, engine.monitor.next_interval, clock):
+        clock[0] = t
+        index = segment_at(segments, t)
+        _, label, title = segments[index]
+        apply_segment(api, label, title)
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        engine.check(now=t)
+        elapsed = time.perf_counter() - wall_start
+        cpu_total += time.process_time() - cpu_start
+        states.append((t, index, engine.is_muted, elapsed))
+
+    # Độ trễ: từ đầu mỗi đợt quảng cáo (các đoạn 'ad' liền nhau) tới lần mute đầu tiên
+    latencies = []
+    false_negatives = 0
+    false_positives = 0
+    break_start = None
+    detected = False
+    for i, (offset, label, _) in enumerate(segments[:-1]):
+        ticks = [s for s in states if s[1] == i]
+        if label == 'ad':
+            if break_start is None:
+                break_start = offset
+                detected = False
+            if not detected:
+                for t, _, muted, elapsed in ticks:
+                    if muted:
+                        latencies.append(t - break_start + elapsed)
+                        detected = True
+                        break
+            next_label = segments[i + 1][1]
+            if next_label != 'ad':
+                if not detected:
+                    false_negatives += 1
+                break_start = None
+        elif label == 'music' and ticks and ticks[-1][2]:
+            false_positives += 1
+
+    wakeups = len(states)
+    duration = segments[-1][0] or 1.0
+    return {
+        'backend': backend,
+        'interval': interval,
+        'wakeups': wakeups,
+        'wakeups_per_min': round(wakeups / duration * 60, 1),
+        'cpu_per_tick_us': round(cpu_total / wakeups * 1e6, 2) if wakeups else 0.0,
+        'latency_mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        'latency_max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+        'ad_breaks_detected': len(latencies),
+        'false_positives': false_positives,
+        'false_negatives': false_negatives,
+        'set_mute_calls': audio.set_mute_calls,
+        'session_enumerations': audio.find_calls,
+        'window_rescans': engine.title_source.rescans,
+        'audio_actions': engine.detector.actions,
+        'saved_actions': engine.detector.saved_actions,
+        'blips': engine.detector.blips,
+        # Số lần thức dậy theo chế độ của scheduler (backend adaptive)
+        'modes': dict(scheduler.mode_counts) if scheduler is not None else {},
+        'stages': engine.latency.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MuteEngine với timeline giả lập")
+    parser.add_argument('timelines', nargs='*', help="File timeline (.tsv), mặc định bench_timelines/*.tsv")
+    parser.add_argument('--backend', choices=['polling', 'push', 'adaptive'], default='polling')
+    parser.add_argument('--interval', type=float, default=0.3, help="Chu kỳ polling (giây)")
+    parser.add_argument('--json', help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    # Log INFO của monitor làm sai lệch số đo CPU
+    logging.disable(logging.INFO)
+
+    paths = args.timelines or sorted(glob.glob(os.path.join(TIMELINE_DIR, '*.tsv')))
+    if not paths:
+        print("Không tìm thấy timeline nào")
+        sys.exit(1)
+
+    results = {}
+    for path in paths:
+        result = replay(load_timeline(path), args.backend, args.interval)
+        results[os.path.basename(path)] = result
+        print(f"{os.path.basename(path):<24} "
+              f"latency avg={result['latency_mean_ms']:8.2f} ms max={result['latency_max_ms']:8.2f} ms  "
+              f"FP={result['false_positives']} FN={result['false_negatives']}  "
+              f"cpu/tick={result['cpu_per_tick_us']:7.2f} µs  "
+              f"wakeups={result['wakeups']}  SetMute={result['set_mute_calls']}  "
+              f"enum={result['session_enumerations']}  "
+              f"saved={result['saved_actions']} blips={result['blips']}"
+              + (f"  hot={result['modes'].get('hot', 0)}" if result['modes'] else ""))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark khởi động tray - thời gian import và thời gian tới lần đọc tiêu đề đầu tiên
+
+Mỗi lần đo chạy trong một tiến trình Python mới (cache import trống như lúc tự khởi
+động cùng Windows). Mặc định dùng backend giả lập để chạy được trên mọi máy; với
+--real thì dùng backend thật của nền tảng (pycaw/win32gui trên Windows).
+
+Kết quả có thể ghi thêm vào file lịch sử (JSON lines, mỗi dòng một lần đo kèm phiên
+bản) để theo dõi qua các lần phát hành.
+
+Chạy: python bench_startup.py [--runs 5] [--real] [--record] [--history FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from version import __version__
+
+HISTORY_FILE = 'bench_startup_history.jsonl'
+
+# Module nặng không được import khi chỉ import module tray
+HEAVY_MODULES = ('comtypes', 'pycaw', 'pythoncom', 'win32gui', 'psutil',
+                 'pystray', 'PIL', 'jeepney', 'pulsectl')
+
+CHILD = r'''
+import json, sys, threading, time
+start = time.perf_counter()
+import spotify_ads_mute_tray as tray
+import_done = time.perf_counter()
+heavy_after_import = [m for m in HEAVY_MODULES if m in sys.modules]
+
+if MODE == 'fake':
+    from audio_sessions import FakeAudioBackend, SpotifySessionManager
+    from platform_backends import PlatformBackend
+    from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+    from window_resolver import FakeWindowApi, SpotifyWindowResolver
+
+    api = FakeWindowApi({100: (1234, "Artist - Song")}, {1234: "Spotify.exe"})
+    app = tray.SpotifyAdsMuteTray(
+        window_resolver=SpotifyWindowResolver(api),
+        session_manager=SpotifySessionManager(FakeAudioBackend()),
+        process_watcher=SpotifyProcessWatcher(FakeProcessTable({1234: "Spotify.exe"})),
+        platform_backend=PlatformBackend(),
+    )
+else:
+    app = tray.SpotifyAdsMuteTray()
+
+# Giống run() nhưng không tạo icon tray
+engine = app.engine
+engine.monitor_thread = threading.Thread(target=engine.monitor_loop, daemon=True)
+engine.monitor_thread.start()
+deadline = time.perf_counter() + 10.0
+while not engine.first_title_read and time.perf_counter() < deadline:
+    time.sleep(0.0005)
+first_title = time.perf_counter()
+engine.monitor.stop()
+engine.monitor_thread.join(3.0)
+
+print(json.dumps({
+    'import_ms': (import_done - start) * 1000,
+    'first_title_ms': (first_title - start) * 1000 if engine.first_title_read else None,
+    'heavy_after_import': heavy_after_import,
+    'heavy_after_first_title': [m for m in HEAVY_MODULES if m in sys.modules],
+}))
+'''
+
+
+def run_once(mode: str) -> dict:
+    """Một lần đo trong tiến trình con"""
+    code = f"MODE = {mode!r}\nHEAVY_MODULES = {HEAVY_MODULES!r}\n" + CHILD
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', code], cwd=here,
+                            capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else
+                           f"exit code {result.returncode}")
+    # Dòng cuối là JSON (log của monitor có thể in trước đó)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(runs: int, mode: str) -> dict:
+    samples = [run_once(mode) for _ in range(runs)]
+    first_titles = [s['first_title_ms'] for s in samples if s['first_title_ms'] is not None]
+    return {
+        'version': __version__,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'mode': mode,
+        'runs': runs,
+        'platform': sys.platform,
+        'python': platform.python_version(),
+        'import_ms': round(statistics.median(s['import_ms'] for s in samples), 2),
+        'first_title_ms': round(statistics.median(first_titles), 2) if first_titles else None,
+        'heavy_after_import': samples[-1]['heavy_after_import'],
+        'heavy_after_first_title': samples[-1]['heavy_after_first_title'],
+    }
+
+
+def load_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def report(result: dict, previous: dict = None):
+    def delta(key):
+        if not previous or previous.get(key) is None or result[key] is None:
+            return ""
+        return f"  ({result[key] - previous[key]:+.2f} ms so với {previous['version']})"
+
+    first_title = f"{result['first_title_ms']:.2f} ms" if result['first_title_ms'] else "-"
+    print(f"Phiên bản {result['version']} ({result['mode']}, {result['runs']} lần, "
+          f"trung vị)")
+    print(f"  import module tray : {result['import_ms']:8.2f} ms{delta('import_ms')}")
+    print(f"  tới tiêu đề đầu tiên: {first_title:>11}{delta('first_title_ms')}")
+    print(f"  module nặng sau import    : {', '.join(result['heavy_after_import']) or '-'}")
+    print(f"  module nặng sau tiêu đề 1 : {', '.join(result['heavy_after_first_title']) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--real', action='store_true', help="Dùng backend thật của nền tảng")
+    parser.add_argument('--record', action='store_true', help="Ghi kết quả vào file lịch sử")
+    parser.add_argument('--history', default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    mode = 'real' if args.real else 'fake'
+    result = measure(args.runs, mode)
+    previous = [h for h in load_history(args.history) if h.get('mode') == mode]
+    report(result, previous[-1] if previous else None)
+
+    if args.record:
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"Đã ghi vào {args.history}")
+
+
+if __name__ == "__main__":
+    main()
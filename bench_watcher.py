@@ -0,0 +1,95 @@
+"""
+Benchmark watcher - So sánh AsyncMonitor polling và push trên kịch bản giả lập
+
+Cùng đường xử lý với bản chạy thật: ScriptedTitleSource làm get_title, và làm thêm
+event_source ở chế độ push. Độ trễ tính từ lúc tiêu đề đổi theo kịch bản tới lúc
+monitor phân loại tiêu đề đó.
+
+Chạy: python bench_watcher.py
+"""
+
+import asyncio
+import threading
+import time
+
+from async_monitor import AsyncMonitor
+from poll_scheduler import PollScheduler
+from title_watcher import ScriptedTitleSource
+
+
+# Kịch bản: nhạc -> quảng cáo -> nhạc, các lần đổi rơi vào giữa nhịp polling
+TIMELINE = [
+    (0.00, "Artist A - Song 1"),
+    (0.47, "Advertisement"),
+    (1.13, "Artist B - Song 2"),
+    (1.81, "Spotify"),
+    (2.29, "Artist C - Song 3"),
+    (3.00, "Artist C - Song 3"),
+]
+
+
+def measure_monitor(timeline, push: bool, check_interval: float = 0.3) -> dict:
+    """
+    Chạy AsyncMonitor trên kịch bản, đo độ trễ phân loại và số lần đọc tiêu đề
+
+    Args:
+        timeline: Kịch bản (offset giây, tiêu đề)
+        push: Dùng kịch bản làm event_source (chu kỳ đọc chỉ còn là resync)
+        check_interval: Chu kỳ polling, hoặc chu kỳ resync khi push
+
+    Returns:
+        Dict gồm latencies (giây, theo từng lần đổi), wakeups, changes, duration
+    """
+    source = ScriptedTitleSource(timeline)
+    seen = []
+
+    def is_ad(title):
+        seen.append((source.clock(), title))
+        return ' - ' not in title
+
+    # Không burst sau mỗi lần đổi: so đúng chu kỳ polling với push
+    scheduler = PollScheduler(5.0 if push else check_interval, burst_interval=None)
+    monitor = AsyncMonitor(source, is_ad, lambda: True, lambda: True,
+                           event_source=source if push else None, scheduler=scheduler)
+    source.start()
+    thread = threading.Thread(target=asyncio.run, args=(monitor.run(),), daemon=True)
+    thread.start()
+    while not source.finished:
+        time.sleep(0.01)
+    # Chờ thêm một nhịp để monitor kịp thấy thay đổi cuối cùng
+    time.sleep((0.0 if push else check_interval) + 0.05)
+    monitor.stop()
+    thread.join(2.0)
+
+    latencies = []
+    for changed_at, title in source.change_times():
+        for seen_at, seen_title in seen:
+            if seen_title == title and seen_at >= changed_at:
+                latencies.append(seen_at - changed_at)
+                break
+
+    return {
+        'latencies': latencies,
+        'wakeups': monitor.samples,
+        'changes': len(seen),
+        'duration': source.clock() - source.start_time,
+    }
+
+
+def report(name: str, result: dict):
+    latencies = result['latencies']
+    avg_ms = sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+    max_ms = max(latencies) * 1000 if latencies else 0.0
+    wakeups_per_min = result['wakeups'] / result['duration'] * 60
+    print(f"{name:<10} latency avg={avg_ms:7.2f} ms  max={max_ms:7.2f} ms  "
+          f"wakeups={result['wakeups']:4d} ({wakeups_per_min:.0f}/phút)  "
+          f"changes={result['changes']}")
+
+
+def main():
+    report("polling", measure_monitor(TIMELINE, push=False))
+    report("push", measure_monitor(TIMELINE, push=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Comtypes Cache - Thư mục code sinh ra của comtypes, giữ lại giữa các lần chạy
+
+Bản EXE (PyInstaller) không ghi được vào comtypes/gen, nên comtypes phải sinh lại
+wrapper từ typelib ở một thư mục tạm. Trước đây thư mục này bị xóa __init__.py ở
+mỗi lần khởi động để ép sinh lại, nên lần tự khởi động cùng Windows nào cũng tốn
+thời gian sinh code.
+
+Ở đây cache được đặt theo phiên bản (app, Python, comtypes): cùng phiên bản thì
+dùng lại, phiên bản mới có thư mục mới nên không bao giờ dùng nhầm code cũ. Các
+thư mục của phiên bản cũ được dọn đi.
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+from version import __version__
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = os.path.join('SpotifyAdsMute', 'comtypes_cache')
+
+_configured = None
+
+
+def cache_key(app_version: str = __version__, comtypes_version: str = None) -> str:
+    """Tên thư mục con cho tổ hợp phiên bản hiện tại"""
+    if comtypes_version is None:
+        import comtypes
+        comtypes_version = getattr(comtypes, '__version__', 'unknown')
+    python = f"py{sys.version_info[0]}{sys.version_info[1]}"
+    return f"{app_version}-{python}-comtypes{comtypes_version}"
+
+
+def default_root() -> str:
+    base = os.getenv('LOCALAPPDATA') or tempfile.gettempdir()
+    return os.path.join(base, CACHE_DIR_NAME)
+
+
+def prepare_cache_dir(root: str, key: str) -> str:
+    """
+    Tạo thư mục cache cho key (nếu chưa có) và xóa thư mục của các key khác
+
+    Returns:
+        Đường dẫn thư mục cache
+    """
+    path = os.path.join(root, key)
+    os.makedirs(path, exist_ok=True)
+    init_file = os.path.join(path, '__init__.py')
+    if not os.path.exists(init_file):
+        with open(init_file, 'w', encoding='utf-8') as f:
+            f.write("# comtypes.gen cache - tự sinh, có thể xóa\n")
+    for name in os.listdir(root):
+        stale = os.path.join(root, name)
+        if name != key and os.path.isdir(stale):
+            shutil.rmtree(stale, ignore_errors=True)
+    return path
+
+
+def setup_comtypes_cache(root: str = None) -> str:
+    """
+    Trỏ comtypes tới cache theo phiên bản (gọi trước lần dùng pycaw đầu tiên)
+
+    Returns:
+        Đường dẫn thư mục cache, None nếu không thiết lập được
+    """
+    global _configured
+    if _configured is not None:
+        return _configured
+    try:
+        import comtypes.client
+        import comtypes.gen
+
+        path = prepare_cache_dir(root or default_root(), cache_key())
+        comtypes.client.gen_dir = path
+        # Module sinh ra được import dưới dạng comtypes.gen.X
+        gen_path = comtypes.gen.__path__
+        if path not in gen_path:
+            gen_path.insert(0, path)
+        _configured = path
+        logger.debug("comtypes cache: %s", path)
+    except Exception as e:
+        logger.warning(f"Không thiết lập được cache comtypes: {e}")
+    return _configured
@@ -0,0 +1,285 @@
+"""
+Config - Cấu hình ngoài (JSON) và nạp lại khi file thay đổi
+
+File spotify_ads_mute.json (cạnh file EXE, hoặc thư mục hiện tại khi chạy từ
+source) chứa luật phân loại, chu kỳ đọc, backend, cửa sổ xác nhận của máy trạng
+thái, bộ phát hiện theo âm thanh và cấu hình log. Thiếu khóa nào thì dùng giá trị
+mặc định; không có file thì dùng toàn bộ mặc định.
+
+    {
+      "classifier": {"keywords": ["advertisement"], "denied_artists": ["Podcast Promo"]},
+      "check_interval": 0.3,
+      "log": {"level": "DEBUG"}
+    }
+
+ConfigWatcher kiểm tra mtime/kích thước file trên thread riêng. Khi file đổi, cấu
+hình mới được kiểm tra và AdClassifier mới được biên dịch ngay trên thread đó (một
+lần mỗi lần nạp), rồi mới giao cho ứng dụng để thay thế nguyên khối. Classifier mới
+có cache riêng nên kết quả nhớ theo luật cũ bị bỏ. File lỗi (JSON hỏng, sai kiểu)
+chỉ được ghi log, cấu hình đang chạy giữ nguyên.
+
+Chạy: python config.py > spotify_ads_mute.json   (in cấu hình mặc định)
+"""
+
+import copy
+import json
+import logging
+import os
+import sys
+import threading
+
+import ad_classifier
+import detection_state
+from ad_classifier import AdClassifier
+from detection_state import DetectionStateMachine
+from log_setup import BACKUP_COUNT, LOG_FILE, MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = 'spotify_ads_mute.json'
+
+DEFAULTS = {
+    'classifier': {
+        'keywords': list(ad_classifier.AD_KEYWORDS),
+        'word_keywords': list(ad_classifier.WORD_KEYWORDS),
+        'separators': list(ad_classifier.SEPARATORS),
+        'allowed_artists': list(ad_classifier.ALLOWED_ARTISTS),
+        'denied_artists': list(ad_classifier.DENIED_ARTISTS),
+        'denied_titles': list(ad_classifier.DENIED_TITLES),
+    },
+    # Chu kỳ đọc khi polling; chu kỳ resync khi backend có sự kiện push
+    'check_interval': 0.3,
+    'resync_interval': 5.0,
+    # 'auto', 'windows' hoặc 'linux' (đổi backend cần khởi động lại)
+    'backend': 'auto',
+    # Giảm âm lượng mượt thay vì SetMute. Windows lưu âm lượng của từng ứng dụng: nếu
+    # chương trình bị dừng giữa quảng cáo, Spotify mở lại ở âm lượng 0 cho tới lần chạy sau
+    'fade': False,
+    # Cửa sổ xác nhận của máy trạng thái (giây, 0 = ngay) và tiêu đề tạm dừng
+    'detection': {
+        'confirm_ad': 0.0,
+        'confirm_song': 0.0,
+        'confirm_pause': 1.0,
+        'confirm_closed': 2.0,
+        'pause_titles': list(detection_state.PAUSE_TITLES),
+    },
+    # Bộ phát hiện quảng cáo theo âm thanh (cần numpy), áp dụng khi khởi động
+    'audio': {
+        'enabled': False,
+        'jingles': [],
+        'ad_threshold': 0.8,
+        'pause_after': 2.0,
+    },
+    # file/max_bytes/backup_count chỉ áp dụng khi khởi động, level áp dụng ngay
+    'log': {
+        'file': LOG_FILE,
+        'level': 'INFO',
+        'max_bytes': MAX_BYTES,
+        'backup_count': BACKUP_COUNT,
+    },
+}
+
+BACKENDS = ('auto', 'windows', 'linux')
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+# Các mục được phép bằng 0 (còn lại phải là số dương)
+NON_NEGATIVE = ('detection.',)
+
+
+class ConfigError(ValueError):
+    """File cấu hình không hợp lệ"""
+
+
+def default_config_path() -> str:
+    """Cạnh file EXE khi chạy bản PyInstaller, ngược lại trong thư mục hiện tại"""
+    if getattr(sys, 'frozen', False):
+        return os.path.join(os.path.dirname(sys.executable), CONFIG_FILE)
+    return CONFIG_FILE
+
+
+def _merge(defaults: dict, data: dict, where: str) -> dict:
+    merged = copy.deepcopy(defaults)
+    for key, value in data.items():
+        name = f"{where}{key}"
+        if key not in defaults:
+            raise ConfigError(f"khóa không hợp lệ: {name}")
+        default = defaults[key]
+        if isinstance(default, dict):
+            if not isinstance(value, dict):
+                raise ConfigError(f"{name} phải là object")
+            merged[key] = _merge(default, value, f"{name}.")
+        elif isinstance(default, list):
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise ConfigError(f"{name} phải là danh sách chuỗi")
+            merged[key] = list(value)
+        elif isinstance(default, (int, float)) and not isinstance(default, bool):
+            if name.startswith(NON_NEGATIVE):
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                    raise ConfigError(f"{name} phải là số không âm")
+            elif isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ConfigError(f"{name} phải là số dương")
+            merged[key] = value
+        elif not isinstance(value, type(default)):
+            raise ConfigError(f"{name} phải là {type(default).__name__}")
+        else:
+            merged[key] = value
+    return merged
+
+
+class AppConfig:
+    """
+    Cấu hình đã kiểm tra (không sửa sau khi tạo, nạp lại thì tạo đối tượng mới)
+    """
+
+    def __init__(self, data: dict = None, path: str = None):
+        """
+        Args:
+            data: Dict đọc từ file (thiếu khóa thì lấy mặc định)
+            path: File nguồn (để ghi log)
+
+        Raises:
+            ConfigError: Khóa lạ, sai kiểu hoặc giá trị không hợp lệ
+        """
+        if data is not None and not isinstance(data, dict):
+            raise ConfigError("file cấu hình phải là JSON object")
+        merged = _merge(DEFAULTS, data or {}, '')
+        if merged['backend'] not in BACKENDS:
+            raise ConfigError(f"backend phải là một trong {', '.join(BACKENDS)}")
+        level = merged['log']['level'].upper()
+        if level not in LOG_LEVELS:
+            raise ConfigError(f"log.level phải là một trong {', '.join(LOG_LEVELS)}")
+        merged['log']['level'] = level
+
+        self.path = path
+        self.classifier = merged['classifier']
+        self.check_interval = float(merged['check_interval'])
+        self.resync_interval = float(merged['resync_interval'])
+        self.backend = merged['backend']
+        self.fade = merged['fade']
+        self.detection = merged['detection']
+        self.audio = merged['audio']
+        self.log = merged['log']
+
+    @property
+    def log_level(self) -> int:
+        return getattr(logging, self.log['level'])
+
+    def build_classifier(self) -> AdClassifier:
+        """Biên dịch luật phân loại (regex, tập hợp) - gọi một lần mỗi lần nạp"""
+        return AdClassifier(**self.classifier)
+
+    def build_detector(self, clock=None) -> DetectionStateMachine:
+        """Máy trạng thái phát hiện theo cửa sổ xác nhận trong cấu hình"""
+        if clock is None:
+            return DetectionStateMachine(**self.detection)
+        return DetectionStateMachine(clock=clock, **self.detection)
+
+    @property
+    def generic_titles(self) -> list:
+        """Tiêu đề chỉ là một từ khóa quảng cáo hoặc tiêu đề tạm dừng (KnownAdIndex không học)"""
+        return (self.classifier['keywords'] + self.classifier['word_keywords']
+                + self.detection['pause_titles'])
+
+    def to_dict(self) -> dict:
+        return {
+            'classifier': copy.deepcopy(self.classifier),
+            'check_interval': self.check_interval,
+            'resync_interval': self.resync_interval,
+            'backend': self.backend,
+            'fade': self.fade,
+            'detection': copy.deepcopy(self.detection),
+            'audio': copy.deepcopy(self.audio),
+            'log': dict(self.log),
+        }
+
+
+def load_config(path: str = None) -> AppConfig:
+    """
+    Đọc file cấu hình; không có file thì trả về cấu hình mặc định
+
+    Raises:
+        ConfigError: JSON hỏng hoặc cấu hình không hợp lệ
+    """
+    path = path or default_config_path()
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return AppConfig(path=path)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"không đọc được {path}: {e}") from None
+    try:
+        return AppConfig(data, path=path)
+    except ConfigError as e:
+        raise ConfigError(f"{path}: {e}") from None
+
+
+class ConfigWatcher:
+    """
+    Theo dõi file cấu hình và gọi on_reload(config, classifier) khi nội dung đổi
+    """
+
+    def __init__(self, path: str, on_reload, interval: float = 1.0):
+        """
+        Args:
+            path: File cấu hình
+            on_reload: Callback nhận (AppConfig, AdClassifier đã biên dịch), chạy trên
+                thread của watcher
+            interval: Chu kỳ kiểm tra file (giây)
+        """
+        self.path = path
+        self.on_reload = on_reload
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def check(self) -> bool:
+        """Nạp lại nếu file đã đổi kể từ lần trước, trả về True nếu đã áp dụng cấu hình mới"""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            config = load_config(self.path)
+            classifier = config.build_classifier()
+        except Exception as e:
+            self.failures += 1
+            logger.error("Cấu hình lỗi, giữ cấu hình đang chạy: %s", e)
+            return False
+        try:
+            self.on_reload(config, classifier)
+        except Exception as e:
+            self.failures += 1
+            logger.error("Lỗi khi áp dụng cấu hình mới: %s", e)
+            return False
+        self.reloads += 1
+        logger.info("Đã nạp lại cấu hình: %s", self.path)
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='config-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+
+if __name__ == "__main__":
+    json.dump(DEFAULTS, sys.stdout, ensure_ascii=False, indent=2)
+    print()
@@ -0,0 +1,361 @@
+"""
+Control API - Điều khiển daemon qua IPC cục bộ (Unix socket / named pipe)
+
+Giao thức là JSON theo dòng: client gửi một object mỗi dòng, server trả lời một
+object mỗi dòng.
+
+    {"cmd": "status"}                         -> {"ok": true, "enabled": true, ...}
+    {"cmd": "disable"}                        -> {"ok": true, "enabled": false}
+    {"cmd": "metrics", "interval": 1.0}       -> mỗi giây một dòng tới khi client ngắt
+    {"cmd": "xyz", "id": 7}                   -> {"ok": false, "error": "...", "id": 7}
+
+Server chạy trên event loop và thread riêng: handler chỉ đọc trạng thái của
+monitor hoặc gọi API an toàn với thread (set_enabled/stop), không bao giờ chạy
+trên event loop của monitor. Client ghi chậm hoặc không đọc phản hồi bị ngắt sau
+write_timeout thay vì làm đầy bộ đệm; số kết nối đồng thời có giới hạn.
+
+Trên Windows dùng named pipe (event loop Proactor), nơi khác dùng Unix socket chỉ
+chủ sở hữu đọc/ghi được (quyền 0600 ngay từ lúc bind, không có khoảng hở trước
+chmod). Named pipe dựa vào ProactorEventLoop.start_serving_pipe: API nội bộ của
+asyncio, có từ CPython 3.5 và đã kiểm tới 3.13; thiếu thì daemon báo lỗi rõ ràng lúc
+khởi động.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PIPE_NAME = r'\\.\pipe\SpotifyAdsMute'
+SOCKET_NAME = 'spotify-ads-mute.sock'
+
+# Giới hạn một dòng yêu cầu, số kết nối đồng thời và chu kỳ stream nhỏ nhất
+MAX_LINE = 64 * 1024
+MAX_CLIENTS = 32
+MIN_STREAM_INTERVAL = 0.05
+
+
+def default_address() -> str:
+    """Named pipe trên Windows, Unix socket trong XDG_RUNTIME_DIR (hoặc thư mục tạm)"""
+    if sys.platform == 'win32':
+        return PIPE_NAME
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, SOCKET_NAME)
+    return os.path.join(tempfile.gettempdir(), f'spotify-ads-mute-{os.getuid()}.sock')
+
+
+class ControlError(Exception):
+    """Yêu cầu không hợp lệ (trả về client dưới dạng {"ok": false, "error": ...})"""
+
+
+class ControlServer:
+    """
+    Server IPC chạy trên thread riêng
+    """
+
+    def __init__(self, handlers: dict, address: str = None, streams: dict = None,
+                 max_clients: int = MAX_CLIENTS, write_timeout: float = 1.0):
+        """
+        Args:
+            handlers: Tên lệnh -> hàm nhận request (dict), trả về dict kết quả.
+                Hàm phải rẻ và không chặn (chạy trên thread của server)
+            address: Đường dẫn Unix socket hoặc tên named pipe (mặc định default_address())
+            streams: Tên lệnh -> hàm trả về dict, được gửi lặp lại theo "interval"
+            max_clients: Số kết nối đồng thời tối đa
+            write_timeout: Thời gian tối đa chờ client đọc phản hồi (giây)
+        """
+        self.handlers = dict(handlers)
+        self.streams = dict(streams or {})
+        self.address = address or default_address()
+        self.max_clients = max_clients
+        self.write_timeout = write_timeout
+        self.clients = 0
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.loop = None
+        self._servers = []
+        self._writers = set()
+        self._stop = None
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._thread = None
+
+    def start(self, timeout: float = 5.0):
+        """Mở endpoint trên thread riêng, chờ tới khi sẵn sàng nhận kết nối"""
+        self._thread = threading.Thread(target=self._run, name='control-api', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Control API không khởi động kịp")
+        if self._startup_error is not None:
+            raise self._startup_error
+        logger.info("Control API: %s", self.address)
+
+    def stop(self, timeout: float = 2.0):
+        """Đóng endpoint và mọi kết nối (gọi được từ thread khác)"""
+        if self.loop is not None and self._stop is not None:
+            self.loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            'address': self.address,
+            'clients': self.clients,
+            'connections': self.connections,
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+        }
+
+    # ---- Thread của server ----
+
+    def _run(self):
+        if sys.platform == 'win32':
+            loop = asyncio.ProactorEventLoop()  # Named pipe chỉ có trên Proactor
+        else:
+            loop = asyncio.new_event_loop()
+        self.loop = loop
+        try:
+            loop.run_until_complete(self._serve())
+        except Exception as e:
+            if not self._ready.is_set():
+                self._startup_error = e
+                self._ready.set()
+            else:
+                logger.error(f"Lỗi control API: {e}")
+        finally:
+            loop.close()
+
+    async def _serve(self):
+        self._stop = asyncio.Event()
+        if sys.platform == 'win32':
+            start_serving_pipe = getattr(self.loop, 'start_serving_pipe', None)
+            if start_serving_pipe is None:
+                raise RuntimeError(
+                    f"Python {sys.version.split()[0]} không có ProactorEventLoop.start_serving_pipe"
+                    " (API nội bộ của asyncio, đã kiểm với CPython 3.5-3.13)")
+            self._servers = await start_serving_pipe(self._pipe_protocol, self.address)
+        else:
+            self._remove_stale_socket()
+            server = await asyncio.start_unix_server(self._handle_client, sock=self._bind_socket(),
+                                                     limit=MAX_LINE)
+            self._servers = [server]
+        self._ready.set()
+        try:
+            await self._stop.wait()
+        finally:
+            for server in self._servers:
+                server.close()
+            for writer in list(self._writers):
+                writer.close()
+            if sys.platform != 'win32':
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+
+    def _pipe_protocol(self):
+        reader = asyncio.StreamReader(limit=MAX_LINE)
+        return asyncio.StreamReaderProtocol(reader, self._handle_client)
+
+    def _bind_socket(self) -> socket.socket:
+        """
+        Bind Unix socket với umask 077 để file socket có quyền 0600 ngay khi được tạo
+
+        umask là của cả tiến trình, nhưng chỉ đổi quanh lời gọi bind(): file do thread
+        khác tạo đúng lúc đó chỉ bị hạn chế quyền chặt hơn, không lỏng hơn.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            old_umask = os.umask(0o077)
+            try:
+                sock.bind(self.address)
+            finally:
+                os.umask(old_umask)
+            os.chmod(self.address, 0o600)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _remove_stale_socket(self):
+        """Xóa socket còn sót từ lần chạy trước; báo lỗi nếu daemon khác đang nghe"""
+        if not os.path.exists(self.address):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.address)
+        except OSError:
+            os.unlink(self.address)
+        else:
+            raise RuntimeError(f"Đã có daemon khác đang chạy tại {self.address}")
+        finally:
+            probe.close()
+
+    async def _handle_client(self, reader, writer):
+        self.connections += 1
+        if self.clients >= self.max_clients:
+            self.rejected += 1
+            await self._send(writer, {'ok': False, 'error': 'quá nhiều kết nối'})
+            writer.close()
+            return
+        self.clients += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    await self._send(writer, {'ok': False, 'error': 'yêu cầu quá dài'})
+                    return
+                if not line:
+                    return
+                if not line.strip():
+                    continue
+                request = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ControlError("yêu cầu phải là JSON object")
+                    cmd = request.get('cmd')
+                    if cmd in self.streams:
+                        await self._stream(writer, request)
+                        return
+                    response = self._dispatch(request)
+                except (ValueError, ControlError) as e:
+                    response = self._error(e, request)
+                except Exception as e:
+                    logger.error("Lỗi khi xử lý lệnh %r: %s", request, e)
+                    response = self._error(e, request)
+                if not await self._send(writer, response):
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            self._writers.discard(writer)
+            writer.close()
+
+    def _dispatch(self, request: dict) -> dict:
+        self.requests += 1
+        cmd = request.get('cmd')
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            commands = ', '.join(sorted(set(self.handlers) | set(self.streams)))
+            raise ControlError(f"lệnh không hợp lệ: {cmd!r} (có: {commands})")
+        response = {'ok': True}
+        response.update(handler(request) or {})
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def _error(self, error: Exception, request) -> dict:
+        self.errors += 1
+        response = {'ok': False, 'error': str(error)}
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    async def _stream(self, writer, request: dict):
+        """Gửi kết quả lặp lại theo chu kỳ tới khi client ngắt hoặc đủ "count" dòng"""
+        self.requests += 1
+        produce = self.streams[request['cmd']]
+        try:
+            interval = max(MIN_STREAM_INTERVAL, float(request.get('interval', 1.0)))
+            count = request.get('count')
+            count = None if count is None else int(count)
+        except (TypeError, ValueError):
+            await self._send(writer, self._error(ControlError("interval/count không hợp lệ"),
+                                                 request))
+            return
+        sent = 0
+        next_at = time.monotonic()
+        while not self._stop.is_set() and (count is None or sent < count):
+            response = {'ok': True, 'ts': time.time()}
+            response.update(produce())
+            if not await self._send(writer, response):
+                return
+            sent += 1
+            next_at += interval
+            try:
+                await asyncio.wait_for(self._stop.wait(), max(0.0, next_at - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, writer, response: dict) -> bool:
+        """Ghi một dòng, ngắt client nếu không đọc kịp trong write_timeout"""
+        writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+        try:
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.warning("Control API: client không đọc phản hồi, ngắt kết nối")
+            return False
+        except ConnectionError:
+            return False
+        return True
+
+
+class ControlClient:
+    """
+    Client đồng bộ cho ControlServer (dùng trong CLI và test)
+    """
+
+    def __init__(self, address: str = None, timeout: float = 5.0):
+        self.address = address or default_address()
+        if sys.platform == 'win32':
+            self._sock = None
+            self._file = open(self.address, 'r+b', buffering=0)
+        else:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(self.address)
+            self._file = self._sock.makefile('rwb')
+
+    def _write(self, request: dict):
+        self._file.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        self._file.flush()
+
+    def _read(self) -> dict:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("server đã đóng kết nối")
+        return json.loads(line)
+
+    def request(self, cmd: str, **params) -> dict:
+        """Gửi một lệnh, trả về phản hồi"""
+        self._write(dict(params, cmd=cmd))
+        return self._read()
+
+    def stream(self, cmd: str, **params):
+        """Gửi lệnh stream, trả về generator các dòng phản hồi"""
+        self._write(dict(params, cmd=cmd))
+        while True:
+            try:
+                yield self._read()
+            except ConnectionError:
+                return
+
+    def close(self):
+        self._file.close()
+        if self._sock is not None:
+            self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
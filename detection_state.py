@@ -0,0 +1,260 @@
+"""
+Detection State - Máy trạng thái chống mute/unmute liên tục khi tiêu đề chớp qua
+
+Khi chuyển bài, tạm dừng hay cửa sổ đổi trạng thái, Spotify hiện thoáng qua
+"Spotify" hoặc tiêu đề rỗng. Phản ứng với từng tiêu đề như vậy tốn một lượt
+liệt kê session + SetMute, và có thể cắt mất đầu bài. Máy trạng thái chỉ đổi
+trạng thái âm thanh khi có chuyển tiếp thật:
+
+    PLAYING     đang phát nhạc, không mute
+    SUSPECT_AD  tiêu đề mới chưa được xác nhận (chờ hết cửa sổ xác nhận)
+    AD          quảng cáo, đã mute
+    PAUSED      tiêu đề tạm dừng ("Spotify", "Spotify Free", ...): không đổi âm thanh
+    CLOSED      không thấy cửa sổ Spotify (đã xác nhận): không đổi âm thanh
+
+Mỗi chuyển tiếp tốn tối đa một lệnh âm thanh: vào AD thì mute (nếu chưa mute),
+về PLAYING thì unmute (nếu đang mute). PAUSED và CLOSED giữ nguyên trạng thái
+mute, bài kế tiếp quyết định. Tiêu đề đổi trước khi hết cửa sổ xác nhận thì
+chuyển tiếp đang chờ bị hủy (một lần "chớp" được bỏ qua).
+
+Tiêu đề tạm dừng không bao giờ tự gây mute. Ngoại lệ duy nhất: quảng cáo chỉ hiện
+"Spotify" trong lúc Spotify vẫn phát ra tiếng. Nếu bộ phát hiện âm thanh báo còn
+tiếng (audible=True) khi hết cửa sổ confirm_pause và bộ phân loại coi tiêu đề là
+quảng cáo, trạng thái được nâng lên AD. Không có bộ phát hiện âm thanh
+(audible=None) thì quảng cáo kiểu này không bị mute; bỏ tiêu đề khỏi pause_titles
+nếu cần mute nó.
+
+Để báo cáo, máy trạng thái chạy song song cách làm cũ (mute/unmute ngay mỗi khi
+kết quả phân loại đổi) và đếm số lệnh âm thanh đã tránh được.
+"""
+
+import logging
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+PLAYING = 'playing'
+SUSPECT_AD = 'suspect_ad'
+AD = 'ad'
+PAUSED = 'paused'
+CLOSED = 'closed'
+
+STATES = (PLAYING, SUSPECT_AD, AD, PAUSED, CLOSED)
+
+# Tiêu đề khi Spotify tạm dừng (không phân biệt hoa thường)
+PAUSE_TITLES = ('spotify', 'spotify free', 'spotify premium')
+
+# previous/state: trạng thái trước/sau, action: 'mute', 'unmute' hoặc None
+Transition = namedtuple('Transition', ['previous', 'state', 'action'])
+
+# is_ad: kết quả phân loại của tiêu đề đang chờ (để nâng PAUSED lên AD)
+_Pending = namedtuple('_Pending', ['target', 'deadline', 'is_ad'])
+
+
+class DetectionStateMachine:
+    """
+    Quyết định mute/unmute từ chuỗi tiêu đề đã phân loại, có cửa sổ xác nhận
+    """
+
+    def __init__(self, confirm_ad: float = 0.0, confirm_song: float = 0.0,
+                 confirm_pause: float = 1.0, confirm_closed: float = 2.0,
+                 pause_titles=PAUSE_TITLES, clock=time.monotonic):
+        """
+        Args:
+            confirm_ad: Tiêu đề quảng cáo phải giữ bao lâu trước khi mute (giây,
+                0 = mute ngay; lớn hơn 0 thì phần đầu quảng cáo vẫn nghe thấy)
+            confirm_song: Tiêu đề bài hát phải giữ bao lâu trước khi unmute
+            confirm_pause: Tiêu đề tạm dừng phải giữ bao lâu mới coi là PAUSED
+            confirm_closed: Cửa sổ biến mất bao lâu mới coi là CLOSED
+            pause_titles: Các tiêu đề tạm dừng
+            clock: Hàm đồng hồ (giây)
+        """
+        self.configure(confirm_ad, confirm_song, confirm_pause, confirm_closed, pause_titles)
+        self.clock = clock
+
+        self.state = CLOSED
+        self.muted = False
+        self.pending = None
+        # Trạng thái trước SUSPECT_AD, quay về đó nếu tiêu đề chỉ chớp qua
+        self._settled = CLOSED
+
+        self.transitions = 0
+        self.actions = 0
+        self.blips = 0
+        self.escalations = 0
+        self.state_counts = {}
+        # Cách làm cũ: lệnh âm thanh mỗi khi kết quả phân loại đổi
+        self.naive_actions = 0
+        self._naive_muted = False
+
+    def configure(self, confirm_ad: float = 0.0, confirm_song: float = 0.0,
+                  confirm_pause: float = 1.0, confirm_closed: float = 2.0,
+                  pause_titles=PAUSE_TITLES):
+        """Đổi cửa sổ xác nhận (vd khi nạp lại cấu hình), áp dụng từ tiêu đề kế tiếp"""
+        self.confirm_ad = confirm_ad
+        self.confirm_song = confirm_song
+        self.confirm_pause = confirm_pause
+        self.confirm_closed = confirm_closed
+        self.pause_titles = frozenset(t.lower().strip() for t in pause_titles)
+
+    # ---- Đầu vào ----
+
+    def observe(self, title: str, is_ad: bool, now: float = None, audible: bool = None):
+        """
+        Ghi nhận tiêu đề (mới, hoặc tiêu đề hiện tại được gửi lại)
+
+        Args:
+            audible: Spotify còn phát ra tiếng không (bộ phát hiện âm thanh), None = không biết
+
+        Returns:
+            Transition nếu trạng thái đổi hoặc cần lệnh âm thanh, ngược lại None
+        """
+        now = self.clock() if now is None else now
+        self._count_naive(title, is_ad)
+        target = self.target(title, is_ad)
+
+        pending = self.pending
+        if pending is not None:
+            if pending.target == target:
+                # Cùng tiêu đề được gửi lại: xác nhận nếu đã đủ thời gian
+                return self._confirm(now, audible)
+            self.pending = None
+            if now < pending.deadline:
+                self.blips += 1
+                logger.debug("Bỏ qua tiêu đề chớp qua (%s -> %s)", pending.target, target)
+            if self.state == SUSPECT_AD:
+                self.state = self._settled
+                if not self._needs_change(target):
+                    return Transition(SUSPECT_AD, self.state, None)
+
+        if not self._needs_change(target):
+            return None
+        window = self._window(target)
+        if window <= 0:
+            return self._enter(target)
+        self.pending = _Pending(target, now + window, is_ad)
+        if target in (AD, PAUSED):
+            return self._suspect()
+        return None
+
+    def tick(self, now: float = None, audible: bool = None):
+        """Xác nhận chuyển tiếp đang chờ nếu đã hết cửa sổ (gọi khi confirm_in() về 0)"""
+        if self.pending is None:
+            return None
+        return self._confirm(self.clock() if now is None else now, audible)
+
+    def confirm_in(self, now: float = None):
+        """Số giây tới lúc cần gọi tick(), None nếu không có gì đang chờ"""
+        if self.pending is None:
+            return None
+        now = self.clock() if now is None else now
+        return max(0.0, self.pending.deadline - now)
+
+    def set_muted(self, muted: bool):
+        """Âm thanh bị đổi từ bên ngoài máy trạng thái (vd pre-mute của predictor)"""
+        self.muted = muted
+        self._naive_muted = muted
+
+    def reset(self):
+        """Chức năng bị tắt: quên trạng thái, monitor tự trả lại âm thanh"""
+        self.state = CLOSED
+        self.pending = None
+        self.muted = False
+        self._naive_muted = False
+
+    def target(self, title: str, is_ad: bool) -> str:
+        """Trạng thái mà tiêu đề hướng tới: PLAYING, AD, PAUSED hoặc CLOSED"""
+        if not title:
+            return CLOSED
+        if title.strip().lower() in self.pause_titles:
+            return PAUSED
+        return AD if is_ad else PLAYING
+
+    def _needs_change(self, target: str) -> bool:
+        if target != self.state:
+            return True
+        # Cùng trạng thái nhưng âm thanh bị đổi từ bên ngoài (pre-mute)
+        if target == AD:
+            return not self.muted
+        if target == PLAYING:
+            return self.muted
+        return False
+
+    def _window(self, target: str) -> float:
+        if target == AD:
+            return 0.0 if self.muted else self.confirm_ad
+        if target == PLAYING:
+            return self.confirm_song if self.muted else 0.0
+        if target == PAUSED:
+            # Đang mute (giữa đợt quảng cáo) thì tạm dừng không cần chờ: không đổi âm thanh
+            return 0.0 if self.muted else self.confirm_pause
+        return self.confirm_closed
+
+    def _suspect(self):
+        if self.state == SUSPECT_AD:
+            return None
+        self._settled = self.state
+        previous, self.state = self.state, SUSPECT_AD
+        return Transition(previous, SUSPECT_AD, None)
+
+    # ---- Nội bộ ----
+
+    def _confirm(self, now: float, audible: bool = None):
+        if now < self.pending.deadline:
+            return None
+        target = self.pending.target
+        if target == PAUSED and self.pending.is_ad and audible:
+            # Tiêu đề tạm dừng giữ suốt cửa sổ mà vẫn có tiếng: quảng cáo chỉ hiện "Spotify"
+            target = AD
+            self.escalations += 1
+            logger.debug("Tiêu đề tạm dừng nhưng vẫn có âm thanh: coi là quảng cáo")
+        self.pending = None
+        return self._enter(target)
+
+    def _enter(self, target: str):
+        previous = self.state
+        action = None
+        if target == AD and not self.muted:
+            action = 'mute'
+        elif target == PLAYING and self.muted:
+            action = 'unmute'
+        if action is not None:
+            self.muted = action == 'mute'
+            self.actions += 1
+        self.state = target
+        self.transitions += 1
+        self.state_counts[target] = self.state_counts.get(target, 0) + 1
+        logger.debug("Trạng thái: %s -> %s%s", previous, target,
+                     f" ({action})" if action else "")
+        return Transition(previous, target, action)
+
+    def _count_naive(self, title: str, is_ad: bool):
+        # Cách làm cũ bỏ qua tiêu đề rỗng
+        if title and is_ad != self._naive_muted:
+            self._naive_muted = is_ad
+            self.naive_actions += 1
+
+    # ---- Báo cáo ----
+
+    @property
+    def saved_actions(self) -> int:
+        """Số lệnh âm thanh (liệt kê session + SetMute) đã tránh so với cách làm cũ"""
+        return max(0, self.naive_actions - self.actions)
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'transitions': self.transitions,
+            'audio_actions': self.actions,
+            'naive_actions': self.naive_actions,
+            'saved_actions': self.saved_actions,
+            'blips': self.blips,
+            'escalations': self.escalations,
+            'states': dict(self.state_counts),
+        }
+
+    def format_status(self) -> str:
+        """Chuỗi ngắn gọn để hiển thị (vd: trong menu tray)"""
+        return (f"{self.state}, tránh {self.saved_actions} lệnh âm thanh, "
+                f"{self.blips} lần chớp")
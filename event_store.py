@@ -0,0 +1,514 @@
+"""
+Event Store - Lịch sử tiêu đề, phân loại và mute/unmute trên đĩa
+
+Thay cho việc đọc lại các dòng tự do trong spotify_mute.log, mỗi sự kiện được ghi
+thành một bản ghi nhị phân kích thước cố định (20 byte) vào file chỉ ghi thêm:
+
+    spotify_events.bin     header 16 byte + bản ghi <ts f64, title_id u32,
+                           latency f32, kind u8, flags u8, 2 byte trống>
+    spotify_events.titles  bảng tiêu đề: u16 độ dài + UTF-8, id = thứ tự xuất hiện
+    spotify_events.stats   tổng số đã đếm (JSON) để không phải quét lại khi mở;
+                           checkpoint định kỳ trên thread ghi và khi đóng
+
+EventStore ghi trên thread nền (monitor chỉ đẩy tuple vào queue), nên khởi động
+không đọc gì từ lịch sử. EventLog đọc bằng mmap và tìm khoảng thời gian bằng tìm
+kiếm nhị phân trên timestamp, nên truy vấn "24 giờ qua" không phải quét cả nhiều
+tháng lịch sử. Tìm kiếm nhị phân cần timestamp không giảm: thread ghi giữ điều đó
+kể cả khi đồng hồ hệ thống bị chỉnh lùi (bản ghi mang timestamp của bản ghi trước
+cho tới khi đồng hồ đuổi kịp, xem EventStore.clamped).
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import queue
+import statistics
+import struct
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+EVENTS_FILE = 'spotify_events.bin'
+
+MAGIC = b'SAMEVT01'
+HEADER = struct.Struct('<8sII')
+RECORD = struct.Struct('<dIfBBxx')
+TITLE_LENGTH = struct.Struct('<H')
+
+# Loại sự kiện
+TITLE = 1       # tiêu đề mới đã phân loại (flags: FLAG_AD)
+MUTE = 2        # mute xong (flags: FLAG_OK, latency: từ lúc đọc tiêu đề)
+UNMUTE = 3
+PRE_MUTE = 4    # mute trước theo predictor
+START = 5       # ứng dụng bắt đầu theo dõi
+STOP = 6
+PAUSE = 7       # tiêu đề tạm dừng ("Spotify"): không mở hay kết thúc đợt quảng cáo
+
+KIND_NAMES = {TITLE: 'title', MUTE: 'mute', UNMUTE: 'unmute', PRE_MUTE: 'pre_mute',
+              START: 'start', STOP: 'stop', PAUSE: 'pause'}
+
+FLAG_AD = 1
+FLAG_OK = 2
+
+NO_TITLE = 0xFFFFFFFF
+
+# ts: giây (Unix time), latency: giây hoặc None
+Event = namedtuple('Event', ['ts', 'kind', 'title_id', 'is_ad', 'ok', 'latency'])
+AdBreak = namedtuple('AdBreak', ['start', 'end', 'titles'])
+Misclassification = namedtuple('Misclassification', ['ts', 'reason', 'title'])
+
+
+def _title_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.titles'
+
+
+def _stats_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.stats'
+
+
+class EventStore:
+    """
+    Ghi sự kiện vào file chỉ ghi thêm, trên thread nền
+    """
+
+    def __init__(self, path: str = EVENTS_FILE, flush_interval: float = 1.0,
+                 batch_size: int = 64, clock=time.time,
+                 checkpoint_interval: float = 60.0, checkpoint_records: int = 1000):
+        """
+        Args:
+            path: File bản ghi (file tiêu đề/tổng số nằm cạnh, cùng tên khác đuôi)
+            flush_interval: Ghi xuống đĩa sau tối đa chừng này giây
+            batch_size: Ghi ngay khi gom đủ chừng này sự kiện
+            clock: Hàm lấy thời gian (giây, Unix time)
+            checkpoint_interval: Ghi file tổng số sau tối đa chừng này giây (khi có bản
+                ghi mới), để lần mở sau khi bị kill không phải đếm lại cả lịch sử
+            checkpoint_records: Ghi file tổng số sau chừng này bản ghi mới
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.clock = clock
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_records = checkpoint_records
+        self.queue = queue.Queue()
+        self.written = 0
+        self.dropped = 0
+        # Số bản ghi bị kéo timestamp lên vì đồng hồ lùi
+        self.clamped = 0
+        self.checkpoints = 0
+        self._last_ts = -math.inf
+        self._checkpoint_at = 0
+        self._checkpoint_time = 0.0
+        # Tổng số từ trước tới nay, có sau khi thread ghi đã mở file
+        self.totals = None
+        self._titles = None
+        self._records = None
+        self._title_file = None
+        self._thread = None
+        self._sentinel = object()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='event-store', daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, kind: int, title: str = None, is_ad: bool = False, ok: bool = True,
+               latency: float = None, ts: float = None):
+        """Thêm một sự kiện (không chặn, gọi được từ mọi thread)"""
+        self.queue.put_nowait((ts if ts is not None else self.clock(), kind, title,
+                               is_ad, ok, latency))
+
+    def close(self, timeout: float = 5.0):
+        """Ghi nốt các sự kiện còn trong queue rồi dừng thread"""
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---- Thread ghi ----
+
+    def _run(self):
+        try:
+            self._open()
+        except Exception as e:
+            logger.error(f"Không mở được lịch sử sự kiện {self.path}: {e}")
+            self._drain()
+            return
+        batch = []
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is self._sentinel:
+                stopping = True
+            elif item is not None:
+                batch.append(item)
+            if batch and (stopping or len(batch) >= self.batch_size or
+                          time.monotonic() - last_flush >= self.flush_interval):
+                self._write(batch)
+                batch = []
+                last_flush = time.monotonic()
+                if not stopping and self._checkpoint_due():
+                    self._checkpoint()
+        self._close_files()
+
+    def _drain(self):
+        while self.queue.get() is not self._sentinel:
+            self.dropped += 1
+
+    def _open(self):
+        # Bảng tiêu đề: đọc tuần tự một lần để dựng map tiêu đề -> id
+        title_path = _title_path(self.path)
+        self._titles = {}
+        self._title_count = 0
+        if os.path.exists(title_path):
+            with open(title_path, 'rb') as f:
+                data = f.read()
+            valid = 0
+            for title, end in _iter_titles(data):
+                self._titles.setdefault(title, self._title_count)
+                self._title_count += 1
+                valid = end
+            if valid != len(data):
+                # Dòng cuối ghi dở (mất điện, bị kill): bỏ phần thừa
+                with open(title_path, 'r+b') as f:
+                    f.truncate(valid)
+        self._title_file = open(title_path, 'ab')
+
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER.size
+        self._records = open(self.path, 'r+b' if exists else 'w+b')
+        if exists:
+            magic, record_size, _ = HEADER.unpack(self._records.read(HEADER.size))
+            if magic != MAGIC or record_size != RECORD.size:
+                raise ValueError("định dạng file không đúng")
+            size = os.path.getsize(self.path)
+            tail = (size - HEADER.size) % RECORD.size
+            if tail:
+                self._records.truncate(size - tail)
+        else:
+            self._records.write(HEADER.pack(MAGIC, RECORD.size, 0))
+        end = self._records.seek(0, os.SEEK_END)
+        if end > HEADER.size:
+            self._records.seek(end - RECORD.size)
+            self._last_ts = RECORD.unpack(self._records.read(RECORD.size))[0]
+        self._load_totals()
+        self._checkpoint_at = self.totals['records']
+        self._checkpoint_time = time.monotonic()
+
+    def _load_totals(self):
+        """Tổng số từ file .stats, cộng thêm phần bản ghi mới hơn checkpoint"""
+        count = (self._records.tell() - HEADER.size) // RECORD.size
+        totals = {'records': 0, 'ads': 0, 'songs': 0, 'mutes': 0, 'pre_mutes': 0,
+                  'in_ad': False}
+        try:
+            with open(_stats_path(self.path), encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('records', 0) <= count:
+                totals.update(saved)
+        except (OSError, ValueError):
+            pass
+        if totals['records'] < count:
+            log = EventLog(self.path)
+            try:
+                for event in log.iter_range(totals['records'], count):
+                    _count_event(totals, event)
+            finally:
+                log.close()
+        totals['records'] = count
+        self.totals = totals
+
+    def _title_id(self, title: str) -> int:
+        if title is None:
+            return NO_TITLE
+        title_id = self._titles.get(title)
+        if title_id is None:
+            encoded = title.encode('utf-8')[:0xFFFF]
+            self._title_file.write(TITLE_LENGTH.pack(len(encoded)) + encoded)
+            title_id = self._titles[title] = self._title_count
+            self._title_count += 1
+        return title_id
+
+    def _write(self, batch: list):
+        chunks = []
+        for ts, kind, title, is_ad, ok, latency in batch:
+            if ts < self._last_ts:
+                # Đồng hồ lùi (hoặc hai thread ghi lệch nhau): giữ thứ tự cho bisect
+                ts = self._last_ts
+                self.clamped += 1
+            self._last_ts = ts
+            flags = (FLAG_AD if is_ad else 0) | (FLAG_OK if ok else 0)
+            chunks.append(RECORD.pack(ts, self._title_id(title),
+                                      math.nan if latency is None else latency, kind, flags))
+            _count_event(self.totals, Event(ts, kind, None, bool(is_ad), bool(ok), latency))
+        # Tiêu đề xuống đĩa trước bản ghi tham chiếu tới nó
+        self._title_file.flush()
+        self._records.write(b''.join(chunks))
+        self._records.flush()
+        self.written += len(batch)
+        self.totals['records'] += len(batch)
+
+    def _checkpoint_due(self) -> bool:
+        new = self.totals['records'] - self._checkpoint_at
+        return new > 0 and (new >= self.checkpoint_records or
+                            time.monotonic() - self._checkpoint_time >= self.checkpoint_interval)
+
+    def _checkpoint(self):
+        """Ghi tổng số ra file .stats (ghi file tạm rồi thay thế, không để file dở)"""
+        path = _stats_path(self.path)
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.totals, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.debug("Không ghi được tổng số sự kiện: %s", e)
+            return
+        self.checkpoints += 1
+        self._checkpoint_at = self.totals['records']
+        self._checkpoint_time = time.monotonic()
+
+    def _close_files(self):
+        self._checkpoint()
+        for f in (self._records, self._title_file):
+            if f is not None:
+                f.close()
+
+
+def _count_event(totals: dict, event: Event):
+    """Cập nhật tổng số (quảng cáo = lần chuyển sang tiêu đề quảng cáo)"""
+    if event.kind == TITLE:
+        if event.is_ad and not totals['in_ad']:
+            totals['ads'] += 1
+        elif not event.is_ad and totals['in_ad']:
+            totals['songs'] += 1
+        totals['in_ad'] = event.is_ad
+    elif event.kind == MUTE and event.ok:
+        totals['mutes'] += 1
+    elif event.kind == PRE_MUTE:
+        totals['pre_mutes'] += 1
+    elif event.kind == STOP:
+        totals['in_ad'] = False
+
+
+def _iter_titles(data: bytes):
+    """(tiêu đề, vị trí kết thúc) cho từng mục hợp lệ trong bảng tiêu đề"""
+    offset = 0
+    size = len(data)
+    while offset + TITLE_LENGTH.size <= size:
+        (length,) = TITLE_LENGTH.unpack_from(data, offset)
+        end = offset + TITLE_LENGTH.size + length
+        if end > size:
+            return
+        yield data[offset + TITLE_LENGTH.size:end].decode('utf-8', 'replace'), end
+        offset = end
+
+
+def _iter_titles_from_file(path: str):
+    with open(path, 'rb') as f:
+        yield from _iter_titles(f.read())
+
+
+class EventLog:
+    """
+    Đọc lịch sử sự kiện qua mmap (chỉ đọc)
+    """
+
+    def __init__(self, path: str = EVENTS_FILE):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._count = 0
+        self._titles = None
+        if os.path.exists(path) and os.path.getsize(path) > HEADER.size:
+            self._file = open(path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, record_size, _ = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or record_size != RECORD.size:
+                self.close()
+                raise ValueError(f"{path}: định dạng file không đúng")
+            self._count = (len(self._map) - HEADER.size) // RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Event:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._unpack(index)
+
+    def _unpack(self, index: int) -> Event:
+        ts, title_id, latency, kind, flags = RECORD.unpack_from(
+            self._map, HEADER.size + index * RECORD.size)
+        return Event(ts, kind, title_id, bool(flags & FLAG_AD), bool(flags & FLAG_OK),
+                     None if math.isnan(latency) else latency)
+
+    def _ts(self, index: int) -> float:
+        return struct.unpack_from('<d', self._map, HEADER.size + index * RECORD.size)[0]
+
+    def bisect(self, ts: float) -> int:
+        """Vị trí bản ghi đầu tiên có timestamp >= ts"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._ts(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def iter_range(self, start: int = 0, stop: int = None):
+        stop = self._count if stop is None else min(stop, self._count)
+        for index in range(start, stop):
+            yield self._unpack(index)
+
+    def events(self, since: float = None, until: float = None):
+        """Các sự kiện trong [since, until) theo thứ tự thời gian"""
+        start = 0 if since is None else self.bisect(since)
+        stop = self._count if until is None else self.bisect(until)
+        return self.iter_range(start, stop)
+
+    def title(self, title_id: int) -> str:
+        """Tiêu đề theo id (bảng tiêu đề chỉ được đọc ở lần gọi đầu tiên)"""
+        if title_id == NO_TITLE:
+            return None
+        if self._titles is None:
+            path = _title_path(self.path)
+            self._titles = [t for t, _ in _iter_titles_from_file(path)] \
+                if os.path.exists(path) else []
+        return self._titles[title_id] if title_id < len(self._titles) else None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---- Truy vấn ----
+
+def ad_breaks(log: EventLog, since: float = None, until: float = None) -> list:
+    """
+    Các đợt quảng cáo: từ tiêu đề quảng cáo đầu tiên tới tiêu đề bài hát kế tiếp
+    (đợt đang dở khi ứng dụng dừng bị bỏ qua)
+    """
+    breaks = []
+    start = None
+    titles = 0
+    for event in log.events(since, until):
+        if event.kind == TITLE:
+            if event.is_ad:
+                if start is None:
+                    start, titles = event.ts, 0
+                titles += 1
+            elif start is not None:
+                breaks.append(AdBreak(start, event.ts, titles))
+                start = None
+        elif event.kind in (START, STOP):
+            start = None
+    return breaks
+
+
+def listening_seconds(log: EventLog, since: float = None, until: float = None,
+                      max_gap: float = 900.0) -> float:
+    """Thời gian có hoạt động (khoảng cách giữa hai sự kiện liên tiếp, tối đa max_gap)"""
+    total = 0.0
+    previous = None
+    for event in log.events(since, until):
+        if previous is not None and previous.kind != STOP:
+            total += min(event.ts - previous.ts, max_gap)
+        previous = event
+    return total
+
+
+def ads_per_hour(log: EventLog, since: float = None, until: float = None) -> dict:
+    """
+    Returns:
+        {'rate': số đợt quảng cáo / giờ nghe, 'by_hour': {giờ trong ngày: số đợt}}
+    """
+    breaks = ad_breaks(log, since, until)
+    hours = listening_seconds(log, since, until) / 3600
+    by_hour = {}
+    for ad_break in breaks:
+        hour = time.localtime(ad_break.start).tm_hour
+        by_hour[hour] = by_hour.get(hour, 0) + 1
+    return {
+        'breaks': len(breaks),
+        'listening_hours': round(hours, 2),
+        'rate': round(len(breaks) / hours, 2) if hours else 0.0,
+        'by_hour': dict(sorted(by_hour.items())),
+    }
+
+
+def median_ad_length(log: EventLog, since: float = None, until: float = None) -> float:
+    """Độ dài trung vị của một đợt quảng cáo (giây), 0 nếu chưa có"""
+    lengths = [b.end - b.start for b in ad_breaks(log, since, until)]
+    return statistics.median(lengths) if lengths else 0.0
+
+
+def misclassifications(log: EventLog, since: float = None, until: float = None,
+                       min_ad_length: float = 2.0) -> list:
+    """
+    Các trường hợp nhiều khả năng phân loại sai:
+
+    - false_pre_mute: mute trước nhưng tiêu đề kế tiếp là bài hát
+    - short_ad: "quảng cáo" ngắn hơn min_ad_length giây (tiêu đề chớp qua)
+    - flip: cùng một tiêu đề từng được phân loại khác nhau (luật đã đổi)
+    """
+    found = []
+    pending_pre_mute = None
+    verdicts = {}
+    ad_start = None
+    for event in log.events(since, until):
+        if event.kind == PRE_MUTE:
+            pending_pre_mute = event
+        elif event.kind == TITLE:
+            if pending_pre_mute is not None and not event.is_ad:
+                found.append(Misclassification(pending_pre_mute.ts, 'false_pre_mute',
+                                               log.title(event.title_id)))
+            pending_pre_mute = None
+            previous = verdicts.setdefault(event.title_id, event.is_ad)
+            if previous != event.is_ad:
+                found.append(Misclassification(event.ts, 'flip', log.title(event.title_id)))
+                verdicts[event.title_id] = event.is_ad
+            if event.is_ad and ad_start is None:
+                ad_start = event
+            elif not event.is_ad and ad_start is not None:
+                if event.ts - ad_start.ts < min_ad_length:
+                    found.append(Misclassification(ad_start.ts, 'short_ad',
+                                                   log.title(ad_start.title_id)))
+                ad_start = None
+        elif event.kind in (START, STOP):
+            ad_start = None
+            pending_pre_mute = None
+    return found
+
+
+def mute_latency(log: EventLog, since: float = None, until: float = None) -> dict:
+    """Phân vị độ trễ mute đã ghi (mili-giây)"""
+    values = sorted(e.latency for e in log.events(since, until)
+                    if e.kind == MUTE and e.ok and e.latency is not None)
+    if not values:
+        return {'count': 0}
+
+    def pct(p):
+        return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 2)
+
+    return {'count': len(values), 'p50_ms': pct(50), 'p95_ms': pct(95), 'max_ms': pct(100)}
@@ -0,0 +1,133 @@
+"""
+Latency Stats - Đo thời gian từng giai đoạn trên đường xử lý quảng cáo
+
+Mỗi giai đoạn (đọc tiêu đề, phân loại, mute/unmute, tổng từ lúc đọc tiêu đề tới
+khi SetMute xong) được ghi vào một histogram trong bộ nhớ với các bucket chia
+theo thang log, đủ để tính p50/p95/p99 mà không phải giữ từng mẫu.
+"""
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LatencyHistogram:
+    """
+    Histogram độ trễ với bucket theo thang log (từ 1 µs tới ~100 s)
+    """
+
+    MIN_VALUE = 1e-6
+    # Mỗi bucket rộng hơn bucket trước 10% -> sai số percentile tối đa ~10%
+    GROWTH = 1.1
+
+    def __init__(self):
+        self._log_growth = math.log(self.GROWTH)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.MIN_VALUE:
+            return 0
+        return int(math.log(seconds / self.MIN_VALUE) / self._log_growth) + 1
+
+    def _bucket_upper(self, index: int) -> float:
+        return self.MIN_VALUE * self.GROWTH ** index
+
+    def record(self, seconds: float):
+        index = self._bucket(seconds)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct: float) -> float:
+        """
+        Args:
+            pct: Phần trăm (0-100)
+
+        Returns:
+            Cận trên của bucket chứa percentile (giây), 0 nếu chưa có mẫu
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * pct / 100.0))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """Tóm tắt theo mili-giây"""
+        def ms(value):
+            return round((value or 0.0) * 1000, 3)
+
+        return {
+            'count': self.count,
+            'mean_ms': ms(self.total / self.count if self.count else 0.0),
+            'min_ms': ms(self.min),
+            'p50_ms': ms(self.percentile(50)),
+            'p95_ms': ms(self.percentile(95)),
+            'p99_ms': ms(self.percentile(99)),
+            'max_ms': ms(self.max),
+        }
+
+
+class LatencyRecorder:
+    """
+    Tập histogram theo tên giai đoạn, an toàn khi dùng từ nhiều thread
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        """Đo thời gian một khối lệnh: with recorder.time('mute'): ..."""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(stage, self.clock() - start)
+
+    def get(self, stage: str) -> LatencyHistogram:
+        return self.histograms.get(stage)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {stage: hist.summary() for stage, hist in sorted(self.histograms.items())}
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), ensure_ascii=False, indent=2)
+
+    def export(self, path: str) -> str:
+        """Ghi số liệu ra file JSON, trả về đường dẫn"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+        return path
+
+    def format_stage(self, stage: str) -> str:
+        """Chuỗi ngắn gọn để hiển thị (vd: trong menu tray)"""
+        histogram = self.histograms.get(stage)
+        if histogram is None or not histogram.count:
+            return "chưa có dữ liệu"
+        s = histogram.summary()
+        return f"p50 {s['p50_ms']:.1f} / p95 {s['p95_ms']:.1f} / p99 {s['p99_ms']:.1f} ms"
@@ -0,0 +1,533 @@
+"""
+Linux Backend - Đọc bài đang phát qua MPRIS và mute qua PulseAudio/PipeWire
+
+- MprisTitleSource: nghe tín hiệu PropertiesChanged của org.mpris.MediaPlayer2.spotify
+  trên session bus (jeepney), dựng tiêu đề giống tiêu đề cửa sổ trên Windows
+  ("Artist - Title", "Advertisement" khi trackid là quảng cáo, "Spotify" khi tạm
+  dừng) để dùng chung AdClassifier. Hoạt động theo sự kiện, không polling; vừa là
+  nguồn tiêu đề (get_title) vừa là event_source cho AsyncMonitor.
+- PulseAudioBackend: AudioBackend mute riêng sink-input của Spotify qua giao thức
+  native của PulseAudio (pulsectl, chạy được với pipewire-pulse).
+- PulseMonitorSource: thu âm riêng sink-input của Spotify (parec --monitor-stream)
+  cho AudioAdDetector.
+
+jeepney và pulsectl chỉ được import khi dùng tới. FakeSinkServer thay cho server
+PulseAudio trong test.
+"""
+
+import logging
+import subprocess
+import threading
+from collections import namedtuple
+
+from audio_sessions import AudioBackend, SessionHandle
+
+logger = logging.getLogger(__name__)
+
+
+MPRIS_BUS_NAME = 'org.mpris.MediaPlayer2.spotify'
+MPRIS_PATH = '/org/mpris/MediaPlayer2'
+MPRIS_PLAYER_INTERFACE = 'org.mpris.MediaPlayer2.Player'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+# Tiêu đề tương ứng với tiêu đề cửa sổ Spotify trên Windows
+AD_TITLE = 'Advertisement'
+PAUSED_TITLE = 'Spotify'
+
+
+def _unwrap(value):
+    """jeepney trả variant dạng (signature, giá trị)"""
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], str):
+        return value[1]
+    return value
+
+
+def mpris_title(metadata: dict, status: str) -> str:
+    """
+    Dựng tiêu đề kiểu cửa sổ Spotify từ metadata MPRIS
+
+    Args:
+        metadata: Dict Metadata (giá trị có thể là variant của jeepney)
+        status: PlaybackStatus ('Playing', 'Paused', 'Stopped')
+    """
+    if status and status != 'Playing':
+        return PAUSED_TITLE
+    metadata = {key: _unwrap(value) for key, value in (metadata or {}).items()}
+    track_id = str(metadata.get('mpris:trackid', ''))
+    # Spotify đánh dấu quảng cáo bằng trackid dạng spotify:ad:... (hoặc /ad/ trong path)
+    if ':ad:' in track_id or '/ad/' in track_id:
+        return AD_TITLE
+    title = metadata.get('xesam:title') or ''
+    artists = metadata.get('xesam:artist') or []
+    if isinstance(artists, str):
+        artists = [artists]
+    artist = ', '.join(a for a in artists if a)
+    if artist and title:
+        return f"{artist} - {title}"
+    return title or artist
+
+
+class MprisTitleSource:
+    """
+    Nguồn tiêu đề Spotify trên Linux qua MPRIS (D-Bus session bus)
+    """
+
+    def __init__(self, bus_name: str = MPRIS_BUS_NAME, connection_factory=None,
+                 poll_timeout: float = 0.5):
+        """
+        Args:
+            bus_name: Tên bus MPRIS của Spotify
+            connection_factory: Hàm tạo kết nối jeepney (mặc định session bus)
+            poll_timeout: Chu kỳ kiểm tra stop/wake khi không có tín hiệu (giây)
+        """
+        self.bus_name = bus_name
+        self.connection_factory = connection_factory
+        self.poll_timeout = poll_timeout
+        self.metadata = {}
+        self.status = ''
+        self.present = False
+        self.signals = 0
+        self._conn = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    # ---- Nguồn tiêu đề ----
+
+    def get_title(self) -> str:
+        """Tiêu đề hiện tại (đọc từ trạng thái đã nhận, không gọi D-Bus)"""
+        with self._lock:
+            if not self.present:
+                return ""
+            return mpris_title(self.metadata, self.status)
+
+    __call__ = get_title
+
+    def invalidate(self):
+        """Tương thích với SpotifyWindowResolver; trạng thái do tín hiệu cập nhật"""
+
+    # ---- Cập nhật trạng thái ----
+
+    def update(self, properties: dict, replace: bool = False):
+        """
+        Áp dụng thuộc tính Player (từ GetAll hoặc PropertiesChanged)
+
+        Returns:
+            True nếu tiêu đề có thể đã thay đổi
+        """
+        properties = {key: _unwrap(value) for key, value in properties.items()}
+        with self._lock:
+            if replace:
+                self.metadata = {}
+                self.status = ''
+            self.present = True
+            changed = False
+            if 'Metadata' in properties:
+                self.metadata = dict(properties['Metadata'] or {})
+                changed = True
+            if 'PlaybackStatus' in properties:
+                self.status = properties['PlaybackStatus']
+                changed = True
+            return changed or replace
+
+    def set_present(self, present: bool):
+        """Spotify xuất hiện/biến mất khỏi bus"""
+        with self._lock:
+            self.present = present
+            if not present:
+                self.metadata = {}
+                self.status = ''
+
+    def handle_message(self, message) -> bool:
+        """
+        Xử lý một tín hiệu D-Bus đã lọc
+
+        Returns:
+            True nếu cần báo cho watcher đọc lại tiêu đề
+        """
+        header = message.header.fields
+        member = header.get(_header_field('member'))
+        if member == 'PropertiesChanged':
+            interface, changed, _invalidated = message.body
+            if interface != MPRIS_PLAYER_INTERFACE:
+                return False
+            self.signals += 1
+            return self.update(changed)
+        if member == 'NameOwnerChanged':
+            name, _old_owner, new_owner = message.body
+            if name != self.bus_name:
+                return False
+            if new_owner:
+                return self._refresh_from_bus()
+            self.set_present(False)
+            return True
+        return False
+
+    # ---- Event source ----
+
+    def run(self, notify, stop_event):
+        """Blocking: nghe tín hiệu MPRIS và gọi notify() khi tiêu đề có thể đổi"""
+        from jeepney import MatchRule
+        from jeepney.bus_messages import message_bus
+
+        if self.connection_factory is not None:
+            conn = self.connection_factory()
+        else:
+            from jeepney.io.blocking import open_dbus_connection
+            conn = open_dbus_connection(bus='SESSION')
+        self._conn = conn
+
+        # Bus lọc theo tên Spotify; bộ lọc cục bộ không có sender vì tín hiệu
+        # mang unique name (:1.xx) chứ không phải tên org.mpris...
+        props_rule = MatchRule(type='signal', interface=PROPERTIES_INTERFACE,
+                               member='PropertiesChanged', path=MPRIS_PATH)
+        bus_props_rule = MatchRule(type='signal', sender=self.bus_name,
+                                   interface=PROPERTIES_INTERFACE,
+                                   member='PropertiesChanged', path=MPRIS_PATH)
+        owner_rule = MatchRule(type='signal', sender='org.freedesktop.DBus',
+                               interface='org.freedesktop.DBus', member='NameOwnerChanged',
+                               path='/org/freedesktop/DBus')
+        owner_rule.add_arg_condition(0, self.bus_name)
+
+        try:
+            conn.send_and_get_reply(message_bus.AddMatch(bus_props_rule))
+            conn.send_and_get_reply(message_bus.AddMatch(owner_rule))
+            # bufsize mặc định là 1: tín hiệu dồn dập sẽ bị mất nếu không nới ra
+            with conn.filter(props_rule, bufsize=64) as props_queue, \
+                    conn.filter(owner_rule, bufsize=16) as owner_queue:
+                self._refresh_from_bus()
+                notify()
+                while not stop_event.is_set():
+                    try:
+                        conn.recv_messages(timeout=self.poll_timeout)
+                    except TimeoutError:
+                        pass
+                    dirty = False
+                    for queue in (props_queue, owner_queue):
+                        while queue:
+                            dirty = self.handle_message(queue.popleft()) or dirty
+                    if self._wake.is_set():
+                        self._wake.clear()
+                        dirty = True
+                    if dirty and not stop_event.is_set():
+                        notify()
+        finally:
+            self._conn = None
+            conn.close()
+
+    def _refresh_from_bus(self) -> bool:
+        """Đọc toàn bộ thuộc tính Player (lúc bắt đầu hoặc khi Spotify vừa mở)"""
+        from jeepney import DBusAddress, Properties
+        from jeepney.wrappers import DBusErrorResponse
+
+        conn = self._conn
+        if conn is None:
+            return False
+        player = DBusAddress(MPRIS_PATH, bus_name=self.bus_name, interface=MPRIS_PLAYER_INTERFACE)
+        try:
+            reply = conn.send_and_get_reply(Properties(player).get_all(), timeout=2.0)
+            if reply.header.message_type.name == 'error':
+                raise DBusErrorResponse(reply)
+        except (DBusErrorResponse, TimeoutError) as e:
+            logger.debug("Spotify chưa có trên D-Bus: %s", e)
+            self.set_present(False)
+            return True
+        return self.update(reply.body[0], replace=True)
+
+    def wake(self):
+        self._wake.set()
+
+
+def _header_field(name: str):
+    from jeepney.low_level import HeaderFields
+    return getattr(HeaderFields, name)
+
+
+class PulseAudioBackend(AudioBackend):
+    """
+    Backend Linux mute sink-input của Spotify qua PulseAudio (hoặc pipewire-pulse)
+
+    pulsectl.Pulse không an toàn khi dùng từ nhiều thread, trong khi thread audio
+    (SetMute, liệt kê) và thread của VolumeFader (âm lượng) dùng chung một backend:
+    mọi lời gọi lên client chính đi qua một lock. Thread nghe sự kiện có kết nối riêng.
+    """
+
+    def __init__(self, client=None, client_factory=None):
+        """
+        Args:
+            client: Đối tượng kiểu pulsectl.Pulse (mặc định tự kết nối)
+            client_factory: Hàm tạo client mới cho thread nghe sự kiện
+        """
+        if client_factory is None:
+            def client_factory(name='spotify-ads-mute'):
+                import pulsectl
+                return pulsectl.Pulse(name)
+        self._client_factory = client_factory
+        # Kết nối tới server PulseAudio ở lần dùng đầu tiên
+        self._client_instance = client
+        self._client_lock = threading.RLock()
+        self._on_mute_changed = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def _client(self):
+        if self._client_instance is None:
+            self._client_instance = self._client_factory()
+        return self._client_instance
+
+    @staticmethod
+    def _matches(sink_input, process_keyword: str) -> bool:
+        props = sink_input.proplist
+        for key in ('application.process.binary', 'application.name'):
+            if process_keyword in str(props.get(key, '')).lower():
+                return True
+        return False
+
+    def find_sessions(self, process_keyword: str) -> list:
+        with self._client_lock:
+            sink_inputs = self._client.sink_input_list()
+        return [
+            SessionHandle(sink_input.index, sink_input, sink_input.index)
+            for sink_input in sink_inputs
+            if self._matches(sink_input, process_keyword)
+        ]
+
+    def set_mute(self, handle: SessionHandle, muted: bool):
+        with self._client_lock:
+            self._client.sink_input_mute(handle.volume, muted)
+
+    def get_volume(self, handle: SessionHandle) -> float:
+        with self._client_lock:
+            return self._client.sink_input_info(handle.volume).volume.value_flat
+
+    def set_volume(self, handle: SessionHandle, level: float):
+        # Đặt cùng mức cho mọi kênh (mức gốc khôi phục theo value_flat)
+        with self._client_lock:
+            sink_input = self._client.sink_input_info(handle.volume)
+            self._client.volume_set_all_chans(sink_input, level)
+
+    def watch_sessions(self, on_change) -> bool:
+        """Nghe sự kiện sink-input new/remove trên kết nối riêng (thread nền)"""
+        try:
+            events_client = self._client_factory('spotify-ads-mute-events')
+        except Exception as e:
+            logger.warning(f"Không đăng ký được sự kiện PulseAudio: {e}")
+            return False
+
+        loop_stop = _pulse_loop_stop()
+        changed = set()
+
+        def callback(event):
+            if event.t in ('new', 'remove'):
+                on_change()
+            elif event.t == 'change' and self._on_mute_changed is not None:
+                # Không được gọi pulsectl trong callback: ghi lại rồi thoát event_listen
+                changed.add(event.index)
+                if loop_stop is not None:
+                    raise loop_stop
+
+        def run():
+            try:
+                events_client.event_mask_set('sink_input')
+                events_client.event_callback_set(callback)
+                while not self._stop.is_set():
+                    events_client.event_listen(timeout=0.5)
+                    while changed:
+                        self._report_mute(events_client, changed.pop())
+            except Exception as e:
+                logger.error(f"Lỗi khi nghe sự kiện PulseAudio: {e}")
+            finally:
+                events_client.close()
+
+        self._thread = threading.Thread(target=run, name='pulse-events', daemon=True)
+        self._thread.start()
+        return True
+
+    def watch_mute(self, on_mute_changed) -> bool:
+        self._on_mute_changed = on_mute_changed
+        return self._thread is not None
+
+    def _report_mute(self, events_client, index: int):
+        try:
+            muted = bool(events_client.sink_input_info(index).mute)
+        except Exception:
+            return  # Stream đã bị xóa, sự kiện 'remove' sẽ làm mới cache
+        self._on_mute_changed(index, muted)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        with self._client_lock:
+            if self._client_instance is not None:
+                self._client_instance.close()
+
+
+class PulseMonitorSource:
+    """
+    Capture source cho AudioAdDetector: thu âm sink-input của Spotify bằng parec
+
+    Chỉ thu stream của Spotify (không lẫn âm thanh khác). Tín hiệu thu được là sau
+    khi mute, nên lúc Spotify bị mute detector chỉ thấy im lặng. Khi Spotify chưa
+    phát hoặc stream bị tạo lại, read() trả về khối rỗng và thử tìm lại stream.
+    """
+
+    def __init__(self, backend=None, sample_rate: int = 16000, chunk: int = 1600,
+                 process_keyword: str = 'spotify', retry_interval: float = 2.0):
+        """
+        Args:
+            backend: PulseAudioBackend dùng riêng cho thread detector (mặc định tạo mới)
+            sample_rate: Tần số lấy mẫu yêu cầu (mono, s16le)
+            chunk: Số mẫu mỗi lần read()
+            process_keyword: Tên tiến trình để tìm sink-input
+            retry_interval: Chờ bao lâu trước khi tìm lại stream (giây)
+        """
+        self.backend = backend or PulseAudioBackend()
+        self.sample_rate = sample_rate
+        self.chunk = chunk
+        self.process_keyword = process_keyword
+        self.retry_interval = retry_interval
+        self.restarts = 0
+        self._proc = None
+        self._closed = threading.Event()
+
+    def _start(self) -> bool:
+        handles = self.backend.find_sessions(self.process_keyword)
+        if not handles:
+            return False
+        command = ['parec', f'--monitor-stream={handles[0].key}', '--format=s16le',
+                   '--channels=1', f'--rate={self.sample_rate}', '--latency-msec=50', '--raw']
+        self._proc = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL)
+        self.restarts += 1
+        return True
+
+    def read(self):
+        import numpy as np
+        if self._closed.is_set():
+            return None
+        if self._proc is None:
+            try:
+                started = self._start()
+            except Exception as e:
+                logger.warning(f"Không thu được âm thanh Spotify: {e}")
+                started = False
+            if not started:
+                self._closed.wait(self.retry_interval)
+                return None if self._closed.is_set() else np.zeros(0, dtype=np.float32)
+        data = self._proc.stdout.read(self.chunk * 2)
+        if len(data) < 2:
+            # Stream của Spotify đã mất (thoát/tạo lại), lần sau tìm lại
+            self._stop_process()
+            return None if self._closed.is_set() else np.zeros(0, dtype=np.float32)
+        data = data[:len(data) // 2 * 2]
+        return np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+
+    def _stop_process(self):
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(1.0)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    def close(self):
+        self._closed.set()
+        self._stop_process()
+
+
+def _pulse_loop_stop():
+    """pulsectl.PulseLoopStop (ném trong callback để event_listen trả về ngay)"""
+    try:
+        from pulsectl import PulseLoopStop
+    except Exception:
+        return None
+    return PulseLoopStop
+
+
+FakeSinkInput = namedtuple('FakeSinkInput', ['index', 'proplist', 'mute', 'volume'])
+FakeVolume = namedtuple('FakeVolume', ['value_flat'])
+FakeEvent = namedtuple('FakeEvent', ['facility', 't', 'index'])
+
+
+class FakeSinkServer:
+    """
+    Server PulseAudio giả lập (cùng giao diện con của pulsectl.Pulse) cho test trên Linux
+    """
+
+    def __init__(self):
+        self.sink_inputs = {}
+        self.mute_calls = 0
+        self.list_calls = 0
+        self._next_index = 1
+        self._callback = None
+        self._pending = []
+        self._event = threading.Event()
+
+    def add_stream(self, binary: str, name: str = None) -> int:
+        """Giả lập ứng dụng mở một stream phát âm thanh, trả về index sink-input"""
+        index = self._next_index
+        self._next_index += 1
+        props = {'application.process.binary': binary, 'application.name': name or binary}
+        self.sink_inputs[index] = FakeSinkInput(index, props, False, FakeVolume(1.0))
+        self._emit('new', index)
+        return index
+
+    def remove_stream(self, index: int):
+        self.sink_inputs.pop(index, None)
+        self._emit('remove', index)
+
+    def external_mute(self, index: int, mute: bool):
+        """Giả lập người dùng đổi mute của stream (vd pavucontrol)"""
+        self.sink_inputs[index] = self.sink_inputs[index]._replace(mute=mute)
+        self._emit('change', index)
+
+    def is_muted(self, index: int) -> bool:
+        return self.sink_inputs[index].mute
+
+    def _emit(self, kind: str, index: int):
+        # Giống PulseAudio: sự kiện được giao trong event_listen của client nghe
+        if self._callback is not None:
+            self._pending.append(FakeEvent('sink_input', kind, index))
+            self._event.set()
+
+    # ---- Giao diện kiểu pulsectl.Pulse ----
+
+    def sink_input_list(self) -> list:
+        self.list_calls += 1
+        return list(self.sink_inputs.values())
+
+    def sink_input_mute(self, index: int, mute: bool):
+        self.mute_calls += 1
+        if index not in self.sink_inputs:
+            raise OSError(f"Sink input {index} không tồn tại")
+        self.sink_inputs[index] = self.sink_inputs[index]._replace(mute=bool(mute))
+        self._emit('change', index)
+
+    def sink_input_info(self, index: int):
+        return self.sink_inputs[index]
+
+    def volume_set_all_chans(self, sink_input, level: float):
+        index = sink_input.index
+        self.sink_inputs[index] = self.sink_inputs[index]._replace(volume=FakeVolume(level))
+        self._emit('change', index)
+
+    def event_mask_set(self, *masks):
+        pass
+
+    def event_callback_set(self, callback):
+        self._callback = callback
+
+    def event_listen(self, timeout=None):
+        self._event.wait(timeout or 0)
+        self._event.clear()
+        while self._pending and self._callback is not None:
+            try:
+                self._callback(self._pending.pop(0))
+            except Exception:
+                return  # Tương đương PulseLoopStop
+
+    def close(self):
+        self._callback = None
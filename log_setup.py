@@ -0,0 +1,293 @@
+"""
+Log Setup - Pipeline logging bất đồng bộ cho monitor
+
+Thread monitor chỉ ghép message rồi đẩy LogRecord vào queue (không format dòng
+log, không I/O). Một thread nền (LogWriter) lấy record ra, format và ghi theo lô;
+file log được xoay vòng theo kích thước và theo thời gian thay vì lớn mãi.
+
+Lỗi khi ghi/xoay vòng (vd trên Windows khi một tiến trình khác đang mở file log)
+không làm chết thread ghi: file được mở lại, xoay vòng được thử lại sau. Queue có
+giới hạn, record bị bỏ khi đầy thay vì làm phình bộ nhớ.
+"""
+
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOG_FILE = 'spotify_mute.log'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Xoay vòng khi file vượt 5 MB hoặc sau 1 ngày, giữ 3 file cũ
+MAX_BYTES = 5 * 1024 * 1024
+ROTATE_INTERVAL = 24 * 60 * 60
+BACKUP_COUNT = 3
+
+# Ghi xuống đĩa khi gom đủ 50 dòng hoặc sau 1 giây
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 1.0
+
+# Số record tối đa chờ ghi; xoay vòng lỗi thì thử lại sau 60 giây
+MAX_QUEUED = 10000
+ROLLOVER_RETRY = 60.0
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler không format dòng log trên thread gọi
+
+    QueueHandler mặc định gọi format() trong prepare() (kể cả traceback của
+    exc_info). Ở đây chỉ ghép msg % args ngay lúc gọi, để tham số có thể đổi sau
+    đó (dict, đối tượng stats) được ghi đúng giá trị tại thời điểm log; thời gian,
+    level và traceback được format trên thread ghi log.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        # Thread ghi chậm hoặc đã chết: bỏ record, không chặn thread gọi
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingRotatingFileHandler(logging.Handler):
+    """
+    Ghi log vào file theo lô, xoay vòng theo kích thước và thời gian
+
+    Chỉ được dùng từ một thread (LogWriter), flush() do LogWriter gọi.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = MAX_BYTES,
+                 rotate_interval: float = ROTATE_INTERVAL, backup_count: int = BACKUP_COUNT,
+                 batch_size: int = BATCH_SIZE, encoding: str = 'utf-8'):
+        super().__init__()
+        self.filename = os.path.abspath(filename)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.encoding = encoding
+        self.buffer = []
+        self.rotations = 0
+        self.errors = 0
+        self.stream = None
+        self._open()
+
+    def _open(self):
+        self._size_retry_at = 0.0
+        self.stream = open(self.filename, 'a', encoding=self.encoding)
+        self.size = self.stream.tell()
+        # File cũ từ lần chạy trước vẫn tính tuổi theo lần sửa cuối
+        started = time.time()
+        if self.size:
+            started = min(started, os.path.getmtime(self.filename))
+        self.rollover_at = started + self.rotate_interval
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + '\n'
+        except Exception:
+            self.handleError(record)
+            return
+        self.buffer.append(line)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        data = ''.join(self.buffer)
+        self.buffer = []
+        try:
+            if self.stream is None:
+                self._open()
+            if self.should_rollover(len(data.encode(self.encoding))):
+                self.do_rollover()
+            self.stream.write(data)
+            self.stream.flush()
+            self.size = self.stream.tell()
+        except Exception as e:
+            # Lô này bị mất; lần flush sau mở lại file
+            self._failed("ghi log", e)
+            self._close_stream()
+
+    def should_rollover(self, pending_bytes: int) -> bool:
+        if self.max_bytes and self.size and self.size + pending_bytes > self.max_bytes \
+                and time.time() >= self._size_retry_at:
+            return True
+        return self.rotate_interval and time.time() >= self.rollover_at
+
+    def do_rollover(self):
+        """
+        spotify_mute.log -> spotify_mute.log.1 -> ... -> .N (bỏ file cũ nhất)
+
+        Không đổi tên được (file đang bị tiến trình khác mở): ghi tiếp vào file hiện
+        tại, thử lại sau ROLLOVER_RETRY giây.
+        """
+        self._close_stream()
+        try:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.filename}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.filename}.{i + 1}")
+            if self.backup_count > 0:
+                os.replace(self.filename, f"{self.filename}.1")
+            else:
+                os.remove(self.filename)
+        except OSError as e:
+            self._failed("xoay vòng file log", e)
+            self._open()
+            self.rollover_at = time.time() + ROLLOVER_RETRY
+            # Chưa xoay được theo kích thước: chờ tới lần thử lại
+            self._size_retry_at = self.rollover_at
+            return
+        self.rotations += 1
+        self._open()
+
+    def _close_stream(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def _failed(self, action: str, error: Exception):
+        # Không log qua logging: đang ở trong chính pipeline log
+        self.errors += 1
+        if sys.stderr is not None:
+            try:
+                sys.stderr.write(f"Lỗi khi {action} {self.filename}: {error}\n")
+            except Exception:
+                pass
+
+    def close(self):
+        try:
+            self.flush()
+            self._close_stream()
+        finally:
+            super().close()
+
+
+class LogWriter:
+    """
+    Thread nền lấy record từ queue và chuyển cho các handler thật
+
+    Khi queue rảnh quá flush_interval giây, các handler được flush để log
+    không nằm trong buffer quá lâu. Lỗi của một handler không làm dừng thread.
+    """
+
+    def __init__(self, log_queue, handlers, flush_interval: float = FLUSH_INTERVAL):
+        self.queue = log_queue
+        self.handlers = list(handlers)
+        self.flush_interval = flush_interval
+        self._thread = None
+        self._sentinel = object()
+        self.errors = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = None
+            if record is self._sentinel:
+                break
+            if record is not None:
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        try:
+                            handler.handle(record)
+                        except Exception:
+                            self.errors += 1
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()
+        self._flush()
+
+    def _flush(self):
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except Exception:
+                self.errors += 1
+
+    def stop(self):
+        """Ghi nốt phần còn lại trong queue rồi dừng thread"""
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=1.0)
+        except queue.Full:
+            pass
+        self._thread.join(5.0)
+        self._thread = None
+        for handler in self.handlers:
+            handler.close()
+
+
+_writer = None
+
+
+def setup_logging(level=logging.INFO, log_file: str = LOG_FILE, stream=None,
+                  max_bytes: int = MAX_BYTES, backup_count: int = BACKUP_COUNT) -> LogWriter:
+    """
+    Cấu hình logging bất đồng bộ cho toàn ứng dụng
+
+    Args:
+        level: Mức log
+        log_file: File log (None = chỉ in ra console)
+        stream: Stream console (mặc định sys.stderr, None nếu không có console)
+        max_bytes: Kích thước file log tối đa trước khi xoay vòng
+        backup_count: Số file log cũ được giữ lại
+
+    Returns:
+        LogWriter đang chạy (tự dừng khi thoát chương trình)
+    """
+    global _writer
+    if _writer is not None:
+        return _writer
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    console = stream if stream is not None else sys.stderr
+    # pythonw (bản EXE windowed) không có console
+    if console is not None:
+        handler = logging.StreamHandler(console)
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+    if log_file:
+        handler = BatchingRotatingFileHandler(log_file, max_bytes=max_bytes,
+                                              backup_count=backup_count)
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+
+    log_queue = queue.Queue(MAX_QUEUED)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(LazyQueueHandler(log_queue))
+
+    _writer = LogWriter(log_queue, handlers)
+    _writer.start()
+    atexit.register(_writer.stop)
+    return _writer
@@ -0,0 +1,48 @@
+"""
+Mute Ctl - Điều khiển daemon Spotify Ads Mute qua control API
+
+Chạy:
+    python mute_ctl.py status
+    python mute_ctl.py enable | disable | shutdown
+    python mute_ctl.py stats
+    python mute_ctl.py metrics [--interval 1] [--count 10]
+"""
+
+import argparse
+import json
+import sys
+
+from control_api import ControlClient
+
+COMMANDS = ('status', 'stats', 'enable', 'disable', 'shutdown', 'metrics')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Điều khiển daemon Spotify Ads Mute")
+    parser.add_argument('command', choices=COMMANDS)
+    parser.add_argument('--socket', default=None, help="Unix socket hoặc named pipe của daemon")
+    parser.add_argument('--interval', type=float, default=1.0, help="Chu kỳ stream metrics (giây)")
+    parser.add_argument('--count', type=int, default=None, help="Số dòng metrics (mặc định: mãi)")
+    args = parser.parse_args(argv)
+
+    try:
+        client = ControlClient(args.socket)
+    except OSError as e:
+        print(f"Lỗi: không kết nối được tới daemon ({e})")
+        return 1
+    with client:
+        if args.command == 'metrics':
+            try:
+                for line in client.stream('metrics', interval=args.interval, count=args.count):
+                    print(json.dumps(line, ensure_ascii=False), flush=True)
+            except KeyboardInterrupt:
+                pass
+            return 0
+        response = client.request(args.command)
+    json.dump(response, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0 if response.get('ok') else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,524 @@
+"""
+Mute Engine - Lõi dùng chung của bản console, tray và daemon
+
+Engine ghép các phần lại với nhau:
+
+    TitleSource  ->  classifier  ->  AsyncMonitor  ->  AudioSink
+                                          |
+                                          v
+                                      Notifier
+
+- TitleSource: get_title() / invalidate() (cửa sổ Win32, MPRIS, backend giả lập)
+- classifier: is_ad() / has_separator() (AdClassifier dựng từ cấu hình)
+- AudioSink: mute() / unmute() trả về số session đã đổi (mặc định mọi session của
+  Spotify, giảm âm lượng mượt hoặc tắt tiếng)
+- Notifier: notify(engine) mỗi khi trạng thái đổi (icon tray, ...)
+
+Phần còn lại (máy trạng thái, chỉ mục quảng cáo, predictor, lịch sử, nạp lại cấu
+hình, bộ phát hiện theo âm thanh, đo CPU) nằm trong engine, nên mọi bản chạy có
+cùng hành vi; giao diện chỉ tạo engine, gắn notifier và gọi start()/stop().
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+
+from ad_index import KnownAdIndex
+from ad_predictor import AdBreakPredictor
+from async_monitor import AsyncMonitor
+from audio_sessions import SpotifySessionManager
+from config import ConfigWatcher, load_config
+from event_store import EventStore
+from latency_stats import LatencyRecorder
+from platform_backends import create_platform_backend
+from poll_scheduler import PollScheduler
+from process_watcher import SpotifyProcessWatcher
+from sampling_profiler import SamplingProfiler
+from volume_fader import FadingMuter, VolumeFader
+
+logger = logging.getLogger(__name__)
+
+# File xuất số liệu độ trễ (JSON)
+LATENCY_FILE = 'spotify_mute_latency.json'
+
+# Kết quả đo CPU: collapsed stack (flamegraph) và bảng tóm tắt theo nhóm
+PROFILE_FILE = 'spotify_mute_profile.folded'
+PROFILE_SUMMARY_FILE = 'spotify_mute_profile.json'
+PROFILE_SECONDS = 30.0
+
+
+class TitleSource:
+    """
+    Nguồn tiêu đề Spotify (SpotifyWindowResolver, MprisTitleSource, ...)
+    """
+
+    def get_title(self) -> str:
+        """Tiêu đề hiện tại, chuỗi rỗng nếu không thấy Spotify (chạy trong executor window)"""
+        raise NotImplementedError
+
+    def invalidate(self):
+        """Bỏ cache (vd Spotify vừa mở lại với PID mới)"""
+
+
+class AudioSink:
+    """
+    Nơi thực hiện mute/unmute (chạy trong executor audio)
+    """
+
+    def mute(self) -> int:
+        """Số session đã tắt tiếng, 0 nếu không tìm thấy session nào"""
+        raise NotImplementedError
+
+    def unmute(self) -> int:
+        """Số session đã bật tiếng"""
+        raise NotImplementedError
+
+    def when_settled(self, callback):
+        """
+        Gọi callback(perf_counter) khi lệnh vừa chạy có hiệu lực hoàn toàn (mặc định
+        ngay khi mute()/unmute() trả về); lệnh bị lệnh sau thay thế thì có thể không gọi
+        """
+        callback(time.perf_counter())
+
+    def prefetch(self):
+        """Lấy sẵn session trước lần mute sắp tới"""
+
+    def invalidate(self):
+        """Bỏ cache session (vd Spotify vừa thoát)"""
+
+    def close(self):
+        """Trả lại âm thanh gốc khi thoát"""
+
+    def stats(self) -> dict:
+        return {}
+
+
+class SessionAudioSink(AudioSink):
+    """
+    Mute/unmute TẤT CẢ session của Spotify, giảm âm lượng mượt hoặc tắt tiếng
+    """
+
+    def __init__(self, session_manager: SpotifySessionManager, fade: bool = False,
+                 initializer=None, latency=None):
+        """
+        Args:
+            session_manager: Cache audio session của Spotify
+            fade: Giảm/khôi phục âm lượng theo đường dốc thay vì SetMute (đổi được lúc chạy)
+            initializer: Hàm khởi tạo thread của đường dốc (vd CoInitialize)
+            latency: LatencyRecorder ghi độ trễ của đường dốc
+        """
+        self.session_manager = session_manager
+        self.fade = fade
+        self.fading_muter = FadingMuter(session_manager, VolumeFader(
+            session_manager.backend, initializer=initializer, latency=latency))
+
+    def mute(self) -> int:
+        # Session manager dùng lại interface đã cache, chỉ quét lại khi cần
+        if self.fade:
+            return self.fading_muter.mute()
+        return self.session_manager.mute()
+
+    def unmute(self) -> int:
+        # Dọn cả hai kiểu (chế độ có thể đã đổi trong lúc quảng cáo)
+        count = 0
+        if self.fade or self.fading_muter.fader.active():
+            count = self.fading_muter.unmute()
+        if not self.fade or self.session_manager.desired_muted:
+            count = max(count, self.session_manager.unmute())
+        return count
+
+    def when_settled(self, callback):
+        # Đường dốc đang chạy: âm thanh chỉ thật sự tắt/bật khi đường dốc xong
+        self.fading_muter.fader.when_done(callback)
+
+    def prefetch(self):
+        self.session_manager.get_sessions()
+
+    def invalidate(self):
+        self.session_manager.invalidate()
+
+    def close(self):
+        # Đặt lại âm lượng gốc nếu đường dốc khôi phục chưa chạy xong
+        self.fading_muter.close()
+
+    def stats(self) -> dict:
+        return {
+            'sessions': self.session_manager.stats(),
+            'fader': self.fading_muter.fader.stats(),
+        }
+
+
+class Notifier:
+    """
+    Nhận engine mỗi khi trạng thái đổi (chạy trên thread của event loop, phải nhanh)
+    """
+
+    def notify(self, engine):
+        raise NotImplementedError
+
+
+class MuteEngine:
+    """
+    Monitor Spotify hoàn chỉnh, không có giao diện
+    """
+
+    def __init__(self, config=None, platform_backend=None, title_source=None,
+                 classifier=None, audio_sink=None, session_manager=None, notifiers=(),
+                 process_watcher=None, history=None, ad_index=None, detector=None,
+                 scheduler=None,
+                 push: bool = True, fade: bool = None, started_at: float = None):
+        """
+        Args:
+            config: AppConfig (mặc định đọc spotify_ads_mute.json, nạp lại khi file đổi)
+            platform_backend: Backend nền tảng tạo nguồn tiêu đề/âm thanh mặc định
+            title_source: TitleSource (mặc định của backend nền tảng)
+            classifier: Bộ phân loại (mặc định dựng từ config)
+            audio_sink: AudioSink (mặc định SessionAudioSink trên session_manager)
+            session_manager: SpotifySessionManager cho audio sink mặc định (mặc định
+                trên audio backend của nền tảng)
+            notifiers: Các Notifier nhận thay đổi trạng thái (thêm sau bằng add_notifier())
+            process_watcher: SpotifyProcessWatcher (mặc định dùng psutil)
+            history: EventStore ghi lịch sử sự kiện (mặc định spotify_events.bin)
+            ad_index: KnownAdIndex (mặc định spotify_known_ads.bin), map trong start()
+            detector: DetectionStateMachine (mặc định theo config, đồng hồ perf_counter)
+            scheduler: PollScheduler (mặc định theo config và kiểu nguồn tiêu đề)
+            push: Dùng nguồn sự kiện push của nền tảng nếu có (False = chỉ polling)
+            fade: Chế độ của SessionAudioSink mặc định (None = theo config, mặc định SetMute)
+            started_at: Mốc khởi động (perf_counter) để đo thời gian tới tiêu đề đầu tiên
+        """
+        self.config = config or load_config()
+        # Windows: tiêu đề cửa sổ + WASAPI; Linux: MPRIS + PulseAudio/PipeWire
+        self.platform_backend = platform_backend or create_platform_backend(self.config.backend)
+        # Theo dõi PID của Spotify, nguồn tiêu đề dùng luôn tập PID này khi quét cửa sổ
+        self.process_watcher = process_watcher or SpotifyProcessWatcher()
+        self.process_watcher.add_listener(self.on_process_event)
+        self.title_source = title_source or self.platform_backend.create_title_source(
+            self.process_watcher)
+        self.classifier = classifier or self.config.build_classifier()
+        self.latency = LatencyRecorder()
+        if audio_sink is None:
+            session_manager = session_manager or SpotifySessionManager(
+                self.platform_backend.create_audio_backend())
+            audio_sink = SessionAudioSink(session_manager,
+                                          fade=self.config.fade if fade is None else fade,
+                                          initializer=self.platform_backend.init_audio_thread,
+                                          latency=self.latency)
+        self.audio_sink = audio_sink
+        self.notifiers = list(notifiers)
+        # Lịch sử sự kiện trên đĩa (truy vấn bằng ad_history.py)
+        self.history = history or EventStore()
+        # Quảng cáo đã gặp (tiêu đề -> thời lượng), map từ file trong start()
+        self.ad_index = ad_index if ad_index is not None else KnownAdIndex()
+        self.ad_index.set_generic_titles(self.config.generic_titles)
+        self.config_watcher = None
+        # Ý kiến thứ hai từ âm thanh (config audio.enabled, cần numpy), tạo trong start()
+        self.audio_detector = None
+        self.audio_opinion = None
+        self.profiler = None
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_title_read = False
+
+        event_source = None
+        if push:
+            event_source = self.platform_backend.create_event_source(self.title_source)
+        self.push = event_source is not None
+        if scheduler is None:
+            # Với backend push, sự kiện đã đánh thức ngay khi đổi tiêu đề nên không cần burst
+            if self.push:
+                scheduler = PollScheduler(self.config.resync_interval, burst_interval=None)
+            else:
+                scheduler = PollScheduler(self.config.check_interval)
+        self.scheduler = scheduler
+        self.monitor = AsyncMonitor(
+            get_title=self.get_title,
+            is_ad=self.is_ad,
+            # Tiêu đề tạm dừng mà vẫn có tiếng -> quảng cáo đội lốt tạm dừng
+            is_audible=self.is_audible,
+            mute=self.mute,
+            unmute=self.unmute,
+            notify=self.on_monitor_update,
+            # Với backend push, polling chỉ còn là resync dự phòng
+            check_interval=self.scheduler.interval,
+            event_source=event_source,
+            audio_initializer=self.platform_backend.init_audio_thread,
+            latency=self.latency,
+            # Đọc dày hơn và lấy sẵn session khi sắp tới lúc Spotify chèn quảng cáo
+            predictor=AdBreakPredictor(),
+            prefetch=self.audio_sink.prefetch,
+            settled=self.audio_sink.when_settled,
+            scheduler=self.scheduler,
+            process_watcher=self.process_watcher,
+            history=self.history,
+            ad_index=self.ad_index,
+            # Chống mute/unmute liên tục khi tiêu đề chớp qua lúc chuyển bài/tạm dừng
+            detector=detector if detector is not None else self.config.build_detector(
+                clock=time.perf_counter),
+        )
+        self.monitor_thread = None
+
+    # Trạng thái do monitor quản lý (chỉ ghi trên thread của event loop)
+    @property
+    def enabled(self) -> bool:
+        return self.monitor.enabled
+
+    @property
+    def is_muted(self) -> bool:
+        return self.monitor.is_muted
+
+    @property
+    def ad_count(self) -> int:
+        return self.monitor.ad_count
+
+    @property
+    def song_count(self) -> int:
+        return self.monitor.song_count
+
+    @property
+    def last_title(self) -> str:
+        return self.monitor.last_title
+
+    @property
+    def detector(self):
+        return self.monitor.detector
+
+    @property
+    def state(self) -> str:
+        """'disabled', 'muted' hoặc 'enabled' (icon tray, status của daemon)"""
+        if not self.enabled:
+            return 'disabled'
+        if self.is_muted:
+            return 'muted'
+        return 'enabled'
+
+    # ---- Các bước của monitor ----
+
+    def get_title(self) -> str:
+        """Lấy tiêu đề Spotify (nguồn tiêu đề tự cache HWND/metadata)"""
+        start = time.perf_counter()
+        title = self.title_source.get_title()
+        end = time.perf_counter()
+        self.latency.record('get_title', end - start)
+        if not self.first_title_read:
+            self.first_title_read = True
+            self.latency.record('startup_to_first_title', end - self.started_at)
+        return title
+
+    def is_ad(self, window_title: str) -> bool:
+        """Kiểm tra đang phát quảng cáo (tiêu đề, gộp với âm thanh nếu bật)"""
+        with self.latency.time('is_ad'):
+            classifier = self.classifier
+            is_ad = classifier.is_ad(window_title)
+            if self.audio_opinion is not None and window_title:
+                is_ad = self.audio_opinion.combine(
+                    window_title, is_ad, classifier.has_separator(window_title),
+                    self.monitor.want_muted)
+            return is_ad
+
+    def is_audible(self):
+        """Spotify có đang phát ra tiếng không (None nếu không bật bộ phát hiện âm thanh)"""
+        if self.audio_opinion is None:
+            return None
+        return self.audio_opinion.audible()
+
+    def mute(self) -> bool:
+        """Tắt tiếng Spotify qua audio sink"""
+        try:
+            with self.latency.time('mute'):
+                count = self.audio_sink.mute()
+            if count > 0:
+                fade = getattr(self.audio_sink, 'fade', False)
+                logger.info("🔇 Đã %s %s session của Spotify",
+                            'giảm âm lượng' if fade else 'tắt tiếng', count)
+                return True
+            logger.error("KHÔNG tìm thấy Session nào của Spotify để mute!")
+        except Exception as e:
+            logger.error(f"Lỗi khi mute Spotify: {e}")
+        return False
+
+    def unmute(self) -> bool:
+        """Bật tiếng Spotify qua audio sink"""
+        try:
+            with self.latency.time('unmute'):
+                count = self.audio_sink.unmute()
+            if count > 0:
+                logger.info("🔊 Đã bật tiếng %s session", count)
+                return True
+        except Exception as e:
+            logger.error(f"Lỗi khi unmute Spotify: {e}")
+        return False
+
+    def on_process_event(self, event):
+        """Spotify mở/thoát: bỏ cache cửa sổ và audio session của tiến trình cũ"""
+        self.title_source.invalidate()
+        self.audio_sink.invalidate()
+
+    def add_notifier(self, notifier):
+        self.notifiers.append(notifier)
+
+    def on_monitor_update(self, monitor):
+        """Monitor báo trạng thái thay đổi (chạy trên thread của event loop)"""
+        for notifier in self.notifiers:
+            try:
+                notifier.notify(self)
+            except Exception as e:
+                logger.error(f"Lỗi khi báo trạng thái cho {type(notifier).__name__}: {e}")
+
+    # ---- Điều khiển (gọi được từ thread bất kỳ) ----
+
+    def set_enabled(self, enabled: bool):
+        """Bật/tắt chức năng; monitor tự unmute khi bị tắt và xử lý lại tiêu đề khi bật lại"""
+        self.monitor.set_enabled(enabled)
+
+    def apply_config(self, config, classifier):
+        """
+        Áp dụng cấu hình vừa nạp lại (chạy trên thread của ConfigWatcher)
+
+        classifier đã được biên dịch sẵn; phép gán thay cả luật lẫn cache cùng lúc,
+        lần is_ad kế tiếp dùng luật mới.
+        """
+        self.classifier = classifier
+        if config.classifier != self.config.classifier:
+            # Quảng cáo đã biết được mute không qua bộ phân loại: học lại theo luật mới
+            self.ad_index.clear()
+        self.ad_index.set_generic_titles(config.generic_titles)
+        self.scheduler.set_interval(config.resync_interval if self.push else config.check_interval)
+        self.monitor.detector.configure(**config.detection)
+        if config.fade != self.config.fade and hasattr(self.audio_sink, 'fade'):
+            self.audio_sink.fade = config.fade
+        logging.getLogger().setLevel(config.log_level)
+        if config.backend != self.config.backend:
+            logger.warning("Đổi backend (%s -> %s) chỉ có hiệu lực sau khi khởi động lại",
+                           self.config.backend, config.backend)
+        self.config = config
+        # Phân loại lại tiêu đề đang hiển thị theo luật mới
+        self.monitor.refresh()
+
+    def check(self, now: float = None) -> str:
+        """Một lần đọc + xử lý đồng bộ, không cần start() (xem AsyncMonitor.check_once)"""
+        return self.monitor.check_once(now)
+
+    # ---- Vòng đời ----
+
+    def start(self, profile: float = None):
+        """
+        Mở lịch sử/chỉ mục, bật các thành phần phụ và chạy monitor trên thread riêng
+
+        Args:
+            profile: Đo CPU trong chừng này giây ngay từ lúc khởi động (None = không đo)
+        """
+        self.history.start()
+        self.ad_index.open()
+        self.start_config_watcher()
+        self.start_audio_detector()
+        if profile:
+            self.start_profiler(profile)
+        self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
+        self.monitor_thread.start()
+
+    def monitor_loop(self):
+        """Chạy asyncio monitor trong thread riêng (event loop riêng)"""
+        logger.info("Bắt đầu monitor Spotify (Thread started)...")
+        try:
+            asyncio.run(self.monitor.run())
+        except Exception as e:
+            logger.error(f"FATAL ERROR in monitor_loop: {e}")
+
+    @property
+    def running(self) -> bool:
+        return self.monitor_thread is not None and self.monitor_thread.is_alive()
+
+    def stop(self):
+        """Dừng monitor, trả lại âm thanh và đóng lịch sử"""
+        if self.profiler is not None and self.profiler.running:
+            # Thoát giữa chừng: vẫn ghi phần đã đo
+            self.profiler.stop()
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+        if self.audio_detector is not None:
+            self.audio_detector.stop()
+        # Monitor trả lại âm thanh trong executor audio trước khi dừng
+        self.monitor.stop()
+        if self.monitor_thread:
+            self.monitor_thread.join(3.0)
+        self.audio_sink.close()
+        self.ad_index.close()
+        self.history.close()
+
+    def start_config_watcher(self):
+        if self.config.path:
+            self.config_watcher = ConfigWatcher(self.config.path, self.apply_config)
+            self.config_watcher.start()
+
+    def start_audio_detector(self):
+        """Bật bộ phát hiện theo âm thanh nếu cấu hình yêu cầu và nền tảng hỗ trợ"""
+        settings = self.config.audio
+        if not settings['enabled']:
+            return
+        if importlib.util.find_spec('numpy') is None:
+            logger.warning("Bộ phát hiện theo âm thanh cần numpy (pip install numpy)")
+            return
+        source = self.platform_backend.create_capture_source()
+        if source is None:
+            logger.warning("Nền tảng %s chưa hỗ trợ thu âm thanh Spotify",
+                           self.platform_backend.name)
+            return
+        from audio_detector import AudioAdDetector, AudioSecondOpinion, Jingle
+        jingles = []
+        for path in settings['jingles']:
+            try:
+                jingles.append(Jingle.from_wav(path))
+            except Exception as e:
+                logger.error("Không đọc được jingle %s: %s", path, e)
+        self.audio_detector = AudioAdDetector(
+            source, jingles, ad_threshold=settings['ad_threshold'],
+            pause_after=settings['pause_after'],
+            # Âm thanh đổi ý -> phân loại lại tiêu đề hiện tại
+            on_change=self.monitor.refresh,
+        )
+        self.audio_opinion = AudioSecondOpinion(self.audio_detector)
+        self.audio_detector.start()
+        logger.info("Bộ phát hiện theo âm thanh: %s jingle", len(jingles))
+
+    # ---- Số liệu ----
+
+    def start_profiler(self, duration: float = PROFILE_SECONDS):
+        """Đo CPU trong duration giây, ghi kết quả khi hết giờ hoặc khi thoát"""
+        if self.profiler is not None and self.profiler.running:
+            logger.info("Đang đo CPU, bỏ qua yêu cầu mới")
+            return self.profiler
+        self.profiler = SamplingProfiler(duration=duration, on_finish=self.finish_profile)
+        return self.profiler.start()
+
+    @property
+    def profiling(self) -> bool:
+        return self.profiler is not None and self.profiler.running
+
+    def finish_profile(self, profiler):
+        """Ghi collapsed stack + bảng tóm tắt (chạy trên thread lấy mẫu)"""
+        path = profiler.write_collapsed(PROFILE_FILE)
+        profiler.export_summary(PROFILE_SUMMARY_FILE)
+        logger.info(profiler.format_summary())
+        logger.info(f"Đã ghi kết quả đo CPU: {os.path.abspath(path)}")
+
+    def export_latency(self, path: str = LATENCY_FILE) -> str:
+        """Xuất histogram độ trễ ra file JSON"""
+        return self.latency.export(path)
+
+    def stats(self) -> dict:
+        totals = self.history.totals
+        return {
+            'ad_count': self.ad_count,
+            'song_count': self.song_count,
+            'samples': self.monitor.samples,
+            'totals': dict(totals) if totals is not None else None,
+            'latency': self.latency.summary(),
+            'scheduler': self.scheduler.stats(),
+            **self.audio_sink.stats(),
+            'process': self.process_watcher.stats(),
+            'detection': self.monitor.detector.stats(),
+            'known_ads': self.ad_index.stats(),
+            'audio': self.audio_opinion.stats() if self.audio_opinion is not None else None,
+        }
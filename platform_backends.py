@@ -0,0 +1,170 @@
+"""
+Platform Backends - Chọn nguồn tiêu đề và backend âm thanh theo hệ điều hành
+
+- WindowsBackend: tiêu đề cửa sổ (SpotifyWindowResolver + WinEventSource), mute
+  qua pycaw (WASAPI)
+- LinuxMprisBackend: tiêu đề từ MPRIS (D-Bus), mute sink-input qua PulseAudio/PipeWire
+
+Thư viện của từng nền tảng chỉ được import khi tạo đối tượng, nên các module vẫn
+import được ở mọi nơi; missing_packages() cho biết cần cài thêm gì trước khi chạy.
+"""
+
+import importlib.util
+import sys
+
+
+class PlatformBackend:
+    """
+    Giao diện backend nền tảng
+    """
+
+    name = 'base'
+    # module cần có -> tên gói pip
+    required_modules = {}
+
+    def missing_packages(self) -> list:
+        """Các gói pip còn thiếu (rỗng nếu đủ)"""
+        missing = []
+        for module, package in self.required_modules.items():
+            if importlib.util.find_spec(module) is None and package not in missing:
+                missing.append(package)
+        return missing
+
+    def create_title_source(self, process_watcher=None):
+        """Đối tượng có get_title() và invalidate()"""
+        raise NotImplementedError
+
+    def create_event_source(self, title_source):
+        """Nguồn sự kiện push cho watcher/monitor, None nếu chỉ polling"""
+        return None
+
+    def create_audio_backend(self):
+        """AudioBackend dùng cho SpotifySessionManager"""
+        raise NotImplementedError
+
+    def init_audio_thread(self):
+        """Khởi tạo thread làm việc với âm thanh (vd CoInitialize)"""
+
+    def create_capture_source(self):
+        """Nguồn thu âm thanh của Spotify cho AudioAdDetector, None nếu chưa hỗ trợ"""
+        return None
+
+
+class WindowsBackend(PlatformBackend):
+    """
+    Windows: tiêu đề cửa sổ + WASAPI
+    """
+
+    name = 'windows'
+    required_modules = {
+        'win32gui': 'pywin32',
+        'win32process': 'pywin32',
+        'pycaw': 'pycaw',
+        'comtypes': 'comtypes',
+        'psutil': 'psutil',
+    }
+
+    def create_title_source(self, process_watcher=None):
+        from window_resolver import SpotifyWindowResolver
+        return SpotifyWindowResolver(process_watcher=process_watcher)
+
+    def create_event_source(self, title_source):
+        from title_watcher import WinEventSource
+        # Chỉ sự kiện của cửa sổ Spotify mới đánh thức monitor
+        return WinEventSource(window_filter=getattr(title_source, 'is_spotify_window', None))
+
+    def create_audio_backend(self):
+        from audio_sessions import PycawAudioBackend
+        return PycawAudioBackend()
+
+    def init_audio_thread(self):
+        """Khởi tạo COM cho thread audio (dùng comtypes vì pycaw dùng comtypes)"""
+        import comtypes
+        try:
+            # MTA: thread executor không có message loop, sự kiện audio session
+            # được gọi thẳng từ thread của COM thay vì chờ marshal về thread này
+            comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+        except Exception:
+            pass  # Có thể đã init rồi
+
+
+class LinuxMprisBackend(PlatformBackend):
+    """
+    Linux: MPRIS trên session bus + PulseAudio/PipeWire
+    """
+
+    name = 'linux'
+    required_modules = {
+        'jeepney': 'jeepney',
+        'pulsectl': 'pulsectl',
+        'psutil': 'psutil',
+    }
+
+    def create_title_source(self, process_watcher=None):
+        from linux_backend import MprisTitleSource
+        return MprisTitleSource()
+
+    def create_event_source(self, title_source):
+        # MprisTitleSource vừa giữ tiêu đề vừa phát sự kiện khi tiêu đề đổi
+        return title_source
+
+    def create_audio_backend(self):
+        from linux_backend import PulseAudioBackend
+        return PulseAudioBackend()
+
+    def create_capture_source(self):
+        from linux_backend import PulseMonitorSource
+        return PulseMonitorSource()
+
+
+class FakePlatformBackend(PlatformBackend):
+    """
+    Backend giả lập (cửa sổ Win32 giả + audio giả), chạy được trên mọi hệ điều hành
+
+    Dùng để chạy engine đầu-cuối trong test và benchmark; set_title() đổi tiêu đề
+    cửa sổ Spotify, audio là FakeAudioBackend để kiểm tra trạng thái mute.
+    """
+
+    name = 'fake'
+    HWND = 0x1001
+
+    def __init__(self, title: str = "", pid: int = 1234, session_keys=('spotify-1',)):
+        from audio_sessions import FakeAudioBackend
+        from window_resolver import FakeWindowApi
+        self.pid = pid
+        self.api = FakeWindowApi({}, {pid: "Spotify.exe"})
+        self.audio = FakeAudioBackend(session_keys)
+        self.set_title(title)
+
+    def set_title(self, title):
+        """Đặt tiêu đề cửa sổ Spotify (None = không có cửa sổ)"""
+        if title is None:
+            self.api.windows.pop(self.HWND, None)
+        else:
+            self.api.windows[self.HWND] = (self.pid, title)
+
+    def create_title_source(self, process_watcher=None):
+        from window_resolver import SpotifyWindowResolver
+        return SpotifyWindowResolver(self.api, process_watcher=process_watcher)
+
+    def create_audio_backend(self):
+        return self.audio
+
+
+BACKENDS = {
+    'windows': WindowsBackend,
+    'linux': LinuxMprisBackend,
+}
+
+
+def create_platform_backend(name: str = 'auto') -> PlatformBackend:
+    """
+    Args:
+        name: 'auto', 'windows' hoặc 'linux'
+    """
+    if name == 'auto':
+        name = 'windows' if sys.platform == 'win32' else 'linux'
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend nền tảng không hợp lệ: {name}") from None
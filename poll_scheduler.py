@@ -0,0 +1,162 @@
+"""
+Poll Scheduler - Chu kỳ đọc tiêu đề thay đổi theo trạng thái
+
+Thay cho chu kỳ cố định 0.3 s, PollScheduler chọn chu kỳ kế tiếp theo trạng thái:
+
+- disabled: chức năng đang tắt -> không đọc, chỉ chờ được đánh thức
+- absent:   không thấy cửa sổ Spotify (tiêu đề rỗng, kể cả trong cửa sổ xác nhận
+            CLOSED của máy trạng thái) -> lùi về vài giây
+- paused:   máy trạng thái đã xác nhận tạm dừng -> chu kỳ idle ngay, không chờ
+- burst:    bài/quảng cáo sắp hết, hoặc vừa đổi tiêu đề mà máy trạng thái chưa xác
+            nhận (tiêu đề chớp qua lúc chuyển bài) -> đọc dày để bắt ngay thay đổi kế
+            tiếp. Tiêu đề đã được xác nhận (bài hát, quảng cáo, tạm dừng) thì còn cả
+            bài mới tới lần đổi sau, burst chỉ tốn thêm lần thức dậy
+- hot:      predictor báo gần ranh giới quảng cáo -> chu kỳ hot của predictor
+- idle:     tiêu đề đứng yên lâu hơn một bài hát (tạm dừng, podcast) -> thưa dần
+- normal:   còn lại, dùng chu kỳ gốc
+
+Scheduler cũng đếm số lần thức dậy trong cửa sổ 60 s gần nhất để kiểm chứng mức
+tiết kiệm CPU/pin trên laptop.
+"""
+
+import threading
+import time
+from collections import deque
+
+from detection_state import AD, CLOSED, PAUSED, PLAYING
+
+# Trạng thái đã xác nhận: đổi tiêu đề không kéo theo burst
+SETTLED_STATES = (PLAYING, AD, PAUSED, CLOSED)
+
+
+class PollScheduler:
+    """
+    Chọn chu kỳ đọc tiêu đề theo trạng thái Spotify
+    """
+
+    def __init__(self, interval: float = 0.3, burst_interval: float = 0.1,
+                 burst_duration: float = 2.0, track_end_window: float = 3.0,
+                 idle_interval: float = 2.0, idle_after: float = 600.0,
+                 absent_interval: float = 5.0, rate_window: float = 60.0,
+                 clock=time.monotonic):
+        """
+        Args:
+            interval: Chu kỳ gốc (giây)
+            burst_interval: Chu kỳ burst, None = không dùng burst (vd backend push)
+            burst_duration: Thời gian burst sau mỗi lần đổi tiêu đề (giây)
+            track_end_window: Burst khi bài hiện tại còn ít hơn số giây này
+            idle_interval: Chu kỳ khi tiêu đề đứng yên lâu
+            idle_after: Tiêu đề không đổi quá số giây này thì chuyển sang idle
+            absent_interval: Chu kỳ khi không thấy Spotify
+            rate_window: Cửa sổ đếm số lần thức dậy (giây)
+            clock: Hàm đồng hồ (giây)
+        """
+        self._requested = (burst_interval, idle_interval, absent_interval)
+        self.set_interval(interval)
+        self.burst_duration = burst_duration
+        self.track_end_window = track_end_window
+        self.idle_after = idle_after
+        self.rate_window = rate_window
+        self.clock = clock
+
+        self.mode = 'normal'
+        self.current_interval = interval
+        self.present = True
+        self.last_change = None
+        self.wakeups = 0
+        self._recent = deque()
+        # on_sample (thread event loop) và stats (thread control API) cùng đụng tới _recent
+        self._lock = threading.Lock()
+        self.mode_counts = {}
+
+    def set_interval(self, interval: float):
+        """Đổi chu kỳ gốc (vd khi nạp lại cấu hình), áp dụng từ lần chờ kế tiếp"""
+        burst_interval, idle_interval, absent_interval = self._requested
+        self.interval = interval
+        self.burst_interval = min(burst_interval, interval) if burst_interval else None
+        self.idle_interval = max(idle_interval, interval)
+        self.absent_interval = max(absent_interval, interval)
+
+    def on_sample(self, title: str, changed: bool, now: float = None):
+        """Ghi nhận một lần đọc tiêu đề"""
+        now = self.clock() if now is None else now
+        self.wakeups += 1
+        with self._lock:
+            self._recent.append(now)
+            self._trim(now)
+        self.present = bool(title)
+        if changed or self.last_change is None:
+            self.last_change = now
+
+    def next_interval(self, enabled: bool = True, hot_interval: float = None,
+                      track_remaining: float = None, now: float = None, state: str = None):
+        """
+        Chu kỳ chờ trước lần đọc kế tiếp
+
+        Args:
+            enabled: Chức năng có đang bật không
+            hot_interval: Chu kỳ hot của predictor (None = không hot)
+            track_remaining: Số giây còn lại của bài hiện tại nếu biết
+            state: Trạng thái của DetectionStateMachine (None = không biết)
+
+        Returns:
+            Số giây, hoặc None nếu chỉ chờ được đánh thức (chức năng tắt)
+        """
+        now = self.clock() if now is None else now
+        if not enabled:
+            mode, interval = 'disabled', None
+        elif not self.present:
+            mode, interval = 'absent', self.absent_interval
+        elif state == PAUSED:
+            mode, interval = 'paused', self.idle_interval
+        elif hot_interval is not None:
+            mode, interval = 'hot', min(hot_interval, self.interval)
+        elif self.burst_interval is not None and self._bursting(now, track_remaining, state):
+            mode, interval = 'burst', self.burst_interval
+        elif self.last_change is not None and now - self.last_change >= self.idle_after:
+            mode, interval = 'idle', self.idle_interval
+        else:
+            mode, interval = 'normal', self.interval
+        self.mode = mode
+        self.current_interval = interval
+        self.mode_counts[mode] = self.mode_counts.get(mode, 0) + 1
+        return interval
+
+    def _bursting(self, now: float, track_remaining, state) -> bool:
+        if state not in SETTLED_STATES and self.last_change is not None \
+                and now - self.last_change < self.burst_duration:
+            return True
+        return track_remaining is not None and track_remaining <= self.track_end_window
+
+    def _trim(self, now: float):
+        while self._recent and now - self._recent[0] > self.rate_window:
+            self._recent.popleft()
+
+    def wakeups_per_minute(self, now: float = None) -> float:
+        """Số lần thức dậy quy về mỗi phút, tính trên cửa sổ rate_window gần nhất"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            self._trim(now)
+            count = len(self._recent)
+        return count * 60.0 / self.rate_window
+
+    def rate(self) -> float:
+        """Tần suất đọc hiện tại (lần/giây), 0 nếu đang chờ đánh thức"""
+        return 1.0 / self.current_interval if self.current_interval else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'mode': self.mode,
+            'interval_s': self.current_interval,
+            'rate_hz': round(self.rate(), 2),
+            'wakeups': self.wakeups,
+            'wakeups_per_min': round(self.wakeups_per_minute(), 1),
+            'modes': dict(self.mode_counts),
+        }
+
+    def format_status(self) -> str:
+        """Chuỗi ngắn gọn để hiển thị (vd: trong menu tray)"""
+        if self.current_interval is None:
+            return f"{self.mode}, {self.wakeups_per_minute():.0f} lần/phút"
+        return (f"{self.mode} {self.current_interval * 1000:.0f} ms, "
+                f"{self.wakeups_per_minute():.0f} lần/phút")
@@ -0,0 +1,187 @@
+"""
+Process Watcher - Theo dõi vòng đời tiến trình Spotify
+
+Thay vì duyệt toàn bộ bảng tiến trình bằng psutil.process_iter (tạo đối tượng
+Process và đọc tên cho mọi tiến trình), watcher chỉ lấy danh sách PID (rẻ) rồi so
+với lần trước: chỉ tra tên cho PID mới xuất hiện, PID biến mất được bỏ khỏi
+cache. Lần tra tên thất bại (AccessDenied, tiến trình vừa thoát: tên rỗng) không
+được cache mà tra lại ở lần poll sau. Khi tập PID của Spotify chuyển từ rỗng sang có (hoặc ngược lại), watcher
+phát sự kiện 'started'/'exited' cho các listener (vd: làm mới cache cửa sổ và
+audio session).
+
+Bảng tiến trình được tách ra (ProcessTable) để test bằng FakeProcessTable trên Linux.
+"""
+
+import logging
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+# kind: 'started' hoặc 'exited', pids: frozenset PID Spotify sau sự kiện
+ProcessEvent = namedtuple('ProcessEvent', ['kind', 'pids'])
+
+
+class PsutilProcessTable:
+    """
+    Bảng tiến trình thật dùng psutil (import lười)
+    """
+
+    def __init__(self):
+        import psutil
+
+        self._psutil = psutil
+
+    def pids(self) -> set:
+        """Tập PID đang chạy (không tạo đối tượng Process)"""
+        return set(self._psutil.pids())
+
+    def name(self, pid: int) -> str:
+        """
+        Returns:
+            Tên tiến trình hoặc chuỗi rỗng nếu đã thoát/không truy cập được
+        """
+        try:
+            return self._psutil.Process(pid).name()
+        except (self._psutil.NoSuchProcess, self._psutil.AccessDenied):
+            return ""
+
+
+class FakeProcessTable:
+    """
+    Bảng tiến trình giả lập cho test và benchmark trên Linux
+
+    processes: dict pid -> tên tiến trình; denied: PID tra tên bị từ chối (như
+    AccessDenied); đếm số lần liệt kê và tra tên.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = dict(processes or {})
+        self.denied = set()
+        self.pid_calls = 0
+        self.name_lookups = 0
+
+    def pids(self) -> set:
+        self.pid_calls += 1
+        return set(self.processes)
+
+    def name(self, pid: int) -> str:
+        self.name_lookups += 1
+        if pid in self.denied:
+            return ""
+        return self.processes.get(pid, "")
+
+    def spawn(self, pid: int, name: str):
+        """Giả lập tiến trình mới"""
+        self.processes[pid] = name
+
+    def kill(self, pid: int):
+        """Giả lập tiến trình thoát"""
+        self.processes.pop(pid, None)
+
+
+class SpotifyProcessWatcher:
+    """
+    Theo dõi PID của Spotify bằng cách so sánh tập PID giữa các lần kiểm tra
+    """
+
+    def __init__(self, table=None, process_keyword: str = 'spotify',
+                 min_interval: float = 2.0, clock=time.monotonic):
+        """
+        Args:
+            table: Bảng tiến trình (mặc định PsutilProcessTable)
+            process_keyword: Từ khóa nhận diện tên tiến trình Spotify
+            min_interval: Khoảng cách tối thiểu giữa hai lần poll qua maybe_poll() (giây)
+            clock: Hàm đồng hồ (giây)
+        """
+        # PsutilProcessTable (import psutil) được tạo ở lần poll đầu tiên
+        self._table = table
+        self.process_keyword = process_keyword
+        self.min_interval = min_interval
+        self.clock = clock
+        self.listeners = []
+        # pid -> có phải Spotify không; chỉ tra tên khi PID mới xuất hiện
+        self._known = {}
+        self.pids = frozenset()
+        self.last_poll = None
+        self.polls = 0
+        # Số lần tra tên thất bại (sẽ tra lại)
+        self.unresolved = 0
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = PsutilProcessTable()
+        return self._table
+
+    @property
+    def running(self) -> bool:
+        return bool(self.pids)
+
+    def add_listener(self, callback):
+        """Đăng ký callback(event: ProcessEvent), được gọi trên thread gọi poll()"""
+        self.listeners.append(callback)
+
+    def poll(self) -> list:
+        """
+        So sánh bảng tiến trình với lần trước
+
+        Returns:
+            Danh sách ProcessEvent phát sinh trong lần này (thường rỗng)
+        """
+        self.polls += 1
+        self.last_poll = self.clock()
+        try:
+            current = self.table.pids()
+        except Exception as e:
+            logger.error(f"Lỗi khi lấy danh sách tiến trình: {e}")
+            return []
+
+        known = self._known
+        for pid in set(known) - current:
+            del known[pid]
+        for pid in current - set(known):
+            name = self.table.name(pid)
+            if not name:
+                # Chưa biết tên: không coi là "không phải Spotify" cho tới khi PID thoát
+                self.unresolved += 1
+                continue
+            known[pid] = self.process_keyword in name.lower()
+
+        was_running = self.running
+        self.pids = frozenset(pid for pid, is_spotify in known.items() if is_spotify)
+
+        events = []
+        if self.pids and not was_running:
+            events.append(ProcessEvent('started', self.pids))
+        elif was_running and not self.pids:
+            events.append(ProcessEvent('exited', self.pids))
+        for event in events:
+            logger.info("Spotify %s (PID: %s)",
+                        'đã mở' if event.kind == 'started' else 'đã thoát',
+                        sorted(event.pids) or '-')
+            for callback in self.listeners:
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Lỗi khi xử lý sự kiện tiến trình: {e}")
+        return events
+
+    def maybe_poll(self) -> list:
+        """poll() nếu đã quá min_interval kể từ lần trước, ngược lại trả về []"""
+        if self.last_poll is not None and self.clock() - self.last_poll < self.min_interval:
+            return []
+        return self.poll()
+
+    def is_spotify_pid(self, pid: int) -> bool:
+        return pid in self.pids
+
+    def stats(self) -> dict:
+        return {
+            'polls': self.polls,
+            'running': self.running,
+            'pids': sorted(self.pids),
+            'tracked': len(self._known),
+            'unresolved': self.unresolved,
+        }
@@ -0,0 +1,365 @@
+"""
+Reclassify - Phát lại lịch sử tiêu đề qua bộ phân loại cũ và mới, báo cáo khác biệt
+
+Dùng để kiểm tra một thay đổi luật trong AdClassifier trên tiêu đề thật trước khi
+phát hành: bao nhiêu tiêu đề trong quá khứ sẽ bị phân loại khác đi, và ví dụ cụ thể.
+
+Nguồn tiêu đề (đọc dạng stream, bộ nhớ không phụ thuộc kích thước lịch sử):
+- spotify_mute.log (và các file xoay vòng .1, .2, ...): dòng "Check Ad: '...' ->
+  IsAd: ..." của bản tray, dòng phát hiện quảng cáo/đang phát của bản console
+- spotify_events.bin: sự kiện TITLE của event_store
+- *.tsv: timeline của bench_replay (có nhãn thật music/ad)
+- *.jsonl: mỗi dòng {"title": "...", "is_ad": true/false (tùy chọn)}
+
+Bộ phân loại "cũ" mặc định là kết quả đã ghi trong lịch sử (recorded); có thể chỉ
+định bằng "module:callable" (vd ad_classifier:AdClassifier) hoặc file JSON chứa
+tham số cho AdClassifier. Với --workers > 1, tiêu đề được chia thành lô và phân
+loại trên process pool, số lô đang xử lý được giới hạn để bộ nhớ không tăng.
+
+Chạy:
+    python reclassify.py spotify_mute.log --new rules_new.json
+    python reclassify.py spotify_events.bin archive/*.jsonl --old old_rules.json --workers 4
+    python reclassify.py bench_timelines/*.tsv --json report.json
+"""
+
+import argparse
+import glob
+import importlib
+import itertools
+import json
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# title: tiêu đề; recorded: kết quả đã ghi (None nếu không có); label: nhãn thật
+# (True = quảng cáo, None nếu không có); source: tên file; count: số lần xuất hiện
+TitleRecord = namedtuple('TitleRecord', ['title', 'recorded', 'label', 'source', 'count'],
+                         defaults=(1,))
+
+RECORDED = 'recorded'
+DEFAULT_CLASSIFIER = 'ad_classifier:AdClassifier'
+
+# Dòng log "<asctime> - <level> - <message>" có tiêu đề: "Check Ad: ..." của bản
+# tray (AsyncMonitor), dòng phát hiện quảng cáo / đang phát của bản console.
+# Một regex quét cả khối văn bản (MULTILINE) thay vì match từng dòng trong Python.
+LOG_TITLE_RE = re.compile(
+    r" - [A-Z]+ - (?:"
+    r"Check Ad: '(.*)' -> IsAd: (True|False)"
+    r"|📢 Phát hiện quảng cáo #\d+: '(.*)'"
+    r"|🎶 Đang phát(?: bài)?: '(.*)'"
+    r")$",
+    re.MULTILINE,
+)
+
+# Kích thước khối khi đọc log (byte), cũng là đơn vị chia việc cho process pool
+CHUNK_SIZE = 4 * 1024 * 1024
+BATCH_SIZE = 5000
+
+
+# ---- Nguồn tiêu đề (generator) ----
+
+def rotated_files(path: str) -> list:
+    """spotify_mute.log.N ... .1, spotify_mute.log (cũ nhất trước)"""
+    rotated = []
+    for name in glob.glob(glob.escape(path) + '.*'):
+        suffix = name[len(path) + 1:]
+        if suffix.isdigit():
+            rotated.append((int(suffix), name))
+    files = [name for _, name in sorted(rotated, reverse=True)]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def log_chunks(path: str, chunk_size: int = CHUNK_SIZE):
+    """Các khoảng byte (tên file, đầu, cuối) của log, cắt đúng ranh giới dòng"""
+    for name in rotated_files(path):
+        size = os.path.getsize(name)
+        with open(name, 'rb') as f:
+            start = 0
+            while start < size:
+                f.seek(min(start + chunk_size, size))
+                f.readline()
+                end = min(f.tell(), size)
+                yield name, start, end
+                start = end
+
+
+def iter_log_chunk(name: str, start: int, end: int):
+    """
+    Tiêu đề trong một khối log, đã gộp theo (tiêu đề, kết quả) với số lần xuất hiện
+    """
+    with open(name, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8', 'replace')
+    counts = Counter()
+    for tray_title, tray_verdict, ad_title, music_title in LOG_TITLE_RE.findall(text):
+        if tray_verdict:
+            counts[(tray_title, tray_verdict == 'True')] += 1
+        elif ad_title:
+            counts[(ad_title, True)] += 1
+        else:
+            counts[(music_title, False)] += 1
+    for (title, verdict), count in counts.items():
+        yield TitleRecord(title, verdict, None, name, count)
+
+
+def iter_log_titles(path: str):
+    """Tiêu đề và kết quả đã ghi từ spotify_mute.log (gồm file xoay vòng)"""
+    for chunk in log_chunks(path):
+        yield from iter_log_chunk(*chunk)
+
+
+def iter_event_titles(path: str):
+    """Sự kiện TITLE từ file event_store"""
+    from event_store import TITLE, EventLog
+
+    with EventLog(path) as log:
+        for event in log.iter_range():
+            if event.kind == TITLE:
+                yield TitleRecord(log.title(event.title_id), event.is_ad, None, path)
+
+
+def iter_timeline_titles(path: str):
+    """Timeline TSV của bench_replay (nhãn 'ad' là quảng cáo thật)"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split('\t', 2)
+            title = parts[2] if len(parts) > 2 else ""
+            if title and parts[1] in ('music', 'ad'):
+                yield TitleRecord(title, None, parts[1] == 'ad', path)
+
+
+def iter_jsonl_titles(path: str):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            yield TitleRecord(item['title'], item.get('is_ad'), item.get('label'), path)
+
+
+STRUCTURED_SOURCES = {
+    '.bin': iter_event_titles,
+    '.tsv': iter_timeline_titles,
+    '.jsonl': iter_jsonl_titles,
+}
+
+
+def iter_titles(paths):
+    """Gộp các nguồn theo đuôi file (còn lại coi là spotify_mute.log)"""
+    for path in paths:
+        source = STRUCTURED_SOURCES.get(os.path.splitext(path)[1].lower(), iter_log_titles)
+        yield from source(path)
+
+
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---- Bộ phân loại ----
+
+def load_classifier(spec: str):
+    """
+    'recorded' -> None (dùng kết quả đã ghi); 'module:callable' -> gọi callable();
+    đường dẫn file .json -> AdClassifier(**tham số), hoặc luật trong file cấu hình
+    của ứng dụng (spotify_ads_mute.json)
+    """
+    if spec == RECORDED:
+        return None
+    if spec.endswith('.json'):
+        from ad_classifier import AdClassifier
+        from config import AppConfig, DEFAULTS
+        with open(spec, encoding='utf-8') as f:
+            data = json.load(f)
+        if set(data) & set(DEFAULTS) and not set(data) - set(DEFAULTS):
+            return AppConfig(data, path=spec).build_classifier()
+        return AdClassifier(**data)
+    module_name, _, attr = spec.partition(':')
+    factory = getattr(importlib.import_module(module_name), attr or 'AdClassifier')
+    return factory()
+
+
+# ---- Báo cáo ----
+
+class DiffReport:
+    """
+    Số đếm và ví dụ (giới hạn) cho một lượt so sánh, gộp được giữa các process
+    """
+
+    def __init__(self, max_examples: int = 10):
+        self.max_examples = max_examples
+        self.total = 0
+        self.skipped = 0
+        # (cũ, mới) -> số tiêu đề
+        self.pairs = Counter()
+        # 'ad->music' / 'music->ad' -> [(tiêu đề, nguồn)]
+        self.examples = {}
+        # Nhãn thật (timeline có nhãn): số lỗi của từng bộ phân loại
+        self.labelled = 0
+        self.errors = Counter()
+
+    def add(self, record: TitleRecord, old: bool, new: bool):
+        count = record.count
+        self.total += count
+        self.pairs[(old, new)] += count
+        if old is not None and old != new:
+            key = f"{_name(old)}->{_name(new)}"
+            examples = self.examples.setdefault(key, [])
+            if len(examples) < self.max_examples:
+                examples.append((record.title, os.path.basename(record.source)))
+        if record.label is not None:
+            self.labelled += count
+            if old is not None and old != record.label:
+                self.errors['old'] += count
+            if new != record.label:
+                self.errors['new'] += count
+
+    def merge(self, other: 'DiffReport'):
+        self.total += other.total
+        self.skipped += other.skipped
+        self.pairs.update(other.pairs)
+        self.labelled += other.labelled
+        self.errors.update(other.errors)
+        for key, examples in other.examples.items():
+            mine = self.examples.setdefault(key, [])
+            mine.extend(examples[:self.max_examples - len(mine)])
+
+    @property
+    def changed(self) -> int:
+        return sum(count for (old, new), count in self.pairs.items()
+                   if old is not None and old != new)
+
+    def to_dict(self) -> dict:
+        return {
+            'total': self.total,
+            'skipped_no_old_verdict': self.skipped,
+            'changed': self.changed,
+            'pairs': {f"{_name(old)}->{_name(new)}": count
+                      for (old, new), count in sorted(self.pairs.items(), key=str)},
+            'labelled': self.labelled,
+            'errors': dict(self.errors),
+            'examples': {key: [{'title': t, 'source': s} for t, s in examples]
+                         for key, examples in sorted(self.examples.items())},
+        }
+
+
+def _name(verdict) -> str:
+    if verdict is None:
+        return 'unknown'
+    return 'ad' if verdict else 'music'
+
+
+def compare(records, old_classifier, new_classifier, max_examples: int = 10) -> DiffReport:
+    """So sánh trên một dãy TitleRecord (chạy trong process hiện tại)"""
+    report = DiffReport(max_examples)
+    for record in records:
+        old = record.recorded if old_classifier is None else old_classifier.is_ad(record.title)
+        if old is None and record.label is None:
+            # Không có gì để so: không có kết quả cũ lẫn nhãn thật
+            report.skipped += record.count
+            continue
+        report.add(record, old, new_classifier.is_ad(record.title))
+    return report
+
+
+_worker_classifiers = None
+
+
+def _init_worker(old_spec: str, new_spec: str):
+    global _worker_classifiers
+    _worker_classifiers = (load_classifier(old_spec), load_classifier(new_spec))
+
+
+def _compare_task(task):
+    """Việc cho worker: ('log', tên, đầu, cuối) hoặc ('records', lô TitleRecord)"""
+    kind, payload, max_examples = task
+    records = iter_log_chunk(*payload) if kind == 'log' else payload
+    old, new = _worker_classifiers
+    return compare(records, old, new, max_examples)
+
+
+def _tasks(paths, max_examples: int, batch_size: int):
+    """Log được chia theo khoảng byte (worker tự đọc), nguồn khác theo lô bản ghi"""
+    for path in paths:
+        source = STRUCTURED_SOURCES.get(os.path.splitext(path)[1].lower())
+        if source is None:
+            for chunk in log_chunks(path):
+                yield 'log', chunk, max_examples
+        else:
+            for batch in batched(source(path), batch_size):
+                yield 'records', batch, max_examples
+
+
+def run(paths, old_spec: str = RECORDED, new_spec: str = DEFAULT_CLASSIFIER,
+        workers: int = 1, max_examples: int = 10, batch_size: int = BATCH_SIZE) -> DiffReport:
+    """Chạy so sánh trên các file lịch sử"""
+    if workers <= 1:
+        return compare(iter_titles(paths), load_classifier(old_spec),
+                       load_classifier(new_spec), max_examples)
+
+    report = DiffReport(max_examples)
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(old_spec, new_spec)) as pool:
+        pending = []
+        for task in _tasks(paths, max_examples, batch_size):
+            pending.append(pool.submit(_compare_task, task))
+            # Giới hạn số việc đang chờ để không đọc cả lịch sử vào bộ nhớ
+            while len(pending) >= workers * 2:
+                report.merge(pending.pop(0).result())
+        for future in pending:
+            report.merge(future.result())
+    return report
+
+
+def print_report(report: DiffReport, old_spec: str, new_spec: str):
+    data = report.to_dict()
+    print(f"Cũ: {old_spec}   Mới: {new_spec}")
+    print(f"Tiêu đề: {data['total']}  (bỏ qua {data['skipped_no_old_verdict']} "
+          f"không có kết quả cũ)")
+    percent = data['changed'] / data['total'] * 100 if data['total'] else 0.0
+    print(f"Phân loại khác đi: {data['changed']} ({percent:.3f}%)")
+    for pair, count in data['pairs'].items():
+        print(f"  {pair:<16} {count}")
+    if data['labelled']:
+        print(f"Có nhãn thật: {data['labelled']}  lỗi cũ={data['errors'].get('old', 0)} "
+              f"lỗi mới={data['errors'].get('new', 0)}")
+    for key, examples in data['examples'].items():
+        print(f"Ví dụ {key}:")
+        for example in examples:
+            print(f"  '{example['title']}'  ({example['source']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="So sánh bộ phân loại cũ và mới trên lịch sử tiêu đề")
+    parser.add_argument('paths', nargs='+', help="spotify_mute.log, *.bin, *.tsv, *.jsonl")
+    parser.add_argument('--old', default=RECORDED,
+                        help="'recorded' (mặc định), module:callable hoặc file .json")
+    parser.add_argument('--new', default=DEFAULT_CLASSIFIER,
+                        help="module:callable hoặc file .json (mặc định AdClassifier hiện tại)")
+    parser.add_argument('--workers', type=int, default=1, help="Số process (mặc định 1)")
+    parser.add_argument('--examples', type=int, default=10, help="Số ví dụ mỗi loại")
+    parser.add_argument('--json', help="Ghi báo cáo ra file JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.paths, args.old, args.new, args.workers, args.examples)
+    print_report(report, args.old, args.new)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
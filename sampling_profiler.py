@@ -0,0 +1,282 @@
+"""
+Sampling Profiler - Đo CPU theo kiểu lấy mẫu stack, chỉ dùng thư viện chuẩn
+
+Một thread nền định kỳ chụp stack của mọi thread khác (sys._current_frames) và
+đếm số lần mỗi stack xuất hiện. Không cài hook vào từng lời gọi như cProfile nên
+chi phí gần như cố định (một lần chụp mỗi interval) và không làm sai lệch thời
+gian của đoạn code đang đo; chạy được trong bản EXE (PyInstaller) vì không cần
+thư viện ngoài.
+
+Kết quả:
+    - file collapsed stack ("thread;module:hàm;...;module:hàm số_mẫu"), mở được
+      bằng flamegraph.pl, speedscope hoặc inferno
+    - bảng tóm tắt chia thời gian bận theo nhóm: EnumWindows, psutil, COM/session
+      âm thanh, phân loại, logging, vẽ icon
+
+Mẫu là thời gian thực (wall clock): thread đang chờ (queue, select, Event.wait)
+được tính riêng vào nhóm "idle" qua hàm ở đỉnh stack.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 100 mẫu/giây: đủ mịn cho vòng lặp monitor, chi phí chụp stack < 1% CPU
+DEFAULT_INTERVAL = 0.01
+
+# (nhóm, module hoặc package, tiền tố tên hàm hoặc None = cả module)
+# Xét từ đỉnh stack xuống, frame đầu tiên khớp quyết định nhóm: logging gọi từ
+# bên trong phân loại được tính cho logging.
+CATEGORY_RULES = (
+    ('enum_windows', 'window_resolver', None),
+    ('enum_windows', 'win32gui', None),
+    ('enum_windows', 'linux_backend', 'MprisTitleSource'),
+    ('psutil', 'psutil', None),
+    ('psutil', 'process_watcher', None),
+    ('com_sessions', 'audio_sessions', None),
+    ('com_sessions', 'comtypes_cache', None),
+    ('com_sessions', 'pycaw', None),
+    ('com_sessions', 'comtypes', None),
+    ('com_sessions', 'linux_backend', 'PulseAudioBackend'),
+    ('com_sessions', 'pulsectl', None),
+    ('classification', 'ad_classifier', None),
+    ('classification', 'detection_state', None),
+    ('classification', 'ad_index', None),
+    ('classification', 'audio_detector', None),
+    ('logging', 'logging', None),
+    ('logging', 'log_setup', None),
+    ('icon', 'tray_icons', None),
+    ('icon', 'PIL', None),
+    ('icon', 'pystray', None),
+)
+
+CATEGORY_LABELS = {
+    'enum_windows': "EnumWindows / đọc tiêu đề",
+    'psutil': "psutil",
+    'com_sessions': "COM / liệt kê session âm thanh",
+    'classification': "Phân loại",
+    'logging': "Logging",
+    'icon': "Vẽ icon",
+    'other': "Khác",
+}
+
+# Hàm ở đỉnh stack khi thread đang chờ (module, hàm)
+IDLE_LEAVES = frozenset({
+    ('threading', 'wait'),
+    ('threading', '_wait_for_tstate_lock'),
+    ('queue', 'get'),
+    ('selectors', 'select'),
+    ('windows_events', '_poll'),
+    ('thread', '_worker'),
+    ('_win32', '_mainloop'),
+    ('_xorg', '_mainloop'),
+    ('_gtk', 'run'),
+})
+
+IDLE = 'idle'
+
+
+def _path_parts(filename: str):
+    """Các thành phần đường dẫn của file nguồn (bản EXE dùng đường dẫn tương đối)"""
+    parts = filename.replace('\\', '/').split('/')
+    stem = os.path.splitext(parts[-1])[0]
+    if stem == '__init__' and len(parts) > 1:
+        stem = parts[-2]
+    return stem, frozenset(parts[:-1])
+
+
+class SamplingProfiler:
+    """
+    Lấy mẫu stack của mọi thread trong tiến trình trong một khoảng thời gian
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, duration: float = None,
+                 on_finish=None, rules=CATEGORY_RULES, idle_leaves=IDLE_LEAVES):
+        """
+        Args:
+            interval: Khoảng cách giữa hai lần lấy mẫu (giây)
+            duration: Tự dừng sau chừng này giây (None = tới khi gọi stop())
+            on_finish: Hàm gọi với profiler khi dừng (trên thread lấy mẫu)
+            rules: Luật chia nhóm (nhóm, module/package, tiền tố hàm)
+            idle_leaves: Các (module, hàm) ở đỉnh stack được coi là đang chờ
+        """
+        self.interval = interval
+        self.duration = duration
+        self.on_finish = on_finish
+        self.rules = rules
+        self.idle_leaves = idle_leaves
+
+        # tuple stack (thread, frame gốc, ..., frame đỉnh) -> số mẫu
+        self.stacks = {}
+        self.categories = {}
+        self.threads = {}
+        self.samples = 0
+        self.busy_samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        # Thời gian CPU của chính thread lấy mẫu
+        self.overhead = 0.0
+
+        # code object -> (nhãn, nhóm hoặc None, có phải hàm chờ không)
+        self._code_info = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---- Vòng đời ----
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self.stopped_at = None
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info("Bắt đầu đo CPU (lấy mẫu mỗi %.0f ms%s)", self.interval * 1000,
+                    f", trong {self.duration:g} giây" if self.duration else "")
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Dừng lấy mẫu (on_finish chạy xong trước khi hàm trả về), trả về summary()"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        return self.summary()
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = self.started_at + self.duration if self.duration else None
+        cpu_start = time.thread_time()
+        try:
+            while not self._stop.wait(self.interval):
+                self.sample(exclude=own)
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+        finally:
+            self.stopped_at = time.perf_counter()
+            self.overhead = time.thread_time() - cpu_start
+        if self.on_finish is not None:
+            try:
+                self.on_finish(self)
+            except Exception as e:
+                logger.error(f"Lỗi khi ghi kết quả đo CPU: {e}")
+
+    # ---- Lấy mẫu ----
+
+    def sample(self, exclude: int = None):
+        """Chụp stack của mọi thread (trừ thread exclude) một lần"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == exclude:
+                continue
+            self._record(names.get(ident, f'thread-{ident}'), frame)
+
+    def _record(self, thread_name: str, frame):
+        labels = []
+        category = None
+        idle = None
+        while frame is not None:
+            label, frame_category, frame_idle = self._info(frame.f_code)
+            if idle is None:
+                idle = frame_idle
+            if category is None:
+                category = frame_category
+            labels.append(label)
+            frame = frame.f_back
+        labels.append(thread_name.replace(';', '_'))
+        labels.reverse()
+        stack = tuple(labels)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+        if idle:
+            category = IDLE
+        else:
+            self.busy_samples += 1
+            category = category or 'other'
+            self.threads[thread_name] = self.threads.get(thread_name, 0) + 1
+        self.categories[category] = self.categories.get(category, 0) + 1
+
+    def _info(self, code):
+        info = self._code_info.get(code)
+        if info is None:
+            info = self._code_info[code] = self._classify(code)
+        return info
+
+    def _classify(self, code):
+        stem, packages = _path_parts(code.co_filename)
+        qualname = getattr(code, 'co_qualname', code.co_name)
+        category = None
+        for name, module, prefix in self.rules:
+            if module == stem or module in packages:
+                if prefix is None or qualname.startswith(prefix):
+                    category = name
+                    break
+        idle = (stem, code.co_name) in self.idle_leaves
+        return f'{stem}:{qualname}', category, idle
+
+    # ---- Kết quả ----
+
+    def collapsed(self) -> list:
+        """Các dòng collapsed stack ("frame;frame;... số_mẫu"), nhiều mẫu nhất trước"""
+        return [f"{';'.join(stack)} {count}"
+                for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1])]
+
+    def write_collapsed(self, path: str) -> str:
+        with open(path, 'w', encoding='utf-8') as f:
+            for line in self.collapsed():
+                f.write(line + '\n')
+        return path
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.stopped_at if self.stopped_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    def summary(self) -> dict:
+        busy = self.busy_samples
+        categories = {}
+        for name in list(CATEGORY_LABELS) + [IDLE]:
+            count = self.categories.get(name, 0)
+            # Tỉ lệ trong thời gian bận (idle: tỉ lệ trong tổng số mẫu)
+            total = self.samples if name == IDLE else busy
+            categories[name] = {
+                'samples': count,
+                'pct': round(100.0 * count / total, 1) if total else 0.0,
+                'seconds': round(count * self.interval, 3),
+            }
+        elapsed = self.elapsed
+        return {
+            'duration_s': round(elapsed, 3),
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'busy_samples': busy,
+            'overhead_pct': round(100.0 * self.overhead / elapsed, 2) if elapsed else 0.0,
+            'categories': categories,
+            'threads': dict(sorted(self.threads.items(), key=lambda item: -item[1])),
+        }
+
+    def export_summary(self, path: str) -> str:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def format_summary(self) -> str:
+        """Bảng tóm tắt nhiều dòng (ghi vào log khi kết thúc)"""
+        s = self.summary()
+        lines = [f"Đo CPU {s['duration_s']:.1f} s: {s['busy_samples']}/{s['samples']} mẫu bận, "
+                 f"chi phí lấy mẫu {s['overhead_pct']:.2f}% CPU"]
+        for name, label in CATEGORY_LABELS.items():
+            c = s['categories'][name]
+            lines.append(f"  {label:<32} {c['pct']:5.1f}%  ({c['samples']} mẫu)")
+        return '\n'.join(lines)
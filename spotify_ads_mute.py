@@ -4,208 +4,82 @@ Author: AI Assistant
 Version: 1.0.0
 
 Cách hoạt động:
-- Monitor tiêu đề cửa sổ Spotify liên tục
+- Monitor tiêu đề cửa sổ Spotify liên tục (Linux: metadata MPRIS qua D-Bus), dùng
+  chung MuteEngine với bản tray và daemon
 - Khi phát hiện quảng cáo (Advertisement) -> tự động mute Spotify
 - Khi hết quảng cáo (có tên bài hát) -> tự động unmute Spotify
 """
 
-import time
-import ctypes
-from ctypes import POINTER, cast
 import logging
-import re
-from datetime import datetime
 import sys
 
-# Windows COM libraries
-try:
-    from comtypes import CLSCTX_ALL
-    from pycaw.pycaw import AudioUtilities, ISimpleAudioVolume
-except ImportError:
-    print("Lỗi: Thiếu thư viện cần thiết!")
-    print("Hãy chạy: pip install pycaw comtypes")
-    sys.exit(1)
+# Thư viện của từng nền tảng (pycaw/pywin32 hay jeepney/pulsectl) chỉ được import
+# khi tạo backend; main() kiểm tra gói còn thiếu (xem platform_backends.py)
+from mute_engine import LATENCY_FILE, MuteEngine
+from platform_backends import create_platform_backend
+from log_setup import setup_logging
+from config import ConfigError, load_config
+from process_watcher import SpotifyProcessWatcher
 
-try:
-    import win32gui
-    import win32process
-    import psutil
-except ImportError:
-    print("Lỗi: Thiếu thư viện cần thiết!")
-    print("Hãy chạy: pip install pywin32 psutil")
-    sys.exit(1)
 
-
-# Cấu hình logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('spotify_mute.log', encoding='utf-8')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
 class SpotifyAdsMute:
     """
-    Class chính để quản lý việc mute/unmute Spotify khi có quảng cáo
+    Bản console: chạy MuteEngine ở foreground tới khi nhấn Ctrl+C
     """
     
-    # Các từ khóa để nhận diện quảng cáo
-    AD_KEYWORDS = [
-        'advertisement',
-        'quảng cáo',
-        'spotify',  # Khi chỉ hiện "Spotify" không có tên bài hát
-    ]
-    
-    # Các pattern cho biết đang phát nhạc (không phải quảng cáo)
-    MUSIC_INDICATORS = [
-        ' - ',  # Thường có format "Artist - Song Title"
-    ]
-    
-    def __init__(self, check_interval: float = 0.5):
+    def __init__(self, watcher_backend: str = 'auto', window_resolver=None,
+                 session_manager=None, classifier=None, scheduler=None, process_watcher=None,
+                 platform_backend=None, history=None, config=None, detector=None):
         """
         Khởi tạo SpotifyAdsMute
         
         Args:
-            check_interval: Thời gian giữa các lần kiểm tra (giây)
-        """
-        self.check_interval = check_interval
-        self.is_muted = False
-        self.last_title = ""
-        self.running = True
-        
-    def get_spotify_window_title(self) -> str:
-        """
-        Lấy tiêu đề cửa sổ Spotify
-        
-        Returns:
-            Tiêu đề cửa sổ Spotify hoặc chuỗi rỗng nếu không tìm thấy
+            watcher_backend: 'auto' (push nếu nền tảng hỗ trợ) hoặc 'polling'
+            window_resolver: Nguồn tiêu đề (mặc định theo backend nền tảng)
+            session_manager: Cache audio session của Spotify (mặc định SpotifySessionManager)
+            classifier: Bộ phân loại quảng cáo dùng chung (mặc định AdClassifier)
+            scheduler: Bộ điều chỉnh chu kỳ đọc (mặc định theo cấu hình)
+            process_watcher: SpotifyProcessWatcher (mặc định dùng psutil)
+            platform_backend: Backend nền tảng tạo nguồn tiêu đề/âm thanh mặc định
+                (mặc định theo hệ điều hành)
+            history: EventStore ghi lịch sử sự kiện (mặc định spotify_events.bin)
+            config: AppConfig (mặc định đọc spotify_ads_mute.json); luật phân loại và
+                chu kỳ đọc được nạp lại khi file đổi
+            detector: DetectionStateMachine quyết định mute/unmute (mặc định theo config)
         """
-        def callback(hwnd, titles):
-            if win32gui.IsWindowVisible(hwnd):
-                title = win32gui.GetWindowText(hwnd)
-                # Tìm cửa sổ Spotify
-                try:
-                    _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                    process = psutil.Process(pid)
-                    if 'spotify' in process.name().lower():
-                        titles.append(title)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            return True
-        
-        titles = []
-        try:
-            win32gui.EnumWindows(callback, titles)
-        except Exception as e:
-            logger.error(f"Lỗi khi lấy danh sách cửa sổ: {e}")
-            
-        # Tìm tiêu đề có nội dung (không phải chuỗi rỗng)
-        for title in titles:
-            if title and title.strip():
-                return title
-                
-        return ""
-    
-    def is_ad_playing(self, window_title: str) -> bool:
-        """
-        Kiểm tra xem đang phát quảng cáo hay không
-        
-        Args:
-            window_title: Tiêu đề cửa sổ Spotify
-            
-        Returns:
-            True nếu đang phát quảng cáo, False nếu không
-        """
-        if not window_title:
-            return False
-            
-        title_lower = window_title.lower().strip()
-        
-        # LOGIC QUAN TRỌNG:
-        # Nhạc Spotify thường có dạng "Artist - Song"
-        # Các dấu gạch có thể là: hyphen (-), en-dash (–), em-dash (—)
-        is_music_format = False
-        for sep in [' - ', ' – ', ' — ']:
-            if sep in window_title:
-                is_music_format = True
-                break
-                
-        if not is_music_format:
-            # Không có dấu gạch phân cách -> Khả năng cao là quảng cáo
-            return True
-            
-        # Nếu có định dạng nhạc, vẫn kiểm tra keyword nhưng chặt chẽ hơn
-        # 1. Kiểm tra các từ khóa dài (substring match ok)
-        for keyword in self.AD_KEYWORDS:
-            if keyword.lower() in title_lower:
-                return True
-        
-        return False
-    
-    def get_spotify_audio_session(self):
-        """
-        Lấy audio session của Spotify
-        
-        Returns:
-            Audio session hoặc None nếu không tìm thấy
-        """
-        try:
-            sessions = AudioUtilities.GetAllSessions()
-            for session in sessions:
-                if session.Process and 'spotify' in session.Process.name().lower():
-                    return session
-        except Exception as e:
-            logger.error(f"Lỗi khi lấy audio session: {e}")
-            
-        return None
-    
-    def mute_spotify(self) -> bool:
-        """
-        Tắt tiếng Spotify
-        
-        Returns:
-            True nếu thành công, False nếu thất bại
-        """
-        try:
-            session = self.get_spotify_audio_session()
-            if session:
-                volume = session._ctl.QueryInterface(ISimpleAudioVolume)
-                volume.SetMute(1, None)
-                self.is_muted = True
-                logger.info("🔇 Đã tắt tiếng Spotify (phát hiện quảng cáo)")
-                return True
-        except Exception as e:
-            logger.error(f"Lỗi khi mute Spotify: {e}")
-            
-        return False
-    
-    def unmute_spotify(self) -> bool:
-        """
-        Bật tiếng Spotify
-        
-        Returns:
-            True nếu thành công, False nếu thất bại
-        """
-        try:
-            session = self.get_spotify_audio_session()
-            if session:
-                volume = session._ctl.QueryInterface(ISimpleAudioVolume)
-                volume.SetMute(0, None)
-                self.is_muted = False
-                logger.info("🔊 Đã bật tiếng Spotify (hết quảng cáo)")
-                return True
-        except Exception as e:
-            logger.error(f"Lỗi khi unmute Spotify: {e}")
-            
-        return False
+        # Tắt tiếng thẳng (SetMute) như trước, không giảm âm lượng mượt
+        self.engine = MuteEngine(
+            config=config,
+            platform_backend=platform_backend,
+            title_source=window_resolver,
+            classifier=classifier,
+            session_manager=session_manager,
+            process_watcher=process_watcher,
+            history=history,
+            detector=detector,
+            scheduler=scheduler,
+            push=watcher_backend == 'auto',
+            fade=False,
+        )
     
+    def log_summary(self):
+        engine = self.engine
+        logger.info("")
+        logger.info("="*50)
+        logger.info("👋 DỪNG CHƯƠNG TRÌNH")
+        logger.info(f"📊 Thống kê: Đã chặn {engine.ad_count} quảng cáo")
+        logger.info(f"⏱️ Độ trễ mute: {engine.latency.format_stage('title_to_mute')}")
+        logger.info(f"🔀 Phát hiện: {engine.detector.format_status()}")
+        if engine.scheduler.wakeups:
+            logger.info(f"🔁 Tần suất đọc: {engine.scheduler.format_status()}")
+        logger.info("="*50)
+
     def run(self):
         """
-        Vòng lặp chính để monitor Spotify
+        Chạy monitor tới khi nhấn Ctrl+C
         """
         logger.info("="*50)
         logger.info("🎵 SPOTIFY ADS MUTE - BẮT ĐẦU CHẠY")
@@ -213,50 +87,19 @@ class SpotifyAdsMute:
         logger.info("Nhấn Ctrl+C để dừng chương trình")
         logger.info("")
         
-        ad_count = 0
-        song_count = 0
-        
+        self.engine.start()
         try:
-            while self.running:
-                # Lấy tiêu đề cửa sổ Spotify
-                window_title = self.get_spotify_window_title()
-                
-                # Chỉ xử lý nếu tiêu đề thay đổi
-                if window_title != self.last_title:
-                    self.last_title = window_title
-                    
-                    if window_title:
-                        is_ad = self.is_ad_playing(window_title)
-                        
-                        if is_ad and not self.is_muted:
-                            # Đang phát quảng cáo -> Mute
-                            ad_count += 1
-                            logger.info(f"📢 Phát hiện quảng cáo #{ad_count}: '{window_title}'")
-                            self.mute_spotify()
-                            
-                        elif not is_ad and self.is_muted:
-                            # Hết quảng cáo -> Unmute
-                            song_count += 1
-                            logger.info(f"🎶 Đang phát bài: '{window_title}'")
-                            self.unmute_spotify()
-                            
-                        elif not is_ad:
-                            logger.info(f"🎶 Đang phát: '{window_title}'")
-                    else:
-                        logger.debug("Không tìm thấy cửa sổ Spotify")
-                
-                time.sleep(self.check_interval)
+            # Main thread chỉ chờ để vẫn nhận được Ctrl+C
+            while self.engine.running:
+                self.engine.monitor_thread.join(0.5)
                 
         except KeyboardInterrupt:
-            logger.info("")
-            logger.info("="*50)
-            logger.info("👋 DỪNG CHƯƠNG TRÌNH")
-            logger.info(f"📊 Thống kê: Đã chặn {ad_count} quảng cáo")
-            logger.info("="*50)
+            self.log_summary()
+            self.engine.export_latency(LATENCY_FILE)
             
-            # Unmute khi thoát để tránh bị mute vĩnh viễn
-            if self.is_muted:
-                self.unmute_spotify()
+        finally:
+            # Monitor unmute khi thoát để tránh bị mute vĩnh viễn
+            self.engine.stop()
 
 
 def print_banner():
@@ -274,32 +117,45 @@ def print_banner():
     print(banner)
 
 
-def check_spotify_running() -> bool:
+def check_spotify_running(process_watcher: SpotifyProcessWatcher) -> bool:
     """
-    Kiểm tra Spotify có đang chạy không
+    Kiểm tra Spotify có đang chạy không (lần poll đầu của process watcher)
     """
-    for proc in psutil.process_iter(['name']):
-        try:
-            if 'spotify' in proc.info['name'].lower():
-                return True
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
-    return False
+    process_watcher.poll()
+    return process_watcher.running
 
 
 def main():
     """Hàm main"""
+    try:
+        config = load_config()
+    except ConfigError as e:
+        print(f"Lỗi cấu hình: {e}")
+        sys.exit(1)
+    platform_backend = create_platform_backend(config.backend)
+    missing = platform_backend.missing_packages()
+    if missing:
+        print("Lỗi: Thiếu thư viện cần thiết!")
+        print(f"Hãy chạy: pip install {' '.join(missing)}")
+        sys.exit(1)
+        
+    # Log đi qua queue, thread nền ghi file theo lô và xoay vòng file log
+    setup_logging(config.log_level, config.log['file'],
+                  max_bytes=config.log['max_bytes'], backup_count=config.log['backup_count'])
     print_banner()
     
-    # Kiểm tra Spotify có đang chạy không
-    if not check_spotify_running():
+    # Kiểm tra Spotify có đang chạy không; watcher sau đó theo dõi tiếp
+    process_watcher = SpotifyProcessWatcher()
+    if not check_spotify_running(process_watcher):
         logger.warning("⚠️ Spotify chưa được mở!")
         logger.info("Hãy mở Spotify trước khi chạy chương trình này.")
         logger.info("Chương trình sẽ tự động phát hiện khi Spotify được mở...")
         print()
         
     # Khởi tạo và chạy
-    muter = SpotifyAdsMute(check_interval=0.3)  # Kiểm tra mỗi 0.3 giây
+    # Chu kỳ gốc từ cấu hình (0.3 giây); khi polling, scheduler thưa dần lúc Spotify đóng/đứng yên
+    muter = SpotifyAdsMute(process_watcher=process_watcher, platform_backend=platform_backend,
+                           config=config)
     muter.run()
 
 
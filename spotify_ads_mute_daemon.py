@@ -0,0 +1,171 @@
+"""
+Spotify Ads Mute - Chế độ daemon (không giao diện)
+
+Chạy cùng MuteEngine như bản tray nhưng không có icon; trạng thái và điều khiển đi
+qua control API cục bộ (Unix socket trên Linux, named pipe trên Windows).
+
+Chạy:   python spotify_ads_mute_daemon.py [--socket ADDR] [--fade | --no-fade] [--profile [SECONDS]]
+Điều khiển: python mute_ctl.py status | enable | disable | stats | metrics | shutdown
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+import time
+
+from config import ConfigError, load_config
+from control_api import ControlServer
+from log_setup import setup_logging
+from mute_engine import PROFILE_SECONDS, MuteEngine
+from platform_backends import create_platform_backend
+from version import __version__
+
+logger = logging.getLogger(__name__)
+
+
+class SpotifyAdsMuteDaemon:
+    """
+    MuteEngine không có icon: trạng thái và điều khiển đi qua control API
+    """
+
+    def __init__(self, address: str = None, window_resolver=None, session_manager=None,
+                 profile=None, **kwargs):
+        """
+        Args:
+            address: Unix socket hoặc named pipe của control API (mặc định theo nền tảng)
+            window_resolver: Nguồn tiêu đề (TitleSource), mặc định của backend nền tảng
+            session_manager: SpotifySessionManager cho audio sink mặc định
+            profile: Đo CPU trong chừng này giây ngay từ lúc khởi động
+            **kwargs: Tham số còn lại của MuteEngine (config, platform_backend, fade, ...)
+        """
+        self.engine = MuteEngine(title_source=window_resolver, session_manager=session_manager,
+                                 **kwargs)
+        self.profile_seconds = profile
+        self.started_at = time.time()
+        self.control = ControlServer(
+            {
+                'status': self.cmd_status,
+                'stats': self.cmd_stats,
+                'enable': lambda request: self.cmd_set_enabled(True),
+                'disable': lambda request: self.cmd_set_enabled(False),
+                'shutdown': self.cmd_shutdown,
+            },
+            address=address,
+            streams={'metrics': self.metrics},
+        )
+        self._stopped = threading.Event()
+
+    # ---- Lệnh của control API (chạy trên thread control, chỉ đọc trạng thái) ----
+
+    def cmd_status(self, request) -> dict:
+        engine = self.engine
+        return {
+            'version': __version__,
+            'state': engine.state,
+            'detection': engine.detector.state,
+            'enabled': engine.enabled,
+            'muted': engine.is_muted,
+            'fade': getattr(engine.audio_sink, 'fade', False),
+            'spotify_running': engine.process_watcher.running,
+            'title': engine.last_title,
+            'ad_count': engine.ad_count,
+            'song_count': engine.song_count,
+            'uptime_s': round(time.time() - self.started_at, 1),
+        }
+
+    def cmd_stats(self, request) -> dict:
+        stats = self.engine.stats()
+        stats['control'] = self.control.stats()
+        return stats
+
+    def cmd_set_enabled(self, enabled: bool) -> dict:
+        # Monitor nhận lệnh qua call_soon_threadsafe, không chờ event loop của nó
+        self.engine.set_enabled(enabled)
+        return {'enabled': enabled}
+
+    def cmd_shutdown(self, request) -> dict:
+        self._stopped.set()
+        return {'stopping': True}
+
+    def metrics(self) -> dict:
+        """Một dòng của stream metrics (số đếm + độ trễ mute)"""
+        engine = self.engine
+        mute = engine.latency.get('title_to_mute')
+        return {
+            'enabled': engine.enabled,
+            'muted': engine.is_muted,
+            'ad_count': engine.ad_count,
+            'song_count': engine.song_count,
+            'samples': engine.monitor.samples,
+            'title_to_mute': mute.summary() if mute is not None else None,
+            'scheduler': engine.scheduler.stats(),
+        }
+
+    # ---- Vòng đời ----
+
+    def request_stop(self):
+        self._stopped.set()
+
+    def run(self):
+        """Chạy monitor và control API tới khi có lệnh shutdown/SIGTERM/Ctrl+C"""
+        # Mở endpoint trước: nếu daemon khác đang chạy thì dừng ngay, chưa đụng tới âm thanh
+        self.control.start()
+        self.engine.start(profile=self.profile_seconds)
+        logger.info("🎵 Spotify Ads Mute đã khởi động (daemon)")
+        try:
+            # Chờ theo từng nhịp ngắn để main thread vẫn nhận được Ctrl+C
+            while not self._stopped.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            logger.info("👋 Dừng daemon, đã chặn %s quảng cáo", self.engine.ad_count)
+            self.control.stop()
+            self.engine.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spotify Ads Mute (daemon)")
+    parser.add_argument('--socket', default=None,
+                        help="Unix socket hoặc named pipe của control API")
+    fade = parser.add_mutually_exclusive_group()
+    fade.add_argument('--fade', dest='fade', action='store_const', const=True, default=None,
+                      help="Giảm âm lượng mượt thay vì tắt tiếng (mặc định theo config)")
+    fade.add_argument('--no-fade', dest='fade', action='store_const', const=False,
+                      help="Tắt tiếng bằng SetMute")
+    parser.add_argument('--profile', nargs='?', type=float, const=PROFILE_SECONDS,
+                        default=None, metavar='SECONDS',
+                        help="Đo CPU bằng lấy mẫu stack trong SECONDS giây")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config()
+    except ConfigError as e:
+        print(f"Lỗi cấu hình: {e}")
+        return 1
+    platform_backend = create_platform_backend(config.backend)
+    missing = platform_backend.missing_packages()
+    if missing:
+        print(f"Lỗi: Thiếu thư viện cần thiết: {', '.join(missing)}")
+        print(f"Hãy chạy: pip install {' '.join(missing)}")
+        return 1
+
+    setup_logging(config.log_level, config.log['file'], stream=sys.stdout,
+                  max_bytes=config.log['max_bytes'], backup_count=config.log['backup_count'])
+    daemon = SpotifyAdsMuteDaemon(address=args.socket, platform_backend=platform_backend,
+                                  fade=args.fade, config=config,
+                                  profile=args.profile)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.request_stop())
+    try:
+        daemon.run()
+    except RuntimeError as e:
+        print(f"Lỗi: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+from ad_classifier import AdClassifier
+
+
+def test_titles_without_separator_are_ads():
+    classifier = AdClassifier()
+    assert classifier.is_ad("Advertisement")
+    assert classifier.is_ad("Spotify")
+    assert not classifier.is_ad("")
+
+
+def test_music_titles_with_any_dash():
+    classifier = AdClassifier()
+    assert not classifier.is_ad("Radiohead - Karma Police")
+    assert not classifier.is_ad("Mỹ Tâm – Đừng Hỏi Em")
+    assert not classifier.is_ad("Adele — Hello")
+
+
+def test_keywords_in_music_format():
+    classifier = AdClassifier()
+    assert classifier.is_ad("Spotify - Try Premium for free")
+    assert classifier.is_ad("Nhãn hàng - QUẢNG CÁO mùa hè")
+
+
+def test_allowed_artist_is_music():
+    classifier = AdClassifier()
+    assert not classifier.is_ad("Spotify Singles - Acoustic Session")
+
+
+def test_word_keywords_match_whole_words_only():
+    classifier = AdClassifier(word_keywords=['ad'])
+    assert classifier.is_ad("Brand - Ad break")
+    assert not classifier.is_ad("Radiohead - Creep")
+
+
+def test_verdicts_are_memoized():
+    classifier = AdClassifier(cache_size=8)
+    for _ in range(5):
+        classifier.is_ad("Radiohead - Creep")
+    info = classifier.cache_info()
+    assert info.misses == 1 and info.hits == 4
+
+
+def test_deny_lists_override_music_format():
+    classifier = AdClassifier(denied_artists=['Podcast Promo'], denied_titles=['Brand - Summer Sale'])
+    assert classifier.is_ad("podcast promo - Listen now")
+    assert classifier.is_ad("BRAND - SUMMER SALE")
+    assert not classifier.is_ad("Podcast Fan - Episode 1")
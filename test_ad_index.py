@@ -0,0 +1,89 @@
+import os
+
+from ad_index import HEADER, KnownAdIndex
+
+
+def test_title_becomes_known_after_stable_repeats_and_persists(tmp_path):
+    path = str(tmp_path / 'ads.bin')
+    index = KnownAdIndex(path).open()
+    assert index.match("Brand X") is None
+
+    index.learn("Brand X", 30.25)
+    # Một lần gặp chưa đủ: có thể là tiêu đề chung
+    assert index.match("Brand X") is None
+    index.learn("Brand X", 29.75)
+    assert index.match("Brand X").duration == 29.75
+    # Lần gặp lệch (tạm dừng giữa quảng cáo) làm mất trạng thái ổn định
+    index.learn("Brand X", 75.0)
+    assert index.match("Brand X") is None
+    index.learn("Brand X", 75.5)
+    index.close()
+
+    reopened = KnownAdIndex(path).open()
+    assert reopened.lookup("Brand X").seen == 4
+    assert reopened.match("Brand X").duration == 75.5
+    reopened.close()
+
+
+def test_generic_titles_and_out_of_range_durations_are_not_learned(tmp_path):
+    index = KnownAdIndex(str(tmp_path / 'ads.bin')).open()
+    # Quảng cáo chung dài đúng 30 giây, tạm dừng dài gần bằng nhau: vẫn không học
+    for title in ("Advertisement", "Spotify", "spotify free "):
+        for duration in (30.0, 30.0, 30.2):
+            assert not index.learn(title, duration)
+        assert index.match(title) is None and index.lookup(title) is None
+    assert not index.learn("Podcast", 1800.0)
+    assert not index.learn("Brand X", 0.3)
+    assert index.stats()['rejected'] == 11
+    assert len(index) == 0
+
+    # Từ khóa trong cấu hình đổi: tiêu đề đã học trước đó cũng thôi được tra
+    index.learn("Promo", 20.0)
+    index.learn("Promo", 20.0)
+    assert index.match("Promo") is not None
+    index.set_generic_titles(["promo"])
+    assert index.match("Promo") is None
+    index.close()
+
+
+def test_file_errors_do_not_escape_learn_or_clear(tmp_path, monkeypatch):
+    index = KnownAdIndex(str(tmp_path / 'ads.bin'), capacity=4).open()
+    index.learn("Ad 0", 10.0)
+    index.learn("Ad 0", 10.0)
+    index.learn("Ad 1", 10.0)
+
+    def locked(src, dst):
+        raise PermissionError("file đang được tiến trình khác map")
+
+    # Windows: instance khác đang map file, không thay được khi mở rộng/xóa
+    monkeypatch.setattr(os, 'replace', locked)
+    assert not index.learn("Ad 2", 10.0)
+    index.clear()
+    # Bảng cũ vẫn dùng được
+    assert index.match("Ad 0").duration == 10.0
+    assert index.learn("Ad 1", 10.0) and index.match("Ad 1") is not None
+    assert index.capacity == 4
+    index.close()
+
+
+def test_grows_and_rehashes(tmp_path):
+    path = str(tmp_path / 'ads.bin')
+    index = KnownAdIndex(path, capacity=8).open()
+    for i in range(100):
+        index.learn(f"Ad {i}", 10.0)
+        index.learn(f"Ad {i}", 10.0)
+    assert len(index) == 100 and index.capacity == 256
+    assert all(index.match(f"Ad {i}") for i in range(100))
+    index.clear()
+    assert len(index) == 0 and index.match("Ad 1") is None
+    index.close()
+    assert os.path.getsize(path) == HEADER.size + 8 * 20
+
+
+def test_corrupt_file_is_replaced(tmp_path):
+    path = tmp_path / 'ads.bin'
+    path.write_bytes(b'not an index' * 10)
+    index = KnownAdIndex(str(path)).open()
+    assert len(index) == 0
+    assert index.learn("Brand X", 20.0)
+    index.close()
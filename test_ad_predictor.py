@@ -0,0 +1,61 @@
+from ad_predictor import AdBreakPredictor
+
+
+def play(predictor, schedule):
+    """schedule: danh sách (thời điểm, tiêu đề, is_ad)"""
+    for now, title, is_ad in schedule:
+        predictor.observe(title, is_ad, now=now)
+
+
+# Mỗi vòng: hai bài 100 s rồi một quảng cáo 30 s
+CYCLE = [(0, "A - One", False), (100, "B - Two", False), (200, "Advertisement", True)]
+
+
+def cycles(count, length=230):
+    return [(t + i * length, title, is_ad) for i in range(count) for t, title, is_ad in CYCLE]
+
+
+def test_not_hot_without_history():
+    predictor = AdBreakPredictor()
+    play(predictor, cycles(1))
+    assert predictor.expected_gap() is None
+    assert not predictor.is_hot(now=250)
+
+
+def test_hot_near_learned_boundary():
+    predictor = AdBreakPredictor(hot_lead=10.0)
+    play(predictor, cycles(3))
+    play(predictor, [(690, "A - One", False), (790, "B - Two", False)])
+
+    assert round(predictor.expected_gap()) == 200
+    assert predictor.remaining(now=850) == 40
+    assert not predictor.is_hot(now=850)
+    assert predictor.is_hot(now=885)
+    assert predictor.should_pre_mute(now=889.8)
+
+
+def test_false_mutes_are_limited_by_budget():
+    predictor = AdBreakPredictor(false_mute_budget=1, budget_window=3600)
+    play(predictor, cycles(3))
+    play(predictor, [(690, "A - One", False), (790, "B - Two", False)])
+
+    predictor.mark_pre_muted(now=889.8)
+    # Spotify không chèn quảng cáo lần này
+    predictor.observe("C - Three", False, now=890)
+    assert predictor.false_mute_total == 1
+    assert predictor.budget_left(now=890) == 0
+
+    predictor.observe("B - Two", False, now=1000)
+    assert not predictor.should_pre_mute(now=1099.8)
+    assert predictor.suspended == 1
+
+
+def test_pre_mute_expires_when_title_does_not_change():
+    predictor = AdBreakPredictor(pre_mute_timeout=2.0)
+    play(predictor, cycles(3))
+    play(predictor, [(690, "A - One", False), (790, "B - Two", False)])
+
+    predictor.mark_pre_muted(now=889.8)
+    assert not predictor.pre_mute_expired(now=890.5)
+    assert predictor.pre_mute_expired(now=892.5)
+    assert predictor.false_mute_total == 1
@@ -0,0 +1,359 @@
+import asyncio
+import threading
+import time
+
+import event_store
+from async_monitor import AsyncMonitor
+from detection_state import DetectionStateMachine
+from title_watcher import ScriptedTitleSource
+
+
+def run_monitor(monitor, duration):
+    thread = threading.Thread(target=asyncio.run, args=(monitor.run(),), daemon=True)
+    thread.start()
+    time.sleep(duration)
+    monitor.stop()
+    thread.join(2.0)
+    assert not thread.is_alive()
+
+
+def test_slow_mute_does_not_delay_sampling():
+    source = ScriptedTitleSource([(0.0, "Artist - Song"), (0.05, "Advertisement")])
+    calls = []
+
+    def slow_mute():
+        calls.append('mute')
+        time.sleep(0.3)
+        return True
+
+    def unmute():
+        calls.append('unmute')
+        return True
+
+    monitor = AsyncMonitor(source, lambda t: ' - ' not in t, slow_mute, unmute,
+                           check_interval=0.01)
+    source.start()
+    run_monitor(monitor, 0.25)
+
+    # Trong lúc SetMute bị treo 0.3 s, tiêu đề vẫn được đọc đều đặn
+    assert monitor.samples >= 10
+    assert monitor.ad_count == 1
+    # Khi thoát luôn trả lại âm thanh
+    assert calls == ['mute', 'unmute']
+    assert not monitor.is_muted
+
+
+def test_only_latest_action_runs_when_audio_lags():
+    source = ScriptedTitleSource([(0.0, "Advertisement"), (0.02, "Artist - Song"),
+                                  (0.04, "Spotify"), (0.06, "Artist - Other")])
+    calls = []
+
+    def action(name):
+        def run():
+            calls.append(name)
+            time.sleep(0.1)
+            return True
+        return run
+
+    monitor = AsyncMonitor(source, lambda t: ' - ' not in t, action('mute'), action('unmute'),
+                           check_interval=0.005)
+    source.start()
+    run_monitor(monitor, 0.4)
+
+    assert calls[0] == 'mute'
+    assert calls[-1] == 'unmute'
+    assert len(calls) < 4
+
+
+def test_disable_unmutes_and_notifies():
+    source = ScriptedTitleSource([(0.0, "Advertisement")])
+    states = []
+    monitor = AsyncMonitor(source, lambda t: True, lambda: True, lambda: True,
+                           notify=lambda m: states.append((m.enabled, m.is_muted)),
+                           check_interval=0.01)
+    source.start()
+    thread = threading.Thread(target=asyncio.run, args=(monitor.run(),), daemon=True)
+    thread.start()
+    time.sleep(0.1)
+    monitor.set_enabled(False)
+    time.sleep(0.1)
+    monitor.stop()
+    thread.join(2.0)
+
+    assert (True, True) in states
+    assert states[-1] == (False, False)
+
+
+def test_predictor_hot_mode_prefetches_and_pre_mutes():
+    class StubPredictor:
+        hot_interval = 0.005
+        clock = staticmethod(time.monotonic)
+
+        def __init__(self):
+            self.armed = True
+            self.observed = []
+
+        def is_hot(self, now):
+            return True
+
+        def should_pre_mute(self, now):
+            return self.armed
+
+        def mark_pre_muted(self, now):
+            self.armed = False
+
+        def pre_mute_expired(self, now):
+            return False
+
+        def remaining(self):
+            return None
+
+        def observe(self, title, is_ad):
+            self.observed.append((title, is_ad))
+
+    source = ScriptedTitleSource([(0.0, "Artist - Song"), (0.1, "Advertisement")])
+    calls = []
+    predictor = StubPredictor()
+    monitor = AsyncMonitor(source, lambda t: ' - ' not in t,
+                           lambda: calls.append('mute') or True,
+                           lambda: calls.append('unmute') or True,
+                           check_interval=1.0, predictor=predictor,
+                           prefetch=lambda: calls.append('prefetch'))
+    source.start()
+    run_monitor(monitor, 0.2)
+
+    # Chu kỳ hot thay cho check_interval 1 s, session được lấy sẵn trước khi mute
+    assert monitor.samples >= 10
+    assert calls[:2] == ['prefetch', 'mute']
+    # Quảng cáo tới sau pre-mute vẫn được đếm là một đợt quảng cáo mới
+    assert monitor.ad_count == 1
+    assert predictor.observed == [("Artist - Song", False), ("Advertisement", True)]
+    assert calls[-1] == 'unmute'
+
+
+def test_window_reads_are_skipped_while_spotify_is_down():
+    from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+
+    table = FakeProcessTable({1: "explorer.exe"})
+    watcher = SpotifyProcessWatcher(table, min_interval=0.0)
+    reads = []
+
+    def get_title():
+        reads.append(1)
+        return "Artist - Song"
+
+    monitor = AsyncMonitor(get_title, lambda t: False, lambda: True, lambda: True,
+                           check_interval=0.01, process_watcher=watcher)
+    # Không thấy Spotify: scheduler lùi về chu kỳ absent
+    monitor.scheduler.absent_interval = 0.01
+    thread = threading.Thread(target=asyncio.run, args=(monitor.run(),), daemon=True)
+    thread.start()
+    time.sleep(0.1)
+    assert reads == []
+
+    table.spawn(42, "Spotify.exe")
+    time.sleep(0.1)
+    monitor.stop()
+    thread.join(2.0)
+    assert reads
+    assert monitor.last_title == "Artist - Song"
+
+
+def test_refresh_reclassifies_current_title():
+    source = ScriptedTitleSource([(0.0, "Podcast Promo - Listen now")])
+    rules = {'denied': False}
+    calls = []
+    monitor = AsyncMonitor(source, lambda t: rules['denied'],
+                           lambda: calls.append('mute') or True, lambda: True,
+                           check_interval=0.5)
+    source.start()
+    thread = threading.Thread(target=asyncio.run, args=(monitor.run(),), daemon=True)
+    thread.start()
+    time.sleep(0.05)
+    # Luật mới được nạp: tiêu đề đang hiển thị được phân loại lại ngay, không chờ chu kỳ
+    rules['denied'] = True
+    monitor.refresh()
+    time.sleep(0.05)
+    assert calls == ['mute'] and monitor.ad_count == 1
+    monitor.stop()
+    thread.join(2.0)
+
+
+def test_known_ad_skips_classifier_and_wakes_at_predicted_end(tmp_path):
+    from ad_index import KnownAdIndex
+
+    index = KnownAdIndex(str(tmp_path / 'ads.bin'), min_duration=0.1).open()
+    index.learn("Brand X", 0.15)
+    index.learn("Brand X", 0.15)
+    source = ScriptedTitleSource([(0.0, "Brand X"), (0.12, "Artist - Song")])
+    classified = []
+    calls = []
+
+    def is_ad(title):
+        classified.append(title)
+        return ' - ' not in title
+
+    monitor = AsyncMonitor(source, is_ad, lambda: calls.append('mute') or True,
+                           lambda: calls.append('unmute') or True,
+                           check_interval=1.0, ad_index=index)
+    # Không burst: chỉ có lần đọc đúng lúc quảng cáo dự kiến hết
+    monitor.scheduler.burst_interval = None
+    source.start()
+    run_monitor(monitor, 0.3)
+
+    assert classified == ["Artist - Song"]
+    assert monitor.index_hits == 1 and monitor.ad_count == 1
+    assert calls == ['mute', 'unmute']
+    # Thời lượng lần này được học thêm
+    assert index.lookup("Brand X").seen == 3
+    index.close()
+
+
+def test_known_ad_end_uses_the_detector_clock(tmp_path):
+    from ad_index import KnownAdIndex
+
+    index = KnownAdIndex(str(tmp_path / 'ads.bin')).open()
+    index.learn("Brand X", 30.0)
+    index.learn("Brand X", 30.0)
+    now = [1000.0]
+    titles = iter(["Brand X"] * 3 + ["Artist - Song"])
+    monitor = AsyncMonitor(lambda: next(titles), lambda title: ' - ' not in title,
+                           lambda: True, lambda: True, check_interval=60.0, ad_index=index,
+                           detector=DetectionStateMachine(clock=lambda: now[0]))
+    monitor.scheduler.burst_interval = None
+    monitor.check_once(now[0])
+    assert monitor.ad_ends_at == 1030.0
+    assert monitor.next_interval() == 30.0
+
+    # Đồng hồ ảo chạy tiếp: lần đọc kế tiếp rơi đúng lúc quảng cáo dự kiến hết
+    now[0] = 1020.0
+    monitor.check_once(now[0])
+    assert monitor.next_interval() == 10.0
+    now[0] = 1030.0
+    monitor.check_once(now[0])
+    assert monitor.is_muted
+    now[0] = 1030.1
+    monitor.check_once(now[0])
+    assert not monitor.is_muted and index.lookup("Brand X").seen == 3
+    index.close()
+
+
+def test_transient_titles_do_not_reach_audio():
+    source = ScriptedTitleSource([(0.0, "A - One"), (0.05, "Spotify"), (0.07, ""),
+                                  (0.09, "B - Two"), (0.15, "Advertisement"),
+                                  (0.2, "Spotify"), (0.22, "C - Three")])
+    calls = []
+    monitor = AsyncMonitor(source, lambda t: ' - ' not in t,
+                           lambda: calls.append('mute') or True,
+                           lambda: calls.append('unmute') or True, check_interval=0.005)
+    source.start()
+    run_monitor(monitor, 0.3)
+
+    # Một lệnh cho mỗi chuyển tiếp thật: vào quảng cáo và hết quảng cáo
+    assert calls == ['mute', 'unmute']
+    assert monitor.detector.blips == 2
+    assert monitor.detector.saved_actions == 2
+
+
+def test_classify_and_audio_errors_do_not_stop_the_monitor(caplog):
+    source = ScriptedTitleSource([(0.0, "Broken - Title"), (0.05, "Advertisement")])
+    calls = []
+
+    def is_ad(title):
+        if title == "Broken - Title":
+            raise RuntimeError("luật hỏng")
+        return ' - ' not in title
+
+    class BrokenHistory:
+        def record(self, kind, title=None, **kwargs):
+            if kind == event_store.MUTE:
+                raise OSError("file lịch sử bị khóa")
+
+    monitor = AsyncMonitor(source, is_ad, lambda: calls.append('mute') or True,
+                           lambda: calls.append('unmute') or True,
+                           check_interval=0.01, history=BrokenHistory())
+    source.start()
+    run_monitor(monitor, 0.2)
+
+    # Tiêu đề lỗi được ghi log, các tiêu đề sau vẫn được phân loại và mute
+    assert monitor.ad_count == 1
+    assert "luật hỏng" in caplog.text and "file lịch sử bị khóa" in caplog.text
+    # Task audio vẫn sống để trả lại âm thanh khi thoát
+    assert calls == ['mute', 'unmute']
+
+
+def test_predictor_and_index_learn_from_detector_decisions(tmp_path):
+    from ad_index import KnownAdIndex
+    from ad_predictor import AdBreakPredictor
+    from detection_state import AD, PAUSED, DetectionStateMachine
+
+    clock = [0.0]
+    title = ["A - One"]
+    audible = [None]
+    calls = []
+    predictor = AdBreakPredictor(clock=lambda: clock[0])
+    index = KnownAdIndex(str(tmp_path / 'ads.bin'), min_duration=1.0).open()
+    monitor = AsyncMonitor(lambda: title[0], lambda t: ' - ' not in t,
+                           lambda: calls.append('mute') or True,
+                           lambda: calls.append('unmute') or True,
+                           predictor=predictor, ad_index=index,
+                           is_audible=lambda: audible[0],
+                           detector=DetectionStateMachine(confirm_pause=1.0,
+                                                          clock=lambda: clock[0]))
+
+    def check(value, t):
+        title[0] = value
+        clock[0] = t
+        monitor.check_once(now=t)
+
+    for t, value in ((0.0, "A - One"), (10.0, "Brand Y"), (40.0, "Spotify"),
+                     (41.0, "Brand X"), (70.0, "B - Two")):
+        check(value, t)
+    # "Spotify" giữa hai quảng cáo không mở đợt mới, không được học như quảng cáo
+    assert calls == ['mute', 'unmute'] and monitor.ad_count == 1
+    assert predictor.misses == 1 and predictor.hits == 0
+    assert index.lookup("Spotify") is None
+    assert index.lookup("Brand Y").duration == 30.0
+
+    # Tạm dừng thật: không phải quảng cáo
+    check("Spotify", 100.0)
+    check("Spotify", 101.5)
+    assert monitor.detector.state == PAUSED and monitor.ad_count == 1
+    # Tiêu đề tạm dừng mà vẫn có tiếng: nâng lên quảng cáo
+    check("B - Two", 110.0)
+    audible[0] = True
+    check("Spotify", 200.0)
+    check("Spotify", 201.5)
+    assert monitor.detector.state == AD and monitor.ad_count == 2
+    assert calls == ['mute', 'unmute', 'mute'] and predictor.misses == 2
+    index.close()
+
+
+def test_check_once_applies_predictor_like_the_sample_task():
+    from ad_predictor import AdBreakPredictor
+
+    clock = [0.0]
+    title = ["A - One"]
+    calls = []
+    predictor = AdBreakPredictor(min_breaks=1, pre_mute_lead=0.5, clock=lambda: clock[0])
+    monitor = AsyncMonitor(lambda: title[0], lambda t: ' - ' not in t,
+                           lambda: calls.append('mute') or True,
+                           lambda: calls.append('unmute') or True,
+                           predictor=predictor)
+
+    def check(value, t):
+        title[0] = value
+        clock[0] = t
+        monitor.check_once(now=t)
+
+    # Một đợt quảng cáo để predictor học độ dài bài và khoảng cách giữa các đợt
+    for t, value in ((0.0, "A - One"), (10.0, "Brand X"), (40.0, "A - One")):
+        check(value, t)
+    assert calls[0] == 'mute' and calls[-1] == 'unmute' and predictor.misses == 1
+    calls.clear()
+    # Gần hết "A - One" lần nữa: mute trước khi quảng cáo tới
+    check("A - One", 49.6)
+    assert monitor.hot and monitor.pre_muted
+    assert calls == ['mute']
+    check("Brand Y", 50.0)
+    assert predictor.hits == 1 and monitor.ad_count == 2
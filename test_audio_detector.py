@@ -0,0 +1,169 @@
+import wave
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from audio_detector import (SAMPLE_RATE, AudioAdDetector, AudioSecondOpinion, Jingle,
+                            RingBuffer, WavCaptureSource)
+
+
+def music(seconds, amp=0.1, seed=0):
+    """Hợp âm ngẫu nhiên đổi mỗi nửa giây + nhiễu nhẹ"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    out = np.zeros_like(t)
+    for i in range(int(seconds * 2)):
+        segment = (t >= i * 0.5) & (t < (i + 1) * 0.5)
+        for freq in rng.uniform(150, 2000, 3):
+            out[segment] += np.sin(2 * np.pi * freq * t[segment])
+    return (amp * out / 3 + 0.005 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def jingle(seconds=2.0, rate=SAMPLE_RATE):
+    t = np.arange(int(seconds * rate)) / rate
+    sweep = np.sin(2 * np.pi * np.cumsum(400 + 1500 * t / seconds) / rate)
+    beeps = np.sin(2 * np.pi * 900 * t) * (t % 0.25 < 0.12)
+    return (0.3 * sweep + 0.2 * beeps).astype(np.float32)
+
+
+def write_wav(path, samples, rate=SAMPLE_RATE, channels=1):
+    data = np.clip(samples, -1, 1)
+    if channels == 2:
+        data = np.repeat(data, 2)
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((data * 32767).astype('<i2').tobytes())
+    return str(path)
+
+
+def test_ring_buffer_wraps_and_reads_by_absolute_position():
+    ring = RingBuffer(5)
+    ring.write(np.arange(3))
+    ring.write(np.arange(3, 8))
+    assert ring.start == 3 and ring.total == 8
+    assert ring.read(4, 7).tolist() == [4, 5, 6]
+    assert ring.latest(10).tolist() == [3, 4, 5, 6, 7]
+    with pytest.raises(IndexError):
+        ring.read(2)
+
+
+def test_wav_jingle_is_detected_over_fake_capture(tmp_path):
+    reference = write_wav(tmp_path / 'jingle.wav', jingle(rate=44100), rate=44100,
+                          channels=2)
+    # Jingle lệch khung, có nhiễu, cùng âm lượng với nhạc (không dựa vào độ lớn)
+    rng = np.random.default_rng(1)
+    played = jingle() * 0.35 + 0.02 * rng.standard_normal(2 * SAMPLE_RATE).astype(np.float32)
+    stream = write_wav(tmp_path / 'stream.wav',
+                       np.concatenate([music(10, seed=3), np.zeros(77), played]))
+
+    scores = []
+    detector = AudioAdDetector(WavCaptureSource([stream]), jingles=[Jingle.from_wav(reference)],
+                               on_change=lambda: scores.append(detector.snapshot.ad_score))
+    detector.start()
+    detector.join(10.0)
+    assert scores and scores[0] >= 0.8
+    assert detector.snapshot.jingle.endswith('jingle.wav')
+
+
+def test_music_alone_is_not_flagged_and_memory_is_bounded():
+    detector = AudioAdDetector(WavCaptureSource([]), jingles=[Jingle.from_samples('j', jingle())])
+    sizes = None
+    peak = 0.0
+    for seed in range(3):
+        samples = music(20, amp=0.2, seed=seed)
+        for i in range(0, len(samples), 1600):
+            peak = max(peak, detector.feed(samples[i:i + 1600]).ad_score)
+        current = (detector.samples.data.nbytes, detector.levels.data.nbytes)
+        assert sizes is None or current == sizes
+        sizes = current
+    assert peak < 0.5
+
+
+def test_loudness_jump_and_silence():
+    detector = AudioAdDetector(WavCaptureSource([]))
+    detector.feed(music(20, amp=0.05, seed=1))
+    assert detector.snapshot.ad_score == 0.0
+    detector.feed(music(4, amp=0.2, seed=2))  # +12 dB
+    assert detector.snapshot.loudness_jump > 9 and detector.snapshot.ad_score == 1.0
+    detector.feed(np.zeros(3 * SAMPLE_RATE, dtype=np.float32))
+    assert detector.snapshot.silent_for >= 2.9
+
+
+def test_second_opinion_combines_with_title_verdict():
+    now = [0.0]
+    detector = AudioAdDetector(WavCaptureSource([]), clock=lambda: now[0])
+    opinion = AudioSecondOpinion(detector)
+
+    # Chưa có dữ liệu âm thanh: chỉ dùng tiêu đề
+    assert opinion.combine("Spotify", True, False, False)
+
+    detector.feed(music(20, amp=0.05, seed=1))
+    assert not opinion.combine("Brand - Summer Sale", False, True, False)
+    detector.feed(music(4, amp=0.2, seed=2))
+    # Tiêu đề kiểu bài hát nhưng âm thanh to đột ngột ngay đầu bài -> quảng cáo,
+    # giữ trong lúc còn mute (âm thanh thu được chỉ còn im lặng)
+    assert opinion.combine("Brand - Summer Sale", False, True, False)
+    detector.feed(np.zeros(3 * SAMPLE_RATE, dtype=np.float32))
+    assert opinion.combine("Brand - Summer Sale", False, True, True)
+
+    # Im lặng từ trước, không bị mute: "Spotify" là tạm dừng
+    assert not opinion.combine("Spotify", True, False, False)
+    # Đang mute thì im lặng không có nghĩa
+    assert opinion.combine("Advertisement", True, False, True)
+    # Snapshot quá cũ (capture dừng): chỉ dùng tiêu đề
+    now[0] = 5.0
+    assert opinion.combine("Spotify", True, False, False)
+    assert opinion.audio_ads == 1 and opinion.pauses == 1
+
+
+def test_audible_reports_sound_only_from_fresh_snapshots():
+    now = [0.0]
+    detector = AudioAdDetector(WavCaptureSource([]), clock=lambda: now[0])
+    opinion = AudioSecondOpinion(detector)
+    # Chưa có snapshot: không biết
+    assert opinion.audible() is None
+    detector.feed(music(2, amp=0.1))
+    assert opinion.audible() is True
+    detector.feed(np.zeros(2 * SAMPLE_RATE, dtype=np.float32))
+    assert opinion.audible() is False
+    # Capture dừng: không đoán
+    now[0] = 5.0
+    assert opinion.audible() is None
+
+
+def tone(seconds, db, freq=440.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (10 ** (db / 20) * np.sqrt(2) * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_song_getting_louder_mid_track_is_not_an_ad():
+    now = [0.0]
+    changes = []
+    detector = AudioAdDetector(WavCaptureSource([]), clock=lambda: now[0],
+                               on_change=lambda: changes.append(now[0]))
+    opinion = AudioSecondOpinion(detector, max_age=100.0)
+
+    assert not opinion.combine("Artist - Song", False, True, False)
+    detector.feed(tone(35, -33))
+    # Đoạn cao trào to hơn 12 dB giữa bài: không tính độ lớn, không phân loại lại
+    now[0] = 35.0
+    detector.feed(tone(5, -21))
+    assert detector.snapshot.loudness_jump > 9 and detector.snapshot.ad_score == 0.0
+    assert changes == []
+    assert not opinion.combine("Artist - Song", False, True, False)
+
+    # Cùng mức tăng ngay sau khi tiêu đề đổi: quảng cáo, nhưng không giữ theo tiêu đề
+    assert not opinion.combine("Brand - Promo", False, True, False)
+    detector.feed(tone(30, -33))
+    detector.feed(tone(4, -21))
+    assert changes == [35.0]
+    assert opinion.combine("Brand - Promo", False, True, False)
+    assert opinion.sticky_title is None
+    detector.feed(np.zeros(3 * SAMPLE_RATE, dtype=np.float32))
+    assert opinion.combine("Brand - Promo", False, True, True)
+    # Không còn mute (vd người dùng tắt chức năng): đánh giá lại, không còn là quảng cáo
+    now[0] = 45.0
+    assert not opinion.combine("Brand - Promo", False, True, False)
@@ -0,0 +1,102 @@
+from audio_sessions import FakeAudioBackend, SpotifySessionManager
+
+
+def test_mute_unmute_reuse_cached_sessions():
+    backend = FakeAudioBackend(['a', 'b'])
+    manager = SpotifySessionManager(backend)
+
+    assert manager.mute() == 2
+    assert manager.unmute() == 2
+    assert manager.mute() == 2
+    assert backend.find_calls == 1
+    assert backend.is_muted('a') and backend.is_muted('b')
+
+
+def test_session_created_event_refreshes_cache():
+    backend = FakeAudioBackend(['a'])
+    manager = SpotifySessionManager(backend)
+    manager.mute()
+
+    backend.add_session('b')
+    assert manager.mute() == 2
+    assert backend.find_calls == 2
+    assert backend.is_muted('b')
+
+
+def test_failed_call_refreshes_and_retries():
+    backend = FakeAudioBackend(['a', 'b'])
+    manager = SpotifySessionManager(backend)
+    manager.mute()
+
+    # Session hết hạn nhưng không có sự kiện -> SetMute lỗi -> làm mới
+    backend.expire_session('a', notify=False)
+    assert manager.unmute() == 1
+    assert backend.find_calls == 2
+    assert [h.key for h in manager.handles] == ['b']
+
+
+def test_no_sessions_lists_again_each_call():
+    backend = FakeAudioBackend([])
+    manager = SpotifySessionManager(backend)
+
+    assert manager.mute() == 0
+    assert manager.mute() == 0
+    assert backend.find_calls == 2
+
+
+def test_repeated_mute_skips_sessions_already_muted():
+    backend = FakeAudioBackend(['a', 'b'])
+    manager = SpotifySessionManager(backend)
+
+    assert manager.mute() == 2
+    calls = backend.set_mute_calls
+    # Quảng cáo nối tiếp: mọi session đã mute, không gọi backend lần nào
+    assert manager.mute() == 2
+    assert manager.mute() == 2
+    assert backend.set_mute_calls == calls
+    assert manager.skipped_calls == 4
+
+
+def test_only_out_of_sync_sessions_are_reconciled():
+    backend = FakeAudioBackend(['a', 'b'])
+    manager = SpotifySessionManager(backend)
+    manager.mute()
+
+    # Người dùng bật tiếng 'a' trong Volume Mixer
+    backend.external_set_mute('a', False)
+    assert manager.out_of_sync() == ['a']
+    calls = backend.set_mute_calls
+    assert manager.mute() == 2
+    assert backend.set_mute_calls == calls + 1
+    assert backend.is_muted('a')
+
+    # Spotify tạo session mới giữa hai quảng cáo: chỉ session mới được mute
+    backend.add_session('c')
+    calls = backend.set_mute_calls
+    assert manager.mute() == 3
+    assert backend.set_mute_calls == calls + 1
+    assert backend.is_muted('c')
+
+
+def test_expired_key_reused_is_reconciled():
+    backend = FakeAudioBackend(['a'])
+    manager = SpotifySessionManager(backend)
+    manager.mute()
+
+    backend.expire_session('a')
+    backend.add_session('a')
+    assert manager.mute() == 1
+    assert backend.is_muted('a')
+
+
+def test_failed_session_is_retried_next_time():
+    backend = FakeAudioBackend(['a', 'b'])
+    manager = SpotifySessionManager(backend)
+    backend.failing.add('a')
+    manager.mute()
+    assert manager.out_of_sync() == ['a']
+
+    backend.failing.clear()
+    manager.mute()
+    assert manager.out_of_sync() == []
+    assert backend.is_muted('a')
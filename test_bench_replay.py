@@ -0,0 +1,50 @@
+import glob
+import os
+
+from bench_replay import TIMELINE_DIR, load_timeline, replay, tick_times
+
+
+def test_load_timeline_skips_comments_and_keeps_empty_titles(tmp_path):
+    path = tmp_path / 'timeline.tsv'
+    path.write_text("# offset\tnhãn\ttiêu đề\n0.0\tmusic\tArtist - Song\n\n"
+                    "12.5\tclosed\n20.0\tad\tBrand X - Sale\tmore\n", encoding='utf-8')
+    assert load_timeline(str(path)) == [
+        (0.0, 'music', "Artist - Song"),
+        (12.5, 'closed', ""),
+        (20.0, 'ad', "Brand X - Sale\tmore"),
+    ]
+
+
+def test_push_ticks_on_changes_resync_and_confirm_deadlines():
+    segments = [(0.0, 'music', "A - 1"), (10.0, 'closed', ""), (20.0, 'music', "B - 2")]
+    clock = [0.0]
+    # Sau lần thức dậy lúc 10.0 đang chờ xác nhận CLOSED 2 giây
+    waits = {10.0: 2.0}
+    ticks = list(tick_times(segments, 'push', 0.3, lambda: waits.get(clock[0], 5.0), clock))
+    assert ticks == [0.0, 5.0, 10.0, 12.0, 17.0, 20.0]
+
+    # Chức năng tắt (None): chỉ còn sự kiện đổi tiêu đề đánh thức
+    ticks = list(tick_times(segments, 'push', 0.3, lambda: None, clock))
+    assert ticks == [0.0, 10.0, 20.0]
+
+
+def test_shipped_timelines_detect_the_same_ads_on_every_backend():
+    for path in sorted(glob.glob(os.path.join(TIMELINE_DIR, '*.tsv'))):
+        segments = load_timeline(path)
+        polling = replay(segments, 'polling')
+        push = replay(segments, 'push')
+        adaptive = replay(segments, 'adaptive')
+        for result in (push, adaptive):
+            assert result['false_positives'] == polling['false_positives'], path
+            assert result['false_negatives'] == polling['false_negatives'], path
+            assert result['ad_breaks_detected'] == polling['ad_breaks_detected'], path
+        assert push['latency_max_ms'] <= polling['latency_max_ms'], path
+        assert push['wakeups'] < polling['wakeups'], path
+
+
+def test_free_tier_session_has_no_misses():
+    result = replay(load_timeline(os.path.join(TIMELINE_DIR, 'free_tier_session.tsv')))
+    assert result['false_positives'] == 0 and result['false_negatives'] == 0
+    assert result['ad_breaks_detected'] > 0
+    # Một lần liệt kê audio session cho cả phiên (session được cache)
+    assert result['session_enumerations'] == 1
@@ -0,0 +1,24 @@
+import os
+
+from comtypes_cache import cache_key, prepare_cache_dir
+
+
+def test_cache_key_changes_with_versions():
+    key = cache_key('1.0.0', '1.4.1')
+    assert key.startswith('1.0.0-py') and key.endswith('-comtypes1.4.1')
+    assert cache_key('1.1.0', '1.4.1') != key
+
+
+def test_cache_dir_is_kept_and_stale_versions_pruned(tmp_path):
+    root = str(tmp_path)
+    old = prepare_cache_dir(root, cache_key('0.9.0', '1.4.1'))
+    open(os.path.join(old, '_generated.py'), 'w').close()
+
+    path = prepare_cache_dir(root, cache_key('1.0.0', '1.4.1'))
+    assert os.path.exists(os.path.join(path, '__init__.py'))
+    assert not os.path.exists(old)
+
+    # Lần khởi động sau cùng phiên bản: code đã sinh vẫn còn
+    open(os.path.join(path, '_generated.py'), 'w').close()
+    assert prepare_cache_dir(root, cache_key('1.0.0', '1.4.1')) == path
+    assert os.path.exists(os.path.join(path, '_generated.py'))
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+from audio_sessions import FakeAudioBackend, SpotifySessionManager
+from config import AppConfig, ConfigError, ConfigWatcher, load_config
+from event_store import EventStore
+from platform_backends import PlatformBackend
+from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+from spotify_ads_mute_tray import SpotifyAdsMuteTray
+from window_resolver import FakeWindowApi, SpotifyWindowResolver
+
+
+def write(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    # mtime trên một số hệ thống tập tin chỉ chính xác tới giây
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_missing_file_gives_defaults(tmp_path):
+    config = load_config(str(tmp_path / 'none.json'))
+    assert config.check_interval == 0.3
+    assert 'advertisement' in config.classifier['keywords']
+    assert config.build_classifier().is_ad("Advertisement")
+
+
+def test_partial_file_is_merged_and_validated(tmp_path):
+    path = tmp_path / 'cfg.json'
+    write(path, {'check_interval': 0.5, 'log': {'level': 'debug'}})
+    config = load_config(str(path))
+    assert config.check_interval == 0.5 and config.resync_interval == 5.0
+    assert config.log['level'] == 'DEBUG' and config.log['backup_count'] == 3
+
+    assert AppConfig({'detection': {'confirm_pause': 0}}).build_detector().confirm_pause == 0
+
+    for bad in ({'check_interval': -1}, {'keywords': ['x']}, {'backend': 'mac'}, {'fade': 1},
+                {'classifier': {'keywords': 'ad'}}, {'detection': {'confirm_ad': -0.5}}):
+        with pytest.raises(ConfigError):
+            AppConfig(bad)
+    path.write_text('{"check_interval": ', encoding='utf-8')
+    with pytest.raises(ConfigError):
+        load_config(str(path))
+
+
+def test_reload_swaps_classifier_and_interval(tmp_path):
+    path = tmp_path / 'cfg.json'
+    write(path, {})
+    api = FakeWindowApi({100: (1234, "Podcast Promo - Listen now")}, {1234: "Spotify.exe"})
+    app = SpotifyAdsMuteTray(
+        window_resolver=SpotifyWindowResolver(api),
+        session_manager=SpotifySessionManager(FakeAudioBackend()),
+        process_watcher=SpotifyProcessWatcher(FakeProcessTable({1234: "Spotify.exe"})),
+        platform_backend=PlatformBackend(),
+        history=EventStore(str(tmp_path / 'events.bin')),
+        config=load_config(str(path)),
+    )
+    engine = app.engine
+    watcher = ConfigWatcher(str(path), engine.apply_config)
+    assert not engine.is_ad("Podcast Promo - Listen now")
+    # Mặc định SetMute: âm lượng của session không bị đổi
+    assert engine.audio_sink.fade is False
+    assert not watcher.check()  # File chưa đổi
+
+    write(path, {'classifier': {'denied_artists': ['Podcast Promo']}, 'check_interval': 0.2,
+                 'fade': True})
+    assert watcher.check()
+    assert engine.is_ad("Podcast Promo - Listen now") and engine.audio_sink.fade
+    assert engine.scheduler.interval == 0.2 and engine.scheduler.burst_interval == 0.1
+
+    # File hỏng: giữ nguyên luật đang chạy
+    classifier = engine.classifier
+    path.write_text('{', encoding='utf-8')
+    assert not watcher.check()
+    assert engine.classifier is classifier and watcher.failures == 1
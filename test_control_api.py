@@ -0,0 +1,142 @@
+import os
+import socket
+import stat
+import threading
+
+import pytest
+
+from ad_index import KnownAdIndex
+from audio_sessions import FakeAudioBackend, SpotifySessionManager
+from control_api import ControlClient, ControlServer
+from event_store import EventStore
+from platform_backends import PlatformBackend
+from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+from spotify_ads_mute_daemon import SpotifyAdsMuteDaemon
+from window_resolver import FakeWindowApi, SpotifyWindowResolver
+
+
+@pytest.fixture
+def server(tmp_path):
+    state = {'enabled': True}
+
+    def set_enabled(request):
+        state['enabled'] = request['value']
+        return {'enabled': state['enabled']}
+
+    server = ControlServer({'status': lambda request: dict(state), 'set': set_enabled},
+                           address=str(tmp_path / 'ctl.sock'),
+                           streams={'metrics': lambda: {'n': 1}}, write_timeout=0.2)
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_requests_and_errors(server):
+    with ControlClient(server.address) as client:
+        assert client.request('status') == {'ok': True, 'enabled': True}
+        assert client.request('set', value=False, id=3) == {'ok': True, 'enabled': False, 'id': 3}
+        error = client.request('nope', id=4)
+        assert not error['ok'] and 'metrics' in error['error'] and error['id'] == 4
+
+        # JSON hỏng không làm rớt kết nối
+        client._file.write(b'{not json\n')
+        client._file.flush()
+        assert not client._read()['ok']
+        assert client.request('status')['enabled'] is False
+    assert server.stats()['errors'] == 2
+
+
+def test_metrics_stream_stops_after_count(server):
+    with ControlClient(server.address) as client:
+        lines = list(client.stream('metrics', interval=0.05, count=3))
+    assert [line['n'] for line in lines] == [1, 1, 1]
+    assert all(line['ts'] for line in lines)
+
+
+def test_second_server_on_same_address_is_refused(server):
+    with pytest.raises(RuntimeError):
+        ControlServer({}, address=server.address).start()
+
+
+def test_socket_is_created_owner_only(tmp_path, monkeypatch):
+    path = str(tmp_path / 'private.sock')
+    modes = []
+    bind = socket.socket.bind
+
+    def checked_bind(sock, address):
+        bind(sock, address)
+        # Quyền ngay sau bind, trước mọi chmod
+        modes.append(stat.S_IMODE(os.stat(address).st_mode))
+
+    monkeypatch.setattr(socket.socket, 'bind', checked_bind)
+    old_umask = os.umask(0o022)
+    try:
+        server = ControlServer({'status': lambda request: {}}, address=path)
+        server.start()
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        server.stop()
+        # umask của tiến trình được trả lại
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(old_umask)
+    # Nhóm/người khác không có quyền ngay từ lúc tạo
+    assert len(modes) == 1 and modes[0] & 0o077 == 0
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = str(tmp_path / 'stale.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()  # File socket còn đó nhưng không ai nghe
+
+    server = ControlServer({'status': lambda request: {}}, address=path)
+    server.start()
+    try:
+        with ControlClient(path) as client:
+            assert client.request('status')['ok']
+    finally:
+        server.stop()
+
+
+def test_daemon_control_commands(tmp_path):
+    api = FakeWindowApi({100: (1234, "Advertisement")}, {1234: "Spotify.exe"})
+    backend = FakeAudioBackend()
+    daemon = SpotifyAdsMuteDaemon(
+        address=str(tmp_path / 'daemon.sock'),
+        window_resolver=SpotifyWindowResolver(api),
+        session_manager=SpotifySessionManager(backend),
+        process_watcher=SpotifyProcessWatcher(FakeProcessTable({1234: "Spotify.exe"})),
+        platform_backend=PlatformBackend(),
+        history=EventStore(str(tmp_path / 'events.bin')),
+        ad_index=KnownAdIndex(str(tmp_path / 'known_ads.bin')),
+        fade=False,
+    )
+    thread = threading.Thread(target=daemon.run, daemon=True)
+    thread.start()
+    try:
+        for _ in range(200):
+            try:
+                client = ControlClient(daemon.control.address)
+                break
+            except OSError:
+                threading.Event().wait(0.01)
+        with client:
+            for _ in range(200):
+                status = client.request('status')
+                if status['muted']:
+                    break
+                threading.Event().wait(0.01)
+            assert status['ad_count'] == 1 and status['title'] == "Advertisement"
+
+            assert client.request('disable')['enabled'] is False
+            for _ in range(200):
+                if not client.request('status')['muted']:
+                    break
+                threading.Event().wait(0.01)
+            assert client.request('status')['state'] == 'disabled'
+            assert 'latency' in client.request('stats')
+            assert client.request('shutdown')['stopping']
+        thread.join(5.0)
+        assert not thread.is_alive()
+    finally:
+        daemon.request_stop()
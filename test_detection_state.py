@@ -0,0 +1,97 @@
+from detection_state import AD, CLOSED, PAUSED, PLAYING, SUSPECT_AD, DetectionStateMachine
+
+
+def feed(machine, timeline):
+    """timeline: (thời điểm, tiêu đề, is_ad) -> danh sách lệnh âm thanh"""
+    actions = []
+    for now, title, is_ad in timeline:
+        transition = machine.observe(title, is_ad, now=now)
+        if transition is not None and transition.action:
+            actions.append(transition.action)
+    return actions
+
+
+def test_transient_titles_during_track_switch_cost_nothing():
+    machine = DetectionStateMachine()
+    actions = feed(machine, [
+        (0.0, "A - One", False),
+        (200.0, "Spotify", True),     # chuyển bài
+        (200.2, "", False),           # cửa sổ chớp mất
+        (200.3, "B - Two", False),
+    ])
+    assert actions == [] and machine.state == PLAYING
+    assert machine.blips == 2
+    # Cách làm cũ: mute khi thấy "Spotify" rồi unmute ở bài kế tiếp
+    assert machine.naive_actions == 2 and machine.saved_actions == 2
+
+
+def test_ad_break_costs_one_mute_and_one_unmute():
+    machine = DetectionStateMachine()
+    actions = feed(machine, [
+        (0.0, "A - One", False),
+        (10.0, "Advertisement", True),
+        (40.0, "Spotify", True),      # giữa hai quảng cáo
+        (41.0, "Brand X", True),
+        (70.0, "B - Two", False),
+    ])
+    assert actions == ['mute', 'unmute']
+    assert machine.state_counts[AD] == 2 and machine.state_counts[PAUSED] == 1
+
+
+def test_pause_is_confirmed_without_muting_and_resume_is_free():
+    machine = DetectionStateMachine(confirm_pause=1.0)
+    feed(machine, [(0.0, "A - One", False)])
+    assert machine.observe("Spotify Free", True, now=5.0).state == SUSPECT_AD
+    assert machine.confirm_in(now=5.5) == 0.5
+    assert machine.tick(now=5.5) is None
+    assert machine.tick(now=6.0).state == PAUSED
+    assert feed(machine, [(60.0, "A - One", False)]) == []
+    assert not machine.muted and machine.saved_actions == 2
+
+
+def test_confirmation_windows_and_closed_state():
+    machine = DetectionStateMachine(confirm_ad=0.5, confirm_song=0.5, confirm_closed=2.0)
+    feed(machine, [(0.0, "A - One", False)])
+    # Quảng cáo phải giữ 0.5 s, bài hát chớp qua giữa đợt không unmute
+    assert feed(machine, [(10.0, "Advertisement", True), (10.2, "A - One", False)]) == []
+    assert feed(machine, [(11.0, "Advertisement", True), (11.5, "Advertisement", True)]) == \
+        ['mute']
+    assert feed(machine, [(40.0, "B - Two", False), (40.1, "Brand X", True)]) == []
+    assert machine.state == AD and machine.muted
+
+    # Spotify đóng giữa quảng cáo: không đổi âm thanh, bài đầu tiên khi mở lại sẽ unmute
+    machine.observe("", False, now=50.0)
+    assert machine.tick(now=52.0).state == CLOSED and machine.muted
+    assert feed(machine, [(90.0, "C - Three", False), (90.5, "C - Three", False)]) == \
+        ['unmute']
+
+
+def test_pre_mute_is_undone_by_next_song():
+    machine = DetectionStateMachine()
+    feed(machine, [(0.0, "A - One", False)])
+    machine.set_muted(True)
+    assert feed(machine, [(100.0, "B - Two", False)]) == ['unmute']
+
+
+def test_audible_pause_title_escalates_to_ad():
+    machine = DetectionStateMachine(confirm_pause=1.0)
+    feed(machine, [(0.0, "A - One", False)])
+    assert machine.observe("Spotify", True, now=5.0, audible=True).state == SUSPECT_AD
+    # Còn tiếng khi hết cửa sổ: quảng cáo chỉ hiện "Spotify"
+    transition = machine.tick(now=6.0, audible=True)
+    assert transition.state == AD and transition.action == 'mute'
+    assert machine.escalations == 1 and machine.stats()['escalations'] == 1
+
+
+def test_pause_title_without_audio_evidence_never_mutes():
+    for audible in (None, False):
+        machine = DetectionStateMachine(confirm_pause=1.0)
+        feed(machine, [(0.0, "A - One", False)])
+        machine.observe("Spotify", True, now=5.0, audible=audible)
+        transition = machine.tick(now=6.0, audible=audible)
+        assert transition.state == PAUSED and transition.action is None
+        assert not machine.muted and machine.escalations == 0
+    # Bộ phân loại không coi là quảng cáo: có tiếng cũng không nâng lên AD
+    machine = DetectionStateMachine(confirm_pause=1.0)
+    machine.observe("Spotify", False, now=5.0, audible=True)
+    assert machine.tick(now=6.0, audible=True).state == PAUSED
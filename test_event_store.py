@@ -0,0 +1,122 @@
+import json
+import os
+import time
+
+import event_store
+from async_monitor import AsyncMonitor
+from event_store import (EventLog, EventStore, ad_breaks, ads_per_hour, median_ad_length,
+                         misclassifications)
+from test_async_monitor import run_monitor
+from title_watcher import ScriptedTitleSource
+
+T0 = 1_700_000_000.0
+
+
+def write_session(path, events):
+    store = EventStore(path).start()
+    for ts, kind, title, is_ad in events:
+        store.record(kind, title, is_ad=is_ad, latency=0.02 if kind == event_store.MUTE else None,
+                     ts=T0 + ts)
+    store.close()
+    return store
+
+
+SESSION = [
+    (0, event_store.START, None, False),
+    (1, event_store.TITLE, "Artist - Song 1", False),
+    (200, event_store.TITLE, "Advertisement", True),
+    (200.05, event_store.MUTE, None, False),
+    (215, event_store.TITLE, "Spotify", True),
+    (230, event_store.TITLE, "Artist - Song 2", False),
+    (230.05, event_store.UNMUTE, None, False),
+    (500, event_store.PRE_MUTE, None, False),
+    (501, event_store.TITLE, "Artist - Song 3", False),
+    (900, event_store.TITLE, "Brand", True),
+    (901, event_store.TITLE, "Artist - Song 4", False),
+    (1000, event_store.STOP, None, False),
+]
+
+
+def test_queries_over_recorded_session(tmp_path):
+    path = str(tmp_path / 'events.bin')
+    store = write_session(path, SESSION)
+    assert store.totals['ads'] == 2
+
+    with EventLog(path) as log:
+        assert len(log) == len(SESSION)
+        assert [(b.end - b.start) for b in ad_breaks(log)] == [30, 1]
+        assert median_ad_length(log) == 15.5
+        assert ads_per_hour(log)['breaks'] == 2
+        reasons = sorted(m.reason for m in misclassifications(log))
+        assert reasons == ['false_pre_mute', 'short_ad']
+        # Tìm theo thời gian bằng tìm kiếm nhị phân
+        assert [e.kind for e in log.events(since=T0 + 900)] == [
+            event_store.TITLE, event_store.TITLE, event_store.STOP]
+        assert log.title(log[2].title_id) == "Advertisement"
+
+
+def test_reopen_appends_and_recovers_torn_write(tmp_path):
+    path = str(tmp_path / 'events.bin')
+    write_session(path, SESSION)
+    # Lần ghi trước bị ngắt giữa chừng: thừa nửa bản ghi, mất file tổng số
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 7)
+    os.remove(str(tmp_path / 'events.stats'))
+
+    store = write_session(path, [(2000, event_store.TITLE, "Advertisement", True),
+                                 (2030, event_store.TITLE, "Artist - Song 1", False)])
+    assert store.totals['ads'] == 3
+    assert store.totals['records'] == len(SESSION) + 2
+    with EventLog(path) as log:
+        assert len(log) == len(SESSION) + 2
+        # Tiêu đề cũ dùng lại id, không thêm vào bảng
+        assert log[-1].title_id == log[1].title_id
+
+
+def test_totals_are_checkpointed_while_running(tmp_path):
+    path = str(tmp_path / 'events.bin')
+    store = EventStore(path, flush_interval=0.05, batch_size=1, checkpoint_records=3).start()
+    for i in range(4):
+        store.record(event_store.TITLE, "Advertisement", is_ad=i % 2 == 0, ts=T0 + i)
+    stats = tmp_path / 'events.stats'
+    deadline = time.monotonic() + 2.0
+    while not stats.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Chưa close() (vd tiến trình bị kill lúc này) mà file tổng số đã có
+    assert json.loads(stats.read_text())['records'] >= 3
+    store.close()
+    assert json.loads(stats.read_text())['records'] == 4
+    assert not os.path.exists(str(stats) + '.tmp')
+
+
+def test_clock_stepping_back_keeps_range_queries_working(tmp_path):
+    path = str(tmp_path / 'events.bin')
+    store = write_session(path, [(10, event_store.TITLE, "Artist - Song 1", False),
+                                 (5, event_store.TITLE, "Advertisement", True),
+                                 (20, event_store.TITLE, "Artist - Song 2", False)])
+    assert store.clamped == 1
+    # Lần chạy sau bắt đầu với đồng hồ còn lùi hơn bản ghi cuối
+    store = write_session(path, [(1, event_store.STOP, None, False)])
+    assert store.clamped == 1
+
+    with EventLog(path) as log:
+        assert [e.ts - T0 for e in log.events()] == [10, 10, 20, 20]
+        assert [log.title(e.title_id) for e in log.events(since=T0 + 10, until=T0 + 20)] == [
+            "Artist - Song 1", "Advertisement"]
+        assert len(list(log.events(since=T0 + 15))) == 2
+
+
+def test_monitor_records_titles_and_actions(tmp_path):
+    path = str(tmp_path / 'events.bin')
+    store = EventStore(path).start()
+    source = ScriptedTitleSource([(0.0, "Artist - Song"), (0.05, "Advertisement")])
+    monitor = AsyncMonitor(source, lambda t: ' - ' not in t, lambda: True, lambda: True,
+                           check_interval=0.01, history=store)
+    source.start()
+    run_monitor(monitor, 0.2)
+    store.close()
+
+    with EventLog(path) as log:
+        kinds = [e.kind for e in log]
+    assert kinds == [event_store.START, event_store.TITLE, event_store.TITLE,
+                     event_store.MUTE, event_store.UNMUTE, event_store.STOP]
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from latency_stats import LatencyHistogram, LatencyRecorder
+
+
+def test_bucket_boundaries():
+    histogram = LatencyHistogram()
+    assert histogram._bucket(0.0) == 0
+    assert histogram._bucket(histogram.MIN_VALUE) == 0
+    for seconds in (2e-6, 1e-3, 0.0123, 0.5, 42.0):
+        index = histogram._bucket(seconds)
+        # Cận dưới bao gồm, cận trên không: sai số tối đa một bước GROWTH
+        assert histogram._bucket_upper(index - 1) <= seconds < histogram._bucket_upper(index)
+    assert histogram._bucket(1e-3) < histogram._bucket(1e-3 * histogram.GROWTH ** 2)
+
+
+def test_percentiles_on_known_data():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000.0)
+
+    assert histogram.count == 100
+    for pct, exact in ((50, 0.050), (95, 0.095), (99, 0.099)):
+        value = histogram.percentile(pct)
+        assert exact <= value <= exact * histogram.GROWTH
+    # Không vượt quá giá trị lớn nhất đã thấy
+    assert histogram.percentile(100) == pytest.approx(0.1)
+    assert histogram.percentile(0) == pytest.approx(0.001 * histogram.GROWTH, rel=0.1)
+
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['mean_ms'] == pytest.approx(50.5)
+    assert summary['min_ms'] == 1.0 and summary['max_ms'] == 100.0
+    assert summary['p50_ms'] <= summary['p95_ms'] <= summary['p99_ms'] <= summary['max_ms']
+
+
+def test_empty_histogram_and_recorder(tmp_path):
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+    assert histogram.summary() == {'count': 0, 'mean_ms': 0.0, 'min_ms': 0.0, 'p50_ms': 0.0,
+                                   'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+
+    clock = iter([1.0, 1.25])
+    recorder = LatencyRecorder(clock=lambda: next(clock))
+    assert recorder.format_stage('mute') == "chưa có dữ liệu"
+    with recorder.time('mute'):
+        pass
+    assert recorder.get('mute').count == 1
+    assert recorder.format_stage('mute') == "p50 250.0 / p95 250.0 / p99 250.0 ms"
+
+    path = recorder.export(str(tmp_path / 'latency.json'))
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['mute']['max_ms'] == 250.0
@@ -0,0 +1,231 @@
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+from audio_sessions import SpotifySessionManager
+from linux_backend import (AD_TITLE, PAUSED_TITLE, FakeSinkServer, MprisTitleSource,
+                           PulseAudioBackend, mpris_title)
+from platform_backends import LinuxMprisBackend, create_platform_backend
+
+
+def metadata(artist, title, track_id='/com/spotify/track/1'):
+    return {
+        'mpris:trackid': ('o', track_id),
+        'xesam:artist': ('as', [artist] if artist else []),
+        'xesam:title': ('s', title),
+    }
+
+
+def test_mpris_metadata_maps_to_window_style_titles():
+    assert mpris_title(metadata('Radiohead', 'Creep'), 'Playing') == "Radiohead - Creep"
+    assert mpris_title(metadata('', 'Brand X', 'spotify:ad:123'), 'Playing') == AD_TITLE
+    assert mpris_title(metadata('', 'Brand X', '/com/spotify/ad/123'), 'Playing') == AD_TITLE
+    assert mpris_title(metadata('Radiohead', 'Creep'), 'Paused') == PAUSED_TITLE
+
+
+def test_title_source_tracks_partial_updates():
+    source = MprisTitleSource()
+    assert source.get_title() == ""
+
+    source.update({'Metadata': ('a{sv}', metadata('Adele', 'Hello')),
+                   'PlaybackStatus': ('s', 'Playing')}, replace=True)
+    assert source.get_title() == "Adele - Hello"
+    source.update({'PlaybackStatus': ('s', 'Paused')})
+    assert source.get_title() == PAUSED_TITLE
+    source.set_present(False)
+    assert source.get_title() == ""
+
+
+def test_pulse_backend_mutes_only_spotify_streams():
+    server = FakeSinkServer()
+    spotify = server.add_stream('spotify')
+    browser = server.add_stream('firefox', 'Firefox')
+    backend = PulseAudioBackend(client=server, client_factory=lambda name: server)
+    manager = SpotifySessionManager(backend)
+
+    assert manager.mute() == 1
+    assert server.is_muted(spotify) and not server.is_muted(browser)
+    assert manager.unmute() == 1
+    assert not server.is_muted(spotify)
+    assert server.list_calls == 1
+
+
+def test_pulse_stream_respawn_refreshes_cache():
+    server = FakeSinkServer()
+    first = server.add_stream('spotify')
+    backend = PulseAudioBackend(client=server, client_factory=lambda name: server)
+    manager = SpotifySessionManager(backend)
+    manager.mute()
+
+    # Spotify mở stream mới giữa hai quảng cáo
+    server.remove_stream(first)
+    second = server.add_stream('spotify')
+    time.sleep(0.05)
+    assert manager.mute() == 1
+    assert server.is_muted(second)
+    backend.close()
+
+
+def test_platform_backend_selection():
+    assert isinstance(create_platform_backend('linux'), LinuxMprisBackend)
+    with pytest.raises(ValueError):
+        create_platform_backend('beos')
+
+
+@pytest.fixture
+def session_bus():
+    """dbus-daemon riêng cho test, trả về địa chỉ bus"""
+    pytest.importorskip('jeepney')
+    daemon = shutil.which('dbus-daemon')
+    if daemon is None:
+        pytest.skip("không có dbus-daemon")
+    proc = subprocess.Popen([daemon, '--session', '--nofork', '--print-address=1'],
+                            stdout=subprocess.PIPE, text=True)
+    address = proc.stdout.readline().strip()
+    yield address
+    proc.terminate()
+    proc.wait(5)
+
+
+class FakeSpotifyPlayer:
+    """Dịch vụ MPRIS giả lập trên session bus (trả lời GetAll, phát PropertiesChanged)"""
+
+    def __init__(self, address):
+        from jeepney.bus_messages import message_bus
+        from jeepney.io.blocking import open_dbus_connection
+
+        self.conn = open_dbus_connection(address)
+        self.conn.send_and_get_reply(message_bus.RequestName('org.mpris.MediaPlayer2.spotify'))
+        self.properties = {'Metadata': ('a{sv}', metadata('Radiohead', 'Creep')),
+                           'PlaybackStatus': ('s', 'Playing')}
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        from jeepney import new_method_return
+
+        while not self.stop.is_set():
+            try:
+                msg = self.conn.receive(timeout=0.1)
+            except TimeoutError:
+                continue
+            except OSError:
+                return
+            if msg.header.message_type.name == 'method_call':
+                self.conn.send_message(new_method_return(msg, 'a{sv}', (self.properties,)))
+
+    def change(self, **changed):
+        from jeepney import DBusAddress, new_signal
+
+        self.properties.update(changed)
+        emitter = DBusAddress('/org/mpris/MediaPlayer2',
+                              interface='org.freedesktop.DBus.Properties')
+        self.conn.send_message(new_signal(emitter, 'PropertiesChanged', 'sa{sv}as',
+                                          ('org.mpris.MediaPlayer2.Player', changed, [])))
+
+    def close(self):
+        self.stop.set()
+        self.thread.join(1.0)
+        self.conn.close()
+
+
+def test_mpris_source_on_local_session_bus(session_bus):
+    from jeepney.io.blocking import open_dbus_connection
+
+    player = FakeSpotifyPlayer(session_bus)
+    source = MprisTitleSource(connection_factory=lambda: open_dbus_connection(session_bus),
+                              poll_timeout=0.05)
+    notified = threading.Event()
+    stop = threading.Event()
+    thread = threading.Thread(target=source.run, args=(notified.set, stop), daemon=True)
+    thread.start()
+    try:
+        assert notified.wait(2.0)
+        assert source.get_title() == "Radiohead - Creep"
+
+        notified.clear()
+        player.change(Metadata=('a{sv}', metadata('', 'Brand X', '/com/spotify/ad/1')))
+        assert notified.wait(2.0)
+        assert source.get_title() == AD_TITLE
+
+        # Spotify thoát: tên trên bus biến mất
+        notified.clear()
+        player.close()
+        assert notified.wait(2.0)
+        deadline = time.monotonic() + 2.0
+        while source.get_title() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert source.get_title() == ""
+    finally:
+        stop.set()
+        thread.join(2.0)
+
+
+def test_pulse_external_unmute_is_reconciled():
+    server = FakeSinkServer()
+    spotify = server.add_stream('spotify')
+    backend = PulseAudioBackend(client=server, client_factory=lambda name: server)
+    manager = SpotifySessionManager(backend)
+    manager.mute()
+    time.sleep(0.05)
+    calls = server.mute_calls
+    assert manager.mute() == 1
+    assert server.mute_calls == calls
+
+    server.external_mute(spotify, False)
+    deadline = time.monotonic() + 2.0
+    while not manager.out_of_sync() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.mute() == 1
+    assert server.is_muted(spotify)
+    backend.close()
+
+
+def test_pulse_client_is_not_used_from_two_threads_at_once():
+    from volume_fader import FadingMuter, VolumeFader
+
+    server = FakeSinkServer()
+    server.add_stream('spotify')
+
+    class ExclusiveClient:
+        """pulsectl.Pulse giả: phát hiện hai thread cùng gọi vào client"""
+
+        def __init__(self):
+            self.inside = 0
+            self.overlaps = 0
+            self.calls = 0
+
+        def __getattr__(self, name):
+            method = getattr(server, name)
+
+            def call(*args):
+                self.inside += 1
+                self.calls += 1
+                if self.inside > 1:
+                    self.overlaps += 1
+                time.sleep(0.0005)
+                try:
+                    return method(*args)
+                finally:
+                    self.inside -= 1
+            return call
+
+    client = ExclusiveClient()
+    backend = PulseAudioBackend(client=client, client_factory=lambda name: server)
+    manager = SpotifySessionManager(backend)
+    muter = FadingMuter(manager, VolumeFader(backend, step_interval=0.001), fade_out=0.1)
+    # Thread fader đổi âm lượng trong khi thread audio liệt kê và SetMute
+    muter.mute()
+    deadline = time.monotonic() + 0.1
+    while time.monotonic() < deadline:
+        manager.invalidate()
+        manager.set_mute(False)
+    assert muter.fader.wait(2.0)
+    muter.close()
+    backend.close()
+    assert client.calls > 20
+    assert client.overlaps == 0
@@ -0,0 +1,131 @@
+import logging
+import os
+import queue
+
+from log_setup import BatchingRotatingFileHandler, LazyQueueHandler, LogWriter
+
+
+def make_record(msg, *args):
+    return logging.LogRecord('test', logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_batches_until_flush(tmp_path):
+    path = tmp_path / 'app.log'
+    handler = BatchingRotatingFileHandler(str(path), batch_size=10)
+    for i in range(5):
+        handler.handle(make_record("line %s", i))
+    assert path.read_text() == ""
+
+    handler.flush()
+    assert path.read_text().splitlines() == [f"line {i}" for i in range(5)]
+    handler.close()
+
+
+def test_rotates_by_size(tmp_path):
+    path = tmp_path / 'app.log'
+    handler = BatchingRotatingFileHandler(str(path), max_bytes=100, batch_size=1, backup_count=2)
+    for i in range(40):
+        handler.handle(make_record("message number %s", i))
+    handler.close()
+
+    assert handler.rotations > 2
+    assert os.path.getsize(path) <= 100
+    assert (tmp_path / 'app.log.1').exists() and (tmp_path / 'app.log.2').exists()
+    assert not (tmp_path / 'app.log.3').exists()
+
+
+def test_rotates_by_time(tmp_path):
+    path = tmp_path / 'app.log'
+    handler = BatchingRotatingFileHandler(str(path), rotate_interval=3600, batch_size=1)
+    handler.handle(make_record("old"))
+    handler.rollover_at = 0
+    handler.handle(make_record("new"))
+    handler.close()
+
+    assert (tmp_path / 'app.log.1').read_text() == "old\n"
+    assert path.read_text() == "new\n"
+
+
+def test_queue_handler_snapshots_message_but_defers_formatting(tmp_path):
+    formatted = []
+
+    class Formatter(logging.Formatter):
+        def format(self, record):
+            formatted.append(record.getMessage())
+            return super().format(record)
+
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger('test_lazy')
+    logger.propagate = False
+    logger.addHandler(LazyQueueHandler(log_queue))
+    stats = {'ads': 1}
+    logger.warning("stats: %s", stats)
+    # Tham số đổi sau khi log: dòng log giữ giá trị lúc gọi
+    stats['ads'] = 2
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("lỗi %d", 7)
+    # Traceback chưa được format trên thread gọi
+    records = [log_queue.get(), log_queue.get()]
+    assert [r.msg for r in records] == ["stats: {'ads': 1}", "lỗi 7"]
+    assert records[1].exc_info and records[1].exc_text is None
+    for record in records:
+        log_queue.put(record)
+
+    handler = BatchingRotatingFileHandler(str(tmp_path / 'app.log'))
+    handler.setFormatter(Formatter())
+    writer = LogWriter(log_queue, [handler], flush_interval=0.05)
+    writer.start()
+    writer.stop()
+    text = (tmp_path / 'app.log').read_text(encoding='utf-8')
+    assert text.startswith("stats: {'ads': 1}\nlỗi 7\nTraceback")
+    assert "ValueError: boom" in text
+    assert formatted == ["stats: {'ads': 1}", "lỗi 7"]
+
+
+def test_failed_rollover_keeps_writing_and_retries(tmp_path, monkeypatch):
+    path = tmp_path / 'app.log'
+    handler = BatchingRotatingFileHandler(str(path), max_bytes=40, batch_size=1)
+    handler.handle(make_record("first line of the log"))
+
+    real_replace = os.replace
+
+    def locked(source, target):
+        raise PermissionError("file đang được tiến trình khác mở")
+
+    # Windows: bản console và tray cùng mở spotify_mute.log
+    monkeypatch.setattr(os, 'replace', locked)
+    handler.handle(make_record("second line of the log"))
+    handler.handle(make_record("third"))
+    assert handler.errors == 1 and handler.rotations == 0
+    assert handler.stream is not None
+    assert path.read_text().splitlines() == ["first line of the log",
+                                             "second line of the log", "third"]
+
+    # Hết hạn thử lại: xoay vòng bình thường
+    monkeypatch.setattr(os, 'replace', real_replace)
+    handler._size_retry_at = 0.0
+    handler.handle(make_record("fourth"))
+    handler.close()
+    assert handler.rotations == 1 and path.read_text() == "fourth\n"
+
+
+def test_writer_survives_handler_errors_and_queue_is_bounded(tmp_path):
+    class BrokenHandler(logging.Handler):
+        def handle(self, record):
+            raise OSError("đĩa đầy")
+
+    log_queue = queue.Queue(2)
+    lazy = LazyQueueHandler(log_queue)
+    for i in range(3):
+        lazy.handle(make_record("line %s", i))
+    # Queue đầy: record bị bỏ, thread gọi không bị chặn
+    assert lazy.dropped == 1
+
+    handler = BatchingRotatingFileHandler(str(tmp_path / 'app.log'))
+    writer = LogWriter(log_queue, [BrokenHandler(), handler], flush_interval=0.05)
+    writer.start()
+    writer.stop()
+    assert writer.errors == 2
+    assert (tmp_path / 'app.log').read_text().splitlines() == ["line 0", "line 1"]
@@ -8,8 +8,12 @@ try:
     from comtypes import CLSCTX_ALL
     from pycaw.pycaw import AudioUtilities, ISimpleAudioVolume
 except ImportError as e:
-    print(f"Lỗi: Thiếu thư viện cần thiết: {e}")
-    sys.exit(1)
+    if __name__ == "__main__":
+        print(f"Lỗi: Thiếu thư viện cần thiết: {e}")
+        sys.exit(1)
+    # Chạy qua pytest ngoài Windows: bỏ qua thay vì thoát cả phiên kiểm thử
+    import pytest
+    pytest.skip(f"Thiếu thư viện cần thiết: {e}", allow_module_level=True)
 
 logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 logger = logging.getLogger(__name__)
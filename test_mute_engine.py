@@ -0,0 +1,150 @@
+import time
+
+from ad_index import KnownAdIndex
+from config import AppConfig
+from detection_state import AD, PAUSED, PLAYING
+import event_store
+from event_store import EventLog, EventStore
+from mute_engine import AudioSink, MuteEngine, Notifier, TitleSource
+from platform_backends import FakePlatformBackend, PlatformBackend
+from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+
+
+class ListTitleSource(TitleSource):
+    def __init__(self, title=""):
+        self.title = title
+        self.invalidations = 0
+
+    def get_title(self) -> str:
+        return self.title
+
+    def invalidate(self):
+        self.invalidations += 1
+
+
+class RecordingSink(AudioSink):
+    def __init__(self):
+        self.calls = []
+
+    def mute(self) -> int:
+        self.calls.append('mute')
+        return 1
+
+    def unmute(self) -> int:
+        self.calls.append('unmute')
+        return 1
+
+
+class RecordingNotifier(Notifier):
+    def __init__(self):
+        self.states = []
+
+    def notify(self, engine):
+        self.states.append(engine.state)
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_engine_end_to_end_on_fake_backend(tmp_path):
+    backend = FakePlatformBackend("Artist - Song")
+    notifier = RecordingNotifier()
+    table = FakeProcessTable({backend.pid: "Spotify.exe"})
+    engine = MuteEngine(
+        config=AppConfig({'check_interval': 0.01}),
+        platform_backend=backend,
+        notifiers=[notifier],
+        process_watcher=SpotifyProcessWatcher(table, min_interval=0.0),
+        history=EventStore(str(tmp_path / 'events.bin')),
+        ad_index=KnownAdIndex(str(tmp_path / 'known_ads.bin')),
+        fade=False,
+    )
+    engine.start()
+    try:
+        assert wait_for(lambda: engine.last_title == "Artist - Song")
+        backend.set_title("Advertisement")
+        assert wait_for(lambda: backend.audio.is_muted('spotify-1'))
+        assert engine.state == 'muted' and engine.ad_count == 1
+        backend.set_title("Artist - Next Song")
+        assert wait_for(lambda: not backend.audio.is_muted('spotify-1'))
+        assert engine.song_count == 1
+
+        backend.set_title("Advertisement")
+        assert wait_for(lambda: engine.is_muted)
+        # Tắt chức năng giữa quảng cáo: trả lại âm thanh ngay
+        engine.set_enabled(False)
+        assert wait_for(lambda: engine.state == 'disabled' and not engine.is_muted)
+        assert not backend.audio.is_muted('spotify-1')
+        engine.set_enabled(True)
+        assert wait_for(lambda: engine.is_muted)
+
+        # Spotify thoát: nguồn tiêu đề và session bị bỏ cache
+        table.kill(backend.pid)
+        assert wait_for(lambda: not engine.process_watcher.running)
+    finally:
+        engine.stop()
+
+    assert not backend.audio.is_muted('spotify-1')
+    assert 'muted' in notifier.states and notifier.states[-1] == 'enabled'
+    assert engine.stats()['sessions'] and engine.stats()['detection']['state']
+    with EventLog(str(tmp_path / 'events.bin')) as log:
+        kinds = [(e.kind, e.is_ad) for e in log if e.kind == event_store.TITLE]
+    assert kinds[:3] == [(event_store.TITLE, False), (event_store.TITLE, True),
+                         (event_store.TITLE, False)]
+
+
+def test_pluggable_parts_through_synchronous_checks(tmp_path):
+    source = ListTitleSource("Artist - Song")
+    sink = RecordingSink()
+    notifier = RecordingNotifier()
+    clock = [0.0]
+    engine = MuteEngine(
+        config=AppConfig({'detection': {'confirm_pause': 1.0}}),
+        platform_backend=PlatformBackend(),
+        title_source=source,
+        audio_sink=sink,
+        notifiers=[notifier],
+        process_watcher=SpotifyProcessWatcher(FakeProcessTable({1: "Spotify.exe"})),
+        history=EventStore(str(tmp_path / 'events.bin')).start(),
+    )
+    engine.monitor.detector.clock = lambda: clock[0]
+
+    def check(title, t):
+        source.title = title
+        clock[0] = t
+        return engine.check(now=t)
+
+    assert check("Artist - Song", 0.0) == "Artist - Song"
+    assert engine.detector.state == PLAYING and sink.calls == []
+    check("Advertisement", 1.0)
+    assert engine.detector.state == AD and sink.calls == ['mute']
+    # Tiêu đề tạm dừng giữa hai quảng cáo không tốn lệnh âm thanh, vẫn là một đợt
+    check("Spotify", 2.0)
+    check("Advertisement", 2.2)
+    check("Artist - Other", 3.0)
+    assert sink.calls == ['mute', 'unmute'] and engine.ad_count == 1
+    # Tiêu đề tạm dừng chớp qua khi chuyển bài bị bỏ qua
+    check("Spotify", 3.5)
+    check("Artist - Third", 3.6)
+    assert engine.detector.blips == 1 and engine.detector.state == PLAYING
+    # Tạm dừng thật: chỉ đổi trạng thái khi hết cửa sổ xác nhận
+    check("Spotify", 4.0)
+    assert engine.detector.state != PAUSED
+    check("Spotify", 5.5)
+    assert engine.detector.state == PAUSED and sink.calls == ['mute', 'unmute']
+    assert notifier.states[1] == 'muted' and notifier.states[-1] == 'enabled'
+    assert engine.song_count == 1
+
+    # Lịch sử đếm giống engine: tạm dừng không phải quảng cáo
+    engine.history.close()
+    assert engine.history.totals['ads'] == engine.ad_count == 1
+    assert engine.history.totals['songs'] == 1
+    with EventLog(str(tmp_path / 'events.bin')) as log:
+        pauses = [log.title(e.title_id) for e in log.events() if e.kind == event_store.PAUSE]
+    assert pauses == ["Spotify"] * 3
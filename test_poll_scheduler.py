@@ -0,0 +1,68 @@
+from poll_scheduler import PollScheduler
+
+
+def test_burst_after_change_then_normal_then_idle():
+    scheduler = PollScheduler(0.3, burst_interval=0.1, burst_duration=2.0,
+                              idle_interval=2.0, idle_after=600.0)
+    scheduler.on_sample("Artist - Song", True, now=0.0)
+    assert scheduler.next_interval(now=0.5) == 0.1
+    assert scheduler.mode == 'burst'
+
+    scheduler.on_sample("Artist - Song", False, now=10.0)
+    assert scheduler.next_interval(now=10.0) == 0.3
+    assert scheduler.next_interval(now=601.0) == 2.0
+    assert scheduler.mode == 'idle'
+
+
+def test_absent_and_disabled_back_off():
+    scheduler = PollScheduler(0.3, absent_interval=5.0)
+    scheduler.on_sample("", True, now=0.0)
+    assert scheduler.next_interval(now=10.0) == 5.0
+    assert scheduler.mode == 'absent'
+    assert scheduler.next_interval(enabled=False, now=10.0) is None
+    assert scheduler.rate() == 0.0
+
+
+def test_track_end_and_hot_mode_speed_up():
+    scheduler = PollScheduler(0.3, burst_interval=0.1, track_end_window=3.0)
+    scheduler.on_sample("Artist - Song", True, now=0.0)
+    assert scheduler.next_interval(track_remaining=60.0, now=100.0) == 0.3
+    assert scheduler.next_interval(track_remaining=2.0, now=100.0) == 0.1
+    assert scheduler.next_interval(hot_interval=0.05, now=100.0) == 0.05
+
+
+def test_push_backend_has_no_burst():
+    scheduler = PollScheduler(5.0, burst_interval=None)
+    scheduler.on_sample("Artist - Song", True, now=0.0)
+    assert scheduler.next_interval(now=0.1) == 5.0
+
+
+def test_wakeups_per_minute_uses_recent_window():
+    scheduler = PollScheduler(rate_window=60.0)
+    for i in range(120):
+        scheduler.on_sample("Artist - Song", i == 0, now=i * 0.5)
+    assert scheduler.wakeups_per_minute(now=59.5) == 120
+    assert scheduler.wakeups_per_minute(now=100.0) == 40
+
+
+def test_detector_state_backs_off_and_settled_titles_skip_burst():
+    from detection_state import AD, CLOSED, PAUSED, PLAYING, SUSPECT_AD
+
+    scheduler = PollScheduler(0.3, burst_interval=0.1, idle_interval=2.0, absent_interval=5.0)
+    scheduler.on_sample("Spotify Free", True, now=0.0)
+    # Tạm dừng đã xác nhận: lùi ngay, không chờ idle_after
+    assert scheduler.next_interval(now=1.5, state=PAUSED) == 2.0
+    assert scheduler.mode == 'paused'
+    # Trạng thái ban đầu CLOSED (chưa phân loại gì) không lùi khi vẫn có tiêu đề
+    assert scheduler.next_interval(now=1.5, state=CLOSED) == 0.3
+    scheduler.on_sample("", True, now=1.6)
+    assert scheduler.next_interval(now=1.7, state=CLOSED) == 5.0
+
+    scheduler.on_sample("Artist - Song", True, now=10.0)
+    # Tiêu đề chưa xác nhận: burst; bài hát/quảng cáo đã xác nhận: chu kỳ gốc
+    assert scheduler.next_interval(now=10.5, state=SUSPECT_AD) == 0.1
+    assert scheduler.next_interval(now=10.5, state=PLAYING) == 0.3
+    assert scheduler.next_interval(now=10.5, state=AD) == 0.3
+    # Bài sắp hết vẫn burst
+    assert scheduler.next_interval(track_remaining=1.0, now=10.5, state=PLAYING) == 0.1
+    assert scheduler.stats()['modes'] == {'paused': 1, 'absent': 1, 'burst': 2, 'normal': 3}
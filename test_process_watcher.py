@@ -0,0 +1,94 @@
+from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+from window_resolver import FakeWindowApi, SpotifyWindowResolver
+
+
+def make_table(count=300):
+    return FakeProcessTable({1000 + i: "svchost.exe" for i in range(count)})
+
+
+def test_only_new_pids_are_looked_up():
+    table = make_table()
+    watcher = SpotifyProcessWatcher(table)
+    watcher.poll()
+    assert table.name_lookups == 300
+
+    table.spawn(2001, "notepad.exe")
+    table.kill(1000)
+    watcher.poll()
+    watcher.poll()
+    assert table.name_lookups == 301
+    assert not watcher.running
+
+
+def test_denied_name_lookup_is_retried():
+    table = make_table(5)
+    table.spawn(4242, "Spotify.exe")
+    table.denied.add(4242)
+    watcher = SpotifyProcessWatcher(table)
+    assert watcher.poll() == []
+    assert not watcher.running and watcher.unresolved == 1
+
+    # Tiến trình vừa khởi động xong, tra tên được: không bị nhớ là "không phải Spotify"
+    table.denied.clear()
+    events = watcher.poll()
+    assert [event.kind for event in events] == ['started']
+    assert watcher.pids == {4242}
+    assert table.name_lookups == 7
+
+
+def test_started_and_exited_events():
+    table = make_table(10)
+    watcher = SpotifyProcessWatcher(table)
+    seen = []
+    watcher.add_listener(seen.append)
+    assert watcher.poll() == []
+
+    table.spawn(42, "Spotify.exe")
+    table.spawn(43, "Spotify.exe")
+    [event] = watcher.poll()
+    assert event.kind == 'started' and event.pids == {42, 43}
+
+    # Một tiến trình con thoát: Spotify vẫn chạy, không có sự kiện
+    table.kill(43)
+    assert watcher.poll() == []
+    assert watcher.pids == {42}
+
+    table.kill(42)
+    [event] = watcher.poll()
+    assert event.kind == 'exited'
+    assert [e.kind for e in seen] == ['started', 'exited']
+
+
+def test_maybe_poll_is_rate_limited():
+    now = [0.0]
+    table = make_table(5)
+    watcher = SpotifyProcessWatcher(table, min_interval=2.0, clock=lambda: now[0])
+    watcher.maybe_poll()
+    now[0] = 1.0
+    watcher.maybe_poll()
+    assert table.pid_calls == 1
+    now[0] = 2.5
+    watcher.maybe_poll()
+    assert table.pid_calls == 2
+
+
+def test_resolver_uses_watcher_pids_instead_of_name_lookups():
+    table = make_table(5)
+    table.spawn(42, "Spotify.exe")
+    watcher = SpotifyProcessWatcher(table)
+    watcher.poll()
+
+    windows = {i: (1000 + i, f"Window {i}") for i in range(5)}
+    windows[9002] = (42, "Artist - Song")
+    api = FakeWindowApi(windows, dict(table.processes))
+    resolver = SpotifyWindowResolver(api, process_watcher=watcher)
+
+    assert resolver.get_title() == "Artist - Song"
+    assert api.name_lookups == 0
+
+
+def test_process_table_is_created_lazily():
+    watcher = SpotifyProcessWatcher()
+    resolver = SpotifyWindowResolver(process_watcher=watcher)
+    # Chưa import psutil/win32gui cho tới lần poll/quét đầu tiên
+    assert watcher._table is None and resolver._api is None
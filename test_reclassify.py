@@ -0,0 +1,63 @@
+import json
+
+from reclassify import iter_log_titles, log_chunks, run
+
+LOG_LINES = [
+    "2026-01-01 10:00:00,001 - INFO - Title changed: '' -> 'Radiohead - Creep'",
+    "2026-01-01 10:00:00,002 - INFO - Check Ad: 'Radiohead - Creep' -> IsAd: False",
+    "2026-01-01 10:03:00,000 - INFO - Check Ad: 'Advertisement' -> IsAd: True",
+    "2026-01-01 10:03:30,000 - INFO - Check Ad: 'Spotify Singles - Live' -> IsAd: False",
+    "2026-01-01 10:06:00,000 - INFO - 📢 Phát hiện quảng cáo #1: 'Brand X'",
+    "2026-01-01 10:06:30,000 - INFO - 🎶 Đang phát bài: 'Spotify Singles - Live'",
+]
+
+
+def write_log(tmp_path):
+    path = tmp_path / 'spotify_mute.log'
+    # File xoay vòng cũ hơn được đọc trước
+    (tmp_path / 'spotify_mute.log.1').write_text(
+        "2026-01-01 09:00:00,000 - INFO - Check Ad: 'Old - Song' -> IsAd: False\n",
+        encoding='utf-8')
+    path.write_text('\n'.join(LOG_LINES) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def test_log_titles_from_tray_and_console_lines(tmp_path):
+    path = write_log(tmp_path)
+    records = sorted((r.title, r.recorded, r.count) for r in iter_log_titles(path))
+    assert records == [
+        ('Advertisement', True, 1),
+        ('Brand X', True, 1),
+        ('Old - Song', False, 1),
+        ('Radiohead - Creep', False, 1),
+        ('Spotify Singles - Live', False, 2),
+    ]
+
+
+def test_chunks_split_on_line_boundaries(tmp_path):
+    path = write_log(tmp_path)
+    chunks = list(log_chunks(path, chunk_size=50))
+    assert len(chunks) > 2
+    assert sum(1 for _ in iter_log_titles(path)) == 5
+
+
+def test_diff_report_against_new_rules(tmp_path):
+    path = write_log(tmp_path)
+    rules = tmp_path / 'rules.json'
+    # Luật mới: bỏ allow-list -> "Spotify Singles" bị coi là quảng cáo
+    rules.write_text(json.dumps({'allowed_artists': []}), encoding='utf-8')
+
+    report = run([path], new_spec=str(rules)).to_dict()
+    assert report['total'] == 6
+    assert report['changed'] == 2
+    assert report['pairs']['music->ad'] == 2
+    assert report['examples']['music->ad'][0]['title'] == 'Spotify Singles - Live'
+
+    # Chia việc cho process pool cho cùng kết quả
+    assert run([path], new_spec=str(rules), workers=2).to_dict()['pairs'] == report['pairs']
+
+
+def test_labelled_timeline_counts_errors():
+    report = run(['bench_timelines/edge_cases.tsv']).to_dict()
+    assert report['labelled'] == report['total'] > 0
+    assert 'old' not in report['errors']
@@ -0,0 +1,54 @@
+import logging
+import threading
+
+from ad_classifier import AdClassifier
+from linux_backend import MprisTitleSource, PulseAudioBackend
+from sampling_profiler import IDLE, SamplingProfiler
+from window_resolver import Win32WindowApi
+
+
+def test_busy_classification_and_idle_threads_are_split(tmp_path):
+    finished = []
+    profiler = SamplingProfiler(interval=0.002, duration=0.4, on_finish=finished.append)
+    stop = threading.Event()
+    waiter = threading.Thread(target=stop.wait, name='idle-waiter', daemon=True)
+    waiter.start()
+
+    classifier = AdClassifier(cache_size=0)
+    profiler.start()
+    i = 0
+    while profiler.running:
+        classifier.is_ad(f"Artist {i} - Song {i}")
+        i += 1
+    stop.set()
+    summary = profiler.stop()
+
+    assert finished == [profiler]
+    assert summary['samples'] > summary['busy_samples'] > 0
+    assert summary['categories']['classification']['pct'] > 50
+    assert summary['categories'][IDLE]['samples'] > 0
+    assert 'idle-waiter' not in summary['threads']
+
+    path = profiler.write_collapsed(str(tmp_path / 'profile.folded'))
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert any(line.startswith('idle-waiter;') and 'threading:Event.wait' in line
+               for line in lines)
+    assert any('ad_classifier:AdClassifier._classify' in line for line in lines)
+    assert "Phân loại" in profiler.format_summary()
+
+
+def test_frames_are_grouped_by_module_and_class():
+    profiler = SamplingProfiler()
+    assert profiler._classify(Win32WindowApi.enum_windows.__code__)[1] == 'enum_windows'
+    assert profiler._classify(MprisTitleSource.get_title.__code__)[1] == 'enum_windows'
+    assert profiler._classify(PulseAudioBackend.find_sessions.__code__)[1] == 'com_sessions'
+    assert profiler._classify(logging.Logger.info.__code__)[1] == 'logging'
+    assert profiler._classify(threading.Event.wait.__code__)[2]
+    # Bản EXE: đường dẫn tương đối kiểu Windows trong archive của PyInstaller
+    namespace = {}
+    exec(compile("def process_iter():\n    pass\n", 'psutil\\__init__.py', 'exec'), namespace)
+    label, category, idle = profiler._classify(namespace['process_iter'].__code__)
+    assert (label, category, idle) == ('psutil:process_iter', 'psutil', False)
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+from async_monitor import AsyncMonitor
+from poll_scheduler import PollScheduler
+from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+from title_watcher import ScriptedTitleSource, WinEventSource
+from window_resolver import FakeWindowApi, SpotifyWindowResolver
+
+
+def test_win_event_source_only_wakes_for_spotify_windows():
+    api = FakeWindowApi({100: (1234, "Artist - Song"), 200: (999, "Inbox - Mail"),
+                         300: (999, "Terminal")}, {1234: "Spotify.exe", 999: "chrome.exe"})
+    resolver = SpotifyWindowResolver(api)
+    source = WinEventSource(window_filter=resolver.is_spotify_window)
+    # Chưa biết Spotify: không cửa sổ nào đánh thức monitor (resync sẽ tìm ra)
+    assert not source.wants(100, source.OBJID_WINDOW, source.CHILDID_SELF)
+
+    assert resolver.get_title() == "Artist - Song"
+    # Tab trình duyệt, terminal đổi tiêu đề: bỏ qua
+    assert not source.wants(200, source.OBJID_WINDOW, source.CHILDID_SELF)
+    assert not source.wants(300, source.OBJID_WINDOW, source.CHILDID_SELF)
+    assert source.wants(100, source.OBJID_WINDOW, source.CHILDID_SELF)
+    # Control con của cửa sổ Spotify: bỏ qua
+    assert not source.wants(100, 5, source.CHILDID_SELF)
+    assert source.events == 4 and source.ignored == 3
+
+    # Cửa sổ Spotify đã đóng (không tra được PID): vẫn nhận ra theo HWND đã cache
+    del api.windows[100]
+    assert source.wants(100, source.OBJID_WINDOW, source.CHILDID_SELF)
+
+
+def test_resolver_filter_uses_process_watcher_pids():
+    api = FakeWindowApi({100: (1234, "Artist - Song"), 200: (999, "Inbox")},
+                        {1234: "Spotify.exe", 999: "chrome.exe"})
+    watcher = SpotifyProcessWatcher(FakeProcessTable({1234: "Spotify.exe", 999: "chrome.exe"}))
+    watcher.poll()
+    resolver = SpotifyWindowResolver(api, process_watcher=watcher)
+    # Spotify vừa mở, chưa quét cửa sổ nào: PID từ process watcher là đủ
+    assert resolver.is_spotify_window(100)
+    assert not resolver.is_spotify_window(200)
+
+
+def test_monitor_with_event_source_reads_only_on_events():
+    source = ScriptedTitleSource([(0.0, "A - 1"), (0.05, "Advertisement"), (0.1, "B - 2")])
+    seen = []
+    calls = []
+
+    def is_ad(title):
+        seen.append(title)
+        return ' - ' not in title
+
+    monitor = AsyncMonitor(source, is_ad, lambda: calls.append('mute') or True,
+                           lambda: calls.append('unmute') or True, event_source=source,
+                           scheduler=PollScheduler(5.0, burst_interval=None))
+    source.start()
+    thread = threading.Thread(target=asyncio.run, args=(monitor.run(),), daemon=True)
+    thread.start()
+    time.sleep(0.25)
+    monitor.stop()
+    thread.join(2.0)
+
+    assert not thread.is_alive()
+    assert seen == ["A - 1", "Advertisement", "B - 2"]
+    assert calls == ['mute', 'unmute']
+    # Lần đọc đầu + một lần cho mỗi sự kiện, không polling theo chu kỳ 5 s
+    assert monitor.samples <= 5
+
+
+def test_scripted_source_follows_timeline():
+    clock = [0.0]
+    source = ScriptedTitleSource([(1.0, "B - 2"), (0.0, "A - 1")], clock=lambda: clock[0])
+    assert source() == ""
+    source.start()
+    assert source() == "A - 1"
+    clock[0] = 1.5
+    assert source() == "B - 2" and source.finished
+    assert source.change_times() == [(0.0, "A - 1"), (1.0, "B - 2")]
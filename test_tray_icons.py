@@ -0,0 +1,50 @@
+import pytest
+
+from tray_icons import ICON_SIZE, STATE_COLORS, IconSprites, IconUpdater
+
+
+class FakeIcon:
+    def __init__(self):
+        self.assigned = []
+
+    def __setattr__(self, name, value):
+        if name == 'icon':
+            self.assigned.append(value)
+        object.__setattr__(self, name, value)
+
+
+class StubSprites:
+    def __init__(self):
+        self.lookups = 0
+
+    def get(self, state, badge=None):
+        self.lookups += 1
+        return (state, badge)
+
+
+def test_sprites_render_one_image_per_state():
+    pytest.importorskip('PIL')
+    sprites = IconSprites()
+    assert set(sprites.images) == {(state, None) for state in STATE_COLORS}
+    images = [sprites.get(state) for state in STATE_COLORS]
+    assert all(image.size == (ICON_SIZE, ICON_SIZE) for image in images)
+    # Mỗi trạng thái một màu nền riêng
+    center = (ICON_SIZE // 2, 8)
+    assert len({image.getpixel(center) for image in images}) == len(STATE_COLORS)
+    # Tra bảng trả lại đúng ảnh đã vẽ, không vẽ lại
+    assert sprites.get('muted') is sprites.get('muted')
+
+
+def test_updater_skips_unchanged_state():
+    sprites = StubSprites()
+    updater = IconUpdater(sprites)
+    icon = FakeIcon()
+
+    for state in ('enabled', 'enabled', 'muted', 'muted', 'muted', 'enabled'):
+        updater.apply(icon, state)
+
+    assert icon.assigned == [('enabled', None), ('muted', None), ('enabled', None)]
+    assert updater.updates == 3 and updater.skipped == 3
+    assert sprites.lookups == 3
+    assert not updater.apply(icon, 'enabled')
+    assert updater.apply(icon, 'enabled', badge='update')
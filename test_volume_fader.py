@@ -0,0 +1,108 @@
+import time
+
+from audio_sessions import FakeAudioBackend, SpotifySessionManager
+from volume_fader import FadingMuter, VolumeFader
+
+
+def make_muter(keys=('a',), volume=0.63, **kwargs):
+    backend = FakeAudioBackend(keys)
+    for state in backend.sessions.values():
+        state['volume'] = volume
+    fader = VolumeFader(backend, step_interval=0.005)
+    muter = FadingMuter(SpotifySessionManager(backend), fader, **kwargs)
+    return backend, fader, muter
+
+
+def test_fade_out_and_restore_exact_original_volume():
+    backend, fader, muter = make_muter(('a', 'b'), fade_out=0.03, fade_in=0.05)
+
+    assert muter.mute() == 2
+    assert fader.wait(2.0)
+    assert backend.sessions['a']['volume'] == 0.0
+    assert not backend.sessions['a']['muted']
+
+    assert muter.unmute() == 2
+    assert fader.wait(2.0)
+    assert backend.sessions['a']['volume'] == 0.63
+    assert backend.sessions['b']['volume'] == 0.63
+    assert not fader.active()
+    assert fader.jitter.count > 0
+    fader.close()
+
+
+def test_flip_back_cancels_ramp_without_jump():
+    backend, fader, muter = make_muter(fade_out=0.5, fade_in=0.05)
+
+    muter.mute()
+    time.sleep(0.1)
+    # Phân loại nhầm: bài hát quay lại giữa chừng đường dốc
+    muter.unmute()
+    assert fader.wait(2.0)
+    assert fader.cancelled == 1
+    assert backend.sessions['a']['volume'] == 0.63
+    fader.close()
+
+
+def test_repeated_duck_costs_no_calls_and_close_restores():
+    backend, fader, muter = make_muter(fade_out=0.02, duck_level=0.2)
+
+    muter.mute()
+    fader.wait(2.0)
+    assert abs(backend.sessions['a']['volume'] - 0.126) < 1e-9
+    calls = backend.set_volume_calls
+    muter.mute()
+    fader.wait(2.0)
+    assert backend.set_volume_calls == calls
+
+    # Thoát giữa quảng cáo: âm lượng gốc được đặt lại ngay
+    muter.close()
+    assert backend.sessions['a']['volume'] == 0.63
+
+
+def test_when_done_fires_after_fade_and_drops_cancelled_ramp():
+    backend, fader, muter = make_muter(fade_out=0.1, fade_in=0.02)
+    done = []
+
+    # Không có đường dốc: báo ngay
+    fader.when_done(done.append)
+    assert len(done) == 1
+
+    muter.mute()
+    fader.when_done(lambda t: done.append(('mute', t)))
+    time.sleep(0.03)
+    # Bị unmute hủy giữa chừng: lần mute không bao giờ "xong"
+    muter.unmute()
+    fader.when_done(lambda t: done.append(('unmute', t)))
+    assert fader.wait(2.0)
+    assert [name for name, _ in done[1:]] == ['unmute']
+
+    submitted = fader.clock()
+    muter.mute()
+    fader.when_done(lambda t: done.append(('mute', t)))
+    assert fader.wait(2.0)
+    assert done[-1][0] == 'mute' and done[-1][1] - submitted >= 0.1
+    assert backend.sessions['a']['volume'] == 0.0
+    fader.close()
+
+
+def test_title_to_mute_is_measured_when_fade_completes():
+    from async_monitor import AsyncMonitor
+    from latency_stats import LatencyRecorder
+    from mute_engine import SessionAudioSink
+
+    backend = FakeAudioBackend(('a',))
+    sink = SessionAudioSink(SpotifySessionManager(backend), fade=True)
+    sink.fading_muter.fade_out = 0.1
+    titles = iter(["Artist - Song", "Advertisement"])
+    latency = LatencyRecorder()
+    monitor = AsyncMonitor(lambda: next(titles), lambda t: ' - ' not in t,
+                           lambda: sink.mute() > 0, lambda: sink.unmute() > 0,
+                           latency=latency, settled=sink.when_settled)
+    monitor.check_once()
+    monitor.check_once()
+    assert monitor.is_muted
+    # Lệnh đã gửi nhưng đường dốc chưa xong: chưa tính là đã im lặng
+    assert latency.get('title_to_mute') is None
+    assert sink.fading_muter.fader.wait(2.0)
+    assert latency.get('title_to_mute').min >= 0.1
+    sink.close()
@@ -0,0 +1,154 @@
+from window_resolver import FakeWindowApi, SpotifyWindowResolver
+
+
+def make_desktop(extra_windows=200):
+    windows = {i: (1000 + i, f"Window {i}") for i in range(extra_windows)}
+    windows[9001] = (42, "")
+    windows[9002] = (42, "Artist - Song")
+    processes = {1000 + i: "explorer.exe" for i in range(extra_windows)}
+    processes[42] = "Spotify.exe"
+    return FakeWindowApi(windows, processes)
+
+
+def test_first_call_scans_then_uses_cache():
+    api = make_desktop()
+    resolver = SpotifyWindowResolver(api)
+
+    assert resolver.get_title() == "Artist - Song"
+    assert resolver.misses == 1 and resolver.rescans == 1
+    lookups = api.name_lookups
+
+    for _ in range(50):
+        assert resolver.get_title() == "Artist - Song"
+    assert resolver.hits == 50
+    assert api.enum_calls == 1
+    assert api.name_lookups == lookups
+
+
+def test_title_change_is_seen_without_rescan():
+    api = make_desktop()
+    resolver = SpotifyWindowResolver(api)
+    resolver.get_title()
+
+    api.windows[9002] = (42, "Advertisement")
+    assert resolver.get_title() == "Advertisement"
+    assert resolver.rescans == 1
+
+
+def test_stale_handle_triggers_rescan():
+    api = make_desktop()
+    resolver = SpotifyWindowResolver(api)
+    resolver.get_title()
+
+    # Spotify khởi động lại: cửa sổ mới, PID mới
+    del api.windows[9002]
+    api.windows[9100] = (77, "Artist - Other")
+    api.processes[77] = "Spotify.exe"
+
+    assert resolver.get_title() == "Artist - Other"
+    assert resolver.rescans == 2
+    assert resolver.spotify_pids == {42, 77}
+
+
+def test_spotify_closed_returns_empty():
+    api = make_desktop(extra_windows=5)
+    resolver = SpotifyWindowResolver(api)
+    resolver.get_title()
+
+    del api.windows[9001]
+    del api.windows[9002]
+    assert resolver.get_title() == ""
+    assert resolver.hwnd is None
+
+
+def test_blank_title_on_cached_window_does_not_rescan():
+    api = make_desktop()
+    resolver = SpotifyWindowResolver(api)
+    resolver.get_title()
+
+    # Đang đổi bài / ẩn xuống khay: HWND và PID vẫn đúng, tiêu đề rỗng
+    api.windows[9002] = (42, "   ")
+    for _ in range(20):
+        assert resolver.get_title() == ""
+    assert resolver.rescans == 1 and api.enum_calls == 1
+
+    api.windows[9002] = (42, "Artist - Next")
+    assert resolver.get_title() == "Artist - Next"
+    assert resolver.hwnd == 9002
+
+
+def test_empty_rescans_are_rate_limited():
+    now = [0.0]
+    api = make_desktop(extra_windows=5)
+    del api.windows[9001]
+    del api.windows[9002]
+    resolver = SpotifyWindowResolver(api, rescan_backoff=2.0, clock=lambda: now[0])
+
+    # Cửa sổ chớp mất lúc chuyển bài: vẫn quét ở mỗi lần đọc
+    for i in range(4):
+        now[0] = i * 0.5
+        assert resolver.get_title() == ""
+    assert resolver.rescans == 4
+
+    # Mất đã lâu: mỗi rescan_backoff giây chỉ quét một lần
+    for i in range(20, 35):
+        now[0] = i * 0.1
+        assert resolver.get_title() == ""
+    assert resolver.rescans == 4
+    now[0] = 3.5
+    assert resolver.get_title() == ""
+    assert resolver.rescans == 5
+
+    api.windows[9100] = (77, "Artist - Song")
+    api.processes[77] = "Spotify.exe"
+    now[0] = 4.0
+    assert resolver.get_title() == ""
+    now[0] = 5.5
+    assert resolver.get_title() == "Artist - Song"
+    assert resolver.rescans == 6
+
+    # invalidate() (người dùng bấm làm mới) luôn quét lại ngay
+    del api.windows[9100]
+    for t in (6.0, 8.0):
+        now[0] = t
+        assert resolver.get_title() == ""
+    resolver.invalidate()
+    api.windows[9100] = (77, "Artist - Song")
+    assert resolver.get_title() == "Artist - Song"
+    assert resolver.rescans == 9
+
+
+def test_window_back_within_backoff_is_seen_at_once():
+    now = [0.0]
+    api = make_desktop(extra_windows=5)
+    resolver = SpotifyWindowResolver(api, clock=lambda: now[0])
+    resolver.get_title()
+
+    saved = api.windows.pop(9002)
+    now[0] = 0.3
+    assert resolver.get_title() == ""
+    api.windows[9002] = saved
+    now[0] = 0.6
+    assert resolver.get_title() == "Artist - Song"
+
+
+def test_new_spotify_pid_skips_rescan_backoff():
+    from process_watcher import FakeProcessTable, SpotifyProcessWatcher
+
+    table = FakeProcessTable({42: "Spotify.exe"})
+    watcher = SpotifyProcessWatcher(table)
+    watcher.poll()
+    api = FakeWindowApi({}, {42: "Spotify.exe"})
+    now = [0.0]
+    resolver = SpotifyWindowResolver(api, process_watcher=watcher, clock=lambda: now[0])
+    for t in (0.0, 2.0, 3.0):
+        now[0] = t
+        assert resolver.get_title() == ""
+    assert resolver.rescans == 2
+
+    # Spotify khởi động lại với PID mới: quét lại ngay dù chưa hết backoff
+    table.processes = {77: "Spotify.exe"}
+    watcher.poll()
+    api.windows[9100] = (77, "Artist - Song")
+    assert resolver.get_title() == "Artist - Song"
+    assert resolver.rescans == 3
@@ -0,0 +1,195 @@
+"""
+Title Watcher - Nguồn sự kiện đổi tiêu đề cho AsyncMonitor
+
+- WinEventSource: đẩy (push) trên Windows bằng SetWinEventHook, chỉ đánh thức
+  monitor khi cửa sổ của Spotify đổi tiêu đề/đóng/mở, không thức dậy định kỳ
+- ScriptedTitleSource: nguồn tiêu đề giả lập theo kịch bản, vừa là get_title vừa
+  là event_source, dùng để đo độ trễ phát hiện và số lần thức dậy trên Linux (xem
+  bench_watcher.py)
+
+Nguồn sự kiện cần có run(notify, stop_event) (blocking, gọi notify() mỗi khi có thể
+có thay đổi) và wake() (đánh thức run() để xử lý stop).
+"""
+
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WinEventSource:
+    """
+    Nguồn sự kiện Windows dùng SetWinEventHook
+
+    Lắng nghe EVENT_OBJECT_NAMECHANGE (đổi tiêu đề) và EVENT_OBJECT_DESTROY..HIDE
+    (cửa sổ đóng/mở) của các cửa sổ top-level. Hook nhận sự kiện của mọi ứng dụng
+    (tab trình duyệt, terminal, ...) nên chỉ cửa sổ được window_filter chấp nhận
+    mới đánh thức monitor. Thêm một WM_TIMER thưa (resync) để tự phục hồi nếu lỡ
+    mất sự kiện (vd cửa sổ Spotify mới chưa có trong cache).
+    """
+
+    EVENT_OBJECT_DESTROY = 0x8001
+    EVENT_OBJECT_HIDE = 0x8003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WINEVENT_SKIPOWNPROCESS = 0x0002
+    OBJID_WINDOW = 0
+    CHILDID_SELF = 0
+    WM_TIMER = 0x0113
+    WM_APP = 0x8000
+
+    def __init__(self, resync_interval: float = 5.0, window_filter=None):
+        """
+        Args:
+            resync_interval: Chu kỳ đọc lại tiêu đề dự phòng (giây)
+            window_filter: Hàm hwnd -> bool, True nếu là cửa sổ của Spotify (vd
+                SpotifyWindowResolver.is_spotify_window); None = mọi cửa sổ
+        """
+        self.resync_interval = resync_interval
+        self.window_filter = window_filter
+        self._thread_id = None
+        self.events = 0
+        self.ignored = 0
+
+    def wants(self, hwnd, id_object: int, id_child: int) -> bool:
+        """Sự kiện có cần đánh thức monitor không (chạy trên thread của hook, phải rẻ)"""
+        # Chỉ quan tâm tới chính cửa sổ top-level, bỏ qua control con
+        if id_object != self.OBJID_WINDOW or id_child != self.CHILDID_SELF:
+            return False
+        self.events += 1
+        if self.window_filter is None:
+            return True
+        try:
+            if self.window_filter(hwnd):
+                return True
+        except Exception as e:
+            logger.debug("Không kiểm tra được cửa sổ %s: %s", hwnd, e)
+        self.ignored += 1
+        return False
+
+    def run(self, notify, stop_event):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None,
+            wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD,
+        )
+
+        def callback(hook, event, hwnd, id_object, id_child, thread, time_ms):
+            if self.wants(hwnd, id_object, id_child):
+                notify()
+
+        # Giữ tham chiếu tới callback để không bị GC thu hồi
+        self._callback = WinEventProc(callback)
+        flags = self.WINEVENT_OUTOFCONTEXT | self.WINEVENT_SKIPOWNPROCESS
+        hooks = [
+            user32.SetWinEventHook(
+                self.EVENT_OBJECT_NAMECHANGE, self.EVENT_OBJECT_NAMECHANGE,
+                0, self._callback, 0, 0, flags),
+            user32.SetWinEventHook(
+                self.EVENT_OBJECT_DESTROY, self.EVENT_OBJECT_HIDE,
+                0, self._callback, 0, 0, flags),
+        ]
+        self._thread_id = kernel32.GetCurrentThreadId()
+        timer_id = user32.SetTimer(None, 0, int(self.resync_interval * 1000), None)
+
+        try:
+            msg = wintypes.MSG()
+            while not stop_event.is_set():
+                if user32.GetMessageW(ctypes.byref(msg), None, 0, 0) <= 0:
+                    break
+                if msg.message in (self.WM_TIMER, self.WM_APP):
+                    notify()
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            user32.KillTimer(None, timer_id)
+            for hook in hooks:
+                if hook:
+                    user32.UnhookWinEvent(hook)
+            self._thread_id = None
+
+    def wake(self):
+        if self._thread_id is not None:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_APP, 0, 0)
+
+
+class ScriptedTitleSource:
+    """
+    Nguồn tiêu đề giả lập theo kịch bản (dùng để đo trên Linux)
+
+    Kịch bản là danh sách (thời điểm tính bằng giây, tiêu đề). Có thể dùng làm
+    get_title của AsyncMonitor khi polling, đồng thời làm event_source khi push.
+    """
+
+    def __init__(self, timeline, clock=time.perf_counter):
+        """
+        Args:
+            timeline: Danh sách (offset giây, tiêu đề), sắp xếp theo thời gian
+            clock: Hàm đồng hồ (mặc định time.perf_counter)
+        """
+        self.timeline = sorted(timeline, key=lambda item: item[0])
+        self.clock = clock
+        self.start_time = None
+        self.reads = 0
+        self._wake = threading.Event()
+
+    def start(self):
+        """Bắt đầu phát kịch bản từ thời điểm hiện tại"""
+        self.start_time = self.clock()
+
+    @property
+    def finished(self) -> bool:
+        if self.start_time is None or not self.timeline:
+            return False
+        return self.clock() - self.start_time >= self.timeline[-1][0]
+
+    def __call__(self) -> str:
+        """Trả về tiêu đề đang hiển thị theo kịch bản"""
+        self.reads += 1
+        if self.start_time is None:
+            return ""
+        elapsed = self.clock() - self.start_time
+        title = ""
+        for offset, value in self.timeline:
+            if offset > elapsed:
+                break
+            title = value
+        return title
+
+    def change_times(self):
+        """Thời điểm tuyệt đối (theo clock) của từng lần đổi tiêu đề"""
+        return [(self.start_time + offset, title) for offset, title in self.timeline]
+
+    def run(self, notify, stop_event):
+        """Giả lập nguồn sự kiện: gọi notify() đúng lúc tiêu đề đổi"""
+        if self.start_time is None:
+            self.start()
+        for offset, _ in self.timeline:
+            while not stop_event.is_set():
+                remaining = self.start_time + offset - self.clock()
+                if remaining <= 0:
+                    break
+                if self._wake.wait(remaining):
+                    self._wake.clear()
+                    if not stop_event.is_set():
+                        notify()
+            if stop_event.is_set():
+                return
+            notify()
+        # Hết kịch bản: chỉ còn chờ refresh/stop
+        while not stop_event.is_set():
+            if self._wake.wait(0.1):
+                self._wake.clear()
+                if not stop_event.is_set():
+                    notify()
+
+    def wake(self):
+        self._wake.set()
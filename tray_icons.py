@@ -0,0 +1,99 @@
+"""
+Tray Icons - Icon system tray được vẽ sẵn một lần khi khởi động
+
+Mỗi trạng thái (đang hoạt động / đang mute / đã tắt, cộng badge nếu có) được vẽ
+một lần thành ảnh PIL. Khi trạng thái đổi chỉ cần tra bảng, và IconUpdater bỏ
+qua lần cập nhật nếu trạng thái không đổi.
+"""
+
+ICON_SIZE = 64
+
+# Màu nền theo trạng thái
+STATE_COLORS = {
+    'enabled': (30, 215, 96),     # Spotify green
+    'muted': (255, 100, 100),     # Muted red
+    'disabled': (128, 128, 128),  # Disabled gray
+}
+
+# Trạng thái có vẽ dấu X cạnh loa
+CROSSED_STATES = ('muted',)
+
+# Badge phụ (chấm tròn góc trên bên phải), thêm biến thể mới vào đây
+BADGE_COLORS = {
+    None: None,
+}
+
+
+def render_icon(state: str, badge=None):
+    """
+    Vẽ icon cho một trạng thái
+
+    Args:
+        state: 'enabled', 'muted' hoặc 'disabled'
+        badge: Tên badge trong BADGE_COLORS (None = không có)
+    """
+    from PIL import Image, ImageDraw
+
+    size = ICON_SIZE
+    image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+
+    # Vẽ hình tròn
+    draw.ellipse([4, 4, size-4, size-4], fill=STATE_COLORS[state])
+
+    # Vẽ icon loa
+    draw.rectangle([20, 24, 28, 40], fill='white')
+    draw.polygon([(28, 20), (44, 12), (44, 52), (28, 44)], fill='white')
+
+    if state in CROSSED_STATES:
+        # Vẽ dấu X khi muted
+        draw.line([(48, 22), (58, 42)], fill='white', width=3)
+        draw.line([(48, 42), (58, 22)], fill='white', width=3)
+
+    badge_color = BADGE_COLORS.get(badge)
+    if badge_color is not None:
+        draw.ellipse([size-20, 2, size-2, 20], fill=badge_color, outline='white', width=2)
+
+    return image
+
+
+class IconSprites:
+    """
+    Bảng icon đã vẽ sẵn cho mọi tổ hợp (trạng thái, badge)
+    """
+
+    def __init__(self, states=tuple(STATE_COLORS), badges=tuple(BADGE_COLORS)):
+        self.images = {
+            (state, badge): render_icon(state, badge)
+            for state in states
+            for badge in badges
+        }
+
+    def get(self, state: str, badge=None):
+        return self.images[(state, badge)]
+
+
+class IconUpdater:
+    """
+    Gán icon cho pystray.Icon, bỏ qua nếu trạng thái không đổi
+    """
+
+    def __init__(self, sprites: IconSprites):
+        self.sprites = sprites
+        self.current = None
+        self.updates = 0
+        self.skipped = 0
+
+    def apply(self, icon, state: str, badge=None) -> bool:
+        """
+        Returns:
+            True nếu icon thật sự được thay
+        """
+        key = (state, badge)
+        if key == self.current:
+            self.skipped += 1
+            return False
+        icon.icon = self.sprites.get(state, badge)
+        self.current = key
+        self.updates += 1
+        return True
@@ -0,0 +1,3 @@
+"""Phiên bản ứng dụng (tăng mỗi lần phát hành; dùng cho cache comtypes và benchmark khởi động)"""
+
+__version__ = '1.0.0'
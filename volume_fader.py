@@ -0,0 +1,348 @@
+"""
+Volume Fader - Giảm/khôi phục âm lượng Spotify theo đường dốc thay vì SetMute
+
+SetMute bật/tắt tiếng đột ngột: hết quảng cáo thì nhạc vào ngay ở âm lượng đầy,
+phân loại nhầm thì có một khoảng lặng cắt ngang bài hát. VolumeFader chạy các
+đường dốc âm lượng (SetMasterVolume) trên thread riêng với timer độ phân giải
+cao, độc lập với nhịp đọc tiêu đề:
+
+- Âm lượng gốc của từng session được ghi lại ở lần giảm đầu tiên và được đặt lại
+  đúng giá trị đó khi khôi phục xong.
+- Lệnh mới hủy đường dốc đang chạy và bắt đầu từ mức hiện tại (không nhảy âm lượng).
+- Độ trễ của từng bước so với lịch (jitter) được ghi vào histogram.
+- when_done() báo lúc đường dốc chạy xong (âm thanh đã thật sự tắt/bật), để độ
+  trễ title -> mute không chỉ đo lúc lệnh được gửi.
+
+FadingMuter dùng VolumeFader thay cho mute/unmute của SpotifySessionManager.
+"""
+
+import logging
+import sys
+import threading
+import time
+
+from latency_stats import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class HighResolutionTimer:
+    """
+    Chờ tới một mốc thời gian với sai số thấp
+
+    Ngủ tới gần mốc rồi quay vòng phần còn lại. Trên Windows bật độ phân giải
+    timer 1 ms (timeBeginPeriod) trong lúc đang có đường dốc.
+    """
+
+    def __init__(self, clock=time.perf_counter, spin: float = 0.001):
+        self.clock = clock
+        self.spin = spin
+        self._winmm = None
+
+    def begin(self):
+        if sys.platform == 'win32' and self._winmm is None:
+            try:
+                import ctypes
+                self._winmm = ctypes.WinDLL('winmm')
+                self._winmm.timeBeginPeriod(1)
+            except Exception:
+                self._winmm = None
+
+    def end(self):
+        if self._winmm is not None:
+            self._winmm.timeEndPeriod(1)
+            self._winmm = None
+
+    def sleep_until(self, deadline: float, cancelled=None):
+        """
+        Args:
+            deadline: Mốc theo clock
+            cancelled: threading.Event, dừng chờ sớm nếu được set
+        """
+        while True:
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return
+            if remaining > self.spin:
+                if cancelled is not None:
+                    if cancelled.wait(remaining - self.spin):
+                        return
+                else:
+                    time.sleep(remaining - self.spin)
+            elif cancelled is not None and cancelled.is_set():
+                return
+
+
+class _Ramp:
+    """Một đường dốc: key -> (handle, mức đầu, mức cuối), mức tính theo tỉ lệ âm lượng gốc"""
+
+    def __init__(self, targets: dict, duration: float, restore: bool, started: float):
+        self.targets = targets
+        self.duration = duration
+        self.restore = restore
+        self.started = started
+        self.done = False
+        # Gọi với thời điểm chạy xong (when_done), bị bỏ nếu đường dốc bị hủy
+        self.callbacks = []
+
+
+class VolumeFader:
+    """
+    Chạy đường dốc âm lượng trên thread riêng
+    """
+
+    def __init__(self, backend, step_interval: float = 0.01, clock=time.perf_counter,
+                 initializer=None, latency=None):
+        """
+        Args:
+            backend: AudioBackend (cần get_volume/set_volume)
+            step_interval: Khoảng cách giữa hai lần đặt âm lượng (giây)
+            clock: Hàm đồng hồ độ phân giải cao (giây)
+            initializer: Hàm khởi tạo thread fader (vd CoInitialize)
+            latency: LatencyRecorder (tùy chọn), ghi jitter vào giai đoạn 'fade_jitter'
+        """
+        self.backend = backend
+        self.step_interval = step_interval
+        self.clock = clock
+        self.initializer = initializer
+        self.latency = latency
+        self.timer = HighResolutionTimer(clock)
+        self.jitter = LatencyHistogram()
+        # key -> âm lượng gốc của người dùng; key -> mức hiện tại (tỉ lệ âm lượng gốc)
+        self.originals = {}
+        self.levels = {}
+        self.ramps = 0
+        self.cancelled = 0
+        self.steps = 0
+        self._ramp = None
+        self._current = None
+        self._closing = False
+        self._condition = threading.Condition()
+        self._new_command = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='volume-fader', daemon=True)
+            self._thread.start()
+
+    def ramp(self, handles, level: float, duration: float) -> int:
+        """
+        Đưa âm lượng các session về level × âm lượng gốc trong duration giây
+
+        Returns:
+            Số session được đưa vào đường dốc
+        """
+        return self._submit(handles, level, duration, restore=False)
+
+    def restore(self, handles, duration: float) -> int:
+        """Đưa các session về đúng âm lượng gốc rồi quên mức gốc"""
+        return self._submit(handles, 1.0, duration, restore=True)
+
+    def _submit(self, handles, level: float, duration: float, restore: bool) -> int:
+        with self._condition:
+            if self._closing:
+                return 0
+            if not self._idle.is_set():
+                self.cancelled += 1  # Đường dốc đang chạy (hoặc đang chờ) bị thay thế
+            targets = {handle.key: (handle, level) for handle in handles}
+            if not targets:
+                return 0
+            self._ramp = self._current = _Ramp(targets, max(0.0, duration), restore,
+                                               self.clock())
+            self.ramps += 1
+            self._idle.clear()
+            self._new_command.set()
+            self._condition.notify()
+        self._ensure_thread()
+        return len(targets)
+
+    def active(self) -> bool:
+        """Có session nào đang bị giảm âm lượng hoặc đang có đường dốc"""
+        return bool(self.originals) or not self._idle.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Chờ đường dốc hiện tại chạy xong"""
+        return self._idle.wait(timeout)
+
+    def when_done(self, callback):
+        """
+        Gọi callback(thời điểm theo clock) khi đường dốc mới nhất chạy xong, ngay
+        lập tức nếu không có đường dốc nào đang chạy
+
+        Đường dốc bị lệnh mới hủy giữa chừng thì callback bị bỏ (không bao giờ xong).
+        Callback chạy trên thread fader hoặc thread gọi, phải nhanh.
+        """
+        with self._condition:
+            ramp = self._current
+            if ramp is not None and not ramp.done and not self._idle.is_set():
+                ramp.callbacks.append(callback)
+                return
+        callback(self.clock())
+
+    def close(self, timeout: float = 2.0):
+        """Khôi phục ngay âm lượng gốc của mọi session (trên thread fader) và dừng thread"""
+        with self._condition:
+            self._closing = True
+            self._new_command.set()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---- Thread fader ----
+
+    def _run(self):
+        if self.initializer is not None:
+            try:
+                self.initializer()
+            except Exception as e:
+                logger.error(f"Lỗi khi khởi tạo thread fader: {e}")
+        handles = {}
+        while True:
+            with self._condition:
+                while self._ramp is None and not self._closing:
+                    self._idle.set()
+                    self._condition.wait()
+                ramp, self._ramp = self._ramp, None
+                closing = self._closing
+                self._new_command.clear()
+            if ramp is not None:
+                for key, (handle, _) in ramp.targets.items():
+                    handles[key] = handle
+                if not closing:
+                    self.timer.begin()
+                    try:
+                        completed = self._execute(ramp, handles)
+                    finally:
+                        self.timer.end()
+                    if completed:
+                        self._finish(ramp)
+            if closing:
+                self._restore_now(handles)
+                self._idle.set()
+                return
+
+    def _execute(self, ramp: _Ramp, handles: dict) -> bool:
+        """Chạy một đường dốc, trả về False nếu bị lệnh mới hủy giữa chừng"""
+        requested = dict(ramp.targets)
+        if ramp.restore:
+            # Khôi phục cả session đã giảm trước đó nhưng không còn trong danh sách
+            for key in self.originals:
+                if key not in requested and key in handles:
+                    requested[key] = (handles[key], 1.0)
+        targets = {}
+        for key, (handle, end) in requested.items():
+            if key not in self.originals:
+                if ramp.restore:
+                    continue  # Chưa từng bị giảm âm lượng
+                try:
+                    self.originals[key] = self.backend.get_volume(handle)
+                except Exception as e:
+                    logger.error("Lỗi đọc âm lượng session %s: %s", key, e)
+                    continue
+                self.levels[key] = 1.0
+            elif self.levels[key] == end and not ramp.restore:
+                continue  # Đã ở đúng mức, không cần gọi backend
+            targets[key] = (handle, self.levels[key], end)
+
+        step = 0
+        while targets:
+            deadline = ramp.started + step * self.step_interval
+            self.timer.sleep_until(deadline, self._new_command)
+            if self._new_command.is_set():
+                return False  # Bị hủy, lệnh mới bắt đầu từ mức hiện tại
+            now = self.clock()
+            if step:
+                lateness = max(0.0, now - deadline)
+                self.jitter.record(lateness)
+                if self.latency is not None:
+                    self.latency.record('fade_jitter', lateness)
+            progress = 1.0 if ramp.duration <= 0 else min(1.0, (now - ramp.started) / ramp.duration)
+            for key in list(targets):
+                handle, start, end = targets[key]
+                level = end if progress >= 1.0 else start + (end - start) * progress
+                if not self._apply(key, handle, level, final=progress >= 1.0 and ramp.restore):
+                    del targets[key]
+            self.steps += 1
+            if progress >= 1.0:
+                break
+            step += 1
+        return True
+
+    def _finish(self, ramp: _Ramp):
+        with self._condition:
+            ramp.done = True
+            callbacks, ramp.callbacks = ramp.callbacks, []
+        now = self.clock()
+        for callback in callbacks:
+            try:
+                callback(now)
+            except Exception as e:
+                logger.error(f"Lỗi trong callback của đường dốc: {e}")
+
+    def _apply(self, key, handle, level: float, final: bool) -> bool:
+        original = self.originals[key]
+        try:
+            # Bước cuối của lần khôi phục đặt đúng giá trị gốc (không nhân tỉ lệ)
+            self.backend.set_volume(handle, original if final else original * level)
+        except Exception as e:
+            logger.error("Lỗi đặt âm lượng session %s: %s", key, e)
+            self.originals.pop(key, None)
+            self.levels.pop(key, None)
+            return False
+        if final:
+            del self.originals[key]
+            del self.levels[key]
+        else:
+            self.levels[key] = level
+        return True
+
+    def _restore_now(self, handles: dict):
+        for key in list(self.originals):
+            handle = handles.get(key)
+            if handle is not None:
+                self._apply(key, handle, 1.0, final=True)
+
+    def stats(self) -> dict:
+        return {
+            'ramps': self.ramps,
+            'cancelled': self.cancelled,
+            'steps': self.steps,
+            'ducked': len(self.originals),
+            'jitter': self.jitter.summary(),
+        }
+
+
+class FadingMuter:
+    """
+    mute()/unmute() bằng đường dốc âm lượng (thay cho SetMute của session manager)
+    """
+
+    def __init__(self, session_manager, fader: VolumeFader, fade_out: float = 0.1,
+                 fade_in: float = 0.6, duck_level: float = 0.0):
+        """
+        Args:
+            session_manager: SpotifySessionManager (cung cấp danh sách session đã cache)
+            fader: VolumeFader
+            fade_out: Thời gian giảm âm lượng khi quảng cáo bắt đầu (giây)
+            fade_in: Thời gian khôi phục âm lượng khi hết quảng cáo (giây)
+            duck_level: Mức âm lượng trong lúc quảng cáo (tỉ lệ âm lượng gốc, 0 = im lặng)
+        """
+        self.session_manager = session_manager
+        self.fader = fader
+        self.fade_out = fade_out
+        self.fade_in = fade_in
+        self.duck_level = duck_level
+
+    def mute(self) -> int:
+        return self.fader.ramp(self.session_manager.get_sessions(), self.duck_level,
+                               self.fade_out)
+
+    def unmute(self) -> int:
+        return self.fader.restore(self.session_manager.get_sessions(), self.fade_in)
+
+    def close(self):
+        self.fader.close()
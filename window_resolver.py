@@ -0,0 +1,258 @@
+"""
+Window Resolver - Tìm và cache cửa sổ chính của Spotify
+
+Thay vì duyệt EnumWindows và tạo psutil.Process cho mọi cửa sổ ở mỗi lần kiểm
+tra, resolver nhớ PID và HWND của Spotify. Mỗi lần kiểm tra chỉ xác minh HWND đã
+cache (O(1)); chỉ quét lại toàn bộ khi handle cũ không còn tồn tại hoặc đã đổi
+PID. HWND vẫn hợp lệ nhưng tiêu đề rỗng (cửa sổ ẩn xuống khay, đang đổi bài) thì
+trả về chuỗi rỗng, không quét lại. Khi đã quét mà không thấy gì liên tục quá
+rescan_backoff giây (không phải cửa sổ chớp mất lúc chuyển bài), mỗi rescan_backoff
+giây chỉ quét lại một lần, trừ khi tập PID Spotify đổi. Nếu có
+SpotifyProcessWatcher, lần quét lại dùng luôn tập PID của watcher thay vì tra tên
+tiến trình cho từng cửa sổ.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Win32WindowApi:
+    """
+    Lớp bọc mỏng quanh win32gui/win32process/psutil
+
+    Import lười để module có thể dùng trên Linux với API giả lập.
+    """
+
+    def __init__(self):
+        import win32gui
+        import win32process
+        import psutil
+
+        self._win32gui = win32gui
+        self._win32process = win32process
+        self._psutil = psutil
+
+    def enum_windows(self) -> list:
+        """Danh sách HWND của các cửa sổ top-level đang hiển thị"""
+        handles = []
+
+        def callback(hwnd, result):
+            if self._win32gui.IsWindowVisible(hwnd):
+                result.append(hwnd)
+            return True
+
+        self._win32gui.EnumWindows(callback, handles)
+        return handles
+
+    def is_window(self, hwnd) -> bool:
+        """HWND còn tồn tại (cửa sổ ẩn xuống khay vẫn tính)"""
+        return bool(self._win32gui.IsWindow(hwnd))
+
+    def get_window_text(self, hwnd) -> str:
+        return self._win32gui.GetWindowText(hwnd)
+
+    def get_window_pid(self, hwnd) -> int:
+        _, pid = self._win32process.GetWindowThreadProcessId(hwnd)
+        return pid
+
+    def get_process_name(self, pid: int) -> str:
+        """
+        Returns:
+            Tên tiến trình hoặc chuỗi rỗng nếu không truy cập được
+        """
+        try:
+            return self._psutil.Process(pid).name()
+        except (self._psutil.NoSuchProcess, self._psutil.AccessDenied):
+            return ""
+
+
+class FakeWindowApi:
+    """
+    API cửa sổ giả lập cho test và benchmark trên Linux
+
+    windows: dict hwnd -> (pid, tiêu đề); processes: dict pid -> tên tiến trình
+    """
+
+    def __init__(self, windows=None, processes=None):
+        self.windows = dict(windows or {})
+        self.processes = dict(processes or {})
+        self.name_lookups = 0
+        self.enum_calls = 0
+
+    def enum_windows(self) -> list:
+        self.enum_calls += 1
+        return list(self.windows)
+
+    def is_window(self, hwnd) -> bool:
+        return hwnd in self.windows
+
+    def get_window_text(self, hwnd) -> str:
+        return self.windows[hwnd][1]
+
+    def get_window_pid(self, hwnd) -> int:
+        return self.windows[hwnd][0]
+
+    def get_process_name(self, pid: int) -> str:
+        self.name_lookups += 1
+        return self.processes.get(pid, "")
+
+
+class SpotifyWindowResolver:
+    """
+    Cache PID/HWND của Spotify, chỉ quét lại khi handle cũ hết hạn
+    """
+
+    def __init__(self, api=None, process_keyword: str = 'spotify', process_watcher=None,
+                 rescan_backoff: float = 2.0, clock=time.monotonic):
+        """
+        Args:
+            api: Đối tượng API cửa sổ (mặc định Win32WindowApi)
+            process_keyword: Từ khóa nhận diện tên tiến trình Spotify
+            process_watcher: SpotifyProcessWatcher cung cấp sẵn PID của Spotify
+            rescan_backoff: Sau chừng này giây liên tục không tìm thấy cửa sổ Spotify,
+                khoảng cách tối thiểu giữa hai lần quét lại (giây)
+            clock: Hàm đồng hồ (giây)
+        """
+        # Win32WindowApi (import win32gui/psutil) được tạo ở lần dùng đầu tiên
+        self._api = api
+        self.process_keyword = process_keyword
+        self.process_watcher = process_watcher
+        self.rescan_backoff = rescan_backoff
+        self.clock = clock
+        self.spotify_pids = set()
+        self.hwnd = None
+        # Các lần quét gần nhất không thấy gì: (lần đầu, lần cuối, tập PID của watcher)
+        self._empty_scan = None
+        # Bộ đếm để theo dõi hiệu quả cache
+        self.hits = 0
+        self.misses = 0
+        self.rescans = 0
+
+    @property
+    def api(self):
+        if self._api is None:
+            self._api = Win32WindowApi()
+        return self._api
+
+    def invalidate(self):
+        """Bỏ cache, lần gọi kế tiếp sẽ quét lại"""
+        self.hwnd = None
+        self.spotify_pids = set()
+        self._empty_scan = None
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'rescans': self.rescans,
+            'pids': sorted(self.spotify_pids),
+            'hwnd': self.hwnd,
+        }
+
+    def is_spotify_window(self, hwnd) -> bool:
+        """
+        Cửa sổ có thuộc Spotify không (lọc sự kiện WinEventSource, gọi từ thread khác)
+
+        Chỉ so với HWND/PID đã biết, không quét lại: cửa sổ của một Spotify vừa mở được
+        nhận ra nhờ process watcher hoặc lần resync kế tiếp.
+        """
+        if hwnd == self.hwnd:
+            return True
+        watcher = self.process_watcher
+        pids = watcher.pids if watcher is not None and watcher.running else self.spotify_pids
+        if not pids:
+            return False
+        return self.api.get_window_pid(hwnd) in pids
+
+    def get_title(self) -> str:
+        """
+        Lấy tiêu đề cửa sổ Spotify, ưu tiên dùng HWND đã cache
+
+        Returns:
+            Tiêu đề cửa sổ Spotify hoặc chuỗi rỗng nếu không tìm thấy
+        """
+        hwnd = self.hwnd
+        if hwnd is not None:
+            try:
+                if (self.api.is_window(hwnd)
+                        and self.api.get_window_pid(hwnd) in self.spotify_pids):
+                    # Cửa sổ vẫn là của Spotify: tiêu đề rỗng cũng không cần quét lại
+                    title = self.api.get_window_text(hwnd)
+                    self.hits += 1
+                    return title if title and title.strip() else ""
+            except Exception as e:
+                logger.debug("HWND cache không còn hợp lệ: %s", e)
+
+        self.misses += 1
+        if self._backing_off():
+            return ""
+        return self.rescan()
+
+    def _known_pids(self):
+        watcher = self.process_watcher
+        return watcher.pids if watcher is not None and watcher.running else None
+
+    def _backing_off(self) -> bool:
+        """Không thấy Spotify đã lâu, lần quét cuối còn mới và PID Spotify chưa đổi"""
+        if self._empty_scan is None:
+            return False
+        empty_since, scanned_at, pids = self._empty_scan
+        known_pids = self._known_pids()
+        if known_pids is not None and set(known_pids) != pids:
+            return False
+        now = self.clock()
+        return (now - empty_since >= self.rescan_backoff
+                and now - scanned_at < self.rescan_backoff)
+
+    def rescan(self) -> str:
+        """
+        Quét toàn bộ cửa sổ để tìm lại Spotify (đường chậm)
+
+        Returns:
+            Tiêu đề cửa sổ Spotify hoặc chuỗi rỗng nếu không tìm thấy
+        """
+        self.rescans += 1
+        self.hwnd = None
+        pids = set()
+        # Mỗi PID chỉ tra tên tiến trình một lần trong một lần quét
+        checked = {}
+        known_pids = self._known_pids()
+        found_title = ""
+
+        try:
+            handles = self.api.enum_windows()
+        except Exception as e:
+            logger.error(f"Lỗi khi lấy danh sách cửa sổ: {e}")
+            handles = []
+
+        for hwnd in handles:
+            try:
+                pid = self.api.get_window_pid(hwnd)
+                if pid not in checked:
+                    if known_pids is not None:
+                        checked[pid] = pid in known_pids
+                    else:
+                        name = self.api.get_process_name(pid)
+                        checked[pid] = self.process_keyword in name.lower()
+                if not checked[pid]:
+                    continue
+                pids.add(pid)
+                if self.hwnd is None:
+                    title = self.api.get_window_text(hwnd)
+                    if title and title.strip():
+                        self.hwnd = hwnd
+                        found_title = title
+            except Exception as e:
+                logger.debug("Bỏ qua cửa sổ %s: %s", hwnd, e)
+
+        self.spotify_pids = pids
+        if self.hwnd is None:
+            now = self.clock()
+            empty_since = self._empty_scan[0] if self._empty_scan is not None else now
+            self._empty_scan = (empty_since, now,
+                                set(known_pids) if known_pids is not None else None)
+        else:
+            self._empty_scan = None
+        return found_title